@@ -8,13 +8,49 @@ import os
 import logging
 import gevent
 import io
+import gzip
+import hmac
+import hashlib
 import argparse
+import functools
+from datetime import datetime
 
-from flask import Flask, render_template, jsonify, request, send_file
+import mimetypes
+
+from flask import (
+    Flask, render_template, jsonify, request, send_file, redirect, abort, make_response, Response, stream_with_context
+)
 from flask_socketio import SocketIO, emit
-from functions.dream_db import DreamDB
-from functions.audio import create_wav_file, process_audio
-from functions.config_loader import load_config, get_config
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+from functions.dream_db import DreamDB, SAMPLE_DREAMS_INSTALLED, encode_cursor, decode_cursor
+from functions.audio import create_wav_file, process_audio, audio_mime_type, reset_openai_client
+from functions.audio_transcode import transcode_archive, transcode_status
+from functions.config_loader import get_config, config_version, reload_config, watch_config
+from functions.library_archive import iter_export, import_archive
+from functions.db_backup import backup_loop, backup_status
+from functions.media_info import dream_media_paths
+from functions.media_scanner import scan_loop, scan_status
+from functions.storage import StorageManager
+from functions.sample_dreams import init_sample_dreams
+from functions.hub_monitor import HubMonitor
+from functions.profiling import SamplingProfiler, MemoryTracer, format_collapsed, format_import_times, measure_imports
+from functions.structured_logging import configure_logging, new_trace_id, trace, traced
+from functions.blob_store import BlobStore, BLOB_CACHE_CONTROL, PRESIGNED_URL_EXPIRES
+from functions.backgrounds import (
+    BACKGROUND_DIST_DIR, MANIFEST_NAME, HASHED_NAME_RE, SCHEDULE_DEFAULT_COUNT, SCHEDULE_MAX_COUNT,
+    total_background_images, background_urls, background_schedule
+)
+from functions.assets import (
+    ASSET_DIST_DIR, HASHED_NAME_RE as ASSET_NAME_RE, asset_tags, assets_version, negotiate_encoding, preferred_encoding
+)
+from functions.thumbnails import (
+    ThumbnailCache, THUMB_WIDTHS, thumbnail_format, thumbnail_url, thumbnail_srcset, source_key
+)
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, get_config()["LOG_LEVEL"]))
@@ -30,7 +66,8 @@ recording_state = {
     'status': 'ready',  # ready, recording, processing, generating, complete
     'transcription': '',
     'video_prompt': '',
-    'video_url': None
+    'video_url': None,
+    'trace_id': None  # Correlates the log lines of one dream, from start_recording to video_ready
 }
 
 # Video playback state
@@ -55,8 +92,16 @@ app = Flask(__name__)
 app.config.update(
     DEBUG=os.environ.get("FLASK_ENV", "production") == "development",
     HOST=get_config()["HOST"],
-    PORT=int(get_config()["PORT"])
+    PORT=get_config()["PORT"]
 )
+# Options read once at startup; a reload cannot apply them to the running app
+RESTART_REQUIRED_OPTIONS = {'HOST', 'PORT', 'DB_PATH', 'LOG_FILE', 'LOG_FILE_MAX_MB', 'LOG_FILE_BACKUPS',
+                            'HUB_MONITOR_ENABLED', 'HUB_MONITOR_INTERVAL_MS', 'HUB_BLOCK_THRESHOLD_MS',
+                            'CONFIG_WATCH_INTERVAL',
+                            # The media backend is created once, on first use
+                            'MEDIA_STORAGE_BACKEND', 'S3_ENDPOINT_URL', 'S3_BUCKET', 'S3_REGION', 'S3_PREFIX',
+                            'S3_MULTIPART_CHUNK_MB', 'S3_ACCESS_KEY_ID', 'S3_SECRET_ACCESS_KEY'}
+app.jinja_env.filters['audio_mime'] = audio_mime_type
 
 # Initialize SocketIO
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
@@ -64,6 +109,28 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
 # Initialize DreamDB
 dream_db = DreamDB()
 
+# Tracks media disk usage against the configured budget
+storage_manager = StorageManager(dream_db)
+
+# Opt-in measurement of event loop lag and of the greenlets that block it
+hub_monitor = HubMonitor()
+
+# On-demand CPU and memory profiling of the running process, behind ADMIN_TOKEN
+profiler = SamplingProfiler()
+memory_tracer = MemoryTracer()
+
+# Content-addressed media; templates link to blobs so browsers can cache them forever
+blob_store = BlobStore(dream_db)
+app.jinja_env.globals['media_url'] = blob_store.url_for
+
+# Resized thumbnail variants for the dreams grid, cached on disk
+thumbnail_cache = ThumbnailCache()
+app.jinja_env.globals['thumb_url'] = thumbnail_url
+app.jinja_env.globals['thumb_srcset'] = thumbnail_srcset
+
+# Bundled, minified scripts and styles; the source files are served as they are in development
+app.jinja_env.globals['asset_tags'] = lambda bundle: asset_tags(bundle, debug=app.config['DEBUG'])
+
 # =============================
 # Core Logic / Helper Functions
 # =============================
@@ -75,6 +142,8 @@ def initiate_recording():
     recording_state['status'] = 'recording'
     recording_state['transcription'] = '' # Reset transcription
     recording_state['video_prompt'] = ''  # Reset video prompt
+    # Every log line about this dream, up to its video, carries the same trace id
+    recording_state['trace_id'] = new_trace_id()
     # Reset audio storage
     audio_buffer = io.BytesIO() 
     audio_chunks = []
@@ -84,19 +153,17 @@ def initiate_recording():
         logger.debug("Initiated recording: state set, buffers reset, wav file created.")
 
 def init_sample_dreams_if_missing():
-    """Attempt to initialize sample dreams by running the init_sample_dreams script."""
-    import subprocess
-    import sys
-    import os
+    """Add the sample dreams to a library that never got them, logging rather than raising on failure."""
     try:
-        script_path = os.path.join(os.path.dirname(__file__), 'scripts', 'init_sample_dreams.py')
-        result = subprocess.run([sys.executable, script_path], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("Sample dreams initialized.")
-        else:
-            print("Failed to initialize sample dreams.")
+        # Recorded only once they are in, so a first boot that dies halfway gets them on the next
+        if dream_db.get_state(SAMPLE_DREAMS_INSTALLED):
+            return
+        added = init_sample_dreams(dream_db, blob_store)
+        if logger:
+            logger.info(f"Sample dreams initialized ({added} added).")
     except Exception as e:
-        print(f"Exception while initializing sample dreams: {e}")
+        if logger:
+            logger.error(f"Exception while initializing sample dreams: {str(e)}")
 
 # =============================
 # SocketIO Event Handlers
@@ -121,8 +188,9 @@ def handle_start_recording():
     if not recording_state['is_recording']:
         initiate_recording()
         emit('state_update', recording_state)
-        if logger:
-            logger.info('Started recording via socket event')
+        with trace(recording_state['trace_id']):
+            if logger:
+                logger.info('Started recording via socket event')
     else:
         if logger:
             logger.warning('Start recording event received, but already recording.')
@@ -146,22 +214,24 @@ def handle_stop_recording():
     """Socket event to stop recording and trigger processing."""
     if recording_state['is_recording']:
         sid = request.sid # Get SID before changing state
+        trace_id = recording_state.get('trace_id')
 
         # Finalize the recording
         recording_state['is_recording'] = False
         recording_state['status'] = 'processing'
-        if logger:
-            logger.info(f"Finalizing recording. Status set to processing. Triggering process_audio for SID: {sid}")
+        with trace(trace_id):
+            if logger:
+                logger.info(f"Finalizing recording. Status set to processing. Triggering process_audio for SID: {sid}")
 
-        # Process the audio in a background task, passing all required arguments
-        gevent.spawn(
-            process_audio, sid, socketio, dream_db, recording_state, audio_chunks, logger
-        )
+            # Process the audio in a background task, passing all required arguments
+            gevent.spawn(
+                traced(trace_id, process_audio), sid, socketio, dream_db, recording_state, audio_chunks, logger
+            )
 
-        # Emit the comprehensive state update after finalizing
-        emit('state_update', recording_state)
-        if logger:
-            logger.info('Stopped recording via socket event.')
+            # Emit the comprehensive state update after finalizing
+            emit('state_update', recording_state)
+            if logger:
+                logger.info('Stopped recording via socket event.')
     else:
         if logger:
             logger.warning('Stop recording event received, but not currently recording.')
@@ -170,8 +240,8 @@ def handle_stop_recording():
 def handle_show_previous_dream():
     """Socket event handler for showing previous dream."""
     try:
-        # Get the most recent dreams
-        dreams = dream_db.get_all_dreams()
+        # Get the most recent dreams that still have a video (evicted ones keep only audio and thumbnail)
+        dreams = [d for d in dream_db.get_all_dreams() if d.get('video_filename')]
         if not dreams:
             if logger:
                 logger.warning("No dreams found to cycle through.")
@@ -189,9 +259,11 @@ def handle_show_previous_dream():
         dream = dreams[video_playback_state['current_index']]
         # Emit the video URL to the client
         socketio.emit('play_video', {
-            'video_url': f"/media/video/{dream['video_filename']}",
+            'video_url': blob_store.url_for(dream, 'video'),
             'loop': True  # Enable looping for the video
         })
+        if dream.get('id') is not None:
+            dream_db.mark_played(dream['id'])
         if logger:
             logger.info(f"Emitted play_video for dream index {video_playback_state['current_index']}: {dream['video_filename']}")
 
@@ -202,38 +274,139 @@ def handle_show_previous_dream():
             logger.error(f"Error in socket handle_show_previous_dream: {str(e)}")
         socketio.emit('error', {'message': str(e)})
 
+# =============================
+# Response Caching & Compression
+# =============================
+
+# Pages and API responses worth compressing. Media is already compressed, and files sent with
+# send_file (including the precompressed asset bundles) pass through untouched.
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/plain', 'text/css', 'text/javascript', 'application/json', 'image/svg+xml'}
+RESPONSE_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+# Fast settings: these bodies are compressed on every request, on a Pi
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+# Templates and code only change with a restart, so validators from a previous run are not trusted
+_PROCESS_TAG = os.urandom(4).hex()
+
+def _versioned(version):
+    """Validate a GET view's response with an ETag made from the data it depends on.
+
+    `version` is called with the view's arguments and returns the data versions (library version,
+    config file mtime, ...). When the browser already has the response for them, it gets a 304
+    without the view running at all.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = [_PROCESS_TAG, *version(*args, **kwargs)]
+            etag = hashlib.sha1('/'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:16]
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # Weak, as the gzip and brotli bodies differ byte for byte but not in meaning
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+    return decorator
+
+@app.after_request
+def compress_response(response):
+    """Compress pages and JSON above RESPONSE_COMPRESS_MIN_BYTES with brotli or gzip, as the browser accepts."""
+    min_bytes = get_config().get('RESPONSE_COMPRESS_MIN_BYTES') or 0
+    if (min_bytes <= 0 or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = preferred_encoding(request.headers.get('Accept-Encoding'), RESPONSE_ENCODINGS)
+    data = response.get_data()
+    if encoding is None or len(data) < min_bytes:
+        return response
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
 # =============================
 # Flask Route Handlers
 # =============================
 
+# The dreams grid: the server renders the first screen (four rows of five), the page fetches the rest
+DREAMS_FIRST_PAGE = 20
+DREAMS_PAGE_LIMIT = 40
+DREAMS_PAGE_MAX = 200
+PROMPT_PREVIEW_LENGTH = 50
+
+def _dream_card(dream):
+    """What a card in the dreams grid shows; the rest of a dream is fetched when it is opened."""
+    thumb = blob_store.url_for(dream, 'thumbs')
+    prompt = dream.get('user_prompt') or ''
+    return {
+        'id': dream['id'],
+        'created_at': dream.get('created_at'),
+        'preview': prompt[:PROMPT_PREVIEW_LENGTH] + ('...' if len(prompt) > PROMPT_PREVIEW_LENGTH else ''),
+        'thumb_url': thumbnail_url(thumb, 320),
+        'thumb_srcset': thumbnail_srcset(thumb),
+    }
+
+def _dreams_page(cursor, limit):
+    """Cards for one page of the grid and the cursor of the next page (None on the last one)."""
+    # One extra row says whether there is another page without a second query
+    dreams = dream_db.get_dreams_page(decode_cursor(cursor), limit + 1)
+    next_cursor = encode_cursor(dreams[limit - 1]) if len(dreams) > limit else None
+    return [_dream_card(dream) for dream in dreams[:limit]], next_cursor
+
+def _preload_links(urls):
+    """`Link` header value asking the browser to preload images."""
+    return ', '.join(f"<{url}>; rel=preload; as=image" for url in urls)
+
 # -- Page Routes --
 @app.route('/')
 def index():
     """Serve the main HTML page."""
-    return render_template('index.html', 
+    response = make_response(render_template('index.html', 
                          is_development=app.config['DEBUG'],
-                         total_background_images=int(get_config()["TOTAL_BACKGROUND_IMAGES"]))
+                         total_background_images=total_background_images()))
+    # The background is otherwise only discovered once the scripts have run. Which one shows depends
+    # on the display's clock, known from the cookie background-manager.js sets; without it, no guess
+    tz_offset = request.cookies.get('tz_offset', type=int)
+    if tz_offset is not None:
+        current = background_schedule(background_urls(), count=0, tz_offset=tz_offset)['current']
+        if current:
+            response.headers['Link'] = _preload_links([current['url']])
+    return response
 
 @app.route('/dreams')
+@_versioned(lambda: (dream_db.get_library_version(), config_version(), assets_version(app.config['DEBUG'])))
 def dreams():
-    """Display the dreams library page."""
-    dreams = dream_db.get_all_dreams()
-    return render_template('dreams.html', dreams=dreams)
+    """Display the dreams library page. Only the first screen is rendered; the rest loads as it is scrolled to."""
+    cards, next_cursor = _dreams_page(None, DREAMS_FIRST_PAGE)
+    return render_template('dreams.html', cards=cards, next_cursor=next_cursor, page_limit=DREAMS_PAGE_LIMIT)
 
 # -- API Routes --
 @app.route('/api/config')
+@_versioned(lambda: (config_version(), app.config['DEBUG']))
 def api_get_config():
     try:
         from functions.config_loader import get_config
         config = get_config()
         return jsonify({
             'is_development': app.config['DEBUG'],
-            'playback_duration': int(config['PLAYBACK_DURATION']),
-            'logo_fade_in_duration': int(config['LOGO_FADE_IN_DURATION']),
-            'logo_fade_out_duration': int(config['LOGO_FADE_OUT_DURATION']),
-            'clock_fade_in_duration': int(config['CLOCK_FADE_IN_DURATION']),
-            'clock_fade_out_duration': int(config['CLOCK_FADE_OUT_DURATION']),
-            'transition_delay': int(config['TRANSITION_DELAY'])
+            'playback_duration': config['PLAYBACK_DURATION'],
+            'logo_fade_in_duration': config['LOGO_FADE_IN_DURATION'],
+            'logo_fade_out_duration': config['LOGO_FADE_OUT_DURATION'],
+            'clock_fade_in_duration': config['CLOCK_FADE_IN_DURATION'],
+            'clock_fade_out_duration': config['CLOCK_FADE_OUT_DURATION'],
+            'transition_delay': config['TRANSITION_DELAY']
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -262,6 +435,34 @@ def gpio_double_tap():
             logger.error(f"Error in API gpio_double_tap: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/dreams')
+@_versioned(lambda: (dream_db.get_library_version(), config_version()))
+def list_dreams():
+    """One page of the dreams grid, newest first. Pass the previous page's `next_cursor` as `cursor` for the next."""
+    limit = min(max(request.args.get('limit', DREAMS_PAGE_LIMIT, type=int), 1), DREAMS_PAGE_MAX)
+    try:
+        cards, next_cursor = _dreams_page(request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'dreams': cards, 'next_cursor': next_cursor})
+
+@app.route('/api/dreams/<int:dream_id>', methods=['GET'])
+def get_dream(dream_id):
+    """Return a single dream, including its stored media metadata and media URLs, as JSON."""
+    dream = dream_db.get_dream(dream_id)
+    if not dream:
+        return jsonify({'success': False, 'message': 'Dream not found'}), 404
+    # Validated by content rather than the library version, as the body includes when it was last played
+    response = jsonify(dict(
+        dream,
+        video_url=blob_store.url_for(dream, 'video'),
+        audio_url=blob_store.url_for(dream, 'audio'),
+        audio_type=audio_mime_type(dream.get('audio_filename')),
+    ))
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/dreams/<int:dream_id>', methods=['DELETE'])
 def delete_dream(dream_id):
     """Delete a dream and its associated files."""
@@ -272,24 +473,19 @@ def delete_dream(dream_id):
             return jsonify({'success': False, 'message': 'Dream not found'}), 404
         # Delete the dream from the database
         if dream_db.delete_dream(dream_id):
-            # Delete associated files
-            try:
-                # Delete video file
-                video_path = os.path.join(get_config()['VIDEOS_DIR'], dream['video_filename'])
-                if os.path.exists(video_path):
-                    os.remove(video_path)
-                # Delete thumbnail file
-                thumb_path = os.path.join(get_config()['THUMBS_DIR'], dream['thumb_filename'])
-                if os.path.exists(thumb_path):
-                    os.remove(thumb_path)
-                # Delete audio file
-                audio_path = os.path.join(get_config()['RECORDINGS_DIR'], dream['audio_filename'])
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-            except Exception as e:
-                if logger:
-                    logger.error(f"Error deleting files for dream {dream_id}: {str(e)}")
-                # Continue even if file deletion fails
+            # Delete associated files; an archived dream has no video, so skip empty names
+            for path in dream_media_paths(dream, get_config()):
+                if not path:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    if logger:
+                        logger.error(f"Error deleting {path} for dream {dream_id}: {str(e)}")
+                    # Continue even if file deletion fails
+            blob_store.release(dream.get('video_sha256'), dream.get('thumb_sha256'), dream.get('audio_sha256'))
             return jsonify({'success': True, 'message': 'Dream deleted successfully'})
         else:
             return jsonify({'success': False, 'message': 'Failed to delete dream'}), 500
@@ -299,6 +495,7 @@ def delete_dream(dream_id):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/clock-config-path')
+@_versioned(lambda: (config_version(),))
 def clock_config_path():
     from functions.config_loader import get_config
     config_path = get_config().get('CLOCK_CONFIG_PATH')
@@ -306,12 +503,154 @@ def clock_config_path():
         return jsonify({'error': 'CLOCK_CONFIG_PATH not set in config'}), 500
     return jsonify({'configPath': config_path})
 
+@app.route('/api/metrics')
+def metrics():
+    """Report operational metrics for monitoring."""
+    return jsonify({
+        'db_backup': backup_status,
+        'storage': storage_manager.stats(),
+        'media_scan': scan_status,
+        'audio_transcode': transcode_status,
+        'hub': hub_monitor.stats(),
+    })
+
+@app.route('/api/health')
+def health():
+    """Liveness for monitoring: the database answers and the event loop is keeping up."""
+    hub = hub_monitor.health()
+    try:
+        dream_db.get_schema_version()
+        database = 'ok'
+    except Exception as e:
+        if logger:
+            logger.error(f"Health check could not reach the database: {str(e)}")
+        database = 'error'
+    status = 'error' if database != 'ok' else hub['status']
+    response = jsonify({'status': status, 'database': database, 'hub': hub})
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 503 if status == 'error' else 200
+
+def apply_config_change(changed):
+    """Act on options that changed in config.json or .env since the last load, and tell the clients."""
+    restart = sorted(changed & RESTART_REQUIRED_OPTIONS)
+    if restart and logger:
+        logger.warning(f"Restart the app to apply {', '.join(restart)}")
+    if 'LOG_LEVEL' in changed:
+        logging.getLogger().setLevel(getattr(logging, get_config()['LOG_LEVEL']))
+    if 'OPENAI_API_KEY' in changed:
+        reset_openai_client()
+    if logger:
+        logger.info(f"Config reloaded, changed: {', '.join(sorted(changed))}")
+    socketio.emit('reload_config', {'changed': sorted(changed)})
+
 @app.route('/api/notify_config_reload', methods=['POST'])
 def notify_config_reload():
-    """Notify all clients to reload config."""
-    load_config()
-    socketio.emit('reload_config')
-    return jsonify({'status': 'reload event emitted'})
+    """Reload the config and, if anything changed, notify all clients."""
+    changed = reload_config()
+    if changed:
+        apply_config_change(changed)
+    return jsonify({'status': 'reload event emitted' if changed else 'config unchanged', 'changed': sorted(changed)})
+
+@app.route('/api/library/manifest')
+def library_manifest():
+    """List the content hashes this device already has, for resuming an export from another device."""
+    return jsonify({'hashes': sorted(dream_db.get_media_hashes())})
+
+@app.route('/api/library/export', methods=['GET', 'POST'])
+def library_export():
+    """Stream the whole dream library as a tar archive.
+
+    POST a JSON body of {"hashes": [...]} (another device's manifest) to leave out files it already has.
+    """
+    have_hashes = []
+    if request.method == 'POST':
+        have_hashes = (request.get_json(silent=True) or {}).get('hashes', [])
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Response(
+        stream_with_context(iter_export(dream_db, get_config(), have_hashes=have_hashes, logger=logger)),
+        mimetype='application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename=dream_library_{timestamp}.tar'}
+    )
+
+@app.route('/api/library/import', methods=['POST'])
+def library_import():
+    """Import a library archive streamed in the request body."""
+    try:
+        summary = import_archive(request.stream, dream_db, get_config(), logger=logger)
+        return jsonify({'success': True, **summary})
+    except Exception as e:
+        if logger:
+            logger.error(f"Error importing library: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+# -- Admin Routes --
+TRACEMALLOC_GROUPINGS = ('lineno', 'filename', 'traceback')
+
+def _admin_only(view):
+    """Require ADMIN_TOKEN from .env as a bearer token. With no token set, the route does not exist."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = get_config().get('ADMIN_TOKEN')
+        if not token:
+            abort(404)
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def _buffered_audio():
+    """Audio held in memory between recordings; it should be empty when nothing is being recorded."""
+    return {
+        'is_recording': recording_state['is_recording'],
+        'audio_chunks': len(audio_chunks),
+        'audio_chunks_bytes': sum(len(chunk) for chunk in audio_chunks),
+        'audio_buffer_bytes': audio_buffer.getbuffer().nbytes,
+    }
+
+@app.route('/api/admin/profile', methods=['POST'])
+@_admin_only
+def admin_profile():
+    """Sample the process's stacks for `seconds` and return them in collapsed format, for flamegraph tools."""
+    try:
+        counts, samples = profiler.profile(
+            request.args.get('seconds', 10, type=float),
+            interval_ms=request.args.get('interval_ms', 5, type=float),
+            all_threads=request.args.get('threads') == 'all',
+        )
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Response(format_collapsed(counts), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename=dream_recorder_{timestamp}.folded',
+        'X-Profile-Samples': str(samples),
+        'Cache-Control': 'no-store',
+    })
+
+@app.route('/api/admin/memory/<action>', methods=['GET', 'POST'])
+@_admin_only
+def admin_memory(action):
+    """tracemalloc: POST start or stop; GET snapshot (largest allocations now) or diff (growth since start)."""
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in TRACEMALLOC_GROUPINGS:
+        return jsonify({'success': False, 'message': f"group_by must be one of {', '.join(TRACEMALLOC_GROUPINGS)}"}), 400
+    limit = min(max(request.args.get('limit', 25, type=int), 1), 500)
+    try:
+        if action == 'start' and request.method == 'POST':
+            result = memory_tracer.start(request.args.get('frames', 10, type=int))
+        elif action == 'stop' and request.method == 'POST':
+            result = memory_tracer.stop()
+        elif action == 'snapshot' and request.method == 'GET':
+            result = memory_tracer.top(limit, group_by)
+        elif action == 'diff' and request.method == 'GET':
+            result = memory_tracer.diff(limit, group_by, reset=request.args.get('reset') == '1')
+        else:
+            abort(404)
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    response = jsonify(dict(result, audio=_buffered_audio()))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 # -- Media Routes --
 @app.route('/media/<path:filename>')
@@ -322,11 +661,144 @@ def serve_media(filename):
     except FileNotFoundError:
         return "File not found", 404
 
+def _thumbnail_variant(key, source, cache_control):
+    """Respond with a resized variant if the request asks for one (?w=320&fmt=webp), else return None.
+
+    `key` and `source` may be callables, so nothing is looked up for plain requests.
+    If the variant cannot be made the caller serves the original image instead.
+    """
+    if 'w' not in request.args and 'fmt' not in request.args:
+        return None
+    fmt = request.args.get('fmt')
+    try:
+        width = int(request.args.get('w', THUMB_WIDTHS[-1]))
+        mimetype = thumbnail_format(fmt)[1]
+    except ValueError:
+        abort(400)
+    if callable(key):
+        key = key()
+    try:
+        path = thumbnail_cache.variant(key, source() if callable(source) else source, width, fmt)
+    except Exception as e:
+        if logger:
+            logger.error(f"Could not resize thumbnail: {str(e)}")
+        return None
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=os.path.basename(path))
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+@app.route('/media/blobs/<name>')
+def serve_blob(name):
+    """Serve a media blob by content hash. The URL never changes meaning, so it is cached forever."""
+    sha256, extension = os.path.splitext(name)
+    try:
+        blob_store.key_for(sha256)
+    except ValueError:
+        abort(404)
+    mimetype = mimetypes.guess_type(f"blob{extension}")[0] or 'application/octet-stream'
+    if mimetype.startswith('image/'):
+        if blob_store.backend.is_local:
+            source = blob_store.path_for(sha256)
+            if not os.path.isfile(source):
+                abort(404)
+        else:
+            # Fetched from the object store only on a cache miss
+            source = lambda: blob_store.open(sha256)
+        response = _thumbnail_variant(sha256, source, BLOB_CACHE_CONTROL)
+        if response:
+            return response
+    # Remote backends serve the bytes themselves; this process only signs the URL
+    presigned = blob_store.presigned_url(sha256, content_type=mimetype)
+    if presigned:
+        response = redirect(presigned)
+        response.headers['Cache-Control'] = f'private, max-age={PRESIGNED_URL_EXPIRES // 2}'
+        return response
+    path = blob_store.path_for(sha256)
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=sha256)
+    response.headers['Cache-Control'] = BLOB_CACHE_CONTROL
+    return response
+
+@app.route('/media/dreams/<int:dream_id>/<kind>')
+def serve_dream_media(dream_id, kind):
+    """Redirect a dream's video, thumbnail or audio to its current, cacheable URL."""
+    dream = dream_db.get_dream(dream_id)
+    if not dream:
+        abort(404)
+    try:
+        url = blob_store.url_for(dream, kind)
+    except ValueError:
+        abort(404)
+    if not url:
+        abort(404)
+    response = redirect(url)
+    # The redirect itself must not be cached: eviction or re-encoding can change the target
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/background/schedule')
+def api_background_schedule():
+    """The background showing now and the next changes with their start times, for the kiosk to prefetch."""
+    count = min(max(request.args.get('count', SCHEDULE_DEFAULT_COUNT, type=int), 1), SCHEDULE_MAX_COUNT)
+    # JavaScript's getTimezoneOffset() of the display; the server's own timezone if not given
+    tz_offset = request.args.get('tz_offset', type=int)
+    schedule = background_schedule(background_urls(), count=count, tz_offset=tz_offset)
+    response = jsonify(schedule)
+    response.headers['Cache-Control'] = 'no-store'
+    if schedule['next'] and tz_offset is not None:
+        response.headers['Link'] = _preload_links([schedule['next'][0]['url']])
+    return response
+
+@app.route('/backgrounds/manifest.json')
+def background_manifest():
+    """The built background set. Revalidated on every load so a rebuild is picked up."""
+    path = os.path.join(BACKGROUND_DIST_DIR, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, mimetype='application/json', conditional=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/backgrounds/<name>')
+def serve_background(name):
+    """Serve a built background image. Names carry a content hash, so each is fetched once per device."""
+    if not HASHED_NAME_RE.match(name):
+        abort(404)
+    path = os.path.join(BACKGROUND_DIST_DIR, name)
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, conditional=True, etag=name.split('.')[1])
+    response.headers['Cache-Control'] = BLOB_CACHE_CONTROL
+    return response
+
+@app.route('/static/dist/<name>')
+def serve_asset(name):
+    """Serve a built script or stylesheet, precompressed if the browser accepts it. Names carry a content hash."""
+    if not ASSET_NAME_RE.match(name):
+        abort(404)
+    path, encoding = negotiate_encoding(name, request.headers.get('Accept-Encoding'), ASSET_DIST_DIR)
+    if not os.path.isfile(path):
+        abort(404)
+    mimetype = 'text/css' if name.endswith('.css') else 'text/javascript'
+    # Each encoding is a different body, so it needs its own validator
+    etag = name.split('.')[1] + (f"-{encoding}" if encoding else '')
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = BLOB_CACHE_CONTROL
+    return response
+
 @app.route('/media/thumbs/<path:filename>')
 def serve_thumbnail(filename):
-    """Serve thumbnail files from the thumbs directory."""
+    """Serve thumbnail files from the thumbs directory, resized when ?w= or ?fmt= is given."""
+    path = safe_join(get_config()['THUMBS_DIR'], filename)
+    if path is None:
+        return "Thumbnail not found", 404
     try:
-        return send_file(os.path.join(get_config()['THUMBS_DIR'], filename))
+        response = _thumbnail_variant(lambda: source_key(path), path, 'public, max-age=86400')
+        return response or send_file(path)
     except FileNotFoundError:
         return "Thumbnail not found", 404
 
@@ -338,7 +810,28 @@ if __name__ == '__main__':  # pragma: no cover
     # Parse command-line arguments
     parser = argparse.ArgumentParser()
     parser.add_argument('--reload', action='store_true', help='Enable auto-reloader')
+    parser.add_argument('--profile-startup', action='store_true', help='Print how long each import takes at startup, then exit')
     args = parser.parse_args()
+    if args.profile_startup:
+        # Measured in a fresh interpreter, as this one has imported everything already
+        print(format_import_times(measure_imports('dream_recorder')))
+        raise SystemExit(0)
+    # Log through a writer thread, so log writes do not hold up the hub
+    configure_logging(get_config())
+    if hub_monitor.enabled:
+        hub_monitor.start()
+    # A new library gets the sample dreams; spawned greenlets first run once the server is listening,
+    # so the first page does not wait for the files
+    gevent.spawn(init_sample_dreams_if_missing)
+    # Start background maintenance tasks
+    gevent.spawn(backup_loop, dream_db)
+    gevent.spawn(storage_manager.enforce_budget)
+    gevent.spawn(scan_loop, dream_db)
+    # Apply edits to config.json and .env without a restart
+    if get_config().get('CONFIG_WATCH_INTERVAL'):
+        gevent.spawn(watch_config, apply_config_change)
+    # Convert recordings made before AUDIO_ARCHIVE_CODEC was set; a no-op once done
+    gevent.spawn_later(60, transcode_archive, dream_db)
     # Start the Flask-SocketIO server
     socketio.run(
         app, 
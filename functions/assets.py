@@ -0,0 +1,265 @@
+import os
+import re
+import gzip
+import json
+import base64
+import hashlib
+import logging
+import urllib.request
+
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+# Bundles and their manifest; generated by scripts/build_assets.py
+ASSET_DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+ASSET_URL_PREFIX = '/static/dist/'
+MANIFEST_VERSION = 1
+HASH_LENGTH = 12
+HASHED_NAME_RE = re.compile(r'^[a-z0-9-]+\.[0-9a-f]{%d}\.(js|css)$' % HASH_LENGTH)
+# Precompressed copies, in the order they are preferred when the browser accepts both
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Third-party files the pages used to load from a CDN. They are downloaded into static/vendor
+# once, checked against their subresource integrity hash, and bundled like our own files.
+VENDOR_ASSETS = {
+    'vendor/socket.io.min.js': {
+        'url': 'https://cdn.socket.io/4.8.1/socket.io.min.js',
+        'integrity': 'sha384-mkQ3/7FUtcGyoppY6bz/PORYoGqOl7/aSUMn2ymDOJcapfS6PHqxhRTMh1RR0Q6+',
+    },
+}
+
+# Each bundle is its files concatenated in order, paths relative to static/
+BUNDLES = {
+    'index.js': [
+        'vendor/socket.io.min.js',
+        'js/icon-animations.js',
+        'js/clock.js',
+        'js/state-manager.js',
+        'js/recorder.js',
+        'js/sockets.js',
+        'js/ui-controller.js',
+        'js/background-manager.js',
+    ],
+    'index.css': [
+        'css/styles.css',
+        'css/icon-animations.css',
+        'css/clock.css',
+    ],
+    'dreams.js': [
+        'js/dreams.js',
+    ],
+    'dreams.css': [
+        'css/dreams.css',
+    ],
+}
+
+# A url() that is not absolute would point somewhere else once the file moves into dist/
+RELATIVE_CSS_URL_RE = re.compile(r'''url\(\s*['"]?(?!/|data:|https?:)([^'")]+)''')
+
+_manifest_cache = {'path': None, 'mtime': None, 'manifest': None}
+
+def load_manifest(dist_dir=ASSET_DIST_DIR):
+    """Return the asset manifest, or None if the bundles have not been built. Re-read when the file changes."""
+    path = os.path.join(dist_dir, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest_cache['path'] != path or _manifest_cache['mtime'] != mtime:
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            if logger:
+                logger.error(f"Could not read asset manifest {path}: {str(e)}")
+            return None
+        _manifest_cache.update({'path': path, 'mtime': mtime, 'manifest': manifest})
+    return _manifest_cache['manifest']
+
+def _tag(name, url, integrity=None):
+    """A <script> or stylesheet <link> for `url`."""
+    extra = Markup(' integrity="{}" crossorigin="anonymous"').format(integrity) if integrity else ''
+    if name.endswith('.css'):
+        return Markup('<link rel="stylesheet" href="{}"{}>').format(url, extra)
+    return Markup('<script src="{}"{}></script>').format(url, extra)
+
+def asset_tags(bundle, debug=False, static_dir=STATIC_DIR, dist_dir=ASSET_DIST_DIR):
+    """HTML that loads a bundle: the built, hashed file if there is one, else each source file.
+
+    The source files are also used in development (`debug`), so edits show up without a rebuild.
+    A vendored file that has not been downloaded yet is loaded from its CDN.
+    """
+    if bundle not in BUNDLES:
+        raise KeyError(f"Unknown asset bundle '{bundle}'")
+    manifest = None if debug else load_manifest(dist_dir)
+    entry = manifest and manifest['assets'].get(bundle)
+    if entry:
+        # Vendored files the build could not download come from their CDN, ahead of the bundle
+        tags = [_tag(bundle, cdn['url'], cdn['integrity']) for cdn in entry.get('cdn', [])]
+        tags.append(_tag(bundle, ASSET_URL_PREFIX + entry['file']))
+        return Markup('\n    ').join(tags)
+    tags = []
+    for path in BUNDLES[bundle]:
+        vendor = VENDOR_ASSETS.get(path)
+        if vendor and not os.path.isfile(os.path.join(static_dir, path)):
+            tags.append(_tag(bundle, vendor['url'], vendor['integrity']))
+        else:
+            tags.append(_tag(bundle, '/static/' + path))
+    return Markup('\n    ').join(tags)
+
+def assets_version(debug=False, dist_dir=ASSET_DIST_DIR):
+    """The hashed names of all built bundles, which change whenever any bundle's content does.
+
+    Pages that load bundles put this in their ETag, so after a rebuild the browser does not get a
+    304 for HTML that points at files that are gone. None when the source files are served.
+    """
+    manifest = None if debug else load_manifest(dist_dir)
+    if not manifest:
+        return None
+    return ','.join(sorted(entry['file'] for entry in manifest['assets'].values()))
+
+def _integrity(data, integrity):
+    """Whether `data` matches a subresource integrity string such as 'sha384-...'."""
+    algorithm, _, expected = integrity.partition('-')
+    return base64.b64encode(hashlib.new(algorithm, data).digest()).decode('ascii') == expected
+
+def fetch_vendor_assets(static_dir=STATIC_DIR, timeout=30):
+    """Download the vendored files that are missing, refusing any that do not match their integrity hash.
+
+    A file that cannot be downloaded is left missing; build_assets then has the page load it from its CDN.
+    """
+    fetched = []
+    for path, vendor in VENDOR_ASSETS.items():
+        dest = os.path.join(static_dir, path)
+        if os.path.isfile(dest):
+            continue
+        try:
+            with urllib.request.urlopen(vendor['url'], timeout=timeout) as response:
+                data = response.read()
+        except OSError as e:
+            if logger:
+                logger.warning(f"Could not download {vendor['url']} ({str(e)}); pages will load it from the CDN")
+            continue
+        if not _integrity(data, vendor['integrity']):
+            raise ValueError(f"{vendor['url']} does not match its integrity hash {vendor['integrity']}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(dest + '.tmp', dest)
+        fetched.append(path)
+        if logger:
+            logger.info(f"Vendored {vendor['url']} as static/{path}")
+    return fetched
+
+def _minify(path, text):
+    """Minify one source file. Files that ship minified are left alone."""
+    if path.endswith('.min.js'):
+        return text
+    if path.endswith('.js'):
+        import rjsmin
+        return rjsmin.jsmin(text)
+    import rcssmin
+    relative = RELATIVE_CSS_URL_RE.search(text)
+    if relative:
+        raise ValueError(f"{path} refers to '{relative.group(1)}' with a relative url(); use an absolute /static/ path")
+    return rcssmin.cssmin(text)
+
+def _compress(data):
+    """Precompressed copies of `data`, as {extension: bytes}. Brotli is skipped if it is not installed."""
+    copies = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        if logger:
+            logger.warning("brotli is not installed; only gzip copies will be written")
+    else:
+        copies['.br'] = brotli.compress(data, quality=11)
+    return copies
+
+def _write(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=ASSET_DIST_DIR, bundles=None, fetch=True):
+    """Concatenate and minify each bundle, write it under a content-hashed name with gzip and brotli
+    copies beside it, then record the names in a manifest.
+
+    As with the background set, the manifest is replaced atomically and files it no longer lists
+    are removed afterwards, so a running app always finds the files it links to. A vendored file
+    that is missing is left out of its bundle and listed under the bundle's `cdn` in the manifest.
+    """
+    bundles = BUNDLES if bundles is None else bundles
+    if fetch:
+        fetch_vendor_assets(static_dir)
+    os.makedirs(dist_dir, exist_ok=True)
+    assets = {}
+    for name, paths in bundles.items():
+        parts = []
+        cdn = []
+        source_bytes = 0
+        for path in paths:
+            vendor = VENDOR_ASSETS.get(path)
+            if vendor and not os.path.isfile(os.path.join(static_dir, path)):
+                # Loaded ahead of the bundle, which is where BUNDLES puts vendored files anyway
+                cdn.append({'url': vendor['url'], 'integrity': vendor['integrity']})
+                continue
+            with open(os.path.join(static_dir, path), 'r', encoding='utf-8') as f:
+                text = f.read()
+            source_bytes += len(text.encode('utf-8'))
+            parts.append(_minify(path, text).strip())
+        # A semicolon keeps a file without a trailing one from running into the next
+        data = (';\n' if name.endswith('.js') else '\n').join(parts).encode('utf-8') + b'\n'
+        sha256 = hashlib.sha256(data).hexdigest()
+        stem, extension = os.path.splitext(name)
+        filename = f"{stem}.{sha256[:HASH_LENGTH]}{extension}"
+        _write(os.path.join(dist_dir, filename), data)
+        entry = {'file': filename, 'sha256': sha256, 'bytes': len(data), 'source_bytes': source_bytes}
+        if cdn:
+            entry['cdn'] = cdn
+        for suffix, compressed in _compress(data).items():
+            _write(os.path.join(dist_dir, filename + suffix), compressed)
+            entry[suffix[1:] + '_bytes'] = len(compressed)
+        assets[name] = entry
+    manifest = {'version': MANIFEST_VERSION, 'assets': assets}
+    _write(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode('utf-8'))
+    keep = {entry['file'] + suffix for entry in assets.values() for suffix in ('', '.gz', '.br')}
+    for name in os.listdir(dist_dir):
+        if HASHED_NAME_RE.match(name.removesuffix('.gz').removesuffix('.br')) and name not in keep:
+            os.remove(os.path.join(dist_dir, name))
+    if logger:
+        logger.info(f"Built {len(assets)} asset bundle(s) in {dist_dir}")
+    return manifest
+
+def accepted_encodings(accept_encoding):
+    """Content codings from an Accept-Encoding header with their q-values."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+def preferred_encoding(accept_encoding, available=tuple(encoding for encoding, _ in ENCODINGS)):
+    """The first of `available` the browser accepts, or None to send the body as it is."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+def negotiate_encoding(filename, accept_encoding, dist_dir=ASSET_DIST_DIR):
+    """The precompressed copy of a built file to send for an Accept-Encoding header, as
+    (path, content encoding); the encoding is None for the uncompressed file."""
+    available = [encoding for encoding, suffix in ENCODINGS if os.path.isfile(os.path.join(dist_dir, filename + suffix))]
+    encoding = preferred_encoding(accept_encoding, available)
+    suffix = dict(ENCODINGS).get(encoding, '')
+    return os.path.join(dist_dir, filename + suffix), encoding
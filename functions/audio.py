@@ -1,33 +1,85 @@
 import wave
 import os
 import tempfile
+import time
 import ffmpeg
 import wave
 
-from datetime import datetime
 from functions.video import generate_video
+from functions.media_info import collect_media_metadata, unique_media_name
+from functions.storage import StorageManager
+from functions.blob_store import BlobStore
 from functions.config_loader import get_config
-from openai import OpenAI
+from functions.structured_logging import current_trace_id, pop_trace_cost
 
-# Initialize OpenAI client
-client = OpenAI(
-    api_key=get_config()["OPENAI_API_KEY"],
-    http_client=None
-)
+# Formats dream recordings can be archived in: (extension, ffmpeg muxer, MIME type, encoder options).
+# Speech needs nowhere near 44.1 kHz PCM; 32 kbps Opus is transparent for a voice memo at ~1/20th the size.
+AUDIO_ARCHIVE_FORMATS = {
+    'opus': ('.opus', 'opus', 'audio/ogg', {'acodec': 'libopus', 'ar': 48000}),
+    'flac': ('.flac', 'flac', 'audio/flac', {'acodec': 'flac', 'ar': 44100}),
+    'wav': ('.wav', 'wav', 'audio/wav', {'acodec': 'pcm_s16le', 'ar': 44100}),
+}
+
+_client = None
+
+def get_openai_client():
+    """The OpenAI client, built on first use: importing openai takes a good part of the app's startup."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(
+            api_key=get_config()["OPENAI_API_KEY"],
+            http_client=None
+        )
+    return _client
+
+def reset_openai_client():
+    """Drop the client, so the next call builds one with the current OPENAI_API_KEY."""
+    global _client
+    _client = None
+
+def __getattr__(name):
+    # `audio.client` still works, but costs nothing until something uses it
+    if name == 'client':
+        return get_openai_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def create_wav_file(audio_buffer):
     """Create a new WAV file in the audio buffer with the correct format."""
     wav_file = wave.open(audio_buffer, 'wb')
-    wav_file.setnchannels(int(get_config()['AUDIO_CHANNELS']))
-    wav_file.setsampwidth(int(get_config()['AUDIO_SAMPLE_WIDTH']))
-    wav_file.setframerate(int(get_config()['AUDIO_FRAME_RATE']))
+    wav_file.setnchannels(get_config()['AUDIO_CHANNELS'])
+    wav_file.setsampwidth(get_config()['AUDIO_SAMPLE_WIDTH'])
+    wav_file.setframerate(get_config()['AUDIO_FRAME_RATE'])
     return wav_file
 
+def audio_archive_format(codec=None):
+    """Return (extension, muxer, MIME type, ffmpeg output options) for an archive codec."""
+    codec = (codec or get_config()['AUDIO_ARCHIVE_CODEC']).lower()
+    if codec not in AUDIO_ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported AUDIO_ARCHIVE_CODEC '{codec}' (expected one of: {', '.join(AUDIO_ARCHIVE_FORMATS)})")
+    extension, muxer, mime_type, options = AUDIO_ARCHIVE_FORMATS[codec]
+    options = dict(options, ac=1)
+    if codec == 'opus':
+        options['audio_bitrate'] = get_config()['AUDIO_ARCHIVE_BITRATE']
+    return extension, muxer, mime_type, options
+
+def audio_mime_type(filename):
+    """MIME type for an archived recording, for the <source type> on the dreams page."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    for ext, _, mime_type, _ in AUDIO_ARCHIVE_FORMATS.values():
+        if ext == extension:
+            return mime_type
+    return 'audio/mpeg'
+
 def save_wav_file(audio_data, filename=None, logger=None):
-    """Save the WAV file locally for debugging. Converts WebM to WAV using ffmpeg."""
+    """Archive the recording in the configured AUDIO_ARCHIVE_CODEC. Converts WebM using ffmpeg.
+
+    The extension of `filename` is replaced to match the codec; the name actually written is returned.
+    """
+    extension, _, _, output_options = audio_archive_format()
     if filename is None:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"recording_{timestamp}.wav"
+        filename = unique_media_name('recording', extension)
+    filename = os.path.splitext(filename)[0] + extension
     # Ensure the recordings directory exists
     os.makedirs(get_config()['RECORDINGS_DIR'], exist_ok=True)
     filepath = os.path.join(get_config()['RECORDINGS_DIR'], filename)
@@ -36,11 +88,11 @@ def save_wav_file(audio_data, filename=None, logger=None):
         temp_webm.write(audio_data)
         temp_webm_path = temp_webm.name
     try:
-        # Convert WebM to WAV using ffmpeg
+        # Convert WebM to the archive format using ffmpeg
         stream = ffmpeg.input(temp_webm_path)
-        stream = ffmpeg.output(stream, filepath, acodec='pcm_s16le', ac=1, ar=44100)
+        stream = ffmpeg.output(stream, filepath, **output_options)
         ffmpeg.run(stream, overwrite_output=True, quiet=True)
-        logger.info(f"Saved WAV file to {filepath}")
+        logger.info(f"Saved audio file to {filepath}")
         return filename
     finally:
         # Clean up temporary file
@@ -53,14 +105,14 @@ def generate_video_prompt(transcription, luma_extend=False, logger=None, config=
     """Generate an enhanced video prompt from the transcription using GPT."""
     try:
         system_prompt = get_config()['GPT_SYSTEM_PROMPT_EXTEND'] if luma_extend else get_config()['GPT_SYSTEM_PROMPT']
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model=get_config()['GPT_MODEL'],
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"{transcription}"}
             ],
-            temperature=float(get_config()['GPT_TEMPERATURE']),
-            max_tokens=int(get_config()['GPT_MAX_TOKENS'])
+            temperature=get_config()['GPT_TEMPERATURE'],
+            max_tokens=get_config()['GPT_MAX_TOKENS']
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -70,21 +122,27 @@ def generate_video_prompt(transcription, luma_extend=False, logger=None, config=
 
 def process_audio(sid, socketio, dream_db, recording_state, audio_chunks, logger = None):
     """Process the recorded audio and generate video, then update state and emit events."""
+    stage_timings = {}
+    storage = StorageManager(dream_db)
     try:
+        # Refuse up front rather than failing halfway through a paid generation
+        storage.ensure_room_for_generation()
+        stage_start = time.monotonic()
         audio_data = b''.join(audio_chunks)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        wav_filename = f"recording_{timestamp}.wav"
-        wav_filename = save_wav_file(audio_data, wav_filename, logger)
+        audio_filename = save_wav_file(audio_data, unique_media_name('recording', ''), logger)
+        stage_timings['save_audio'] = time.monotonic() - stage_start
         # Create a temporary file for the audio
         with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
             temp_file.write(audio_data)
             temp_file_path = temp_file.name
         # Transcribe the audio using OpenAI's Whisper API
+        stage_start = time.monotonic()
         with open(temp_file_path, 'rb') as audio_file:
-            transcription = client.audio.transcriptions.create(
+            transcription = get_openai_client().audio.transcriptions.create(
                 model=get_config()['WHISPER_MODEL'],
                 file=audio_file
             )
+        stage_timings['transcribe'] = time.monotonic() - stage_start
         # Update the transcription in the global state
         recording_state['transcription'] = transcription.text
         # Emit the transcription
@@ -95,7 +153,9 @@ def process_audio(sid, socketio, dream_db, recording_state, audio_chunks, logger
         # Check if LUMA_EXTEND is set
         luma_extend = str(get_config()['LUMA_EXTEND']).lower() in ('1', 'true', 'yes')
         # Generate video prompt
+        stage_start = time.monotonic()
         video_prompt = generate_video_prompt(transcription=transcription.text, luma_extend=luma_extend, logger=logger, config=get_config())
+        stage_timings['prompt'] = time.monotonic() - stage_start
         if not video_prompt:
             raise Exception("Failed to generate video prompt")
         recording_state['video_prompt'] = video_prompt
@@ -103,7 +163,39 @@ def process_audio(sid, socketio, dream_db, recording_state, audio_chunks, logger
             socketio.emit('video_prompt_update', {'text': video_prompt}, room=sid)
         else:
             socketio.emit('video_prompt_update', {'text': video_prompt})
-        video_filename, thumb_filename = generate_video(prompt=video_prompt, luma_extend=luma_extend, logger=logger)
+        video_filename, thumb_filename = generate_video(prompt=video_prompt, luma_extend=luma_extend, logger=logger, timings=stage_timings)
+        # Record sizes, hashes and dimensions once, while the files are fresh
+        stage_start = time.monotonic()
+        media_metadata = {}
+        try:
+            media_metadata = collect_media_metadata(
+                video_path=os.path.join(get_config()['VIDEOS_DIR'], video_filename),
+                thumb_path=os.path.join(get_config()['THUMBS_DIR'], thumb_filename) if thumb_filename else None,
+                audio_path=os.path.join(get_config()['RECORDINGS_DIR'], audio_filename),
+                logger=logger
+            )
+        except Exception as e:
+            if logger:
+                logger.warning(f"Could not collect media metadata: {str(e)}")
+        # Move the files into the content-addressed store, reusing the hashes just computed
+        blob_store = BlobStore(dream_db)
+        for directory, filename, hash_key in (
+            ('VIDEOS_DIR', video_filename, 'video_sha256'),
+            ('THUMBS_DIR', thumb_filename, 'thumb_sha256'),
+            ('RECORDINGS_DIR', audio_filename, 'audio_sha256'),
+        ):
+            if not media_metadata.get(hash_key):
+                continue
+            try:
+                blob_store.ingest(os.path.join(get_config()[directory], filename), media_metadata[hash_key])
+            except Exception as e:
+                if logger:
+                    logger.warning(f"Could not store {filename} in the blob store: {str(e)}")
+        stage_timings['metadata'] = time.monotonic() - stage_start
+        # Time this dream's log calls have taken on the hub so far; the writer thread does the rest
+        log_records, stage_timings['logging'] = pop_trace_cost(current_trace_id())
+        if logger:
+            logger.info(f"Logged {log_records} records for this dream in {stage_timings['logging'] * 1000:.1f} ms")
         # Save to database
         DreamData = None
         try:
@@ -113,12 +205,19 @@ def process_audio(sid, socketio, dream_db, recording_state, audio_chunks, logger
         dream_data = DreamData(
             user_prompt=recording_state['transcription'],
             generated_prompt=recording_state['video_prompt'],
-            audio_filename=wav_filename,
+            audio_filename=audio_filename,
             video_filename=video_filename,
             thumb_filename=thumb_filename,
             status='completed',
+            stage_timings=stage_timings,
+            **media_metadata,
         )
         dream_db.save_dream(dream_data.model_dump())
+        try:
+            storage.enforce_budget()
+        except Exception as e:
+            if logger:
+                logger.error(f"Error enforcing storage budget: {str(e)}")
         recording_state['status'] = 'complete'
         recording_state['video_url'] = f"/media/video/{video_filename}"
         # Emit the video ready event to trigger playback
@@ -136,6 +235,7 @@ def process_audio(sid, socketio, dream_db, recording_state, audio_chunks, logger
     finally:
         # Clean up
         audio_chunks = []
+        pop_trace_cost(current_trace_id())
         # Remove temporary file if it exists
         if 'temp_file_path' in locals():
             try:
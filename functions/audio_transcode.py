@@ -0,0 +1,135 @@
+import os
+import time
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import ffmpeg
+
+from functions.audio import audio_archive_format
+from functions.blob_store import BlobStore
+from functions.config_loader import get_config
+from functions.media_info import file_sha256
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+# Background work must never make a recording stutter
+TRANSCODE_NICENESS = 19
+
+# Progress and outcome of the most recent archive transcode, reported by /api/metrics
+transcode_status = {
+    'running': False,
+    'codec': None,
+    'converted': 0,
+    'failed': 0,
+    'bytes_before': 0,
+    'bytes_after': 0,
+    'bytes_reclaimed': 0,
+    'duration': None,
+}
+
+def _lower_priority():
+    os.nice(TRANSCODE_NICENESS)
+
+def transcode_file(src, dest, codec=None):
+    """Transcode one recording into `dest` at low CPU priority, one encoder thread per file."""
+    _, muxer, _, output_options = audio_archive_format(codec)
+    args = ffmpeg.compile(
+        ffmpeg.output(ffmpeg.input(src), dest, f=muxer, threads=1, **output_options),
+        overwrite_output=True
+    )
+    subprocess.run(
+        args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        preexec_fn=_lower_priority if hasattr(os, 'nice') else None
+    )
+    return os.path.getsize(dest)
+
+def _transcode_dream(dream, recordings_dir, extension, codec):
+    """Convert one dream's WAV recording. Returns (dream, new filename, bytes before, bytes after)."""
+    src_name = os.path.basename(dream['audio_filename'])
+    src = os.path.join(recordings_dir, src_name)
+    dest_name = os.path.splitext(src_name)[0] + extension
+    dest = os.path.join(recordings_dir, dest_name)
+    # Encode beside the target so a crash leaves a .part for the media scanner, never a truncated recording
+    part = dest + '.part'
+    try:
+        size_before = os.path.getsize(src)
+        size_after = transcode_file(src, part, codec)
+        if size_after == 0:
+            raise IOError(f"ffmpeg produced an empty file for {src_name}")
+        os.replace(part, dest)
+        return dream, dest_name, size_before, size_after
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+
+def transcode_archive(dream_db, config=None, codec=None, workers=None):
+    """Re-encode every WAV recording in the library to the archive codec and report bytes reclaimed.
+
+    Files are converted in parallel (one niced ffmpeg per core by default). A dream's row is
+    switched to the new file before the WAV is deleted, so an interruption at any point leaves
+    a playable recording behind. Safe to re-run; already converted dreams are skipped.
+    """
+    config = config or get_config()
+    codec = (codec or config['AUDIO_ARCHIVE_CODEC']).lower()
+    extension = audio_archive_format(codec)[0]
+    recordings_dir = config['RECORDINGS_DIR']
+    workers = workers or os.cpu_count() or 1
+    blob_store = BlobStore(dream_db, config)
+    report = {'codec': codec, 'converted': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0, 'bytes_reclaimed': 0}
+    started = time.monotonic()
+    transcode_status.update(dict(report, running=True, duration=None))
+    try:
+        if codec == 'wav':
+            return report
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            last_id = 0
+            while True:
+                batch = dream_db.get_dreams_after(after_id=last_id, limit=BATCH_SIZE)
+                if not batch:
+                    break
+                last_id = batch[-1]['id']
+                pending = [
+                    pool.submit(_transcode_dream, dream, recordings_dir, extension, codec)
+                    for dream in batch
+                    if (dream.get('audio_filename') or '').lower().endswith('.wav')
+                    and os.path.isfile(os.path.join(recordings_dir, os.path.basename(dream['audio_filename'])))
+                ]
+                for future in pending:
+                    try:
+                        dream, dest_name, size_before, size_after = future.result()
+                    except Exception as e:
+                        report['failed'] += 1
+                        if logger:
+                            stderr = getattr(e, 'stderr', None)
+                            detail = stderr.decode(errors='replace').strip().splitlines()[-1:] if stderr else [str(e)]
+                            logger.error(f"Could not transcode recording: {' '.join(detail)}")
+                        continue
+                    dest = os.path.join(recordings_dir, dest_name)
+                    sha256 = blob_store.ingest(dest, file_sha256(dest))
+                    dream_db.update_dream(dream['id'], {
+                        'audio_filename': dest_name,
+                        'audio_bytes': size_after,
+                        'audio_sha256': sha256,
+                    })
+                    try:
+                        os.remove(os.path.join(recordings_dir, os.path.basename(dream['audio_filename'])))
+                    except OSError as e:
+                        if logger:
+                            logger.warning(f"Could not remove {dream['audio_filename']}: {str(e)}")
+                    blob_store.release(dream.get('audio_sha256'))
+                    report['converted'] += 1
+                    report['bytes_before'] += size_before
+                    report['bytes_after'] += size_after
+                    report['bytes_reclaimed'] = report['bytes_before'] - report['bytes_after']
+                    transcode_status.update(report)
+        if logger:
+            logger.info(
+                f"Transcoded {report['converted']} recording(s) to {codec}, {report['failed']} failed, "
+                f"reclaimed {report['bytes_reclaimed']} bytes"
+            )
+        return report
+    finally:
+        report['duration'] = round(time.monotonic() - started, 3)
+        transcode_status.update(dict(report, running=False))
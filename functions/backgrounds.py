@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ffmpeg
+
+from functions.media_info import file_sha256
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'images', 'background'))
+# Built images and their manifest; generated by scripts/build_backgrounds.py
+BACKGROUND_DIST_DIR = os.path.join(BACKGROUND_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+BACKGROUND_URL_PREFIX = '/backgrounds/'
+SOURCE_URL_PREFIX = '/static/images/background/'
+MANIFEST_VERSION = 1
+# The Waveshare 7.9" panel the recorder is built around
+DEFAULT_WIDTH = 1280
+DEFAULT_HEIGHT = 400
+HASH_LENGTH = 12
+SOURCE_RE = re.compile(r'^(\d+)\.jpe?g$', re.IGNORECASE)
+HASHED_NAME_RE = re.compile(r'^\d+\.[0-9a-f]{%d}\.(webp|avif)$' % HASH_LENGTH)
+
+def _background_formats(quality):
+    """(extension, ffmpeg output options) per format, for a 0-100 quality."""
+    return {
+        'webp': ('.webp', {'c:v': 'libwebp', 'quality': quality, 'compression_level': 6}),
+        # AV1's CRF runs the other way: 0 is lossless, 63 the smallest
+        'avif': ('.avif', {'c:v': 'libaom-av1', 'still-picture': 1, 'cpu-used': 4,
+                           'crf': round(63 - quality * 63 / 100)}),
+    }
+
+BACKGROUND_FORMATS = tuple(_background_formats(0))
+
+_manifest_cache = {'path': None, 'mtime': None, 'manifest': None}
+_source_count_cache = {}
+
+def load_manifest(dist_dir=BACKGROUND_DIST_DIR):
+    """Return the background manifest, or None if the set has not been built. Re-read when the file changes."""
+    path = os.path.join(dist_dir, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest_cache['path'] != path or _manifest_cache['mtime'] != mtime:
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            if logger:
+                logger.error(f"Could not read background manifest {path}: {str(e)}")
+            return None
+        _manifest_cache.update({'path': path, 'mtime': mtime, 'manifest': manifest})
+    return _manifest_cache['manifest']
+
+def background_sources(source_dir):
+    """Numbered source JPEGs in display order, as (number, filename)."""
+    try:
+        names = os.listdir(source_dir)
+    except FileNotFoundError:
+        return []
+    sources = [(int(m.group(1)), name) for name in names for m in [SOURCE_RE.match(name)] if m]
+    return sorted(sources)
+
+def background_urls(dist_dir=BACKGROUND_DIST_DIR, source_dir=BACKGROUND_DIR):
+    """URLs of the background images in display order: the built set if there is one, else the source JPEGs."""
+    manifest = load_manifest(dist_dir)
+    if manifest:
+        return [BACKGROUND_URL_PREFIX + image['file'] for image in manifest['images']]
+    return [SOURCE_URL_PREFIX + name for _, name in background_sources(source_dir)]
+
+def total_background_images(dist_dir=BACKGROUND_DIST_DIR, source_dir=BACKGROUND_DIR):
+    """Number of background images, from the manifest when the set has been built."""
+    manifest = load_manifest(dist_dir)
+    if manifest:
+        return len(manifest['images'])
+    # The source set only changes with a new release, so count it once
+    if source_dir not in _source_count_cache:
+        _source_count_cache[source_dir] = len(background_sources(source_dir))
+    return _source_count_cache[source_dir]
+
+def _encode(src, dest, width, height, output_options):
+    """Scale and centre-crop `src` to exactly width x height."""
+    stream = ffmpeg.input(src)
+    stream = ffmpeg.filter(stream, 'scale', width, height, force_original_aspect_ratio='increase')
+    stream = ffmpeg.filter(stream, 'crop', width, height)
+    stream = ffmpeg.output(stream, dest, vframes=1, **output_options)
+    ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+
+def _build_one(number, name, source_dir, dist_dir, settings, extension, output_options, previous):
+    """Encode one source image unless the previous build already has it. Returns its manifest entry."""
+    src = os.path.join(source_dir, name)
+    source_sha256 = file_sha256(src)
+    old = previous.get(name)
+    if old and old.get('source_sha256') == source_sha256 and os.path.isfile(os.path.join(dist_dir, old['file'])):
+        return old
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{number}-", suffix=extension, dir=dist_dir)
+    os.close(fd)
+    try:
+        _encode(src, tmp_path, settings['width'], settings['height'], output_options)
+        sha256 = file_sha256(tmp_path)
+        filename = f"{number}.{sha256[:HASH_LENGTH]}{extension}"
+        os.replace(tmp_path, os.path.join(dist_dir, filename))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {
+        'file': filename,
+        'sha256': sha256,
+        'bytes': os.path.getsize(os.path.join(dist_dir, filename)),
+        'source': name,
+        'source_sha256': source_sha256,
+    }
+
+def build_backgrounds(source_dir=BACKGROUND_DIR, dist_dir=BACKGROUND_DIST_DIR, width=DEFAULT_WIDTH,
+                      height=DEFAULT_HEIGHT, fmt='webp', quality=80, workers=None, force=False):
+    """Re-encode the background set for the display and write a manifest of hashed filenames.
+
+    Images whose source and settings are unchanged since the last build are kept, so a rebuild
+    only encodes what changed. The manifest is replaced atomically, and images no longer listed
+    in it are removed afterwards, so a running app always sees a complete set.
+    """
+    formats = _background_formats(quality)
+    if fmt not in formats:
+        raise ValueError(f"Unsupported background format '{fmt}' (expected one of {', '.join(formats)})")
+    extension, output_options = formats[fmt]
+    sources = background_sources(source_dir)
+    if not sources:
+        raise FileNotFoundError(f"No numbered background images found in {source_dir}")
+    os.makedirs(dist_dir, exist_ok=True)
+    settings = {'width': int(width), 'height': int(height), 'format': fmt, 'quality': int(quality)}
+    old_manifest = None if force else load_manifest(dist_dir)
+    previous = {}
+    if old_manifest and all(old_manifest.get(k) == v for k, v in settings.items()):
+        previous = {image['source']: image for image in old_manifest['images']}
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        images = list(pool.map(
+            lambda source: _build_one(*source, source_dir, dist_dir, settings, extension, output_options, previous),
+            sources
+        ))
+    manifest = dict(settings, version=MANIFEST_VERSION, count=len(images),
+                    total_bytes=sum(image['bytes'] for image in images), images=images)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    keep = {image['file'] for image in images}
+    for name in os.listdir(dist_dir):
+        if HASHED_NAME_RE.match(name) and name not in keep:
+            os.remove(os.path.join(dist_dir, name))
+    if logger:
+        logger.info(f"Built {len(images)} background image(s), {manifest['total_bytes']} bytes, in {dist_dir}")
+    return manifest
+
+MINUTES_PER_DAY = 24 * 60
+SCHEDULE_DEFAULT_COUNT = 5
+SCHEDULE_MAX_COUNT = 30
+
+def background_index(minute_of_day, total):
+    """Image shown at a minute of the day: the day is split evenly across the set."""
+    return min(max(minute_of_day * total // MINUTES_PER_DAY, 0), total - 1)
+
+def local_utc_offset(now):
+    """Offset of local time from UTC at `now` in minutes, with the sign of JavaScript's getTimezoneOffset()."""
+    return -time.localtime(now).tm_gmtoff // 60
+
+def background_schedule(urls, count=SCHEDULE_DEFAULT_COUNT, now=None, tz_offset=None):
+    """The image showing now and the next `count` changes, each with the epoch milliseconds it starts at.
+
+    `tz_offset` is the display's offset from UTC in minutes, as JavaScript reports it, so the
+    schedule follows the kiosk's clock even if the server runs in another timezone.
+    """
+    now = time.time() if now is None else now
+    total = len(urls)
+    if total == 0:
+        return {'total': 0, 'now': int(now * 1000), 'current': None, 'next': []}
+    offset = local_utc_offset(now) if tz_offset is None else int(tz_offset)
+    # Minutes since the epoch on the display's wall clock
+    minute = int(now // 60) - offset
+    index = background_index(minute % MINUTES_PER_DAY, total)
+    current = {'index': index, 'url': urls[index]}
+    upcoming = []
+    for step in range(1, MINUTES_PER_DAY + 1):
+        if len(upcoming) >= count:
+            break
+        next_index = background_index((minute + step) % MINUTES_PER_DAY, total)
+        if next_index != index:
+            index = next_index
+            upcoming.append({'index': index, 'url': urls[index], 'at': (minute + step + offset) * 60 * 1000})
+    return {'total': total, 'now': int(now * 1000), 'current': current, 'next': upcoming}
@@ -0,0 +1,168 @@
+import os
+import re
+import logging
+import mimetypes
+
+from functions.config_loader import get_config
+from functions.media_info import file_sha256
+from functions.media_backend import get_media_backend, link_or_copy
+
+logger = logging.getLogger(__name__)
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+# Unreferenced blobs younger than this may belong to a dream that is about to be saved
+GC_GRACE_SECONDS = 3600
+# Blob URLs name their content, so browsers never need to revalidate them
+BLOB_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Lifetime of presigned URLs handed out for blobs in a remote backend
+PRESIGNED_URL_EXPIRES = 3600
+
+MEDIA_KINDS = (
+    # (kind, filename column, hash column, legacy URL prefix)
+    ('video', 'video_filename', 'video_sha256', '/media/video/'),
+    ('thumbs', 'thumb_filename', 'thumb_sha256', '/media/thumbs/'),
+    ('audio', 'audio_filename', 'audio_sha256', '/media/audio/'),
+)
+
+class BlobStore:
+    """Content-addressed media: each distinct file is kept once, keyed ab/cd/<sha256>.
+
+    With the local backend, blobs live in MEDIA_BLOBS_DIR and the per-kind directories
+    (VIDEOS_DIR, ...) keep their human-readable names as hardlinks to them, so duplicates
+    cost no extra space and nothing that reads those paths has to change. With a remote
+    backend the blobs are mirrored there and browsers are served from it, while the per-kind
+    directories still hold a local copy of each file for playback and processing on the device.
+    References are counted by triggers on the dreams table (see migration 5).
+    """
+
+    def __init__(self, dream_db, config=None, backend=None):
+        self.dream_db = dream_db
+        self._config = config
+        self._backend = backend
+
+    @property
+    def config(self):
+        return self._config or get_config()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_media_backend(self.config)
+        return self._backend
+
+    @staticmethod
+    def key_for(sha256):
+        """Sharded backend key of a blob. Raises ValueError for anything but a hex SHA-256."""
+        if not SHA256_RE.match(sha256 or ''):
+            raise ValueError(f"Invalid blob hash: {sha256!r}")
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def path_for(self, sha256):
+        """On-disk path of a blob in the local store."""
+        return os.path.join(self.config['MEDIA_BLOBS_DIR'], *self.key_for(sha256).split('/'))
+
+    def has(self, sha256):
+        if not SHA256_RE.match(sha256 or ''):
+            return False
+        if self.backend.is_local:
+            return os.path.isfile(self.path_for(sha256))
+        # Only ask the database, so rendering a page never waits on the object store
+        return self.dream_db.is_blob_stored(sha256)
+
+    def ingest(self, path, sha256=None):
+        """Add a media file to the store and return its hash.
+
+        Locally, if identical content is already stored, `path` is replaced by a hardlink to
+        the existing blob so the duplicate's disk space is released. Remote backends skip
+        the upload when the object already exists.
+        """
+        sha256 = sha256 or file_sha256(path)
+        key = self.key_for(sha256)
+        if self.backend.is_local:
+            blob_path = self.path_for(sha256)
+            if os.path.exists(blob_path):
+                if not os.path.samefile(path, blob_path):
+                    link = path + '.link'
+                    try:
+                        os.link(blob_path, link)
+                        os.replace(link, path)
+                    except OSError as e:
+                        if logger:
+                            logger.warning(f"Could not deduplicate {path}: {str(e)}")
+            else:
+                self.backend.put_file(key, path)
+        elif self.backend.stat(key) is None:
+            self.backend.put_file(key, path, mimetypes.guess_type(path)[0])
+        self.dream_db.register_blob(sha256, os.path.getsize(path))
+        return sha256
+
+    def link_into(self, src, dest, sha256=None, register=True):
+        """Place the content of `src` at `dest` through the store: stored once, hardlinked after that.
+
+        Without `register` the caller records the blob itself, e.g. with DreamDB.save_dreams.
+        """
+        sha256 = sha256 or file_sha256(src)
+        if self.backend.is_local:
+            blob_path = self.path_for(sha256)
+            if not os.path.exists(blob_path):
+                self.backend.put_file(self.key_for(sha256), src)
+            src = blob_path
+        elif self.backend.stat(self.key_for(sha256)) is None:
+            self.backend.put_file(self.key_for(sha256), src, mimetypes.guess_type(dest)[0])
+        if not os.path.exists(dest):
+            link_or_copy(src, dest)
+        if register:
+            self.dream_db.register_blob(sha256, os.path.getsize(dest))
+        return sha256
+
+    def release(self, *hashes):
+        """Delete the blobs among `hashes` that no dream references any more. Returns bytes freed."""
+        freed = 0
+        for sha256 in hashes:
+            if not sha256 or not SHA256_RE.match(sha256):
+                continue
+            if not self.dream_db.delete_unreferenced_blob(sha256):
+                continue
+            key = self.key_for(sha256)
+            try:
+                info = self.backend.stat(key)
+                if info and self.backend.delete(key):
+                    freed += info['size']
+            except Exception as e:
+                if logger:
+                    logger.error(f"Error removing blob {key}: {str(e)}")
+        return freed
+
+    def collect_garbage(self, grace_seconds=GC_GRACE_SECONDS):
+        """Delete every blob that has been unreferenced for longer than `grace_seconds`."""
+        freed = 0
+        while True:
+            hashes = self.dream_db.get_unreferenced_blobs(older_than_seconds=grace_seconds)
+            if not hashes:
+                break
+            freed += self.release(*hashes)
+        if freed and logger:
+            logger.info(f"Blob garbage collection freed {freed} bytes")
+        return freed
+
+    def open(self, sha256):
+        """Yield a blob's bytes in chunks, wherever the backend keeps it."""
+        return self.backend.open(self.key_for(sha256))
+
+    def presigned_url(self, sha256, content_type=None):
+        """Direct URL for a blob in a remote backend, or None when the app serves it itself."""
+        return self.backend.url(self.key_for(sha256), expires=PRESIGNED_URL_EXPIRES, content_type=content_type)
+
+    def url_for(self, dream, kind):
+        """URL for one of a dream's media files: the immutable blob URL once stored, else the legacy path."""
+        for media_kind, name_column, hash_column, legacy_prefix in MEDIA_KINDS:
+            if media_kind != kind:
+                continue
+            filename = dream.get(name_column)
+            if not filename:
+                return ''
+            sha256 = dream.get(hash_column)
+            if sha256 and self.has(sha256):
+                return f"/media/blobs/{sha256}{os.path.splitext(filename)[1].lower()}"
+            return f"{legacy_prefix}{filename}"
+        raise ValueError(f"Unknown media kind: {kind}")
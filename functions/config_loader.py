@@ -1,31 +1,203 @@
 import os
 import json
-from dotenv import load_dotenv
+import logging
+from dotenv import find_dotenv, dotenv_values
+
+logger = logging.getLogger(__name__)
 
 _config = None
 
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'config.template.json')
+CONFIG_PATH = "config.json"
+# Secrets come from .env rather than config.json
+API_KEY_NAMES = ("OPENAI_API_KEY", "LUMALABS_API_KEY", "S3_ACCESS_KEY_ID", "S3_SECRET_ACCESS_KEY", "ADMIN_TOKEN")
+DEFAULT_WATCH_INTERVAL = 2.0
+_TRUE = ('true', '1', 'yes', 'y', 'on')
+_FALSE = ('false', '0', 'no', 'n', 'off', '')
+
+# The .env values seen last, so a later edit to the file can take effect without a restart
+_dotenv_seen = {}
+
+def load_template():
+    """The option definitions in config.template.json: name, type, default and optional options/min/max."""
+    try:
+        with open(TEMPLATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def load_template_defaults():
+    """Return the default value of every option in config.template.json."""
+    return {item["name"]: item["default"] for item in load_template()}
+
+def coerce_option(spec, value):
+    """`value` as the type its template entry declares, or ValueError if it is not one or is out of range.
+
+    Strings are accepted for every type, as typed into the config editor.
+    """
+    kind = spec.get('type', 'string')
+    if kind == 'boolean':
+        if isinstance(value, str) and value.strip().lower() in _TRUE + _FALSE:
+            value = value.strip().lower() in _TRUE
+        elif not isinstance(value, bool) and value in (0, 1):
+            value = bool(value)
+        if not isinstance(value, bool):
+            raise ValueError(f"expected true or false, got {value!r}")
+    elif kind in ('integer', 'float'):
+        if isinstance(value, bool):
+            raise ValueError(f"expected a number, got {value!r}")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"expected a number, got {value!r}") from None
+        if kind == 'integer':
+            if not number.is_integer():
+                raise ValueError(f"expected a whole number, got {value!r}")
+            number = int(number)
+        if 'min' in spec and number < spec['min']:
+            raise ValueError(f"{number} is below the minimum of {spec['min']}")
+        if 'max' in spec and number > spec['max']:
+            raise ValueError(f"{number} is above the maximum of {spec['max']}")
+        value = number
+    else:
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError(f"expected text, got {value!r}")
+        value = str(value)
+        if kind == 'url' and value and not value.startswith(('http://', 'https://')):
+            raise ValueError(f"expected an http(s) URL, got {value!r}")
+    if 'options' in spec and value not in spec['options']:
+        raise ValueError(f"{value!r} is not one of {', '.join(map(str, spec['options']))}")
+    return value
+
+class ConfigSnapshot(dict):
+    """The configuration at one moment: every template option already converted to its type.
+
+    It is read-only. A reload builds a new snapshot and swaps it in whole, so a caller that
+    holds on to one always sees a consistent set of values.
+    """
+
+    def __init__(self, values, version=None, errors=()):
+        super().__init__(values)
+        self.version = version
+        # Options that were invalid and fell back to their default, as (name, reason)
+        self.errors = tuple(errors)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("The configuration is read-only; edit config.json instead")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = pop = popitem = clear = setdefault = _read_only
+
+    def replace(self, **changes):
+        """A copy with some values changed, for tools and tests; the values are used as given."""
+        return ConfigSnapshot({**self, **changes}, self.version, self.errors)
+
+    def changed_keys(self, other):
+        """Names whose value differs between this snapshot and `other`, including added and removed ones."""
+        return {key for key in self.keys() | other.keys() if self.get(key) != other.get(key)}
+
+def _source_paths():
+    return CONFIG_PATH, find_dotenv()
+
+def _source_version():
+    """Modification times of config.json and .env; a change in either means the config may have changed."""
+    version = []
+    for path in _source_paths():
+        try:
+            version.append(os.stat(path).st_mtime_ns)
+        except (FileNotFoundError, TypeError):
+            version.append(None)
+    return tuple(version)
+
+def _load_api_keys():
+    """Secrets from the environment and .env. A value edited in .env since it was last read replaces
+    the one in the environment; otherwise the environment wins, as with load_dotenv."""
+    path = _source_paths()[1]
+    values = dotenv_values(path) if path else {}
+    for key, value in values.items():
+        if value is None:
+            continue
+        if key not in os.environ or (key in _dotenv_seen and _dotenv_seen[key] != value):
+            os.environ[key] = value
+    _dotenv_seen.clear()
+    _dotenv_seen.update(values)
+    return {name: os.getenv(name) for name in API_KEY_NAMES}
+
+def build_config(raw, template=None, api_keys=None, version=None):
+    """Validate `raw` (the parsed config.json) against the template into a ConfigSnapshot.
+
+    Options added after config.json was written get their template defaults. An invalid value
+    is logged and replaced by the default, so one typo cannot stop the kiosk from starting.
+    """
+    template = load_template() if template is None else template
+    values = dict(raw)
+    errors = []
+    for spec in template:
+        name = spec['name']
+        if name not in raw:
+            values[name] = spec['default']
+            continue
+        try:
+            values[name] = coerce_option(spec, raw[name])
+        except ValueError as e:
+            errors.append((name, str(e)))
+            values[name] = spec['default']
+            logger.warning(f"Config option {name}: {e}; using the default {spec['default']!r}")
+    values.update(api_keys or {})
+    return ConfigSnapshot(values, version, errors)
+
 def load_config():
+    """Read config.json and .env into a new snapshot and make it the current one."""
     global _config
-    # Load API keys from .env
-    load_dotenv()
-    api_keys = {
-        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
-        "LUMALABS_API_KEY": os.getenv("LUMALABS_API_KEY"),
-    }
-
-    # Determine which config to load
-    config_file = "config.json"
+    version = _source_version()
+    api_keys = _load_api_keys()
+    with open(CONFIG_PATH, "r") as f:
+        raw = json.load(f)
+    _config = build_config(raw, api_keys=api_keys, version=version)
+    return _config
 
-    with open(config_file, "r") as f:
-        config = json.load(f)
+def reload_config():
+    """Load the config again and return the names of the options whose value changed.
 
-    # Merge API keys into config
-    config.update(api_keys)
-    _config = config
-    return config
+    If config.json cannot be read (for instance while an editor is halfway through saving it)
+    the current snapshot is kept and nothing is reported as changed.
+    """
+    previous = _config
+    try:
+        current = load_config()
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not reload {CONFIG_PATH}, keeping the current configuration: {str(e)}")
+        return set()
+    return current.changed_keys(previous) if previous is not None else set(current)
 
 def get_config():
     global _config
     if _config is None:
         return load_config()
-    return _config 
\ No newline at end of file
+    return _config
+
+def config_version():
+    """Modification times of config.json and .env when the config was last loaded; changes with every reload of an edited file."""
+    return get_config().version
+
+def watch_config(on_change, interval=None):
+    """Reload whenever config.json or .env is modified, calling `on_change` with the names of the
+    options that changed. Checks the files' modification times every CONFIG_WATCH_INTERVAL seconds.
+    """
+    import gevent
+    while True:
+        gevent.sleep(interval or get_config().get('CONFIG_WATCH_INTERVAL') or DEFAULT_WATCH_INTERVAL)
+        if _source_version() == get_config().version:
+            continue
+        changed = reload_config()
+        if changed:
+            try:
+                on_change(changed)
+            except Exception as e:
+                logger.error(f"Error applying config change: {str(e)}")
+
+def override_config(**values):
+    """Replace some values in the current snapshot, for scripts that point the app elsewhere before importing it."""
+    global _config
+    _config = get_config().replace(**values)
+    return _config
@@ -0,0 +1,116 @@
+import os
+import time
+import logging
+from datetime import datetime
+
+import gevent
+
+from functions.config_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = 'dreams-'
+BACKUP_SUFFIX = '.db'
+
+# Outcome of the most recent backup, reported by /api/metrics
+backup_status = {
+    'last_attempt': None,
+    'last_success': None,
+    'ok': None,
+    'path': None,
+    'bytes': None,
+    'pages': None,
+    'duration': None,
+    'error': None,
+    'backups_kept': 0,
+}
+
+def list_backups(backup_dir):
+    """Return backup file paths, oldest first. Names sort by their timestamp."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(
+        entry.name for entry in os.scandir(backup_dir)
+        if entry.is_file() and entry.name.startswith(BACKUP_PREFIX) and entry.name.endswith(BACKUP_SUFFIX)
+    )
+    return [os.path.join(backup_dir, name) for name in names]
+
+def rotate_backups(backup_dir, retention):
+    """Delete all but the newest `retention` backups and return the removed paths."""
+    backups = list_backups(backup_dir)
+    expired = backups[:-retention] if retention > 0 else []
+    for path in expired:
+        try:
+            os.remove(path)
+        except OSError as e:
+            if logger:
+                logger.warning(f"Could not remove old backup {path}: {str(e)}")
+    return expired
+
+def run_backup(dream_db, config=None):
+    """Take one verified backup, rotate old ones and record the outcome in backup_status."""
+    config = config or get_config()
+    backup_dir = config['DB_BACKUP_DIR']
+    os.makedirs(backup_dir, exist_ok=True)
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
+    dest = os.path.join(backup_dir, f"{BACKUP_PREFIX}{timestamp}{BACKUP_SUFFIX}")
+    # Write to a side file so a half-finished or corrupt copy never looks like a backup
+    part = dest + '.part'
+    started = time.monotonic()
+    backup_status['last_attempt'] = now.isoformat(timespec='seconds')
+    try:
+        pages = dream_db.backup_to(
+            part,
+            pages_per_step=int(config['DB_BACKUP_PAGES_PER_STEP']),
+            step_sleep=float(config['DB_BACKUP_STEP_SLEEP'])
+        )
+        os.replace(part, dest)
+        rotate_backups(backup_dir, int(config['DB_BACKUP_RETENTION']))
+        backup_status.update({
+            'last_success': backup_status['last_attempt'],
+            'ok': True,
+            'path': dest,
+            'bytes': os.path.getsize(dest),
+            'pages': pages,
+            'error': None,
+        })
+        if logger:
+            logger.info(f"Database backed up to {dest}")
+        return dest
+    except Exception as e:
+        backup_status.update({'ok': False, 'error': str(e)})
+        if logger:
+            logger.error(f"Database backup failed: {str(e)}")
+        if os.path.exists(part):
+            os.remove(part)
+        return None
+    finally:
+        backup_status['duration'] = round(time.monotonic() - started, 3)
+        backup_status['backups_kept'] = len(list_backups(backup_dir))
+
+def seconds_until_next_backup(backup_dir, interval_seconds, now=None):
+    """Time left before the newest backup is `interval_seconds` old (0 if one is due now)."""
+    backups = list_backups(backup_dir)
+    if not backups:
+        return 0
+    now = time.time() if now is None else now
+    age = now - os.path.getmtime(backups[-1])
+    return max(0, interval_seconds - age)
+
+def backup_loop(dream_db):
+    """Greenlet body: back up whenever the newest backup is older than the configured interval."""
+    while True:
+        interval_hours = float(get_config()['DB_BACKUP_INTERVAL_HOURS'])
+        if interval_hours <= 0:
+            gevent.sleep(3600)
+            continue
+        interval = interval_hours * 3600
+        wait = seconds_until_next_backup(get_config()['DB_BACKUP_DIR'], interval)
+        if wait > 0:
+            # Re-check at least hourly so config changes are picked up
+            gevent.sleep(min(wait, 3600))
+            continue
+        if run_backup(dream_db) is None:
+            # Don't hammer a failing disk; try again later
+            gevent.sleep(min(interval, 3600))
@@ -1,16 +1,210 @@
 import sqlite3
 import json
+import base64
+import functools
+import contextvars
+import time
+from contextlib import closing
 from datetime import datetime
 from pathlib import Path
 import logging
 from pydantic import BaseModel
-from typing import Optional
+from typing import Callable, NamedTuple, Optional
 import os
 from functions.config_loader import get_config
-import shutil
+
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:  # pragma: no cover
+    gevent = None
 
 logger = logging.getLogger(__name__)
 
+def _blocking_sleep(seconds):
+    """Sleep the current OS thread, even when time.sleep has been patched to yield to the hub."""
+    if gevent is not None and monkey.is_module_patched('time'):
+        return monkey.get_original('time', 'sleep')(seconds)
+    return time.sleep(seconds)
+
+def _off_hub(func):
+    """Run a blocking sqlite call in gevent's native threadpool when the process is monkey-patched.
+
+    Only the calling greenlet waits for the result, so a slow fsync on the SD card no longer
+    freezes every other greenlet (Socket.IO clients, audio ingest). Callers see the same
+    return values and exceptions as a direct call.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if gevent is None or not monkey.is_module_patched('socket'):
+            return func(*args, **kwargs)
+        # Run in a copy of the caller's context, so log records from the thread keep its trace id
+        return gevent.get_hub().threadpool.apply(contextvars.copy_context().run, (func,) + args, kwargs)
+    return wrapper
+
+class Migration(NamedTuple):
+    """A single schema step. `apply` must be idempotent; `destructive` steps trigger a backup first."""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+    destructive: bool = False
+
+def _add_column(conn, table, column, definition):
+    """Add a column if it is missing. ALTER TABLE ADD COLUMN only touches the schema, not the rows."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_create_dreams(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dreams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_prompt TEXT NOT NULL,
+            generated_prompt TEXT NOT NULL,
+            audio_filename TEXT NOT NULL,
+            video_filename TEXT NOT NULL,
+            thumb_filename TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT
+        )
+    ''')
+
+def _migration_created_at_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dreams_created_at ON dreams (created_at)")
+
+# Media metadata captured once at ingest so nothing has to re-probe files on the SD card
+MEDIA_METADATA_COLUMNS = {
+    'video_duration': 'REAL',
+    'video_width': 'INTEGER',
+    'video_height': 'INTEGER',
+    'video_bytes': 'INTEGER',
+    'thumb_bytes': 'INTEGER',
+    'audio_bytes': 'INTEGER',
+    'audio_duration': 'REAL',
+    'video_sha256': 'TEXT',
+    'thumb_sha256': 'TEXT',
+    'audio_sha256': 'TEXT',
+    'stage_timings': 'TEXT',  # JSON object of pipeline stage name -> seconds
+}
+
+def _migration_media_metadata(conn):
+    for column, definition in MEDIA_METADATA_COLUMNS.items():
+        _add_column(conn, 'dreams', column, definition)
+
+def _migration_last_played(conn):
+    _add_column(conn, 'dreams', 'last_played_at', 'TIMESTAMP')
+    # Eviction walks dreams from least to most recently played; never-played dreams count from creation
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dreams_lru ON dreams (COALESCE(last_played_at, created_at), id)")
+
+# Columns holding content hashes of a dream's media; each non-null value is one reference to a blob
+BLOB_HASH_COLUMNS = ('video_sha256', 'thumb_sha256', 'audio_sha256')
+
+def _blob_ref_sql(ref, delta):
+    """Trigger body statements adjusting media_blobs.refcount for every hash column of OLD or NEW."""
+    statements = []
+    for column in BLOB_HASH_COLUMNS:
+        value = f"{ref}.{column}"
+        if delta > 0:
+            statements.append(
+                f"INSERT OR IGNORE INTO media_blobs (sha256) SELECT {value} WHERE {value} IS NOT NULL;"
+            )
+        statements.append(
+            f"UPDATE media_blobs SET refcount = refcount {'+' if delta > 0 else '-'} 1, "
+            f"updated_at = CURRENT_TIMESTAMP WHERE sha256 = {value};"
+        )
+    return '\n'.join(statements)
+
+def _migration_media_blobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS media_blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Garbage collection only ever looks at unreferenced blobs
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_media_blobs_unreferenced ON media_blobs (updated_at) WHERE refcount <= 0")
+    union = ' UNION ALL '.join(f"SELECT {column} AS sha256 FROM dreams" for column in BLOB_HASH_COLUMNS)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO media_blobs (sha256, refcount)
+        SELECT sha256, COUNT(*) FROM ({union}) WHERE sha256 IS NOT NULL GROUP BY sha256
+    ''')
+    # Triggers keep the counts right whichever code path inserts, edits or deletes a dream
+    hash_columns = ', '.join(BLOB_HASH_COLUMNS)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS dreams_blob_refs_insert AFTER INSERT ON dreams BEGIN {_blob_ref_sql('NEW', 1)} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS dreams_blob_refs_delete AFTER DELETE ON dreams BEGIN {_blob_ref_sql('OLD', -1)} END")
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS dreams_blob_refs_update AFTER UPDATE OF {hash_columns} ON dreams "
+        f"BEGIN {_blob_ref_sql('OLD', -1)} {_blob_ref_sql('NEW', 1)} END"
+    )
+
+# Columns that change what the library shows. last_played_at is left out: it is touched every
+# time a dream plays, and a version bumped on playback would defeat caching of the dreams page.
+LIBRARY_VERSION_COLUMNS = (
+    'user_prompt', 'generated_prompt', 'audio_filename', 'video_filename', 'thumb_filename', 'created_at', 'status',
+) + tuple(MEDIA_METADATA_COLUMNS)
+
+def _migration_library_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS library_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO library_version (id, version) VALUES (1, 1)")
+    # Bumped by triggers, so imports and maintenance scripts invalidate cached pages too
+    bump = "UPDATE library_version SET version = version + 1 WHERE id = 1;"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS dreams_version_insert AFTER INSERT ON dreams BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS dreams_version_delete AFTER DELETE ON dreams BEGIN {bump} END")
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS dreams_version_update AFTER UPDATE OF {', '.join(LIBRARY_VERSION_COLUMNS)} "
+        f"ON dreams BEGIN {bump} END"
+    )
+
+# library_state entry recorded once the sample dreams are in a new library
+SAMPLE_DREAMS_INSTALLED = 'sample_dreams_installed'
+
+def _migration_library_state(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS library_state (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # A library that already has dreams got the samples when it was created
+    if conn.execute('SELECT 1 FROM dreams LIMIT 1').fetchone():
+        conn.execute("INSERT OR IGNORE INTO library_state (name, value) VALUES (?, '1')", (SAMPLE_DREAMS_INSTALLED,))
+
+# Ordered schema history. Append new steps here; never edit or reorder released ones.
+MIGRATIONS = [
+    Migration(1, 'create dreams table', _migration_create_dreams),
+    Migration(2, 'index dreams by created_at', _migration_created_at_index),
+    Migration(3, 'add media metadata columns', _migration_media_metadata),
+    Migration(4, 'track when dreams were last played', _migration_last_played),
+    Migration(5, 'reference-counted content-addressed media blobs', _migration_media_blobs),
+    Migration(6, 'library version bumped on every change to a dream', _migration_library_version),
+    Migration(7, 'library state, such as whether the sample dreams were installed', _migration_library_state),
+]
+
+def encode_cursor(dream):
+    """Opaque page cursor pointing just past `dream` in newest-first order."""
+    key = json.dumps([dream['created_at'], dream['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """The (created_at, id) keyset in a cursor from encode_cursor, or None for the first page. Raises ValueError."""
+    if not cursor:
+        return None
+    try:
+        created_at, dream_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(created_at, str) or not isinstance(dream_id, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return created_at, dream_id
+
 class DreamData(BaseModel):
     user_prompt: str
     generated_prompt: str
@@ -18,6 +212,17 @@ class DreamData(BaseModel):
     video_filename: str
     thumb_filename: Optional[str] = None
     status: Optional[str] = 'completed'
+    video_duration: Optional[float] = None
+    video_width: Optional[int] = None
+    video_height: Optional[int] = None
+    video_bytes: Optional[int] = None
+    thumb_bytes: Optional[int] = None
+    audio_bytes: Optional[int] = None
+    audio_duration: Optional[float] = None
+    video_sha256: Optional[str] = None
+    thumb_sha256: Optional[str] = None
+    audio_sha256: Optional[str] = None
+    stage_timings: Optional[dict] = None
 
 class DreamDB:
     def __init__(self, db_path=None):
@@ -27,110 +232,154 @@ class DreamDB:
         self._init_db()
     
     def _init_db(self):
-        """Initialize the database and create tables if they don't exist. If the dreams table is created, also initialize sample dreams."""
+        """Initialize the database and bring its schema up to date."""
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            # WAL lets readers in the threadpool carry on while a write is being committed
+            conn.execute('PRAGMA journal_mode=WAL').fetchone()
+        self._migrate()
+
+    @_off_hub
+    def get_state(self, name, default=None):
+        """Get a value recorded with set_state."""
         with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            # Check if the dreams table exists
-            cursor.execute("""
-                SELECT name FROM sqlite_master WHERE type='table' AND name='dreams';
-            """)
-            table_exists = cursor.fetchone() is not None
-            # Create the table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS dreams (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_prompt TEXT NOT NULL,
-                    generated_prompt TEXT NOT NULL,
-                    audio_filename TEXT NOT NULL,
-                    video_filename TEXT NOT NULL,
-                    thumb_filename TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT
-                )
-            ''')
+            row = conn.execute('SELECT value FROM library_state WHERE name = ?', (name,)).fetchone()
+            return row[0] if row else default
+
+    @_off_hub
+    def set_state(self, name, value):
+        """Record a value about the library as a whole, such as SAMPLE_DREAMS_INSTALLED."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                '''INSERT INTO library_state (name, value) VALUES (?, ?)
+                   ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP''',
+                (name, str(value))
+            )
             conn.commit()
-            # If the table did not exist before, initialize sample dreams
-            if not table_exists:
-                self._init_sample_dreams()
-
-    def _init_sample_dreams(self):
-        """Copy sample dreams and insert them into the database if missing."""
-        SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'dream_samples')
-        VIDEO_DEST = os.path.join(os.path.dirname(__file__), '..', get_config()['VIDEOS_DIR'])
-        THUMB_DEST = os.path.join(os.path.dirname(__file__), '..', get_config()['THUMBS_DIR'])
-        SAMPLES = [
-            {'video': 'video_1.mp4', 'thumb': 'thumb_1.png', 'video_dest': 'dream_1.mp4', 'thumb_dest': 'dream_1.png'},
-            {'video': 'video_2.mp4', 'thumb': 'thumb_2.png', 'video_dest': 'dream_2.mp4', 'thumb_dest': 'dream_2.png'},
-            {'video': 'video_3.mp4', 'thumb': 'thumb_3.png', 'video_dest': 'dream_3.mp4', 'thumb_dest': 'dream_3.png'},
-            {'video': 'video_4.mp4', 'thumb': 'thumb_4.png', 'video_dest': 'dream_4.mp4', 'thumb_dest': 'dream_4.png'},
-        ]
-        # Ensure destination directories exist
-        os.makedirs(VIDEO_DEST, exist_ok=True)
-        os.makedirs(THUMB_DEST, exist_ok=True)
-        # Get existing video filenames
-        existing = self.get_all_dreams()
-        existing_videos = {d['video_filename'] for d in existing}
-        for i, sample in enumerate(SAMPLES, 1):
-            # Copy video
-            src_video = os.path.join(SAMPLES_DIR, sample['video'])
-            dst_video = os.path.join(VIDEO_DEST, sample['video_dest'])
-            if not os.path.exists(dst_video):
-                try:
-                    shutil.copy2(src_video, dst_video)
-                except Exception as e:
-                    if logger:
-                        logger.warning(f"Could not copy sample video {src_video} to {dst_video}: {e}")
-            # Copy thumb
-            src_thumb = os.path.join(SAMPLES_DIR, sample['thumb'])
-            dst_thumb = os.path.join(THUMB_DEST, sample['thumb_dest'])
-            if not os.path.exists(dst_thumb):
-                try:
-                    shutil.copy2(src_thumb, dst_thumb)
-                except Exception as e:
+
+    @_off_hub
+    def get_schema_version(self):
+        """Return the schema version recorded in PRAGMA user_version."""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def _migrate(self):
+        """Apply pending migrations in order, all inside a single transaction."""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            current = conn.execute('PRAGMA user_version').fetchone()[0]
+            pending = [m for m in MIGRATIONS if m.version > current]
+            if not pending:
+                return current
+            # A fresh file has nothing to lose, so only back up databases that already have a schema
+            if current > 0 and any(m.destructive for m in pending):
+                self._backup_before_migration(current)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for migration in pending:
                     if logger:
-                        logger.warning(f"Could not copy sample thumb {src_thumb} to {dst_thumb}: {e}")
-            # Insert into DB if not present
-            if sample['video_dest'] not in existing_videos:
-                dream_data = DreamData(
-                    user_prompt='',
-                    generated_prompt='',
-                    audio_filename='',
-                    video_filename=sample['video_dest'],
-                    thumb_filename=sample['thumb_dest'],
-                    status='completed',
-                )
-                self.save_dream(dream_data.model_dump())
-                if logger:
-                    logger.info(f"Inserted sample dream {i}")
-            else:
+                        logger.info(f"Applying migration {migration.version}: {migration.description}")
+                    migration.apply(conn)
+                # user_version lives in the file header and is rolled back with the transaction
+                conn.execute(f'PRAGMA user_version = {int(pending[-1].version)}')
+                conn.execute('COMMIT')
+            except Exception as e:
+                conn.execute('ROLLBACK')
                 if logger:
-                    logger.info(f"Sample dream {i} already exists in DB")
-    
-    def save_dream(self, dream_data):
-        """Save a new dream record to the database."""
+                    logger.error(f"Migration failed, database left at version {current}: {str(e)}")
+                raise
+            return pending[-1].version
+        finally:
+            conn.close()
+
+    @_off_hub
+    def backup_to(self, dest_path, pages_per_step=100, step_sleep=0.05):
+        """Copy the live database to dest_path with the online backup API and verify the copy.
+
+        The copy proceeds a few pages at a time with a pause between steps, so writers are
+        never held up for long. Returns the number of pages copied.
+        """
+        src = sqlite3.connect(self.db_path)
+        dst = sqlite3.connect(dest_path)
+        pages = {'total': 0}
+        def progress(status, remaining, total):
+            pages['total'] = total
+            if remaining:
+                _blocking_sleep(step_sleep)
+        try:
+            src.backup(dst, pages=max(1, int(pages_per_step)), progress=progress)
+            result = dst.execute('PRAGMA integrity_check').fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+        finally:
+            dst.close()
+            src.close()
+        return pages['total']
+
+    def _backup_before_migration(self, version):
+        """Copy the database next to itself using the online backup API."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = f"{self.db_path}.v{version}-{timestamp}.bak"
+        src = sqlite3.connect(self.db_path)
+        dst = sqlite3.connect(backup_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        if logger:
+            logger.info(f"Backed up database to {backup_path} before destructive migration")
+        return backup_path
+
+    def _dream_insert(self, dream_data):
+        """The INSERT statement and its values for a new dream record."""
         required_fields = ['user_prompt', 'generated_prompt', 'audio_filename', 'video_filename']
         for field in required_fields:
             if field not in dream_data:
                 raise ValueError(f"Missing required field: {field}")
         
+        columns = required_fields + ['thumb_filename', 'status']
+        values = [dream_data[field] for field in required_fields]
+        values += [dream_data.get('thumb_filename'), dream_data.get('status', 'completed')]
+        # Metadata columns are optional; only write the ones we actually know
+        for column in MEDIA_METADATA_COLUMNS:
+            if dream_data.get(column) is not None:
+                columns.append(column)
+                values.append(self._encode_column(column, dream_data[column]))
+        placeholders = ', '.join('?' for _ in columns)
+        return f"INSERT INTO dreams ({', '.join(columns)}) VALUES ({placeholders})", values
+
+    @_off_hub
+    def save_dream(self, dream_data):
+        """Save a new dream record to the database."""
+        sql, values = self._dream_insert(dream_data)
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO dreams (
-                    user_prompt, generated_prompt, audio_filename, video_filename,
-                    thumb_filename, status
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                dream_data['user_prompt'],
-                dream_data['generated_prompt'],
-                dream_data['audio_filename'],
-                dream_data['video_filename'],
-                dream_data.get('thumb_filename'),
-                dream_data.get('status', 'completed')
-            ))
+            cursor.execute(sql, values)
             conn.commit()
+            if logger:
+                logger.info(f"Saved dream {cursor.lastrowid}")
             return cursor.lastrowid
+
+    @_off_hub
+    def save_dreams(self, dreams, blobs=()):
+        """Save several dream records, and register the blobs they use as (sha256, size), in one transaction.
+
+        One commit means one fsync on the SD card, however many dreams there are. Returns the new ids.
+        """
+        statements = [self._dream_insert(dream_data) for dream_data in dreams]
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                '''INSERT INTO media_blobs (sha256, size) VALUES (?, ?)
+                   ON CONFLICT(sha256) DO UPDATE SET size = excluded.size, updated_at = CURRENT_TIMESTAMP''',
+                list(blobs)
+            )
+            ids = [conn.execute(sql, values).lastrowid for sql, values in statements]
+            conn.commit()
+        if logger and ids:
+            logger.info(f"Saved dreams {', '.join(map(str, ids))}")
+        return ids
     
+    @_off_hub
     def get_dream(self, dream_id):
         """Get a single dream by ID."""
         with sqlite3.connect(self.db_path) as conn:
@@ -142,6 +391,133 @@ class DreamDB:
                 return self._row_to_dict(row)
             return None
     
+    @_off_hub
+    def get_dreams_missing_metadata(self, after_id=0, limit=100):
+        """Get dreams whose media metadata has not been recorded yet, oldest first."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM dreams WHERE video_bytes IS NULL AND id > ? ORDER BY id LIMIT ?', (after_id, limit))
+            return [self._row_to_dict(row) for row in cursor.fetchall()]
+
+    @_off_hub
+    def get_dreams_after(self, after_id=0, limit=500):
+        """Get a batch of dreams in id order, for walking the whole library without loading it at once."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM dreams WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))
+            return [self._row_to_dict(row) for row in cursor.fetchall()]
+
+    @_off_hub
+    def get_media_hashes(self):
+        """Get the set of content hashes of all media files referenced by dreams."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT video_sha256, thumb_sha256, audio_sha256 FROM dreams')
+            return {h for row in cursor.fetchall() for h in row if h}
+
+    @_off_hub
+    def get_media_file_hashes(self):
+        """Get {(filename column, filename): sha256} for every media file whose hash was recorded."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT video_filename, video_sha256, thumb_filename, thumb_sha256, '
+                           'audio_filename, audio_sha256 FROM dreams')
+            hashes = {}
+            for row in cursor.fetchall():
+                for column, name, sha256 in zip(('video_filename', 'thumb_filename', 'audio_filename'), row[::2], row[1::2]):
+                    if name and sha256:
+                        hashes[(column, name)] = sha256
+            return hashes
+
+    @_off_hub
+    def register_blob(self, sha256, size):
+        """Record a blob written to the store. Touching updated_at keeps a fresh blob safe from garbage collection."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                '''INSERT INTO media_blobs (sha256, size) VALUES (?, ?)
+                   ON CONFLICT(sha256) DO UPDATE SET size = excluded.size, updated_at = CURRENT_TIMESTAMP''',
+                (sha256, size)
+            )
+            conn.commit()
+
+    @_off_hub
+    def get_blob_refcount(self, sha256):
+        """Get how many dream columns reference a blob, or None if the blob is unknown."""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute('SELECT refcount FROM media_blobs WHERE sha256 = ?', (sha256,)).fetchone()
+            return row[0] if row else None
+
+    @_off_hub
+    def is_blob_stored(self, sha256):
+        """Whether a blob has been written to the store (not merely referenced by a dream)."""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute('SELECT size IS NOT NULL FROM media_blobs WHERE sha256 = ?', (sha256,)).fetchone()
+            return bool(row and row[0])
+
+    @_off_hub
+    def get_unreferenced_blobs(self, older_than_seconds=0, limit=500):
+        """Get hashes of blobs no dream references and that have not been touched for a while."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(
+                '''SELECT sha256 FROM media_blobs WHERE refcount <= 0 AND updated_at <= datetime('now', ?)
+                   ORDER BY updated_at LIMIT ?''',
+                (f'-{int(older_than_seconds)} seconds', limit)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @_off_hub
+    def delete_unreferenced_blob(self, sha256):
+        """Forget a blob if nothing references it. Returns True if the caller should delete its file."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute('DELETE FROM media_blobs WHERE sha256 = ? AND refcount <= 0', (sha256,))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    @_off_hub
+    def get_media_references(self, after_id=0, limit=1000):
+        """Get a batch of (id, video_filename, thumb_filename, audio_filename) tuples in id order."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT id, video_filename, thumb_filename, audio_filename FROM dreams WHERE id > ? ORDER BY id LIMIT ?',
+                (after_id, limit)
+            )
+            return cursor.fetchall()
+
+    @_off_hub
+    def import_dreams(self, dreams):
+        """Insert many dreams in a single transaction, skipping ones already in the library.
+
+        A dream is matched by its video. Archived dreams have none, so they are matched by their
+        recording and creation time instead.
+        """
+        columns = ['user_prompt', 'generated_prompt', 'audio_filename', 'video_filename',
+                   'thumb_filename', 'status', 'created_at'] + list(MEDIA_METADATA_COLUMNS)
+        inserted = 0
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            for dream in dreams:
+                for field in ('user_prompt', 'generated_prompt', 'audio_filename', 'video_filename'):
+                    if field not in dream:
+                        raise ValueError(f"Missing required field: {field}")
+                present = [c for c in columns if dream.get(c) is not None]
+                if dream['video_filename']:
+                    key = ['video_filename']
+                else:
+                    key = [c for c in ('video_filename', 'audio_filename', 'created_at') if dream.get(c) is not None]
+                cursor.execute(
+                    f"INSERT INTO dreams ({', '.join(present)}) "
+                    f"SELECT {', '.join('?' for _ in present)} "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM dreams WHERE {' AND '.join(f'{c} = ?' for c in key)})",
+                    [self._encode_column(c, dream[c]) for c in present] + [self._encode_column(c, dream[c]) for c in key]
+                )
+                inserted += cursor.rowcount
+            conn.commit()
+        return inserted
+
+    @_off_hub
     def get_all_dreams(self):
         """Get all dreams, ordered by creation date (newest first)."""
         with sqlite3.connect(self.db_path) as conn:
@@ -149,7 +525,54 @@ class DreamDB:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM dreams ORDER BY created_at DESC')
             return [self._row_to_dict(row) for row in cursor.fetchall()]
+
+    @_off_hub
+    def get_dreams_page(self, before=None, limit=50):
+        """Up to `limit` dreams, newest first, starting after the (created_at, id) keyset `before`.
+
+        Seeks straight to the cursor on the created_at index (which ends in the rowid, so it orders
+        by id too), so a page deep in a large library costs the same as the first one.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            if before is None:
+                cursor = conn.execute('SELECT * FROM dreams ORDER BY created_at DESC, id DESC LIMIT ?', (limit,))
+            else:
+                cursor = conn.execute(
+                    'SELECT * FROM dreams WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?',
+                    (*before, limit)
+                )
+            return [self._row_to_dict(row) for row in cursor.fetchall()]
+
+    @_off_hub
+    def get_library_version(self):
+        """A number that changes whenever a dream is added, edited or deleted, for validating cached pages."""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('SELECT version FROM library_version WHERE id = 1').fetchone()[0]
     
+    @_off_hub
+    def mark_played(self, dream_id):
+        """Record that a dream was just played, for least-recently-played eviction."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE dreams SET last_played_at = CURRENT_TIMESTAMP WHERE id = ?', (dream_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    @_off_hub
+    def get_least_recently_played(self, limit=20, with_video_only=False):
+        """Get dreams ordered from least to most recently played (never-played ones by creation date)."""
+        where = "WHERE video_filename != ''" if with_video_only else ''
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(
+                f'SELECT * FROM dreams {where} ORDER BY COALESCE(last_played_at, created_at), id LIMIT ?',
+                (limit,)
+            )
+            return [self._row_to_dict(row) for row in cursor.fetchall()]
+
+    @_off_hub
     def update_dream(self, dream_id, updates):
         """Update an existing dream."""
         if not updates:
@@ -160,7 +583,7 @@ class DreamDB:
             values = []
             for key, value in updates.items():
                 set_clauses.append(f"{key} = ?")
-                values.append(value)
+                values.append(self._encode_column(key, value))
             
             values.append(dream_id)
             query = f"UPDATE dreams SET {', '.join(set_clauses)} WHERE id = ?"
@@ -184,6 +607,7 @@ class DreamDB:
                 logger.error(f"Error updating dream {dream_id}: {str(e)}")
             raise
     
+    @_off_hub
     def delete_dream(self, dream_id):
         """Delete a dream from the database."""
         with sqlite3.connect(self.db_path) as conn:
@@ -192,6 +616,18 @@ class DreamDB:
             conn.commit()
             return cursor.rowcount > 0
     
+    def _encode_column(self, column, value):
+        """Serialize values for columns stored as JSON text."""
+        if column == 'stage_timings' and isinstance(value, dict):
+            return json.dumps(value)
+        return value
+
     def _row_to_dict(self, row):
         """Convert a database row to a dictionary."""
-        return dict(row) 
\ No newline at end of file
+        dream = dict(row)
+        if dream.get('stage_timings'):
+            try:
+                dream['stage_timings'] = json.loads(dream['stage_timings'])
+            except ValueError:
+                pass
+        return dream 
\ No newline at end of file
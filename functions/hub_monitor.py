@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import logging
+import warnings
+import traceback
+from collections import deque
+
+import gevent
+import gevent.events
+from gevent import monkey
+
+from functions.config_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the lag histogram buckets, in milliseconds; a final bucket counts anything slower
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Lag samples kept for /api/health, which reports on the recent past rather than since boot
+RECENT_WINDOW_SECONDS = 60
+MAX_OFFENDERS = 50
+TOP_OFFENDERS = 10
+STACK_FRAMES = 12
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# The monitor thread is a real OS thread; a patched lock would try to switch greenlets in it
+_Lock = monkey.get_original('threading', 'Lock')
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def _offender_frame(frames):
+    """The innermost frame of our own code in a stack, which is what to fix; else the innermost frame."""
+    for frame in reversed(frames):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(PROJECT_DIR + os.sep) and path != os.path.abspath(__file__) and 'site-packages' not in path:
+            return frame
+    return frames[-1] if frames else None
+
+class HubMonitor:
+    """Measure how late the gevent hub runs, and record what was running when it stalled.
+
+    A sampling greenlet sleeps for a fixed interval and records how much later than asked it
+    woke up: that lateness is the time other greenlets held the hub. gevent's monitor thread
+    reports any greenlet that runs longer than the block threshold without yielding, and the
+    stack it was blocked in is kept, grouped by the line of our code responsible.
+    """
+
+    def __init__(self, config=None):
+        config = config or get_config()
+        self.enabled = bool(config.get('HUB_MONITOR_ENABLED'))
+        self.interval = int(config.get('HUB_MONITOR_INTERVAL_MS') or 100) / 1000
+        self.threshold = int(config.get('HUB_BLOCK_THRESHOLD_MS') or 100) / 1000
+        self._lock = _Lock()
+        self._greenlet = None
+        self._counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self._samples = 0
+        self._total_lag = 0.0
+        self._max_lag = 0.0
+        self._recent = deque(maxlen=max(int(RECENT_WINDOW_SECONDS / self.interval), 1))
+        self._offenders = {}
+        self._blocked_reports = 0
+        self._saved_config = None
+        self._hub = None
+        # Monitor threads that other hubs started while ours was starting
+        self._worker_monitors = []
+
+    def start(self):
+        """Start sampling and ask gevent to report blocking greenlets. Call from the hub's thread."""
+        if self._greenlet is not None:
+            return
+        self._saved_config = {name: getattr(gevent.config, name)
+                              for name in ('max_blocking_time', 'print_blocking_reports', 'monitor_thread')}
+        gevent.config.max_blocking_time = self.threshold
+        # The greenlet tree gevent would print is not needed; the stack is recorded below
+        gevent.config.print_blocking_reports = False
+        gevent.config.monitor_thread = True
+        gevent.events.subscribers.append(self._on_event)
+        self._hub = gevent.get_hub()
+        try:
+            with warnings.catch_warnings():
+                # The thread also watches memory if psutil is installed; only blocking matters here
+                warnings.filterwarnings('ignore', message='Unable to monitor memory usage')
+                self._hub.start_periodic_monitoring_thread()
+        finally:
+            # Only this hub is watched. Left on, every hub created later, such as each threadpool
+            # worker's, would start a monitor thread of its own that walks other threads' stacks
+            gevent.config.monitor_thread = self._saved_config['monitor_thread']
+        self._greenlet = gevent.spawn(self._sample_loop)
+        if logger:
+            logger.info(f"Hub monitor started: sampling every {self.interval * 1000:.0f} ms, "
+                        f"reporting greenlets that block for {self.threshold * 1000:.0f} ms")
+
+    def stop(self):
+        if self._greenlet is None:
+            return
+        self._greenlet.kill()
+        self._greenlet = None
+        if self._on_event in gevent.events.subscribers:
+            gevent.events.subscribers.remove(self._on_event)
+        if self._hub.periodic_monitoring_thread is not None:
+            self._hub.periodic_monitoring_thread.kill()
+            self._hub.periodic_monitoring_thread = None
+        self._hub = None
+        for monitor in self._worker_monitors:
+            # kill() uninstalls a tracer that belongs to the monitored thread; this only ends the thread
+            monitor.should_run = False
+        self._worker_monitors = []
+        for name, value in self._saved_config.items():
+            setattr(gevent.config, name, value)
+
+    def _sample_loop(self):
+        while True:
+            start = time.perf_counter()
+            gevent.sleep(self.interval)
+            self.record_lag(max(time.perf_counter() - start - self.interval, 0.0))
+
+    def record_lag(self, lag):
+        """Add one sample of hub lag, in seconds."""
+        lag_ms = lag * 1000
+        bucket = next((i for i, bound in enumerate(LAG_BUCKETS_MS) if lag_ms <= bound), len(LAG_BUCKETS_MS))
+        with self._lock:
+            self._counts[bucket] += 1
+            self._samples += 1
+            self._total_lag += lag
+            self._max_lag = max(self._max_lag, lag)
+            self._recent.append((time.time(), lag))
+
+    def _on_event(self, event):
+        if isinstance(event, gevent.events.PeriodicMonitorThreadStartedEvent) and event.monitor.hub is not self._hub:
+            # Another thread's hub started while monitor_thread was on. This runs in that thread,
+            # which is where its monitor has to be killed
+            self._worker_monitors.append(event.monitor)
+            event.monitor.kill()
+            event.monitor.hub.periodic_monitoring_thread = None
+        elif isinstance(event, gevent.events.EventLoopBlocked):
+            key = self.record_blocked(event.hub.thread_ident, event.greenlet)
+            if key and logger:
+                # Log from the hub once it is free; logging's locks belong to the patched threading module
+                event.hub.loop.run_callback_threadsafe(
+                    logger.warning, f"Hub blocked for over {self.threshold * 1000:.0f} ms at {key}"
+                )
+
+    def record_blocked(self, thread_ident, greenlet=None):
+        """Record the stack of a thread whose hub is blocked. Runs in gevent's monitor thread.
+
+        Returns where the blocking call is, or None if the thread has gone.
+        """
+        frame = sys._current_frames().get(thread_ident)
+        if frame is None:
+            return None
+        frames = traceback.extract_stack(frame)[-STACK_FRAMES:]
+        culprit = _offender_frame(frames)
+        key = f"{os.path.relpath(culprit.filename, PROJECT_DIR)}:{culprit.lineno} in {culprit.name}" if culprit else 'unknown'
+        now = time.time()
+        with self._lock:
+            self._blocked_reports += 1
+            offender = self._offenders.get(key)
+            if offender is None:
+                if len(self._offenders) >= MAX_OFFENDERS:
+                    # Make room by forgetting the offender that has cost the least
+                    del self._offenders[min(self._offenders, key=lambda k: self._offenders[k]['reports'])]
+                offender = self._offenders[key] = {'location': key, 'reports': 0, 'first_seen': now}
+            offender['reports'] += 1
+            offender['last_seen'] = now
+            offender['greenlet'] = repr(greenlet) if greenlet is not None else None
+            offender['stack'] = ''.join(traceback.format_list(frames))
+        return key
+
+    def _recent_lags(self):
+        cutoff = time.time() - RECENT_WINDOW_SECONDS
+        return [lag for at, lag in self._recent if at >= cutoff]
+
+    def stats(self):
+        """Lag histogram and the greenlets that blocked the hub longest, for /api/metrics."""
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            counts = list(self._counts)
+            offenders = sorted((dict(o) for o in self._offenders.values()), key=lambda o: o['reports'], reverse=True)
+            samples, total_lag, max_lag, blocked = self._samples, self._total_lag, self._max_lag, self._blocked_reports
+            recent = self._recent_lags()
+        return {
+            'enabled': True,
+            'interval_ms': self.interval * 1000,
+            'block_threshold_ms': self.threshold * 1000,
+            'lag_ms': {
+                'samples': samples,
+                'mean': round(total_lag / samples * 1000, 3) if samples else 0.0,
+                'max': round(max_lag * 1000, 3),
+                'recent_p99': round(_percentile(recent, 0.99) * 1000, 3),
+                'histogram': {
+                    'buckets': list(LAG_BUCKETS_MS),
+                    # One more count than buckets: the last is everything slower than the largest bucket
+                    'counts': counts,
+                },
+            },
+            'blocked_reports': blocked,
+            # Each report means the hub went at least block_threshold_ms without switching
+            'top_offenders': offenders[:TOP_OFFENDERS],
+        }
+
+    def health(self):
+        """Whether the hub has kept up over the last minute."""
+        if not self.enabled:
+            return {'enabled': False, 'status': 'ok'}
+        with self._lock:
+            recent = self._recent_lags()
+        worst = max(recent, default=0.0)
+        return {
+            'enabled': True,
+            'status': 'degraded' if worst > self.threshold else 'ok',
+            'recent_max_lag_ms': round(worst * 1000, 3),
+            'recent_p99_lag_ms': round(_percentile(recent, 0.99) * 1000, 3),
+        }
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import tarfile
+import time
+
+from functions.media_info import file_sha256
+from functions.blob_store import BlobStore
+
+# Archive layout: each dream is written as `dreams/<id>.json` followed by its media files
+# (`video/<name>`, `thumbs/<name>`, `audio/<name>`), and `manifest.json` closes the stream.
+# Keeping rows next to their files means neither side ever holds the whole library in memory.
+MEDIA_KINDS = (
+    # (archive directory, config key, filename column, hash column)
+    ('video', 'VIDEOS_DIR', 'video_filename', 'video_sha256'),
+    ('thumbs', 'THUMBS_DIR', 'thumb_filename', 'thumb_sha256'),
+    ('audio', 'RECORDINGS_DIR', 'audio_filename', 'audio_sha256'),
+)
+ARCHIVE_FORMAT = 1
+CHUNK_SIZE = 64 * 1024
+ROW_BATCH_SIZE = 200
+
+def _tar_header(name, size, mtime=None):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = int(mtime if mtime is not None else time.time())
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+def _padding(size):
+    return b'\0' * (-size % tarfile.BLOCKSIZE)
+
+def _iter_file(path, size, chunk_size):
+    """Yield exactly `size` bytes of a file, failing loudly if it shrank while we read it."""
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                raise IOError(f"{path} changed size during export")
+            remaining -= len(chunk)
+            yield chunk
+
+def iter_export(dream_db, config, have_hashes=(), chunk_size=CHUNK_SIZE, logger=None):
+    """Yield the library as an uncompressed tar stream, one chunk at a time.
+
+    Files whose hash is in `have_hashes` (the receiving device's manifest) are described in
+    the dream rows but not sent, so an interrupted transfer can resume where it stopped.
+    """
+    have_hashes = set(have_hashes)
+    offset = 0
+    dream_count = file_count = skipped_count = total_bytes = 0
+    last_id = 0
+    while True:
+        batch = dream_db.get_dreams_after(after_id=last_id, limit=ROW_BATCH_SIZE)
+        if not batch:
+            break
+        for dream in batch:
+            last_id = dream['id']
+            files = []
+            for kind, dir_key, name_column, hash_column in MEDIA_KINDS:
+                name = dream.get(name_column)
+                if not name:
+                    continue
+                path = os.path.join(config[dir_key], os.path.basename(name))
+                if not os.path.isfile(path):
+                    if logger:
+                        logger.warning(f"Export: {path} is missing, dream {dream['id']} will reference it anyway")
+                    continue
+                size = os.path.getsize(path)
+                sha256 = dream.get(hash_column) or file_sha256(path)
+                included = sha256 not in have_hashes
+                files.append({'kind': kind, 'name': os.path.basename(name), 'path': path,
+                              'size': size, 'sha256': sha256, 'included': included})
+            row = {k: v for k, v in dream.items() if k != 'id'}
+            row['files'] = [{k: v for k, v in f.items() if k != 'path'} for f in files]
+            row_bytes = json.dumps(row).encode('utf-8')
+            for piece in (_tar_header(f"dreams/{dream['id']}.json", len(row_bytes)), row_bytes, _padding(len(row_bytes))):
+                offset += len(piece)
+                yield piece
+            dream_count += 1
+            for f in files:
+                if not f['included']:
+                    skipped_count += 1
+                    continue
+                header = _tar_header(f"{f['kind']}/{f['name']}", f['size'], os.path.getmtime(f['path']))
+                offset += len(header)
+                yield header
+                for chunk in _iter_file(f['path'], f['size'], chunk_size):
+                    offset += len(chunk)
+                    yield chunk
+                padding = _padding(f['size'])
+                offset += len(padding)
+                yield padding
+                file_count += 1
+                total_bytes += f['size']
+    manifest = json.dumps({
+        'format': ARCHIVE_FORMAT,
+        'exported_at': int(time.time()),
+        'dreams': dream_count,
+        'files': file_count,
+        'skipped_files': skipped_count,
+        'bytes': total_bytes,
+    }).encode('utf-8')
+    for piece in (_tar_header('manifest.json', len(manifest)), manifest, _padding(len(manifest))):
+        offset += len(piece)
+        yield piece
+    # End-of-archive marker, then pad to a full tar record
+    end = b'\0' * (tarfile.BLOCKSIZE * 2)
+    offset += len(end)
+    yield end + b'\0' * (-offset % tarfile.RECORDSIZE)
+
+def _store_member(tar, member, dest, expected_sha256, chunk_size):
+    """Stream a tar member into place, verifying its hash before it becomes visible."""
+    part_path = dest + '.part'
+    digest = hashlib.sha256()
+    source = tar.extractfile(member)
+    try:
+        with open(part_path, 'wb') as out:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        if expected_sha256 and digest.hexdigest() != expected_sha256:
+            raise ValueError(f"Checksum mismatch for {member.name}")
+        os.replace(part_path, dest)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+def import_archive(fileobj, dream_db, config, chunk_size=CHUNK_SIZE, logger=None):
+    """Read an archive produced by iter_export from a stream and merge it into the library.
+
+    Files already on disk with the same content are skipped, so re-running an
+    interrupted import only transfers what is missing. All rows are inserted in one
+    transaction at the end.
+    """
+    dirs = {kind: config[dir_key] for kind, dir_key, _, _ in MEDIA_KINDS}
+    for directory in dirs.values():
+        os.makedirs(directory, exist_ok=True)
+    # What the library already recorded for each file, so those need not be hashed again
+    recorded = dream_db.get_media_file_hashes()
+    name_columns = {kind: name_column for kind, _, name_column, _ in MEDIA_KINDS}
+    blob_store = BlobStore(dream_db, config)
+    expected = {}
+    rows = []
+    conflicted = set()
+    summary = {'dreams': 0, 'files_written': 0, 'files_skipped': 0, 'files_missing': 0,
+               'conflicts': 0, 'bytes_written': 0, 'manifest': None}
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            top, _, name = member.name.partition('/')
+            if member.name == 'manifest.json':
+                summary['manifest'] = json.load(tar.extractfile(member))
+            elif top == 'dreams':
+                row = json.load(tar.extractfile(member))
+                for f in row.get('files', []):
+                    expected[(f['kind'], os.path.basename(f['name']))] = f['sha256']
+                rows.append(row)
+            elif top in dirs and name and os.path.basename(name) == name:
+                sha256 = expected.get((top, name))
+                dest = os.path.join(dirs[top], name)
+                if os.path.exists(dest):
+                    same = sha256 and (recorded.get((name_columns[top], name)) == sha256 or file_sha256(dest) == sha256)
+                    if same:
+                        summary['files_skipped'] += 1
+                        if sha256 and not blob_store.has(sha256):
+                            blob_store.ingest(dest, sha256)
+                    else:
+                        # Same name, different content: keep ours and leave the row out
+                        conflicted.add((top, name))
+                        summary['conflicts'] += 1
+                        if logger:
+                            logger.warning(f"Import: {dest} exists with different content, skipped")
+                    continue
+                _store_member(tar, member, dest, sha256, chunk_size)
+                if sha256:
+                    blob_store.ingest(dest, sha256)
+                summary['files_written'] += 1
+                summary['bytes_written'] += member.size
+            elif logger:
+                logger.warning(f"Import: ignoring unexpected archive member {member.name}")
+    to_insert = []
+    for row in rows:
+        files = row.pop('files', [])
+        if any((f['kind'], f['name']) in conflicted for f in files):
+            continue
+        for f in files:
+            if not os.path.exists(os.path.join(dirs[f['kind']], f['name'])):
+                summary['files_missing'] += 1
+        to_insert.append(row)
+    summary['dreams'] = dream_db.import_dreams(to_insert)
+    return summary
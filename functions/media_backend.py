@@ -0,0 +1,273 @@
+import os
+import hmac
+import shutil
+import hashlib
+import logging
+import mimetypes
+from abc import ABC, abstractmethod
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+import requests
+
+from functions.config_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# S3 requires every part but the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Each part is read into memory before it is sent, so keep it small enough for a Pi
+MAX_PART_SIZE = 64 * 1024 * 1024
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+class MediaBackendError(Exception):
+    """Raised when the media backend rejects or fails a request."""
+
+class MediaBackend(ABC):
+    """Where media blobs are stored. Keys are relative, '/'-separated paths such as 'ab/cd/<sha256>'.
+
+    The per-kind media directories keep a local copy of every file whatever the backend, since
+    playback on the device, transcoding and archiving read them from disk. Backends that can hand
+    out their own URLs return them from `url()`, so the app redirects browsers instead of
+    streaming large files through the Flask process.
+    """
+
+    is_local = False
+
+    @abstractmethod
+    def put_file(self, key, path, content_type=None):
+        """Store the file at `path` under `key`."""
+
+    @abstractmethod
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        """Yield the object's bytes in chunks. Raises FileNotFoundError if it does not exist."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Delete an object. Returns False if it did not exist."""
+
+    @abstractmethod
+    def stat(self, key):
+        """Return {'size', 'etag'} for an object, or None if it does not exist."""
+
+    def url(self, key, expires=3600, content_type=None):
+        """A URL clients can fetch the object from directly, or None to have the app serve it."""
+        return None
+
+def link_or_copy(src, dest):
+    """Hardlink src to dest, copying when the two are on different filesystems."""
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        pass
+    except OSError:
+        part = dest + '.part'
+        shutil.copyfile(src, part)
+        os.replace(part, dest)
+
+class LocalBackend(MediaBackend):
+    """Objects are files under a local directory; files are hardlinked in rather than copied."""
+
+    is_local = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def put_file(self, key, path, content_type=None):
+        dest = self.path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        link_or_copy(path, dest)
+
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        with open(self.path(key), 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stat(self, key):
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return {'size': st.st_size, 'etag': None}
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+class S3Backend(MediaBackend):
+    """S3-compatible object storage (AWS, MinIO, Garage, ...) over plain HTTP with SigV4 signing.
+
+    Uses path-style URLs so any S3-compatible server works without DNS tricks. Files at least
+    `part_size` long (clamped to 5-64 MiB) are sent as a multipart upload, one part in memory at a time.
+    """
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key, region='us-east-1', prefix='',
+                 part_size=8 * 1024 * 1024, session=None, timeout=60):
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.host = urlsplit(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip('/')
+        self.part_size = min(max(int(part_size), MIN_PART_SIZE), MAX_PART_SIZE)
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def _path(self, key):
+        full_key = f"{self.prefix}/{key}" if self.prefix else key
+        return f"/{quote(self.bucket)}/{quote(full_key)}"
+
+    def _signing_key(self, date_stamp):
+        key = _hmac(('AWS4' + self.secret_key).encode('utf-8'), date_stamp)
+        for part in (self.region, 's3', 'aws4_request'):
+            key = _hmac(key, part)
+        return key
+
+    def _signature(self, method, path, query, headers, payload_hash, now):
+        """SigV4 signature over the canonical request; `query` is a dict, `headers` lower-cased."""
+        canonical_query = '&'.join(
+            f"{quote(k, safe='-_.~')}={quote(str(v), safe='-_.~')}" for k, v in sorted(query.items())
+        )
+        signed_headers = ';'.join(sorted(headers))
+        canonical_headers = ''.join(f"{k}:{str(headers[k]).strip()}\n" for k in sorted(headers))
+        canonical_request = '\n'.join([method, path, canonical_query, canonical_headers, signed_headers, payload_hash])
+        scope = f"{now:%Y%m%d}/{self.region}/s3/aws4_request"
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', f"{now:%Y%m%dT%H%M%SZ}", scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+        ])
+        signature = hmac.new(self._signing_key(f"{now:%Y%m%d}"), string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+        return signature, scope, signed_headers, canonical_query
+
+    def _request(self, method, key, query=None, data=None, headers=None, stream=False, expected=(200,)):
+        query = query or {}
+        now = datetime.now(timezone.utc)
+        path = self._path(key)
+        signed = {
+            'host': self.host,
+            'x-amz-date': f"{now:%Y%m%dT%H%M%SZ}",
+            'x-amz-content-sha256': UNSIGNED_PAYLOAD,
+        }
+        signed.update({k.lower(): v for k, v in (headers or {}).items()})
+        signature, scope, signed_headers, canonical_query = self._signature(
+            method, path, query, signed, UNSIGNED_PAYLOAD, now
+        )
+        request_headers = {k: v for k, v in signed.items() if k != 'host'}
+        request_headers['Authorization'] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        url = self.endpoint_url + path + (f"?{canonical_query}" if canonical_query else '')
+        response = self.session.request(method, url, data=data, headers=request_headers,
+                                        stream=stream, timeout=self.timeout)
+        if response.status_code not in expected:
+            if response.status_code == 404:
+                raise FileNotFoundError(key)
+            raise MediaBackendError(f"S3 {method} {key} failed with {response.status_code}: {response.text[:200]}")
+        return response
+
+    def put_file(self, key, path, content_type=None):
+        content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        size = os.path.getsize(path)
+        if size < self.part_size:
+            with open(path, 'rb') as f:
+                self._request('PUT', key, data=f, headers={'content-type': content_type, 'content-length': str(size)})
+            return
+        response = self._request('POST', key, query={'uploads': ''}, headers={'content-type': content_type})
+        root = ET.fromstring(response.content)
+        # Some servers omit the namespace
+        upload_id = root.findtext(f'{S3_NAMESPACE}UploadId') or root.findtext('UploadId')
+        if not upload_id:
+            raise MediaBackendError(f"S3 did not return an upload ID for {key}")
+        etags = []
+        try:
+            with open(path, 'rb') as f:
+                for part_number in range(1, size // self.part_size + 2):
+                    chunk = f.read(self.part_size)
+                    if not chunk:
+                        break
+                    response = self._request('PUT', key, query={'partNumber': part_number, 'uploadId': upload_id}, data=chunk)
+                    etags.append((part_number, response.headers.get('ETag', '')))
+            body = ''.join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in etags
+            )
+            self._request(
+                'POST', key, query={'uploadId': upload_id},
+                data=f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode('utf-8'),
+                headers={'content-type': 'application/xml'}
+            )
+        except Exception:
+            try:
+                self._request('DELETE', key, query={'uploadId': upload_id}, expected=(200, 204))
+            except Exception as e:
+                if logger:
+                    logger.warning(f"Could not abort multipart upload of {key}: {str(e)}")
+            raise
+
+    def open(self, key, chunk_size=CHUNK_SIZE):
+        response = self._request('GET', key, stream=True)
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                yield chunk
+        finally:
+            response.close()
+
+    def delete(self, key):
+        # S3 answers 204 whether or not the key existed; ask first so callers get a useful answer
+        existed = self.stat(key) is not None
+        self._request('DELETE', key, expected=(200, 204))
+        return existed
+
+    def stat(self, key):
+        try:
+            response = self._request('HEAD', key)
+        except FileNotFoundError:
+            return None
+        return {'size': int(response.headers.get('Content-Length', 0)), 'etag': response.headers.get('ETag')}
+
+    def url(self, key, expires=3600, content_type=None):
+        """Presigned GET URL, valid for `expires` seconds."""
+        now = datetime.now(timezone.utc)
+        path = self._path(key)
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f"{self.access_key}/{now:%Y%m%d}/{self.region}/s3/aws4_request",
+            'X-Amz-Date': f"{now:%Y%m%dT%H%M%SZ}",
+            'X-Amz-Expires': str(int(expires)),
+            'X-Amz-SignedHeaders': 'host',
+        }
+        if content_type:
+            query['response-content-type'] = content_type
+        signature, _, _, canonical_query = self._signature('GET', path, query, {'host': self.host}, UNSIGNED_PAYLOAD, now)
+        return f"{self.endpoint_url}{path}?{canonical_query}&X-Amz-Signature={signature}"
+
+def get_media_backend(config=None):
+    """Build the backend selected by MEDIA_STORAGE_BACKEND; 's3' mirrors the local store offsite."""
+    config = config or get_config()
+    backend = str(config.get('MEDIA_STORAGE_BACKEND') or 'local').lower()
+    if backend == 'local':
+        return LocalBackend(config['MEDIA_BLOBS_DIR'])
+    if backend == 's3':
+        return S3Backend(
+            endpoint_url=config['S3_ENDPOINT_URL'],
+            bucket=config['S3_BUCKET'],
+            access_key=config['S3_ACCESS_KEY_ID'],
+            secret_key=config['S3_SECRET_ACCESS_KEY'],
+            region=config['S3_REGION'],
+            prefix=config['S3_PREFIX'],
+            part_size=int(config['S3_MULTIPART_CHUNK_MB']) * 1024 * 1024,
+        )
+    raise ValueError(f"Unknown MEDIA_STORAGE_BACKEND '{backend}' (expected 'local' or 's3')")
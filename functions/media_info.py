@@ -0,0 +1,70 @@
+import hashlib
+import os
+import secrets
+from datetime import datetime
+
+import ffmpeg
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the hex SHA-256 of a file, reading it in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def unique_media_name(prefix, extension):
+    """Timestamped filename with a random suffix, so two dreams finishing in the same second never collide."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{prefix}_{timestamp}_{secrets.token_hex(3)}{extension}"
+
+def probe_media(path):
+    """Run ffprobe once and return the duration and, for video, the dimensions."""
+    probe = ffmpeg.probe(path)
+    info = {'duration': None, 'width': None, 'height': None}
+    duration = (probe.get('format') or {}).get('duration')
+    if duration is not None:
+        info['duration'] = float(duration)
+    video_stream = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), None)
+    if video_stream:
+        info['width'] = int(video_stream['width'])
+        info['height'] = int(video_stream['height'])
+        if info['duration'] is None and video_stream.get('duration') is not None:
+            info['duration'] = float(video_stream['duration'])
+    return info
+
+def collect_media_metadata(video_path=None, thumb_path=None, audio_path=None, logger=None):
+    """Gather sizes, hashes, durations and dimensions for a dream's media files.
+
+    Missing files are skipped and probe failures are logged, so callers always get a
+    (possibly partial) dict of dream columns back.
+    """
+    metadata = {}
+    for kind, path in (('video', video_path), ('thumb', thumb_path), ('audio', audio_path)):
+        if not path or not os.path.isfile(path):
+            continue
+        metadata[f'{kind}_bytes'] = os.path.getsize(path)
+        metadata[f'{kind}_sha256'] = file_sha256(path)
+        if kind == 'thumb':
+            continue
+        try:
+            info = probe_media(path)
+        except Exception as e:
+            if logger:
+                logger.warning(f"Could not probe {path}: {str(e)}")
+            continue
+        metadata[f'{kind}_duration'] = info['duration']
+        if kind == 'video':
+            metadata['video_width'] = info['width']
+            metadata['video_height'] = info['height']
+    return metadata
+
+def dream_media_paths(dream, config):
+    """Return the on-disk (video, thumb, audio) paths for a dream row."""
+    def path_for(directory, filename):
+        return os.path.join(config[directory], filename) if filename else None
+    return (
+        path_for('VIDEOS_DIR', dream.get('video_filename')),
+        path_for('THUMBS_DIR', dream.get('thumb_filename')),
+        path_for('RECORDINGS_DIR', dream.get('audio_filename')),
+    )
@@ -0,0 +1,164 @@
+import os
+import time
+import logging
+from datetime import datetime
+
+import gevent
+
+from functions.config_loader import get_config
+from functions.blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+MEDIA_KINDS = (
+    # (report key, config key, index in DreamDB.get_media_references rows)
+    ('video', 'VIDEOS_DIR', 1),
+    ('thumbs', 'THUMBS_DIR', 2),
+    ('audio', 'RECORDINGS_DIR', 3),
+)
+SCAN_BATCH_SIZE = 1000
+# Only this many paths/rows are listed in a report; the counts are always complete
+REPORT_LIMIT = 100
+STARTUP_DELAY = 300
+
+# Outcome and live progress of the most recent scan, reported by /api/metrics
+scan_status = {
+    'running': False,
+    'phase': None,
+    'rows_scanned': 0,
+    'files_scanned': 0,
+    'last_run': None,
+    'duration': None,
+    'orphans': None,
+    'orphan_bytes': None,
+    'removed': None,
+    'missing': None,
+    'error': None,
+}
+
+def _referenced_names(dream_db, batch_size):
+    """Load the media filenames referenced by dreams, per kind, with the ids of the dreams using each.
+
+    Rows are read one keyset batch at a time. Several dreams can share a file, e.g. duplicates
+    made by an import, so every id is kept.
+    """
+    referenced = {kind: {} for kind, _, _ in MEDIA_KINDS}
+    last_id = 0
+    while True:
+        rows = dream_db.get_media_references(after_id=last_id, limit=batch_size)
+        if not rows:
+            break
+        for row in rows:
+            for kind, _, index in MEDIA_KINDS:
+                if row[index]:
+                    referenced[kind].setdefault(os.path.basename(row[index]), []).append(row[0])
+        last_id = rows[-1][0]
+        scan_status['rows_scanned'] += len(rows)
+        gevent.sleep(0)
+    return referenced
+
+def scan_media(dream_db, config=None, remove_orphans=False, min_age_seconds=None, batch_size=SCAN_BATCH_SIZE):
+    """Compare the media directories with the dreams table.
+
+    Orphans are files no dream refers to (leftovers of failed pipelines, interrupted
+    imports, best-effort deletes). Files younger than `min_age_seconds` are left alone
+    so a generation in progress is never mistaken for one. Missing entries are files
+    gone from disk, with the ids of the dreams referring to them; they are only reported.
+    """
+    config = config or get_config()
+    if min_age_seconds is None:
+        min_age_seconds = int(config['MEDIA_SCAN_MIN_AGE_MINUTES']) * 60
+    started = time.monotonic()
+    report = {
+        'files_scanned': 0,
+        'orphans': [],
+        'orphan_count': 0,
+        'orphan_bytes': 0,
+        'removed': 0,
+        'missing': [],
+        'missing_count': 0,
+    }
+    scan_status.update({'running': True, 'phase': 'database', 'rows_scanned': 0, 'files_scanned': 0, 'error': None})
+    try:
+        referenced = _referenced_names(dream_db, batch_size)
+        cutoff = time.time() - min_age_seconds
+        for kind, dir_key, _ in MEDIA_KINDS:
+            scan_status['phase'] = kind
+            directory = config[dir_key]
+            names = referenced[kind]
+            found = set()
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                entries = None
+            if entries is not None:
+                with entries:
+                    for entry in entries:
+                        report['files_scanned'] += 1
+                        if report['files_scanned'] % batch_size == 0:
+                            scan_status['files_scanned'] = report['files_scanned']
+                            gevent.sleep(0)
+                        if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                            continue
+                        if entry.name in names:
+                            found.add(entry.name)
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_mtime > cutoff:
+                            continue
+                        report['orphan_count'] += 1
+                        report['orphan_bytes'] += stat.st_size
+                        if len(report['orphans']) < REPORT_LIMIT:
+                            report['orphans'].append(entry.path)
+                        if remove_orphans:
+                            try:
+                                os.remove(entry.path)
+                                report['removed'] += 1
+                            except OSError as e:
+                                if logger:
+                                    logger.warning(f"Could not remove orphaned file {entry.path}: {str(e)}")
+            for name, dream_ids in names.items():
+                if name in found:
+                    continue
+                report['missing_count'] += 1
+                if len(report['missing']) < REPORT_LIMIT:
+                    report['missing'].append({'ids': dream_ids, 'kind': kind, 'filename': name})
+        report['duration'] = round(time.monotonic() - started, 3)
+        scan_status.update({
+            'last_run': datetime.now().isoformat(timespec='seconds'),
+            'duration': report['duration'],
+            'orphans': report['orphan_count'],
+            'orphan_bytes': report['orphan_bytes'],
+            'removed': report['removed'],
+            'missing': report['missing_count'],
+        })
+        if logger:
+            logger.info(
+                f"Media scan: {report['files_scanned']} files, {report['orphan_count']} orphaned "
+                f"({report['orphan_bytes']} bytes, {report['removed']} removed), "
+                f"{report['missing_count']} missing"
+            )
+        return report
+    except Exception as e:
+        scan_status['error'] = str(e)
+        raise
+    finally:
+        scan_status.update({'running': False, 'phase': None, 'files_scanned': report['files_scanned']})
+
+def scan_loop(dream_db):
+    """Greenlet body: scan the media directories every MEDIA_SCAN_INTERVAL_HOURS."""
+    # Let startup (sample dreams, first requests) settle before walking the disk
+    gevent.sleep(STARTUP_DELAY)
+    while True:
+        config = get_config()
+        interval_hours = float(config['MEDIA_SCAN_INTERVAL_HOURS'])
+        if interval_hours <= 0:
+            gevent.sleep(3600)
+            continue
+        try:
+            scan_media(dream_db, config, remove_orphans=bool(config['MEDIA_SCAN_REMOVE_ORPHANS']))
+            BlobStore(dream_db, config).collect_garbage()
+        except Exception as e:
+            if logger:
+                logger.error(f"Media scan failed: {str(e)}")
+        gevent.sleep(interval_hours * 3600)
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import logging
+import subprocess
+import tracemalloc
+from collections import Counter
+
+import gevent
+from gevent import monkey
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MAX_PROFILE_SECONDS = 120
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+# Allocations made by the tracing itself are not what anyone is hunting for
+_TRACEMALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+# The sampler must keep running while the hub is busy, so it is a real OS thread
+_start_new_thread = monkey.get_original('_thread', 'start_new_thread')
+_get_ident = monkey.get_original('_thread', 'get_ident')
+_sleep = monkey.get_original('time', 'sleep')
+
+def _frame_label(frame):
+    """`function (file:line)`, with paths inside the project made relative."""
+    code = frame.f_code
+    path = os.path.abspath(code.co_filename)
+    if path.startswith(PROJECT_DIR + os.sep):
+        path = os.path.relpath(path, PROJECT_DIR)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{frame.f_lineno})"
+
+def collapse_stack(frame, root):
+    """One stack in the collapsed format flamegraph tools read: frames from the root, separated by ';'."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    # A frame label may not contain the separator
+    return ';'.join(label.replace(';', ':') for label in reversed(labels))
+
+class SamplingProfiler:
+    """Sample the stacks of the running process from a background thread.
+
+    Everything the app does runs on the hub's thread, so by default only that thread is sampled.
+    Whatever greenlet is running is on top of its stack; when the hub is idle the stack ends
+    in gevent's event loop. The threadpool threads, which run the sqlite calls, can be
+    included with `all_threads`.
+    """
+
+    def __init__(self):
+        self.running = False
+
+    def profile(self, seconds, interval_ms=DEFAULT_SAMPLE_INTERVAL_MS, all_threads=False):
+        """Sample for `seconds` and return (collapsed stack -> sample count, samples taken).
+
+        Only the calling greenlet waits; the hub keeps serving requests meanwhile.
+        """
+        if self.running:
+            raise RuntimeError('A profile is already being taken')
+        seconds = min(max(float(seconds), 0.1), MAX_PROFILE_SECONDS)
+        interval = max(float(interval_ms), 1) / 1000
+        hub_ident = gevent.get_hub().thread_ident
+        counts = Counter()
+        state = {'done': False, 'samples': 0, 'error': None}
+
+        def sample():
+            try:
+                own = _get_ident()
+                deadline = time.monotonic() + seconds
+                while time.monotonic() < deadline:
+                    for ident, frame in sys._current_frames().items():
+                        if ident == own or (ident != hub_ident and not all_threads):
+                            continue
+                        counts[collapse_stack(frame, 'hub' if ident == hub_ident else f"thread-{ident}")] += 1
+                    state['samples'] += 1
+                    _sleep(interval)
+            except Exception as e:  # pragma: no cover
+                state['error'] = e
+            finally:
+                state['done'] = True
+
+        self.running = True
+        try:
+            _start_new_thread(sample, ())
+            gevent.sleep(seconds)
+            while not state['done']:
+                gevent.sleep(0.05)
+        finally:
+            self.running = False
+        if state['error'] is not None:  # pragma: no cover
+            raise state['error']
+        if logger:
+            logger.info(f"CPU profile: {state['samples']} samples over {seconds:.1f} s")
+        return counts, state['samples']
+
+def format_collapsed(counts):
+    """The collapsed-stack file: one `stack count` line per distinct stack, most frequent first."""
+    return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+class MemoryTracer:
+    """tracemalloc snapshots against a baseline, for finding what keeps growing."""
+
+    def __init__(self):
+        self.baseline = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=TRACEMALLOC_FRAMES):
+        """Start tracing (a few percent slower while it runs) and take the baseline snapshot."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(int(frames))
+        self.baseline = self._snapshot()
+        return self.status()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+        return self.status()
+
+    def status(self):
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {'tracing': tracemalloc.is_tracing(), 'traced_bytes': current, 'peak_bytes': peak,
+                'frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else 0}
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+
+    def _require_tracing(self):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('tracemalloc is not running; start it first')
+
+    def top(self, limit=TOP_ALLOCATIONS, group_by='lineno'):
+        """Where the memory that is allocated right now was allocated, largest first."""
+        self._require_tracing()
+        stats = self._snapshot().statistics(group_by)
+        return dict(self.status(), top=[
+            {'size': stat.size, 'count': stat.count, 'traceback': stat.traceback.format()}
+            for stat in stats[:limit]
+        ])
+
+    def diff(self, limit=TOP_ALLOCATIONS, group_by='lineno', reset=False):
+        """What has grown (or shrunk) most since the baseline. With `reset`, now becomes the baseline."""
+        self._require_tracing()
+        # Tracing can also be started by PYTHONTRACEMALLOC, which takes no baseline
+        if self.baseline is None:
+            raise RuntimeError('No baseline snapshot; start tracing first')
+        snapshot = self._snapshot()
+        stats = snapshot.compare_to(self.baseline, group_by)
+        if reset:
+            self.baseline = snapshot
+        return dict(self.status(), top=[
+            {'size': stat.size, 'size_diff': stat.size_diff, 'count': stat.count, 'count_diff': stat.count_diff,
+             'traceback': stat.traceback.format()}
+            for stat in stats[:limit]
+        ])
+
+def parse_import_times(output):
+    """The tree in `python -X importtime` output, as (name, self_seconds, cumulative_seconds, children) tuples
+    for the top-level imports, heaviest first."""
+    roots, stack = [], []
+    # Python prints a module after everything it imported, so reading backwards gives parents first
+    for line in reversed(output.splitlines()):
+        prefix, _, rest = line.partition('import time:')
+        if prefix or rest.count('|') != 2:
+            continue
+        self_us, cumulative_us, name = rest.split('|')
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        node = (name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, [])
+        del stack[depth:]
+        (stack[-1][3] if stack else roots).append(node)
+        stack.append(node)
+    _sort_tree(roots)
+    return roots
+
+def _sort_tree(nodes):
+    nodes.sort(key=lambda node: -node[2])
+    for node in nodes:
+        _sort_tree(node[3])
+
+def measure_imports(module='dream_recorder', cwd=PROJECT_DIR):
+    """Import `module` in a fresh interpreter with -X importtime and return the parsed tree."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    return parse_import_times(result.stderr)
+
+def format_import_times(tree, max_depth=3, min_seconds=0.005):
+    """An indented breakdown of the slowest imports: cumulative and own time in ms for each module."""
+    lines = [f"{'total ms':>9} {'self ms':>8}  module"]
+
+    def walk(nodes, depth):
+        for name, self_seconds, cumulative, children in nodes:
+            if cumulative < min_seconds:
+                continue
+            lines.append(f"{cumulative * 1000:9.1f} {self_seconds * 1000:8.1f}  {'  ' * depth}{name}")
+            if depth + 1 < max_depth:
+                walk(children, depth + 1)
+    walk(tree, 0)
+    return '\n'.join(lines)
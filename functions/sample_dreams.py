@@ -0,0 +1,81 @@
+import os
+import logging
+
+from functions.config_loader import get_config
+from functions.dream_db import DreamData, SAMPLE_DREAMS_INSTALLED, _off_hub
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'dream_samples')
+# Bundled file names, and the names they get in the library
+SAMPLES = [
+    {'video': 'video_1.mp4', 'thumb': 'thumb_1.png', 'video_dest': 'dream_1.mp4', 'thumb_dest': 'dream_1.png'},
+    {'video': 'video_2.mp4', 'thumb': 'thumb_2.png', 'video_dest': 'dream_2.mp4', 'thumb_dest': 'dream_2.png'},
+    {'video': 'video_3.mp4', 'thumb': 'thumb_3.png', 'video_dest': 'dream_3.mp4', 'thumb_dest': 'dream_3.png'},
+    {'video': 'video_4.mp4', 'thumb': 'thumb_4.png', 'video_dest': 'dream_4.mp4', 'thumb_dest': 'dream_4.png'},
+]
+
+@_off_hub
+def _link_samples(blob_store, config):
+    """Put every sample file in place through the blob store, in the threadpool as it hashes and copies them.
+
+    Returns the hash columns found for each sample (None for a sample whose video could not be
+    put in place), the size of each blob, and whether every file was put in place.
+    """
+    os.makedirs(config['VIDEOS_DIR'], exist_ok=True)
+    os.makedirs(config['THUMBS_DIR'], exist_ok=True)
+    sample_hashes, blobs = [], {}
+    complete = True
+    for sample in SAMPLES:
+        hashes = {}
+        for kind, src_name, dest_dir, dest_name in (
+            ('video', sample['video'], config['VIDEOS_DIR'], sample['video_dest']),
+            ('thumb', sample['thumb'], config['THUMBS_DIR'], sample['thumb_dest']),
+        ):
+            src = os.path.join(SAMPLES_DIR, src_name)
+            dst = os.path.join(dest_dir, dest_name)
+            try:
+                sha256 = blob_store.link_into(src, dst, register=False)
+            except Exception as e:
+                if logger:
+                    logger.warning(f"Could not copy sample {kind} {src} to {dst}: {e}")
+                complete = False
+                continue
+            hashes[f'{kind}_sha256'] = sha256
+            blobs[sha256] = os.path.getsize(dst)
+        sample_hashes.append(hashes if 'video_sha256' in hashes else None)
+    return sample_hashes, blobs, complete
+
+def init_sample_dreams(dream_db, blob_store, config=None):
+    """Put the sample dreams in the library: files first, then the dreams still missing, in one transaction.
+
+    The files go through the blob store, so they are hardlinked rather than copied unless the
+    media directories are on another filesystem. Running it again only fills in what is missing.
+    A sample whose video could not be put in place is skipped. SAMPLE_DREAMS_INSTALLED is only
+    recorded once every file was, so a failure is retried on the next start. Returns the number
+    of dreams added.
+    """
+    config = config or get_config()
+    existing_videos = {d['video_filename'] for d in dream_db.get_all_dreams()}
+    sample_hashes, blobs, complete = _link_samples(blob_store, config)
+    dreams = []
+    for i, (sample, hashes) in enumerate(zip(SAMPLES, sample_hashes), 1):
+        if sample['video_dest'] in existing_videos:
+            if logger:
+                logger.info(f"Sample dream {i} already exists in DB")
+            continue
+        if hashes is None:
+            continue
+        dreams.append(DreamData(
+            user_prompt='',
+            generated_prompt='',
+            audio_filename='',
+            video_filename=sample['video_dest'],
+            thumb_filename=sample['thumb_dest'],
+            status='completed',
+            **hashes,
+        ).model_dump())
+    dream_db.save_dreams(dreams, blobs.items())
+    if complete:
+        dream_db.set_state(SAMPLE_DREAMS_INSTALLED, 1)
+    return len(dreams)
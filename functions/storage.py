@@ -0,0 +1,169 @@
+import os
+import shutil
+import time
+import logging
+
+from functions.config_loader import get_config
+from functions.dream_db import _off_hub
+from functions.media_info import dream_media_paths
+from functions.blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+MEDIA_DIRS = (
+    # (usage key, config key)
+    ('video', 'VIDEOS_DIR'),
+    ('thumbs', 'THUMBS_DIR'),
+    ('audio', 'RECORDINGS_DIR'),
+    # Blobs are hardlinked from the directories above, so only unlinked ones add to the total
+    ('blobs', 'MEDIA_BLOBS_DIR'),
+)
+USAGE_CACHE_SECONDS = 60
+
+def _iter_files(directory):
+    """Yield the regular files under a directory, descending into the blob store's shard directories."""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+@_off_hub
+def _measure(directories):
+    """Bytes used under each (key, directory), plus a total, counting hardlinked files once.
+
+    Walking a large library on the SD card takes a while, so it runs off the gevent hub.
+    """
+    usage = {'total': 0}
+    seen = set()
+    for key, directory in directories:
+        usage[key] = 0
+        for entry in _iter_files(directory):
+            stat = entry.stat(follow_symlinks=False)
+            inode = (stat.st_dev, stat.st_ino)
+            if inode in seen:
+                continue
+            seen.add(inode)
+            usage[key] += stat.st_size
+            usage['total'] += stat.st_size
+    return usage
+
+class InsufficientStorageError(Exception):
+    """Raised when there is not enough free disk space to run a generation."""
+
+class StorageManager:
+    """Tracks media disk usage and keeps it within the configured budget."""
+
+    def __init__(self, dream_db, config=None):
+        self.dream_db = dream_db
+        self._config = config
+        self._usage = None
+        self._usage_time = 0
+
+    @property
+    def config(self):
+        return self._config or get_config()
+
+    def usage(self, refresh=False):
+        """Return bytes used per media directory, plus a total. Hardlinked files are counted once."""
+        if not refresh and self._usage and time.monotonic() - self._usage_time < USAGE_CACHE_SECONDS:
+            return self._usage
+        usage = _measure([(key, self.config[dir_key]) for key, dir_key in MEDIA_DIRS])
+        self._usage = usage
+        self._usage_time = time.monotonic()
+        return usage
+
+    def free_bytes(self):
+        """Return free bytes on the filesystem holding the videos directory."""
+        path = self.config['VIDEOS_DIR']
+        while path and not os.path.exists(path):
+            path = os.path.dirname(path)
+        return shutil.disk_usage(path or '.').free
+
+    def stats(self):
+        """Summarize usage, budget and free space for /api/metrics."""
+        return {
+            'usage_bytes': self.usage(),
+            'free_bytes': self.free_bytes(),
+            'budget_bytes': self.config['MEDIA_STORAGE_BUDGET_MB'] * 1024 * 1024,
+            'generation_min_free_bytes': self.config['GENERATION_MIN_FREE_MB'] * 1024 * 1024,
+        }
+
+    def has_room_for_generation(self):
+        """Whether free space covers the worst-case needs of one pipeline run."""
+        return self.free_bytes() >= self.config['GENERATION_MIN_FREE_MB'] * 1024 * 1024
+
+    def ensure_room_for_generation(self):
+        """Raise InsufficientStorageError instead of starting a generation that would fail halfway."""
+        if self.has_room_for_generation():
+            return
+        # Eviction may free enough; only refuse if it doesn't
+        self.enforce_budget()
+        if not self.has_room_for_generation():
+            free_mb = self.free_bytes() // (1024 * 1024)
+            raise InsufficientStorageError(
+                f"Not enough free disk space to generate a dream ({free_mb} MB free, "
+                f"{self.config['GENERATION_MIN_FREE_MB']} MB needed)"
+            )
+
+    def enforce_budget(self):
+        """Evict least-recently-played dreams until media fits the budget. Returns evicted dream IDs."""
+        budget = self.config['MEDIA_STORAGE_BUDGET_MB'] * 1024 * 1024
+        if budget <= 0:
+            return []
+        policy = self.config['MEDIA_EVICTION_POLICY']
+        used = self.usage(refresh=True)['total']
+        evicted = []
+        while used > budget:
+            candidates = self.dream_db.get_least_recently_played(limit=20, with_video_only=(policy == 'downgrade'))
+            if not candidates:
+                if logger:
+                    logger.warning(f"Media uses {used} bytes, over the {budget} byte budget, but nothing is left to evict")
+                break
+            for dream in candidates:
+                used -= self.evict(dream, policy)
+                evicted.append(dream['id'])
+                if used <= budget:
+                    break
+        if evicted:
+            self.usage(refresh=True)
+        return evicted
+
+    def evict(self, dream, policy='downgrade'):
+        """Free a dream's media according to the eviction policy and return the bytes freed."""
+        video_path, thumb_path, audio_path = dream_media_paths(dream, self.config)
+        if policy == 'delete':
+            self.dream_db.delete_dream(dream['id'])
+            paths = (video_path, thumb_path, audio_path)
+        else:
+            # Keep the audio and thumbnail so the dream can still be browsed and listened to
+            self.dream_db.update_dream(dream['id'], {
+                'video_filename': '',
+                'video_bytes': None,
+                'video_sha256': None,
+                'status': 'archived',
+            })
+            paths = (video_path,)
+        freed = 0
+        for path in paths:
+            if not path or not os.path.isfile(path):
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except OSError as e:
+                if logger:
+                    logger.error(f"Error evicting {path}: {str(e)}")
+        # The files above were hardlinks; the space only comes back once the blob goes too
+        hashes = (dream.get('video_sha256'),) if policy != 'delete' else (
+            dream.get('video_sha256'), dream.get('thumb_sha256'), dream.get('audio_sha256'))
+        BlobStore(self.dream_db, self._config).release(*hashes)
+        if logger:
+            logger.info(f"Evicted dream {dream['id']} ({policy}), freed {freed} bytes")
+        return freed
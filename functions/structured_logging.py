@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import logging
+import contextvars
+import functools
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from gevent import monkey
+
+# The writer is a native thread, so file and console writes happen off the hub; it needs the
+# unpatched queue and locks, as a patched one would try to switch greenlets in that thread
+_SimpleQueue = monkey.get_original('queue', 'SimpleQueue')
+_RLock = monkey.get_original('threading', 'RLock')
+_Lock = monkey.get_original('threading', 'Lock')
+_start_new_thread = monkey.get_original('_thread', 'start_new_thread')
+
+DEFAULT_MAX_MESSAGE_CHARS = 2000
+# Traces whose cost was never collected (a recording that was never stopped) are dropped past this many
+MAX_TRACKED_TRACES = 100
+TEXT_FORMAT = '%(levelname)s:%(name)s:%(trace)s%(message)s'
+# Attributes every LogRecord has; anything else was passed with extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'trace_id', 'trace'}
+
+_trace_id = contextvars.ContextVar('trace_id', default=None)
+# trace id -> [records logged, seconds spent logging them in the caller]
+_trace_costs = {}
+# Threadpool threads log too, so the hub is not the only one updating _trace_costs
+_trace_costs_lock = _Lock()
+
+def new_trace_id():
+    return uuid.uuid4().hex[:12]
+
+def current_trace_id():
+    return _trace_id.get()
+
+@contextmanager
+def trace(trace_id):
+    """Tag every log record made inside the block, in this greenlet, with `trace_id`."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+def traced(trace_id, func):
+    """`func` wrapped to run inside `trace(trace_id)`, for handing to gevent.spawn.
+
+    A spawned greenlet starts with an empty context, so the trace has to be passed explicitly.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with trace(trace_id):
+            return func(*args, **kwargs)
+    return wrapper
+
+def pop_trace_cost(trace_id):
+    """(records, seconds) logged so far under `trace_id`, and stop counting it."""
+    with _trace_costs_lock:
+        records, seconds = _trace_costs.pop(trace_id, (0, 0.0))
+    return records, seconds
+
+def _truncate(text, limit):
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} more characters]"
+    return text
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace id and any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'trace_id', None):
+            entry['trace_id'] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """The console format, with the trace id in brackets when there is one."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record):
+        trace_id = getattr(record, 'trace_id', None)
+        record.trace = f"[{trace_id}] " if trace_id else ''
+        return super().format(record)
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread; the caller only formats the message and enqueues it.
+
+    Messages longer than `max_chars` are cut, so a large API payload costs neither the queue nor
+    the log file much. The time spent here is added up per trace, which is the logging overhead
+    a dream pays on the hub.
+    """
+
+    def __init__(self, queue, max_chars=DEFAULT_MAX_MESSAGE_CHARS):
+        super().__init__(queue)
+        self.max_chars = max_chars
+
+    def createLock(self):
+        # Taken from the threadpool threads as well as the hub, so not gevent's
+        self.lock = _RLock()
+
+    def handle(self, record):
+        # Handler.handle without the lock around emit: SimpleQueue.put is thread-safe on its own
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def prepare(self, record):
+        # What the stdlib does, minus formatting the whole line: the writer's formatters do that
+        record = logging.makeLogRecord(vars(record))
+        record.msg = _truncate(record.getMessage(), self.max_chars)
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.trace_id = _trace_id.get()
+        return record
+
+    def emit(self, record):
+        start = time.perf_counter()
+        super().emit(record)
+        trace_id = _trace_id.get()
+        if trace_id:
+            elapsed = time.perf_counter() - start
+            with _trace_costs_lock:
+                if trace_id not in _trace_costs and len(_trace_costs) >= MAX_TRACKED_TRACES:
+                    del _trace_costs[next(iter(_trace_costs))]
+                cost = _trace_costs.setdefault(trace_id, [0, 0.0])
+                cost[0] += 1
+                cost[1] += elapsed
+
+class LogWriter(logging.handlers.QueueListener):
+    """A QueueListener whose thread is a native one, so slow writes never hold up the hub."""
+
+    def __init__(self, queue, *handlers):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        for handler in handlers:
+            # Only this thread uses the handlers, but their locks must not be gevent's
+            handler.lock = _RLock()
+        self._running = _Lock()
+
+    def start(self):
+        self._running.acquire()
+
+        def run():
+            try:
+                self._monitor()
+            finally:
+                self._running.release()
+        _start_new_thread(run, ())
+
+    def stop(self):
+        """Write out everything queued so far, then stop."""
+        if self._running.locked():
+            self.enqueue_sentinel()
+            self._running.acquire(timeout=5)
+            self._running.release()
+
+_writer = None
+
+def configure_logging(config):
+    """Route all logging through the writer thread: text to the console and, if LOG_FILE is set,
+    JSON lines to a rotating file. Safe to call more than once; later calls do nothing."""
+    global _writer
+    if _writer is not None:
+        return _writer
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(TextFormatter())
+    handlers = [console]
+    log_file = config.get('LOG_FILE')
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(float(config.get('LOG_FILE_MAX_MB') or 10) * 1024 * 1024),
+            backupCount=int(config.get('LOG_FILE_BACKUPS') or 5),
+            encoding='utf-8',
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    queue = _SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(AsyncQueueHandler(queue, int(config.get('LOG_MAX_MESSAGE_CHARS') or 0)))
+    root.setLevel(getattr(logging, str(config.get('LOG_LEVEL') or 'INFO')))
+    _writer = LogWriter(queue, *handlers)
+    _writer.start()
+    atexit.register(_writer.stop)
+    return _writer
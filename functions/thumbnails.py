@@ -0,0 +1,173 @@
+import os
+import hashlib
+import logging
+import secrets
+import threading
+
+import ffmpeg
+
+from functions.config_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+# Variant widths served for the dreams grid; requests are snapped to these so the cache stays small
+THUMB_WIDTHS = (160, 320, 480)
+THUMB_FORMATS = {
+    # format: (extension, mime type, ffmpeg output options)
+    'webp': ('.webp', 'image/webp', {'c:v': 'libwebp', 'quality': 80, 'compression_level': 4}),
+    'jpeg': ('.jpg', 'image/jpeg', {'q:v': 4}),
+    'png': ('.png', 'image/png', {}),
+}
+# Thumbnails are made by ffmpeg; a page full of cache misses must not start one per image at once
+MAX_CONCURRENT_RESIZES = 2
+# Shrink the cache to this fraction of its budget when it overflows, so eviction is not run on every miss
+EVICT_TARGET = 0.9
+
+def snap_width(width):
+    """Smallest variant width that is at least `width`, or the largest one."""
+    for candidate in THUMB_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return THUMB_WIDTHS[-1]
+
+def thumbnail_format(fmt=None):
+    """Return (extension, mime type, ffmpeg options) for a format, defaulting to THUMB_FORMAT."""
+    fmt = (fmt or get_config()['THUMB_FORMAT']).lower()
+    if fmt not in THUMB_FORMATS:
+        raise ValueError(f"Unsupported thumbnail format '{fmt}' (expected one of {', '.join(THUMB_FORMATS)})")
+    return THUMB_FORMATS[fmt]
+
+def thumbnail_url(url, width, fmt=None):
+    """URL of a resized variant of the thumbnail at `url`."""
+    if not url:
+        return ''
+    return f"{url}?w={snap_width(width)}&fmt={(fmt or get_config()['THUMB_FORMAT']).lower()}"
+
+def thumbnail_srcset(url, fmt=None):
+    """`srcset` value listing every variant width of the thumbnail at `url`."""
+    if not url:
+        return ''
+    return ', '.join(f"{thumbnail_url(url, width, fmt)} {width}w" for width in THUMB_WIDTHS)
+
+def source_key(path):
+    """Cache key for a thumbnail that has no content hash: changes whenever the file does."""
+    st = os.stat(path)
+    return hashlib.sha256(f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}".encode('utf-8')).hexdigest()
+
+class ThumbnailCache:
+    """Resized thumbnail variants, generated on first request and kept on disk.
+
+    Variants are named <key>-<width><ext>, where the key identifies the source image's
+    content, so a cached file never goes stale and its name doubles as an ETag. The cache
+    is kept under THUMB_CACHE_MAX_MB by removing the least recently requested variants.
+    """
+
+    def __init__(self, config=None):
+        self._config = config
+        self._size = None
+        self._lock = threading.Lock()
+        self._resizes = threading.BoundedSemaphore(MAX_CONCURRENT_RESIZES)
+
+    @property
+    def config(self):
+        return self._config or get_config()
+
+    def path_for(self, key, width, fmt=None):
+        extension = thumbnail_format(fmt)[0]
+        return os.path.join(self.config['THUMB_CACHE_DIR'], key[:2], f"{key}-{snap_width(width)}{extension}")
+
+    def variant(self, key, source, width, fmt=None):
+        """Return the path of a cached variant, creating it from `source` on a miss.
+
+        `source` is the original image's path, or an iterable of its bytes for images that
+        are not on local disk (those are only read on a miss).
+        """
+        extension, _, output_options = thumbnail_format(fmt)
+        width = snap_width(width)
+        path = self.path_for(key, width, fmt)
+        try:
+            # Mark the variant as recently used for eviction
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Hidden, unique temporary names keep the extension ffmpeg picks the encoder from
+        token = secrets.token_hex(4)
+        tmp_path = os.path.join(os.path.dirname(path), f".{token}-{os.path.basename(path)}")
+        source_path = None
+        try:
+            if not isinstance(source, str):
+                source_path = os.path.join(os.path.dirname(path), f".{token}.src")
+                with open(source_path, 'wb') as f:
+                    for chunk in source:
+                        f.write(chunk)
+                source = source_path
+            stream = ffmpeg.input(source)
+            stream = ffmpeg.filter(stream, 'scale', width, -2)
+            stream = ffmpeg.output(stream, tmp_path, vframes=1, **output_options)
+            with self._resizes:
+                try:
+                    ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                except ffmpeg.Error as e:
+                    if logger:
+                        logger.error(f"FFmpeg error resizing thumbnail: {e.stderr.decode(errors='replace')}")
+                    raise
+            os.replace(tmp_path, path)
+        finally:
+            for leftover in (tmp_path, source_path):
+                if leftover and os.path.exists(leftover):
+                    os.remove(leftover)
+        self._added(os.path.getsize(path))
+        return path
+
+    def _walk(self):
+        root = self.config['THUMB_CACHE_DIR']
+        for directory, _, files in os.walk(root):
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st
+
+    def size(self):
+        """Bytes used by cached variants. Measured once, then kept up to date as variants come and go."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(st.st_size for _, st in self._walk())
+            return self._size
+
+    def _added(self, size):
+        with self._lock:
+            if self._size is None:
+                # The first measurement already includes the new variant
+                self._size = sum(st.st_size for _, st in self._walk())
+            else:
+                self._size += size
+            over_budget = self._size > int(self.config['THUMB_CACHE_MAX_MB']) * 1024 * 1024
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used variants until the cache is back under budget. Returns bytes freed."""
+        target = int(self.config['THUMB_CACHE_MAX_MB']) * 1024 * 1024 * EVICT_TARGET
+        entries = sorted(self._walk(), key=lambda item: item[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        freed = 0
+        for path, st in entries:
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+                freed += st.st_size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = total - freed
+        if freed and logger:
+            logger.info(f"Thumbnail cache evicted {freed} bytes")
+        return freed
@@ -5,8 +5,8 @@ import os
 import ffmpeg
 import shutil
 
-from datetime import datetime
 from functions.config_loader import get_config
+from functions.media_info import unique_media_name
 
 def process_video(input_path, logger=None):
     """Process the video using FFmpeg with specific filters from environment variables."""
@@ -16,11 +16,11 @@ def process_video(input_path, logger=None):
             temp_path = temp_file.name
         # Apply FFmpeg filters using environment variables
         stream = ffmpeg.input(input_path)
-        stream = ffmpeg.filter(stream, 'eq', brightness=float(get_config()['FFMPEG_BRIGHTNESS']))
-        stream = ffmpeg.filter(stream, 'vibrance', intensity=float(get_config()['FFMPEG_VIBRANCE']))
-        stream = ffmpeg.filter(stream, 'vaguedenoiser', threshold=float(get_config()['FFMPEG_DENOISE_THRESHOLD']))
-        stream = ffmpeg.filter(stream, 'bilateral', sigmaS=float(get_config()['FFMPEG_BILATERAL_SIGMA']))
-        stream = ffmpeg.filter(stream, 'noise', all_strength=float(get_config()['FFMPEG_NOISE_STRENGTH']))
+        stream = ffmpeg.filter(stream, 'eq', brightness=get_config()['FFMPEG_BRIGHTNESS'])
+        stream = ffmpeg.filter(stream, 'vibrance', intensity=get_config()['FFMPEG_VIBRANCE'])
+        stream = ffmpeg.filter(stream, 'vaguedenoiser', threshold=get_config()['FFMPEG_DENOISE_THRESHOLD'])
+        stream = ffmpeg.filter(stream, 'bilateral', sigmaS=get_config()['FFMPEG_BILATERAL_SIGMA'])
+        stream = ffmpeg.filter(stream, 'noise', all_strength=get_config()['FFMPEG_NOISE_STRENGTH'])
         stream = ffmpeg.output(stream, temp_path)
         # Run FFmpeg
         ffmpeg.run(stream, overwrite_output=True, quiet=True)
@@ -50,9 +50,7 @@ def process_thumbnail(video_path, logger=None):
         # Create output directory if it doesn't exist
         thumbs_dir = get_config()['THUMBS_DIR']
         os.makedirs(thumbs_dir, exist_ok=True)
-        # Generate simple timestamp-based filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        thumb_filename = f"thumb_{timestamp}.png"
+        thumb_filename = unique_media_name('thumb', '.png')
         thumb_path = os.path.join(thumbs_dir, thumb_filename)
         # Log the FFmpeg command for debugging
         if logger:
@@ -79,9 +77,15 @@ def process_thumbnail(video_path, logger=None):
             logger.error(f"Error generating thumbnail: {str(e)}")
         raise
 
-def generate_video(prompt, filename=None, luma_extend=False, logger=None, config=None):
-    """Generate a video using Luma Labs API, with optional extension if LUMA_EXTEND is set."""
+def generate_video(prompt, filename=None, luma_extend=False, logger=None, config=None, timings=None):
+    """Generate a video using Luma Labs API, with optional extension if LUMA_EXTEND is set.
+
+    If a `timings` dict is passed, the seconds spent in each stage are recorded into it.
+    """
+    if timings is None:
+        timings = {}
     try:
+        stage_start = time.monotonic()
         # If luma_extend, split the prompt into two parts
         if luma_extend and '*****' in prompt:
             initial_prompt, extension_prompt = [p.strip() for p in prompt.split('*****', 1)]
@@ -108,7 +112,7 @@ def generate_video(prompt, filename=None, luma_extend=False, logger=None, config
             raise Exception(f"Luma API error: {response.text}")
         response_data = response.json()
         if logger:
-            logger.info(f"API response: {response_data}")
+            logger.debug(f"API response: {response_data}")
         generation_id = response_data.get('id')
         if not generation_id:
             raise Exception("Failed to get generation ID from response")
@@ -116,8 +120,9 @@ def generate_video(prompt, filename=None, luma_extend=False, logger=None, config
             logger.info(f"Started video generation with ID: {generation_id}")
         def poll_for_completion(generation_id):
             """Poll the Luma API for video generation completion."""
-            max_attempts = int(get_config()['LUMA_MAX_POLL_ATTEMPTS'])
-            poll_interval = float(get_config()['LUMA_POLL_INTERVAL'])
+            max_attempts = get_config()['LUMA_MAX_POLL_ATTEMPTS']
+            poll_interval = get_config()['LUMA_POLL_INTERVAL']
+            last_state = None
             for attempt in range(max_attempts):
                 status_response = requests.get(
                     f"{get_config()['LUMA_API_URL']}/generations/{generation_id}",
@@ -134,10 +139,12 @@ def generate_video(prompt, filename=None, luma_extend=False, logger=None, config
                 status_data = status_response.json()
                 if attempt == 0 or attempt % 10 == 0:
                     if logger:
-                        logger.info(f"Full status response: {status_data}")
+                        logger.debug(f"Full status response: {status_data}")
                 state = status_data.get('state')
-                if logger:
+                # One line per change of state rather than one per poll
+                if logger and state != last_state:
                     logger.info(f"Generation state: {state} (attempt {attempt+1}/{max_attempts})")
+                last_state = state
                 if state in ['completed', 'succeeded']:
                     assets = status_data.get('assets') or {}
                     video_url = None
@@ -198,24 +205,30 @@ def generate_video(prompt, filename=None, luma_extend=False, logger=None, config
             video_url = poll_for_completion(extend_id)
         else:
             video_url = poll_for_completion(generation_id)
+        timings['luma'] = time.monotonic() - stage_start
         # Download the generated video
+        stage_start = time.monotonic()
         video_response = requests.get(video_url, stream=True)
         video_response.raise_for_status()
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"generated_{timestamp}.mp4"
+            filename = unique_media_name('generated', '.mp4')
         os.makedirs(get_config()['VIDEOS_DIR'], exist_ok=True)
         video_path = os.path.join(get_config()['VIDEOS_DIR'], filename)
         with open(video_path, 'wb') as f:
             for chunk in video_response.iter_content(chunk_size=8192):
                 f.write(chunk)
+        timings['download'] = time.monotonic() - stage_start
         if logger:
             logger.info(f"Saved video to {video_path}")
         # Post-process the video and generate a thumbnail
+        stage_start = time.monotonic()
         processed_video_path = process_video(video_path, logger)
+        timings['process_video'] = time.monotonic() - stage_start
         if logger:
             logger.info(f"Processed video saved to {processed_video_path}")
+        stage_start = time.monotonic()
         thumb_filename = process_thumbnail(processed_video_path, logger)
+        timings['thumbnail'] = time.monotonic() - stage_start
         return filename, thumb_filename
     except Exception as e:
         if logger:
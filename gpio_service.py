@@ -8,6 +8,7 @@ It detects different touch patterns and calls different endpoints.
 """
 
 import time
+import queue
 import logging
 import requests
 import argparse
@@ -27,21 +28,30 @@ class TouchPattern(Enum):
     SINGLE_TAP = 1
     DOUBLE_TAP = 2
 
+# How the pin is watched: edge interrupts, or reading it every GPIO_SAMPLING_RATE seconds
+MONITOR_MODES = ('interrupt', 'polling')
+# Put on the edge queue by stop_monitoring, to wake the interrupt loop
+_STOP = object()
+
 class GPIOController:
     """Controller for GPIO interactions with hardware components."""
     
-    def __init__(self, pin=None, debounce_time=None, sampling_rate=None):
+    def __init__(self, pin=None, debounce_time=None, sampling_rate=None, mode=None):
         """
         Initialize the GPIO controller.
         
         Args:
             pin (int): GPIO pin number for the touch sensor
             debounce_time (float): Minimum time between state changes
-            sampling_rate (float): How often to sample the pin state
+            sampling_rate (float): How often to sample the pin state in polling mode
+            mode (str): 'interrupt' to be woken by edges, 'polling' to sample the pin
         """
         self.pin = pin or int(get_config()['GPIO_PIN'])
         self.debounce_time = debounce_time or float(get_config()['GPIO_DEBOUNCE_TIME'])
         self.sampling_rate = sampling_rate or float(get_config()['GPIO_SAMPLING_RATE'])
+        self.mode = mode or get_config()['GPIO_MODE']
+        if self.mode not in MONITOR_MODES:
+            raise ValueError(f"Unknown GPIO mode {self.mode!r}; expected one of {', '.join(MONITOR_MODES)}")
         self.is_running = False
         self.callbacks = {}
         
@@ -51,6 +61,10 @@ class GPIOController:
         self.press_start_time = 0
         self.last_tap_time = 0
         self.tap_count = 0
+        # Set when a change came too soon after the last one, so the pin is read again once the debounce time is up
+        self.recheck_pending = False
+        self._edges = None
+        self._edge_level = False
         
         # Import GPIO here for better error handling
         import RPi.GPIO as GPIO
@@ -72,6 +86,47 @@ class GPIOController:
         self.callbacks[pattern] = callback_func
         logger.info(f"Registered callback for {pattern.name}")
     
+    def handle_state(self, current_state, current_time):
+        """
+        Feed one reading of the pin through debounce and tap detection; both modes share this.
+        
+        Args:
+            current_state (bool): Whether the sensor is touched
+            current_time (float): When the pin had that state
+        """
+        if current_state == self.last_state:
+            # Back where it was: whatever came in between was a bounce
+            self.recheck_pending = False
+            return
+        if current_time - self.last_change_time <= self.debounce_time:
+            self.recheck_pending = True
+            return
+        self.recheck_pending = False
+        self.last_change_time = current_time
+        self.last_state = current_state
+
+        if current_state:  # Button pressed
+            self.press_start_time = current_time
+        else:  # Button released
+            press_duration = current_time - self.press_start_time
+            
+            if press_duration <= self.single_tap_max:
+                self.tap_count += 1
+                if self.tap_count == 1:
+                    self.last_tap_time = current_time
+                elif self.tap_count == 2:
+                    if current_time - self.last_tap_time <= self.double_tap_max_interval:
+                        if TouchPattern.DOUBLE_TAP in self.callbacks:
+                            self.callbacks[TouchPattern.DOUBLE_TAP]()
+                    self.tap_count = 0
+
+    def check_single_tap(self, current_time):
+        """Report a single tap once the time for a second tap has passed."""
+        if self.tap_count == 1 and current_time - self.last_tap_time > self.double_tap_max_interval:
+            if TouchPattern.SINGLE_TAP in self.callbacks:
+                self.callbacks[TouchPattern.SINGLE_TAP]()
+            self.tap_count = 0
+
     def start_monitoring(self, single_tap_max=None, double_tap_max_interval=None):
         """
         Start monitoring for touch sensor events with specific pattern detection.
@@ -83,42 +138,14 @@ class GPIOController:
         self.single_tap_max = single_tap_max or float(get_config()['GPIO_SINGLE_TAP_MAX_DURATION'])
         self.double_tap_max_interval = double_tap_max_interval or float(get_config()['GPIO_DOUBLE_TAP_MAX_INTERVAL'])
         self.is_running = True
-        logger.info("Starting GPIO monitoring loop")
         
         try:
-            while self.is_running:
-                current_state = self.GPIO.input(self.pin) == self.GPIO.HIGH
-                current_time = time.time()
-                
-                if current_state != self.last_state:
-                    if current_time - self.last_change_time > self.debounce_time:
-                        self.last_change_time = current_time
-                        self.last_state = current_state
-
-                        if current_state:  # Button pressed
-                            self.press_start_time = current_time
-                        else:  # Button released
-                            press_duration = current_time - self.press_start_time
-                            
-                            if press_duration <= self.single_tap_max:
-                                self.tap_count += 1
-                                if self.tap_count == 1:
-                                    self.last_tap_time = current_time
-                                elif self.tap_count == 2:
-                                    if current_time - self.last_tap_time <= self.double_tap_max_interval:
-                                        if TouchPattern.DOUBLE_TAP in self.callbacks:
-                                            self.callbacks[TouchPattern.DOUBLE_TAP]()
-                                    self.tap_count = 0
-
-                # Check for single tap timeout
-                if self.tap_count == 1 and current_time - self.last_tap_time > self.double_tap_max_interval:
-                    if TouchPattern.SINGLE_TAP in self.callbacks:
-                        self.callbacks[TouchPattern.SINGLE_TAP]()
-                    self.tap_count = 0
-                
-                # Sleep for a bit to reduce CPU usage
-                time.sleep(self.sampling_rate)
-                
+            if self.mode == 'interrupt' and self._start_edge_detection():
+                logger.info("Starting GPIO monitoring on edge interrupts")
+                self._monitor_edges()
+            else:
+                logger.info("Starting GPIO monitoring loop")
+                self._poll()
         except KeyboardInterrupt:
             logger.info("Keyboard interrupt received, stopping")
         except Exception as e:
@@ -126,10 +153,71 @@ class GPIOController:
                 logger.error(f"Error in GPIO monitoring: {str(e)}")
         finally:
             self.cleanup()
+
+    def _poll(self):
+        """Read the pin every `sampling_rate` seconds."""
+        while self.is_running:
+            current_state = self.GPIO.input(self.pin) == self.GPIO.HIGH
+            current_time = time.time()
+            self.handle_state(current_state, current_time)
+            # Check for single tap timeout
+            self.check_single_tap(current_time)
+            # Sleep for a bit to reduce CPU usage
+            time.sleep(self.sampling_rate)
+
+    def _start_edge_detection(self):
+        """Ask for a callback on every edge of the pin. False if the kernel or library cannot do it."""
+        self._edges = queue.SimpleQueue()
+        # The level before the first edge; every edge after it flips it
+        self._edge_level = self.GPIO.input(self.pin) == self.GPIO.HIGH
+        def on_edge(channel):
+            # Runs on the GPIO library's thread: note the time, and leave the rest to the monitor
+            self._edges.put(time.time())
+        try:
+            self.GPIO.add_event_detect(self.pin, self.GPIO.BOTH, callback=on_edge)
+        except (RuntimeError, AttributeError) as e:
+            logger.warning(f"Edge detection unavailable ({str(e)}); polling the pin every {self.sampling_rate} s instead")
+            return False
+        return True
+
+    def _next_deadline(self, now):
+        """Seconds until the monitor has something to do without a new edge, or None to wait for one."""
+        deadlines = []
+        if self.tap_count == 1:
+            deadlines.append(self.last_tap_time + self.double_tap_max_interval)
+        if self.recheck_pending:
+            deadlines.append(self.last_change_time + self.debounce_time)
+        if not deadlines:
+            return None
+        # Just past the deadline, as both checks compare with `>`
+        return max(min(deadlines) - now, 0) + 0.001
+
+    def _monitor_edges(self):
+        """Sleep until an edge arrives or a tap window or debounce period ends."""
+        self.handle_state(self._edge_level, time.time())
+        while self.is_running:
+            try:
+                edge_time = self._edges.get(timeout=self._next_deadline(time.time()))
+            except queue.Empty:
+                edge_time = None
+            if edge_time is _STOP:
+                break
+            if edge_time is not None:
+                # A BOTH callback does not say which way the pin went, and reading the pin in it sees the
+                # level when the callback ran, which after a short tap may already be the release
+                self._edge_level = not self._edge_level
+                self.handle_state(self._edge_level, edge_time)
+            elif self.recheck_pending and time.time() - self.last_change_time > self.debounce_time:
+                # A change was dropped as a bounce; the level it settled on counts from now
+                self._edge_level = self.GPIO.input(self.pin) == self.GPIO.HIGH
+                self.handle_state(self._edge_level, time.time())
+            self.check_single_tap(time.time())
     
     def stop_monitoring(self):
         """Stop monitoring for touch sensor events."""
         self.is_running = False
+        if self._edges is not None:
+            self._edges.put(_STOP)
         logger.info("Stopping GPIO monitoring")
     
     def cleanup(self):
@@ -159,6 +247,8 @@ def main():
                         help=f'Debounce time in seconds (default: {get_config()["GPIO_DEBOUNCE_TIME"]})')
     parser.add_argument('--sampling-rate', type=float, default=get_config()['GPIO_SAMPLING_RATE'],
                         help=f'Sampling rate in seconds (default: {get_config()["GPIO_SAMPLING_RATE"]})')
+    parser.add_argument('--mode', choices=MONITOR_MODES, default=get_config()['GPIO_MODE'],
+                        help=f'Watch the pin with edge interrupts or by polling (default: {get_config()["GPIO_MODE"]})')
     parser.add_argument('--startup-delay', type=int, default=int(get_config()['GPIO_STARTUP_DELAY']),
                         help=f'Delay in seconds before starting (default: {get_config()["GPIO_STARTUP_DELAY"]})')
     parser.add_argument('--test', action='store_true', help='Run in test mode (simulate taps from CLI)')
@@ -297,7 +387,8 @@ def main():
             controller = GPIOController(
                 pin=args.pin, 
                 debounce_time=args.debounce_time,
-                sampling_rate=args.sampling_rate
+                sampling_rate=args.sampling_rate,
+                mode=args.mode
             )
             
             # Register callbacks for each touch pattern
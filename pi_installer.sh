@@ -194,6 +194,20 @@ else
     log_warn "Luma Labs API key is invalid. Please check your .env file."
 fi
 
+log_step "Building background images for the display"
+if docker compose exec dream_recorder python scripts/build_backgrounds.py; then
+    log_info "Background images built."
+else
+    log_warn "Could not build background images. The original images will be used."
+fi
+
+log_step "Building scripts and stylesheets"
+if docker compose exec dream_recorder python scripts/build_assets.py; then
+    log_info "Scripts and stylesheets built."
+else
+    log_warn "Could not build scripts and stylesheets. The unbundled files will be used."
+fi
+
 log_step "Enabling lingering for user services to start at boot"
 if sudo loginctl enable-linger $USER; then
     log_info "Lingering enabled for $USER. User services will start at boot."
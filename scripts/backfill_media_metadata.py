@@ -0,0 +1,59 @@
+import os
+import sys
+import logging
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.config_loader import get_config
+from functions.dream_db import DreamDB
+from functions.media_info import collect_media_metadata, dream_media_paths
+from functions.blob_store import BlobStore
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+def main():
+    db = DreamDB()
+    updated = 0
+    skipped = 0
+    last_id = 0
+    while True:
+        batch = db.get_dreams_missing_metadata(after_id=last_id, limit=BATCH_SIZE)
+        if not batch:
+            break
+        for dream in batch:
+            last_id = dream['id']
+            video_path, thumb_path, audio_path = dream_media_paths(dream, get_config())
+            metadata = collect_media_metadata(video_path, thumb_path, audio_path, logger=logger)
+            if 'video_bytes' not in metadata:
+                skipped += 1
+                print(f"Dream {dream['id']}: video file missing, skipped")
+                continue
+            db.update_dream(dream['id'], metadata)
+            updated += 1
+            print(f"Dream {dream['id']}: metadata recorded")
+    print(f"Backfilled {updated} dream(s), skipped {skipped}")
+    # Move existing media into the content-addressed store; identical files end up stored once
+    blob_store = BlobStore(db)
+    stored = 0
+    last_id = 0
+    while True:
+        batch = db.get_dreams_after(after_id=last_id, limit=BATCH_SIZE)
+        if not batch:
+            break
+        for dream in batch:
+            last_id = dream['id']
+            paths = dream_media_paths(dream, get_config())
+            for path, hash_column in zip(paths, ('video_sha256', 'thumb_sha256', 'audio_sha256')):
+                sha256 = dream.get(hash_column)
+                if not sha256 or not path or not os.path.isfile(path) or blob_store.has(sha256):
+                    continue
+                blob_store.ingest(path, sha256)
+                stored += 1
+    print(f"Added {stored} file(s) to the blob store")
+
+if __name__ == '__main__':
+    main()
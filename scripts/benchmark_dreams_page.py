@@ -0,0 +1,170 @@
+# The app runs under gevent; patch before anything else is imported, as dream_recorder.py does
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+from html.parser import HTMLParser
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.config_loader import get_config, override_config
+
+logging.basicConfig(level=logging.WARNING, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+SAMPLE_THUMB = os.path.join(os.path.dirname(__file__), '..', 'dream_samples', 'thumb_1.png')
+
+class ImageCollector(HTMLParser):
+    """Collect the attributes of every <img> in the dream grid (not the empty one in the card template)."""
+
+    def __init__(self):
+        super().__init__()
+        self.images = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'img' and 'dream-thumbnail' in (attrs.get('class') or '') and attrs.get('src'):
+            self.images.append(attrs)
+
+def pick_from_srcset(srcset, slot_width):
+    """The candidate a browser would pick for an image laid out `slot_width` device pixels wide."""
+    candidates = []
+    for candidate in srcset.split(','):
+        url, descriptor = candidate.strip().rsplit(' ', 1)
+        candidates.append((int(descriptor[:-1]), url))
+    candidates.sort()
+    for width, url in candidates:
+        if width >= slot_width:
+            return url
+    return candidates[-1][1]
+
+def fetch_size(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return len(response.get_data())
+
+def time_requests(client, url, runs, headers=None):
+    """Request `url` `runs` times; the last response and the median time in seconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers or {})
+        response.get_data()
+        timings.append(time.perf_counter() - start)
+    return response, statistics.median(timings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure page weight and render time of /dreams with a large library')
+    parser.add_argument('--dreams', type=int, default=1000, help='Number of dreams in the library (default: 1000)')
+    parser.add_argument('--runs', type=int, default=10, help='Times to render the page (default: 10)')
+    parser.add_argument('--viewport', type=int, default=1920, help='Viewport width in device pixels (default: 1920)')
+    parser.add_argument('--thumb', default=SAMPLE_THUMB, help='Thumbnail image every dream uses')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='dreams-bench-')
+    try:
+        # Point the app at a scratch library before it opens its database
+        override_config(**{
+            'DB_PATH': os.path.join(workdir, 'dreams.db'),
+            'VIDEOS_DIR': os.path.join(workdir, 'video'),
+            'THUMBS_DIR': os.path.join(workdir, 'thumbs'),
+            'RECORDINGS_DIR': os.path.join(workdir, 'audio'),
+            'MEDIA_BLOBS_DIR': os.path.join(workdir, 'blobs'),
+            'THUMB_CACHE_DIR': os.path.join(workdir, 'cache'),
+            'MEDIA_STORAGE_BACKEND': 'local',
+        })
+        for key in ('VIDEOS_DIR', 'THUMBS_DIR', 'RECORDINGS_DIR'):
+            os.makedirs(get_config()[key], exist_ok=True)
+        import dream_recorder
+        from functions.dream_db import DreamData
+
+        dream_db = dream_recorder.dream_db
+        existing = len(dream_db.get_all_dreams())
+        thumb_name = 'bench_thumb.png'
+        thumb_path = os.path.join(get_config()['THUMBS_DIR'], thumb_name)
+        shutil.copyfile(args.thumb, thumb_path)
+        thumb_sha256 = dream_recorder.blob_store.ingest(thumb_path)
+        for i in range(max(args.dreams - existing, 0)):
+            dream_db.save_dream(DreamData(
+                user_prompt=f"Benchmark dream {i}", generated_prompt='A benchmark dream', audio_filename='',
+                video_filename=f"bench_{i}.mp4", thumb_filename=thumb_name, thumb_sha256=thumb_sha256,
+                thumb_bytes=os.path.getsize(thumb_path),
+            ).model_dump())
+
+        client = dream_recorder.app.test_client()
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            response = client.get('/dreams')
+            timings.append(time.perf_counter() - start)
+        html = response.get_data()
+        # What goes over the wire: compressed, and then revalidated with the ETag on the next visit
+        gzipped, gzip_time = time_requests(client, '/dreams', args.runs, {'Accept-Encoding': 'gzip'})
+        brotlied, br_time = time_requests(client, '/dreams', args.runs, {'Accept-Encoding': 'gzip, deflate, br'})
+        revalidated, revalidate_time = time_requests(client, '/dreams', args.runs, {
+            'Accept-Encoding': 'gzip, deflate, br', 'If-None-Match': brotlied.headers.get('ETag', '')})
+        # Scrolling to the end: every further page through the cursor API
+        page_times = []
+        cursor = dream_recorder._dreams_page(None, dream_recorder.DREAMS_FIRST_PAGE)[1]
+        while cursor:
+            start = time.perf_counter()
+            page = client.get(f'/api/dreams?cursor={cursor}').get_json()
+            page_times.append(time.perf_counter() - start)
+            cursor = page['next_cursor']
+        collector = ImageCollector()
+        collector.feed(html.decode('utf-8'))
+        images = collector.images
+
+        # The grid has five columns, each a fifth of the viewport
+        slot_width = args.viewport // 5
+        sizes = {}
+        cold = {}
+        for attrs in images:
+            for url in (attrs['src'].split('?')[0], pick_from_srcset(attrs.get('srcset', attrs['src']), slot_width)):
+                if url not in sizes:
+                    start = time.perf_counter()
+                    sizes[url] = fetch_size(client, url)
+                    cold[url] = time.perf_counter() - start
+        warm_start = time.perf_counter()
+        chosen = pick_from_srcset(images[0].get('srcset', images[0]['src']), slot_width)
+        fetch_size(client, chosen)
+        warm = time.perf_counter() - warm_start
+
+        originals = sum(sizes[attrs['src'].split('?')[0]] for attrs in images)
+        variants = [sizes[pick_from_srcset(attrs.get('srcset', attrs['src']), slot_width)] for attrs in images]
+        eager = sum(size for attrs, size in zip(images, variants) if attrs.get('loading') != 'lazy')
+        mb = 1024 * 1024
+        library_size = len(dream_db.get_all_dreams())
+        print(f"/dreams with {library_size} dreams ({len(images)} rendered up front), "
+              f"viewport {args.viewport}px ({slot_width}px per thumbnail)")
+        print(f"  HTML: {len(html) / 1024:.1f} KB, rendered in {statistics.median(timings) * 1000:.1f} ms "
+              f"(median of {args.runs}, min {min(timings) * 1000:.1f} ms)")
+        kb = 1024
+        print(f"  Transfer: {len(html) / kb:.1f} KB uncompressed, "
+              f"{len(gzipped.get_data()) / kb:.1f} KB gzip ({gzip_time * 1000:.1f} ms), "
+              f"{len(brotlied.get_data()) / kb:.1f} KB {brotlied.headers.get('Content-Encoding', 'uncompressed')} "
+              f"({br_time * 1000:.1f} ms)")
+        print(f"  Revisit: {revalidated.status_code} with {len(revalidated.get_data())} bytes in {revalidate_time * 1000:.1f} ms")
+        if page_times:
+            print(f"  Scrolling: {len(page_times)} more page(s) from /api/dreams, median {statistics.median(page_times) * 1000:.1f} ms, "
+                  f"last page {page_times[-1] * 1000:.1f} ms")
+        print(f"  Full-size thumbnails: {originals / mb:.1f} MB, all requested on load")
+        print(f"  Resized thumbnails:   {sum(variants) / mb:.1f} MB in total, "
+              f"{eager / mb:.2f} MB requested on load ({sum(1 for a in images if a.get('loading') != 'lazy')} eager)")
+        print(f"  Variant {chosen.split('?')[1]}: {cold[chosen] * 1000:.1f} ms to generate, {warm * 1000:.1f} ms from cache")
+        if sum(variants) == originals:
+            print("  Note: no resized variants were served (is ffmpeg installed?), so both figures are full size")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.fake_gpio import FakeGPIO
+from scripts.benchmark_pipeline import RESULTS_DIR, git_version, summarize
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+PIN = 4
+
+def run_mode(mode, taps=10, idle_seconds=5.0, sampling_rate=0.01, debounce_time=0.01,
+             single_tap_max=0.5, double_tap_max_interval=0.3, tap_duration=0.05, bounces=2):
+    """Run the touch sensor monitor on a fake pin in `mode`; CPU use and detection latency.
+
+    First the pin is left alone for `idle_seconds`, which is where a sensor spends nearly all its
+    time, then `taps` single taps and `taps` double taps are made, with contact bounce. A single tap
+    cannot be reported until the double-tap window has passed, so its latency is counted from the
+    end of that window; a double tap's from the second release.
+    """
+    from gpio_service import GPIOController, TouchPattern
+
+    gpio = FakeGPIO().install()
+    controller = GPIOController(pin=PIN, debounce_time=debounce_time, sampling_rate=sampling_rate, mode=mode)
+    detected = queue.SimpleQueue()
+    controller.register_callback(TouchPattern.SINGLE_TAP, lambda: detected.put(('single', time.time())))
+    controller.register_callback(TouchPattern.DOUBLE_TAP, lambda: detected.put(('double', time.time())))
+    monitor = threading.Thread(target=controller.start_monitoring, daemon=True,
+                               kwargs={'single_tap_max': single_tap_max, 'double_tap_max_interval': double_tap_max_interval})
+    monitor.start()
+    try:
+        time.sleep(0.1)
+        reads, cpu, wall = gpio.reads, time.process_time(), time.perf_counter()
+        time.sleep(idle_seconds)
+        idle_wall = time.perf_counter() - wall
+        idle = {'cpu_percent': round((time.process_time() - cpu) / idle_wall * 100, 3),
+                'reads_per_second': round((gpio.reads - reads) / idle_wall, 1)}
+
+        latency = {'single': [], 'double': []}
+        missed = 0
+        cpu, wall = time.process_time(), time.perf_counter()
+        for pattern in ['single'] * taps + ['double'] * taps:
+            released = gpio.tap(PIN, tap_duration, bounces)
+            if pattern == 'double':
+                time.sleep(tap_duration)
+                released = gpio.tap(PIN, tap_duration, bounces)
+            else:
+                released += double_tap_max_interval
+            try:
+                kind, at = detected.get(timeout=double_tap_max_interval + 1)
+            except queue.Empty:
+                missed += 1
+                continue
+            if kind != pattern:
+                missed += 1
+                continue
+            latency[pattern].append(max(at - released, 0))
+            # Let the window close so the next tap starts afresh
+            time.sleep(double_tap_max_interval + debounce_time)
+        active_cpu = (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+    finally:
+        controller.stop_monitoring()
+        monitor.join(1)
+    return {
+        'mode': mode,
+        'idle': idle,
+        'active_cpu_percent': round(active_cpu, 3),
+        'latency': {kind: summarize(values) for kind, values in latency.items() if values},
+        'missed': missed,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare interrupt and polling GPIO monitoring on a fake touch sensor')
+    parser.add_argument('--taps', type=int, default=10, help='Single taps, and double taps, to make (default: 10)')
+    parser.add_argument('--idle-seconds', type=float, default=5, help='How long to measure the idle sensor (default: 5)')
+    parser.add_argument('--sampling-rate', type=float, default=0.01, help='Polling interval in seconds (default: 0.01)')
+    parser.add_argument('--bounces', type=int, default=2, help='Contact bounces on each press and release (default: 2)')
+    parser.add_argument('--output', help='Where to save the JSON results (default: benchmark_results/gpio-<version>-<time>.json)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for mode in ('polling', 'interrupt'):
+        logger.info(f"Running {mode} mode...")
+        results.append(run_mode(mode, taps=args.taps, idle_seconds=args.idle_seconds,
+                                sampling_rate=args.sampling_rate, bounces=args.bounces))
+
+    logger.info(f"\n{'mode':<10} {'idle CPU':>9} {'reads/s':>8} {'tap CPU':>8} {'single p50':>11} {'double p50':>11} {'missed':>7}")
+    for r in results:
+        single = r['latency'].get('single', {}).get('p50', 0) * 1000
+        double = r['latency'].get('double', {}).get('p50', 0) * 1000
+        logger.info(f"{r['mode']:<10} {r['idle']['cpu_percent']:>8.2f}% {r['idle']['reads_per_second']:>8.0f} "
+                    f"{r['active_cpu_percent']:>7.2f}% {single:>9.1f}ms {double:>9.1f}ms {r['missed']:>7}")
+
+    result = {
+        'version': git_version(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': vars(args),
+        'modes': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"gpio-{result['version']}-{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    logger.info(f"Saved results to {output}")
+
+if __name__ == '__main__':
+    main()
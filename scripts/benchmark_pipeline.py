@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import socket
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+import ffmpeg
+import requests
+import socketio
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.config_loader import load_template_defaults
+from scripts.fake_services import FakeOpenAI, FakeLuma
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmark_results')
+# The browser's MediaRecorder sends a chunk every 100 ms
+CHUNK_SECONDS = 0.1
+PERCENTILES = (50, 90, 99)
+# Client-side timings, then the app's own stage_timings in pipeline order
+METRICS = ('upload', 'transcription_event', 'prompt_event', 'total',
+           'save_audio', 'transcribe', 'prompt', 'luma', 'download', 'process_video', 'thumbnail', 'metadata', 'logging')
+
+def make_fixtures(workdir, audio_seconds, video_seconds):
+    """A test-pattern MP4 for the fake Luma to return, and a WebM/Opus recording like the browser sends."""
+    video_path = os.path.join(workdir, 'fixture.mp4')
+    video = ffmpeg.input(f'testsrc2=size=1344x576:rate=24:duration={video_seconds}', f='lavfi')
+    ffmpeg.run(ffmpeg.output(video, video_path, vcodec='libx264', pix_fmt='yuv420p'), overwrite_output=True, quiet=True)
+    audio_path = os.path.join(workdir, 'fixture.webm')
+    audio = ffmpeg.input(f'sine=frequency=220:duration={audio_seconds}', f='lavfi')
+    ffmpeg.run(ffmpeg.output(audio, audio_path, acodec='libopus', audio_bitrate='48k'), overwrite_output=True, quiet=True)
+    return video_path, [audio_path]
+
+def split_chunks(data, seconds):
+    """Cut a recording into as many pieces as MediaRecorder would send for it."""
+    count = max(int(seconds / CHUNK_SECONDS), 1)
+    size = -(-len(data) // count)
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def process_usage(pid):
+    """CPU seconds used, current and peak RSS in bytes of a process, from /proc."""
+    with open(f'/proc/{pid}/stat') as f:
+        # The command name may contain spaces; the fields after it are fixed
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    memory = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmHWM'):
+                memory[key] = int(value.split()[0]) * 1024
+    return cpu_seconds, memory.get('VmRSS', 0), memory.get('VmHWM', 0)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+def summarize(values):
+    return dict({f"p{pct}": round(percentile(values, pct), 4) for pct in PERCENTILES},
+                max=round(max(values), 4), mean=round(sum(values) / len(values), 4))
+
+def write_app_config(workdir, port, **overrides):
+    """config.json for running dream_recorder.py in `workdir` with a scratch library."""
+    config = load_template_defaults()
+    config.update({
+        'HOST': '127.0.0.1',
+        'PORT': port,
+        'DEBUG': False,
+        'DB_PATH': os.path.join(workdir, 'dreams.db'),
+        'DB_BACKUP_DIR': os.path.join(workdir, 'backups'),
+        'RECORDINGS_DIR': os.path.join(workdir, 'media', 'audio'),
+        'VIDEOS_DIR': os.path.join(workdir, 'media', 'video'),
+        'THUMBS_DIR': os.path.join(workdir, 'media', 'thumbs'),
+        'MEDIA_BLOBS_DIR': os.path.join(workdir, 'media', 'blobs'),
+        'THUMB_CACHE_DIR': os.path.join(workdir, 'media', 'cache', 'thumbs'),
+    }, **overrides)
+    # The app reads config.json from its working directory
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+
+def start_app(workdir, port, openai, luma, poll_interval=0.5):
+    """Run dream_recorder.py against a scratch library and the fake services."""
+    write_app_config(workdir, port, LUMA_API_URL=luma.url, LUMA_GENERATIONS_ENDPOINT=f"{luma.url}/generations",
+                     LUMA_POLL_INTERVAL=poll_interval)
+    env = dict(os.environ, OPENAI_API_KEY='bench', LUMALABS_API_KEY='bench',
+               OPENAI_BASE_URL=f"{openai.url}/v1", PYTHONUNBUFFERED='1')
+    env.pop('FLASK_ENV', None)
+    log = open(os.path.join(workdir, 'app.log'), 'wb')
+    process = subprocess.Popen([sys.executable, os.path.join(PROJECT_DIR, 'dream_recorder.py')],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode}; see {log.name}")
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"The app did not answer within 60 s; see {log.name}")
+
+class PipelineClient:
+    """A kiosk page's Socket.IO connection: records when each pipeline event arrives."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.events = queue.Queue()
+        self.sio = socketio.Client()
+        for name in ('state_update', 'transcription_update', 'video_prompt_update', 'video_ready', 'error'):
+            self.sio.on(name, self._recorder(name))
+        self.sio.connect(base_url, wait_timeout=10)
+
+    def _recorder(self, name):
+        return lambda data=None: self.events.put((name, time.perf_counter(), data))
+
+    def wait_for(self, names, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            name, at, data = self.events.get(timeout=max(deadline - time.monotonic(), 0.001))
+            if name == 'error':
+                raise RuntimeError(f"The app reported an error: {data}")
+            if name in names:
+                return name, at, data
+
+    def record(self, chunks, realtime, timeout):
+        """One dream from start_recording to video_ready; client-side timings in seconds."""
+        while not self.events.empty():
+            self.events.get_nowait()
+        start = time.perf_counter()
+        self.sio.emit('start_recording')
+        while not self.wait_for({'state_update'}, 10)[2].get('is_recording'):
+            pass
+        for chunk in chunks:
+            self.sio.emit('stream_recording', {'data': chunk})
+            if realtime:
+                time.sleep(CHUNK_SECONDS)
+        self.sio.emit('stop_recording')
+        stopped = time.perf_counter()
+        timings = {'upload': stopped - start}
+        for name, metric in (('transcription_update', 'transcription_event'),
+                             ('video_prompt_update', 'prompt_event'),
+                             ('video_ready', 'total')):
+            timings[metric] = self.wait_for({name}, timeout)[1] - stopped
+        return timings
+
+    def last_stage_timings(self):
+        """The stage timings the app recorded for the dream just made."""
+        page = requests.get(f"{self.base_url}/api/dreams", params={'limit': 1}, timeout=10).json()
+        dream = requests.get(f"{self.base_url}/api/dreams/{page['dreams'][0]['id']}", timeout=10).json()
+        return dream.get('stage_timings') or {}
+
+    def close(self):
+        self.sio.disconnect()
+
+def compare(result, baseline):
+    """Print how the latency percentiles moved against an earlier result."""
+    logger.info(f"\nAgainst {baseline.get('version', '?')} ({baseline.get('created_at', '?')}):")
+    for metric, stats in result['latency'].items():
+        old = baseline.get('latency', {}).get(metric)
+        if not old:
+            continue
+        changes = []
+        for key in ('p50', 'p90'):
+            delta = stats[key] - old[key]
+            pct = f" ({delta / old[key] * 100:+.0f}%)" if old[key] else ''
+            changes.append(f"{key} {delta * 1000:+.0f} ms{pct}")
+        logger.info(f"  {metric:<20} {', '.join(changes)}")
+    old_process, process = baseline.get('process', {}), result['process']
+    if old_process:
+        logger.info(f"  {'peak RSS':<20} {process['peak_rss_mb'] - old_process['peak_rss_mb']:+.1f} MB")
+        logger.info(f"  {'CPU per dream':<20} {(process['cpu_seconds_per_dream'] - old_process['cpu_seconds_per_dream']) * 1000:+.0f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the recording-to-video pipeline against local stand-ins for OpenAI and Luma')
+    parser.add_argument('--runs', type=int, default=10, help='Dreams to record (default: 10)')
+    parser.add_argument('--warmup', type=int, default=1, help='Dreams recorded first and left out of the results (default: 1)')
+    parser.add_argument('--audio', action='append', help='Recording to send (repeat to cycle through several; default: a generated tone)')
+    parser.add_argument('--audio-seconds', type=float, default=5, help='Length of the generated recording (default: 5)')
+    parser.add_argument('--realtime', action='store_true', help='Send the chunks at the pace a browser records them')
+    parser.add_argument('--transcribe-delay', type=float, default=0.5, help='Seconds the fake Whisper takes (default: 0.5)')
+    parser.add_argument('--chat-delay', type=float, default=1.0, help='Seconds the fake chat completion takes (default: 1.0)')
+    parser.add_argument('--luma-delay', type=float, default=3.0, help='Seconds the fake Luma takes to generate (default: 3)')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='LUMA_POLL_INTERVAL for the run (default: 0.5)')
+    parser.add_argument('--video-seconds', type=float, default=5, help='Length of the video the fake Luma returns (default: 5)')
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for each dream (default: 300)')
+    parser.add_argument('--output', help='Where to save the JSON results (default: benchmark_results/pipeline-<version>-<time>.json)')
+    parser.add_argument('--compare', help='An earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory with the app log')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='pipeline-bench-')
+    openai = luma = process = client = None
+    try:
+        video_path, generated_audio = make_fixtures(workdir, args.audio_seconds, args.video_seconds)
+        recordings = []
+        for path in args.audio or generated_audio:
+            with open(path, 'rb') as f:
+                data = f.read()
+            duration = float(ffmpeg.probe(path)['format'].get('duration') or args.audio_seconds)
+            recordings.append(split_chunks(data, duration))
+        openai = FakeOpenAI(args.transcribe_delay, args.chat_delay).start()
+        luma = FakeLuma(video_path, args.luma_delay).start()
+        process, base_url = start_app(workdir, free_port(), openai, luma, args.poll_interval)
+        client = PipelineClient(base_url)
+        logger.info(f"App started (pid {process.pid}); recording {args.warmup} warm-up and {args.runs} timed dream(s)")
+
+        runs = []
+        cpu_start = wall_start = None
+        for i in range(args.warmup + args.runs):
+            if i == args.warmup:
+                cpu_start, _, _ = process_usage(process.pid)
+                wall_start = time.perf_counter()
+            timings = client.record(recordings[i % len(recordings)], args.realtime, args.timeout)
+            timings.update(client.last_stage_timings())
+            if i >= args.warmup:
+                runs.append({key: round(value, 4) for key, value in timings.items()})
+            logger.info(f"  {'warm-up' if i < args.warmup else f'run {i - args.warmup + 1}'}: {timings['total']:.2f} s")
+        cpu_end, rss, peak_rss = process_usage(process.pid)
+        wall = time.perf_counter() - wall_start
+
+        result = {
+            'version': git_version(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'settings': {key: getattr(args, key) for key in ('runs', 'warmup', 'realtime', 'audio_seconds', 'transcribe_delay',
+                                                             'chat_delay', 'luma_delay', 'poll_interval', 'video_seconds')},
+            'latency': {metric: summarize([run[metric] for run in runs])
+                        for metric in METRICS if all(metric in run for run in runs)},
+            'process': {
+                'cpu_seconds': round(cpu_end - cpu_start, 3),
+                'cpu_seconds_per_dream': round((cpu_end - cpu_start) / args.runs, 3),
+                'cpu_percent': round((cpu_end - cpu_start) / wall * 100, 1),
+                'rss_mb': round(rss / 1e6, 1),
+                'peak_rss_mb': round(peak_rss / 1e6, 1),
+            },
+            'fake_requests': {**openai.requests, **luma.requests},
+            'runs': runs,
+        }
+
+        logger.info(f"\n{'stage':<20} " + ' '.join(f"{key:>8}" for key in ('p50', 'p90', 'p99', 'max')) + '   (seconds)')
+        for metric, stats in result['latency'].items():
+            logger.info(f"{metric:<20} " + ' '.join(f"{stats[key]:>8.3f}" for key in ('p50', 'p90', 'p99', 'max')))
+        process_stats = result['process']
+        logger.info(f"\nApp CPU: {process_stats['cpu_seconds_per_dream']:.2f} s per dream ({process_stats['cpu_percent']:.0f}% of one core); "
+                    f"RSS {process_stats['rss_mb']:.0f} MB, peak {process_stats['peak_rss_mb']:.0f} MB")
+
+        output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{result['version']}-{datetime.now():%Y%m%d_%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        logger.info(f"Saved results to {output}")
+        if args.compare:
+            with open(args.compare) as f:
+                compare(result, json.load(f))
+    finally:
+        if client:
+            client.close()
+        if process:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for service in (openai, luma):
+            if service:
+                service.stop()
+        if args.keep:
+            logger.info(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
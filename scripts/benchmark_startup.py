@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+import requests
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.profiling import measure_imports, format_import_times
+from scripts.benchmark_pipeline import PROJECT_DIR, RESULTS_DIR, free_port, git_version, summarize, write_app_config
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# Polling faster than this would mostly measure the polling
+POLL_SECONDS = 0.01
+
+def time_to_first_response(workdir, port, timeout=60):
+    """Seconds from launching dream_recorder.py until `/` first answers 200."""
+    env = dict(os.environ, OPENAI_API_KEY='bench', LUMALABS_API_KEY='bench', PYTHONUNBUFFERED='1')
+    env.pop('FLASK_ENV', None)
+    url = f"http://127.0.0.1:{port}/"
+    with open(os.path.join(workdir, 'app.log'), 'ab') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(PROJECT_DIR, 'dream_recorder.py')],
+                                   cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"The app exited with code {process.returncode}; see {log.name}")
+                try:
+                    if requests.get(url, timeout=timeout).status_code == 200:
+                        return time.perf_counter() - start
+                except requests.ConnectionError:
+                    pass
+                time.sleep(POLL_SECONDS)
+            raise RuntimeError(f"The app did not answer within {timeout} s; see {log.name}")
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+def compare(result, baseline):
+    """Print how startup moved against an earlier result."""
+    logger.info(f"\nAgainst {baseline.get('version', '?')} ({baseline.get('created_at', '?')}):")
+    for metric, stats in result['latency'].items():
+        old = baseline.get('latency', {}).get(metric)
+        if not old:
+            continue
+        delta = stats['p50'] - old['p50']
+        pct = f" ({delta / old['p50'] * 100:+.0f}%)" if old['p50'] else ''
+        logger.info(f"  {metric:<16} p50 {delta * 1000:+.0f} ms{pct}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time from starting the app to its first page, and where the import time goes')
+    parser.add_argument('--runs', type=int, default=5, help='Times to start the app (default: 5)')
+    parser.add_argument('--warmup', type=int, default=1, help='Starts left out of the results, which also create the database (default: 1)')
+    parser.add_argument('--output', help='Where to save the JSON results (default: benchmark_results/startup-<version>-<time>.json)')
+    parser.add_argument('--compare', help='An earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory with the app log')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    try:
+        port = free_port()
+        write_app_config(workdir, port)
+        runs = []
+        for i in range(args.warmup + args.runs):
+            seconds = time_to_first_response(workdir, port)
+            if i >= args.warmup:
+                runs.append({'first_response': round(seconds, 4)})
+            logger.info(f"  {'warm-up' if i < args.warmup else f'run {i - args.warmup + 1}'}: {seconds:.2f} s")
+        # The import alone, in fresh interpreters, so the two can be told apart
+        tree = None
+        for run in runs:
+            tree = measure_imports('dream_recorder')
+            run['import'] = round(next(node[2] for node in tree if node[0] == 'dream_recorder'), 4)
+
+        result = {
+            'version': git_version(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'settings': {'runs': args.runs, 'warmup': args.warmup},
+            'latency': {metric: summarize([run[metric] for run in runs]) for metric in ('import', 'first_response')},
+            'runs': runs,
+        }
+        logger.info('\n' + format_import_times(tree, max_depth=2, min_seconds=0.01))
+        for metric, stats in result['latency'].items():
+            logger.info(f"{metric:<16} p50 {stats['p50']:.3f} s, max {stats['max']:.3f} s")
+
+        output = args.output or os.path.join(RESULTS_DIR, f"startup-{result['version']}-{datetime.now():%Y%m%d_%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        logger.info(f"Saved results to {output}")
+        if args.compare:
+            with open(args.compare) as f:
+                compare(result, json.load(f))
+    finally:
+        if args.keep:
+            logger.info(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
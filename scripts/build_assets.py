@@ -0,0 +1,28 @@
+import os
+import sys
+import logging
+import argparse
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.assets import ASSET_DIST_DIR, build_assets
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bundle, minify and precompress the scripts and stylesheets, and write their manifest')
+    parser.add_argument('--offline', action='store_true',
+                        help='Do not download vendored files that are missing; pages load them from their CDN instead')
+    args = parser.parse_args(argv)
+    manifest = build_assets(fetch=not args.offline)
+    kb = 1024
+    print(f"Built {len(manifest['assets'])} bundle(s) in {ASSET_DIST_DIR}:")
+    for name, entry in manifest['assets'].items():
+        compressed = ', '.join(f"{entry[key] / kb:.1f} KB {key[:-6]}" for key in ('br_bytes', 'gz_bytes') if key in entry)
+        print(f"  {name} -> {entry['file']}: {entry['source_bytes'] / kb:.1f} KB -> {entry['bytes'] / kb:.1f} KB minified"
+              + (f" ({compressed})" if compressed else ''))
+
+if __name__ == '__main__':
+    main()
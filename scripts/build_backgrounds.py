@@ -0,0 +1,34 @@
+import os
+import sys
+import logging
+import argparse
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.backgrounds import (
+    BACKGROUND_DIR, BACKGROUND_DIST_DIR, BACKGROUND_FORMATS, DEFAULT_WIDTH, DEFAULT_HEIGHT,
+    background_sources, build_backgrounds
+)
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-encode the background images for the display and write their manifest')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help=f'Display width in pixels (default: {DEFAULT_WIDTH})')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help=f'Display height in pixels (default: {DEFAULT_HEIGHT})')
+    parser.add_argument('--format', choices=BACKGROUND_FORMATS, default='webp', help='Image format (default: webp)')
+    parser.add_argument('--quality', type=int, default=80, help='Quality from 0 to 100 (default: 80)')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel ffmpeg processes (default: one per core)')
+    parser.add_argument('--force', action='store_true', help='Re-encode every image, even if it is unchanged')
+    args = parser.parse_args(argv)
+    manifest = build_backgrounds(width=args.width, height=args.height, fmt=args.format, quality=args.quality,
+                                 workers=args.workers, force=args.force)
+    source_bytes = sum(os.path.getsize(os.path.join(BACKGROUND_DIR, name)) for _, name in background_sources(BACKGROUND_DIR))
+    mb = 1024 * 1024
+    print(f"Built {manifest['count']} {args.format} background(s) at {args.width}x{args.height} in {BACKGROUND_DIST_DIR}: "
+          f"{source_bytes / mb:.1f} MB -> {manifest['total_bytes'] / mb:.1f} MB")
+
+if __name__ == '__main__':
+    main()
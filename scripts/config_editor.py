@@ -1,10 +1,14 @@
 import curses
 import json
 import os
+import sys
 import requests
 import time
 import subprocess
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from functions.config_loader import coerce_option
+
 TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'config.template.json')
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '..', 'config.json')
 
@@ -184,6 +188,13 @@ def main(stdscr):
             opts_str = str(item['options'])[:box_width-4]
             stdscr.addstr(y_in_box, box_left+2, f"Options: {opts_str}", curses.color_pair(COLOR_INSTR))
             y_in_box += 1
+        if 'min' in item or 'max' in item:
+            if 'min' in item and 'max' in item:
+                range_str = f"{item['min']} to {item['max']}"
+            else:
+                range_str = f"at least {item['min']}" if 'min' in item else f"at most {item['max']}"
+            stdscr.addstr(y_in_box, box_left+2, f"Range: {range_str}"[:box_width-4], curses.color_pair(COLOR_INSTR))
+            y_in_box += 1
         if editing:
             edit_prompt = f"Enter new value for {item['name']}: {edit_value}"
             stdscr.addstr(y_in_box, box_left+2, edit_prompt[:box_width-4], curses.color_pair(COLOR_EDIT) | curses.A_BOLD)
@@ -199,18 +210,8 @@ def main(stdscr):
             if key in (curses.KEY_ENTER, 10, 13):
                 # Validate and set value
                 try:
-                    if item['type'] == 'integer':
-                        val = int(edit_value)
-                    elif item['type'] == 'float':
-                        val = float(edit_value)
-                    elif item['type'] == 'boolean':
-                        val = edit_value.lower() in ('true', '1', 'yes', 'y')
-                    elif item['type'] == 'string' or item['type'] == 'url':
-                        val = edit_value
-                    else:
-                        val = edit_value
-                    if 'options' in item and val not in item['options']:
-                        raise ValueError('Value not in options')
+                    # The same checks the app makes when it loads config.json
+                    val = coerce_option(item, edit_value)
                     config[item['name']] = val
                     editing = False
                     edit_value = ''
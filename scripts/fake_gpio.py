@@ -0,0 +1,108 @@
+import sys
+import time
+import queue
+import threading
+import types
+
+class FakeGPIO:
+    """Stand-in for the RPi.GPIO module, for running gpio_service without a Pi.
+
+    The level of each pin is set with `set_level` or `tap`. Like RPi.GPIO, edge callbacks run
+    on one thread of their own, one after another. `edge_times` holds when each edge happened,
+    so a test can tell how long detection took, and `reads` counts calls to `input`.
+    """
+
+    BCM = 11
+    IN = 1
+    PUD_DOWN = 21
+    LOW = 0
+    HIGH = 1
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, edge_detection=True, callback_delay=0):
+        # False behaves like a kernel without edge detection: add_event_detect fails
+        self.edge_detection = edge_detection
+        # How far the callback thread runs behind the edges, as on a busy Pi
+        self.callback_delay = callback_delay
+        self.levels = {}
+        self.callbacks = {}
+        self.edge_times = []
+        self.reads = 0
+        self._events = queue.SimpleQueue()
+        self._dispatcher = None
+
+    def install(self):
+        """Make `import RPi.GPIO` return this."""
+        package = types.ModuleType('RPi')
+        package.GPIO = self
+        sys.modules['RPi'] = package
+        sys.modules['RPi.GPIO'] = self
+        return self
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.levels[pin] = self.LOW
+
+    def input(self, pin):
+        self.reads += 1
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        if not self.edge_detection:
+            raise RuntimeError('Failed to add edge detection')
+        self.callbacks[pin] = callback
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+            self._dispatcher.start()
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self, pin=None):
+        for watched in list(self.callbacks) if pin is None else [pin]:
+            self.remove_event_detect(watched)
+        if not self.callbacks and self._dispatcher is not None:
+            self._events.put(None)
+            if self._dispatcher is not threading.current_thread():
+                self._dispatcher.join()
+            self._dispatcher = None
+
+    def set_level(self, pin, level):
+        """Drive the pin to `level`; an edge if it changed."""
+        if self.levels.get(pin, self.LOW) == level:
+            return
+        self.levels[pin] = level
+        self.edge_times.append(time.time())
+        if pin in self.callbacks:
+            self._events.put(pin)
+
+    def tap(self, pin, duration=0.05, bounces=0, bounce_interval=0.001):
+        """Touch the sensor for `duration` seconds, chattering `bounces` times on press and release."""
+        for level in (self.HIGH, self.LOW):
+            for _ in range(bounces):
+                self.set_level(pin, level)
+                time.sleep(bounce_interval)
+                self.set_level(pin, self.HIGH - level)
+                time.sleep(bounce_interval)
+            self.set_level(pin, level)
+            if level == self.HIGH:
+                time.sleep(duration)
+        return self.edge_times[-1]
+
+    def _dispatch(self):
+        while True:
+            pin = self._events.get()
+            if pin is None:
+                break
+            if self.callback_delay:
+                time.sleep(self.callback_delay)
+            callback = self.callbacks.get(pin)
+            if callback:
+                callback(pin)
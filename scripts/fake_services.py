@@ -0,0 +1,177 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSCRIPT = 'I was flying over a city made of glass while whales swam between the towers.'
+DEFAULT_PROMPT = ('Aerial shot gliding over a glittering glass city at dawn, translucent towers refracting '
+                  'golden light, enormous whales drifting slowly between the skyscrapers, dreamlike haze.')
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the `routes` of the server it belongs to: {(method, pattern): handler}."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _dispatch(self, method):
+        path = self.path.split('?', 1)[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        for (route_method, pattern), handler in self.server.routes.items():
+            match = route_method == method and re.fullmatch(pattern, path)
+            if match:
+                self.server.count(f"{method} {pattern}")
+                status, content_type, payload = handler(body, *match.groups())
+                break
+        else:
+            status, content_type, payload = 404, 'application/json', {'error': f"No route for {method} {path}"}
+        if content_type == 'application/json':
+            payload = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, format, *args):
+        # Every poll would be logged otherwise
+        pass
+
+class FakeService(ThreadingHTTPServer):
+    """A local HTTP server standing in for a paid API, with a configurable delay per call."""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeServiceHandler)
+        self.routes = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, route):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakeOpenAI(FakeService):
+    """Whisper transcriptions and chat completions under /v1, as the openai client calls them."""
+
+    def __init__(self, transcribe_delay=0.5, chat_delay=1.0, transcript=DEFAULT_TRANSCRIPT, prompt=DEFAULT_PROMPT, **kwargs):
+        super().__init__(**kwargs)
+        self.transcribe_delay = transcribe_delay
+        self.chat_delay = chat_delay
+        self.transcript = transcript
+        self.prompt = prompt
+        self.routes = {
+            ('POST', r'/v1/audio/transcriptions'): self.transcribe,
+            ('POST', r'/v1/chat/completions'): self.chat,
+        }
+
+    def transcribe(self, body):
+        time.sleep(self.transcribe_delay)
+        return 200, 'application/json', {'text': self.transcript}
+
+    def chat(self, body):
+        time.sleep(self.chat_delay)
+        request = json.loads(body or b'{}')
+        return 200, 'application/json', {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o-mini'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.prompt},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }
+
+class FakeLuma(FakeService):
+    """Luma generations: created queued, `dreaming` until `generation_delay` has passed, then completed
+    with a link to `video_path`, which this server also serves."""
+
+    def __init__(self, video_path, generation_delay=5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.video_path = video_path
+        self.generation_delay = generation_delay
+        self.generations = {}
+        self.routes = {
+            ('POST', r'/generations'): self.create,
+            ('GET', r'/generations/([\w-]+)'): self.status,
+            ('GET', r'/videos/([\w-]+)\.mp4'): self.video,
+        }
+
+    def create(self, body):
+        generation_id = str(uuid.uuid4())
+        self.generations[generation_id] = time.monotonic()
+        return 201, 'application/json', {'id': generation_id, 'state': 'queued'}
+
+    def status(self, body, generation_id):
+        created = self.generations.get(generation_id)
+        if created is None:
+            return 404, 'application/json', {'detail': 'Generation not found'}
+        if time.monotonic() - created < self.generation_delay:
+            return 200, 'application/json', {'id': generation_id, 'state': 'dreaming', 'assets': None}
+        return 200, 'application/json', {
+            'id': generation_id,
+            'state': 'completed',
+            'assets': {'video': f"{self.url}/videos/{generation_id}.mp4"},
+        }
+
+    def video(self, body, generation_id):
+        with open(self.video_path, 'rb') as f:
+            return 200, 'video/mp4', f.read()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run local stand-ins for the OpenAI and Luma APIs')
+    parser.add_argument('--video', required=True, help='MP4 file every generation returns')
+    parser.add_argument('--openai-port', type=int, default=8701)
+    parser.add_argument('--luma-port', type=int, default=8702)
+    parser.add_argument('--transcribe-delay', type=float, default=0.5, help='Seconds per transcription (default: 0.5)')
+    parser.add_argument('--chat-delay', type=float, default=1.0, help='Seconds per chat completion (default: 1.0)')
+    parser.add_argument('--luma-delay', type=float, default=5.0, help='Seconds until a generation completes (default: 5)')
+    args = parser.parse_args(argv)
+    openai = FakeOpenAI(args.transcribe_delay, args.chat_delay, port=args.openai_port).start()
+    luma = FakeLuma(os.path.abspath(args.video), args.luma_delay, port=args.luma_port).start()
+    logger.info(f"OPENAI_BASE_URL={openai.url}/v1")
+    logger.info(f"LUMA_API_URL={luma.url}")
+    logger.info(f"LUMA_GENERATIONS_ENDPOINT={luma.url}/generations")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        openai.stop()
+        luma.stop()
+
+if __name__ == '__main__':
+    sys.exit(main())
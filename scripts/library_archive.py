@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import logging
+import argparse
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.config_loader import get_config
+from functions.dream_db import DreamDB
+from functions.library_archive import iter_export, import_archive
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def export_library(db, path, have_path=None):
+    have_hashes = []
+    if have_path:
+        with open(have_path, 'r') as f:
+            have_hashes = json.load(f).get('hashes', [])
+    out = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    try:
+        for chunk in iter_export(db, get_config(), have_hashes=have_hashes, logger=logger):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    if path != '-':
+        print(f"Exported library to {path}")
+
+def import_library(db, path):
+    src = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        summary = import_archive(src, db, get_config(), logger=logger)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    print(f"Imported {summary['dreams']} dream(s): {summary['files_written']} file(s) written, "
+          f"{summary['files_skipped']} already present, {summary['conflicts']} conflict(s), "
+          f"{summary['files_missing']} missing")
+
+def write_manifest(db, path):
+    with open(path, 'w') as f:
+        json.dump({'hashes': sorted(db.get_media_hashes())}, f)
+    print(f"Wrote manifest to {path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export or import the Dream Recorder library')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_parser = sub.add_parser('export', help='Write the library to a tar archive')
+    export_parser.add_argument('path', help="Archive path, or '-' for stdout")
+    export_parser.add_argument('--have', help='Manifest from the receiving device; its files are left out')
+    import_parser = sub.add_parser('import', help='Merge a tar archive into the library')
+    import_parser.add_argument('path', help="Archive path, or '-' for stdin")
+    manifest_parser = sub.add_parser('manifest', help='Write the hashes of media on this device')
+    manifest_parser.add_argument('path')
+    args = parser.parse_args(argv)
+    db = DreamDB()
+    if args.command == 'export':
+        export_library(db, args.path, args.have)
+    elif args.command == 'import':
+        import_library(db, args.path)
+    else:
+        write_manifest(db, args.path)
+
+if __name__ == '__main__':
+    main()
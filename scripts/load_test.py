@@ -0,0 +1,291 @@
+# Each simulated display is a greenlet, as the app's own clients are; patch before anything else is imported
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+
+import gevent
+import requests
+import socketio
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.fake_services import FakeOpenAI, FakeLuma
+from scripts.benchmark_pipeline import RESULTS_DIR, free_port, git_version, process_usage, start_app, summarize
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+# recorder.js sends what MediaRecorder produced in the last 100 ms
+FRAME_SECONDS = 0.1
+# A 100 ms chunk of 48 kbps Opus in WebM
+FRAME_BYTES = 600
+# Beyond this the load generator itself is the bottleneck and the step's numbers are not the server's
+GENERATOR_LAG_LIMIT = 0.05
+
+class StepStats:
+    """What the clients saw during one load step."""
+
+    def __init__(self):
+        self.frames_sent = 0
+        self.frames_late = 0
+        self.frame_latency = []
+        self.tap_latency = []
+        self.gpio_latency = []
+        self.fanout_latency = []
+        self.generator_lag = []
+        self.errors = 0
+        self.disconnects = 0
+        self.last_gpio_post = None
+
+    def frames_acked(self, timeout):
+        return sum(1 for latency in self.frame_latency if latency <= timeout)
+
+class RecorderClient:
+    """One display: streams frames like recorder.js and double-taps now and then, over its own Socket.IO connection."""
+
+    def __init__(self, base_url, frames, tap_interval, transports):
+        self.base_url = base_url
+        self.frames = frames
+        self.tap_interval = tap_interval
+        self.stats = None
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('device_event', self._device_event)
+        self.sio.on('disconnect', self._disconnected)
+        self.sio.connect(base_url, transports=transports, wait_timeout=10)
+
+    def _device_event(self, data=None):
+        stats = self.stats
+        if stats and stats.last_gpio_post is not None:
+            stats.fanout_latency.append(time.perf_counter() - stats.last_gpio_post)
+
+    def _disconnected(self, *args):
+        if self.stats:
+            self.stats.disconnects += 1
+
+    def _emit(self, event, data, latencies):
+        stats = self.stats
+        sent = time.perf_counter()
+        try:
+            self.sio.emit(event, data, callback=lambda *args: latencies.append(time.perf_counter() - sent))
+        except socketio.exceptions.SocketIOError:
+            stats.errors += 1
+
+    def run(self):
+        """Stream a frame every 100 ms until killed, on a fixed schedule so a slow server cannot slow the sender down."""
+        # Any display may start a recording; the app has one recording state, so the rest are ignored
+        self.sio.emit('start_recording')
+        frame = random.randrange(len(self.frames))
+        next_frame = time.perf_counter() + random.uniform(0, FRAME_SECONDS)
+        next_tap = time.perf_counter() + (random.expovariate(1 / self.tap_interval) if self.tap_interval else float('inf'))
+        while True:
+            gevent.sleep(max(next_frame - time.perf_counter(), 0))
+            stats = self.stats
+            lag = time.perf_counter() - next_frame
+            stats.generator_lag.append(lag)
+            if lag > FRAME_SECONDS:
+                stats.frames_late += 1
+            chunk = self.frames[frame % len(self.frames)]
+            frame += 1
+            stats.frames_sent += 1
+            self._emit('stream_recording', {'data': list(chunk), 'timestamp': int(time.time() * 1000)}, stats.frame_latency)
+            if time.perf_counter() >= next_tap:
+                # What the page sends when the device is double-tapped
+                self._emit('show_previous_dream', None, stats.tap_latency)
+                next_tap += random.expovariate(1 / self.tap_interval)
+            next_frame += FRAME_SECONDS
+
+    def close(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+def post_gpio(base_url, rate, holder):
+    """POST the GPIO tap endpoints, as gpio_service.py does, `rate` times a second."""
+    session = requests.Session()
+    endpoints = ('/api/gpio_single_tap', '/api/gpio_double_tap')
+    i = 0
+    while True:
+        gevent.sleep(random.expovariate(rate))
+        stats = holder['stats']
+        stats.last_gpio_post = sent = time.perf_counter()
+        try:
+            session.post(base_url + endpoints[i % 2], timeout=10).raise_for_status()
+            stats.gpio_latency.append(time.perf_counter() - sent)
+        except requests.RequestException:
+            stats.errors += 1
+        i += 1
+
+def load_frames(path):
+    """Frames to stream: a real recording cut into 100 ms pieces, or noise of the same size."""
+    if not path:
+        return [os.urandom(FRAME_BYTES) for _ in range(50)]
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [data[i:i + FRAME_BYTES] for i in range(0, len(data), FRAME_BYTES)]
+
+def summarize_ms(values):
+    return {key: round(value * 1000, 1) for key, value in summarize(values).items()} if values else None
+
+def run_step(clients, stats, pid, seconds):
+    """Measure the connected clients for `seconds`; the clients keep running into the next step."""
+    for client in clients:
+        client.stats = stats
+    cpu_start, _, _ = process_usage(pid)
+    wall_start = time.perf_counter()
+    peak_rss = 0
+    while time.perf_counter() - wall_start < seconds:
+        gevent.sleep(1)
+        peak_rss = max(peak_rss, process_usage(pid)[1])
+    cpu_end, rss, _ = process_usage(pid)
+    return (cpu_end - cpu_start) / (time.perf_counter() - wall_start), rss, peak_rss
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find how many recorder displays one server can carry')
+    parser.add_argument('--clients', default='1,5,10,25,50,100',
+                        help='Comma-separated numbers of concurrent displays to step through (default: 1,5,10,25,50,100)')
+    parser.add_argument('--step-seconds', type=float, default=30, help='How long to measure each step (default: 30)')
+    parser.add_argument('--ramp-seconds', type=float, default=5, help='Time to connect new clients and settle before measuring (default: 5)')
+    parser.add_argument('--tap-interval', type=float, default=30,
+                        help='Mean seconds between double-taps on each display; 0 for none (default: 30)')
+    parser.add_argument('--gpio-rate', type=float, default=1, help='GPIO tap POSTs per second, across all displays (default: 1)')
+    parser.add_argument('--audio', help='Recording to stream (default: random bytes at the rate of 48 kbps Opus)')
+    parser.add_argument('--max-p99-ms', type=float, default=250, help='Frame round trip p99 a step may reach and pass (default: 250)')
+    parser.add_argument('--max-drop-rate', type=float, default=0.001,
+                        help='Fraction of frames that may go unacknowledged and pass (default: 0.001)')
+    parser.add_argument('--transport', choices=('websocket', 'polling'), default='websocket',
+                        help='Socket.IO transport the clients use (default: websocket, as browsers do)')
+    parser.add_argument('--output', help='Where to save the JSON results (default: benchmark_results/load-<version>-<time>.json)')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory with the app log')
+    args = parser.parse_args(argv)
+    steps = sorted({int(n) for n in args.clients.split(',')})
+    ack_timeout = args.max_p99_ms / 1000 * 4
+
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    # Nothing is ever sent for processing, but the app must never reach the real APIs
+    openai = FakeOpenAI().start()
+    luma = FakeLuma(os.devnull).start()
+    process = None
+    clients = []
+    greenlets = []
+    results = []
+    try:
+        process, base_url = start_app(workdir, free_port(), openai, luma)
+        frames = load_frames(args.audio)
+        holder = {'stats': StepStats()}
+        if args.gpio_rate > 0:
+            greenlets.append(gevent.spawn(post_gpio, base_url, args.gpio_rate, holder))
+        logger.info(f"App started (pid {process.pid}); {args.step_seconds:g} s per step\n")
+        logger.info(f"{'clients':>7} {'frame p50':>10} {'frame p99':>10} {'dropped':>8} {'tap p99':>8} {'fanout p99':>10} "
+                    f"{'CPU':>6} {'RSS':>7}  verdict")
+        for target in steps:
+            holder['stats'] = StepStats()
+            while len(clients) < target:
+                try:
+                    client = RecorderClient(base_url, frames, args.tap_interval, [args.transport])
+                except socketio.exceptions.ConnectionError as e:
+                    logger.warning(f"Client {len(clients) + 1} could not connect: {e}")
+                    break
+                client.stats = holder['stats']
+                clients.append(client)
+                greenlets.append(gevent.spawn(client.run))
+                gevent.sleep(args.ramp_seconds / target)
+            gevent.sleep(args.ramp_seconds)
+            stats = holder['stats'] = StepStats()
+            cpu, rss, peak_rss = run_step(clients, stats, process.pid, args.step_seconds)
+            # Let the acks of the last frames arrive before counting what was lost
+            gevent.sleep(ack_timeout)
+            dropped = stats.frames_sent - stats.frames_acked(ack_timeout)
+            drop_rate = dropped / stats.frames_sent if stats.frames_sent else 1.0
+            frame = summarize_ms(stats.frame_latency)
+            generator_lag = summarize(stats.generator_lag)['p99'] if stats.generator_lag else 0.0
+            passed = (len(clients) == target and stats.disconnects == 0 and frame is not None
+                      and frame['p99'] <= args.max_p99_ms and drop_rate <= args.max_drop_rate)
+            result = {
+                'clients': len(clients),
+                'frames_sent': stats.frames_sent,
+                'frames_dropped': dropped,
+                'frames_late': stats.frames_late,
+                'drop_rate': round(drop_rate, 5),
+                'frame_round_trip_ms': frame,
+                'double_tap_round_trip_ms': summarize_ms(stats.tap_latency),
+                'gpio_post_ms': summarize_ms(stats.gpio_latency),
+                'device_event_fanout_ms': summarize_ms(stats.fanout_latency),
+                'errors': stats.errors,
+                'disconnects': stats.disconnects,
+                'generator_lag_p99_ms': round(generator_lag * 1000, 1),
+                'server_cpu_percent': round(cpu * 100, 1),
+                'server_rss_mb': round(rss / 1e6, 1),
+                'server_peak_rss_mb': round(peak_rss / 1e6, 1),
+                'passed': passed,
+            }
+            results.append(result)
+            verdict = 'ok' if passed else 'FAIL'
+            if generator_lag > GENERATOR_LAG_LIMIT:
+                verdict += ' (load generator saturated; run it on another machine or split the clients)'
+            tap = result['double_tap_round_trip_ms'] or {}
+            fanout = result['device_event_fanout_ms'] or {}
+            logger.info(f"{len(clients):>7} {(frame or {}).get('p50', 0):>8.1f}ms {(frame or {}).get('p99', 0):>8.1f}ms "
+                        f"{drop_rate:>8.2%} {tap.get('p99', 0):>6.0f}ms {fanout.get('p99', 0):>8.0f}ms "
+                        f"{result['server_cpu_percent']:>5.0f}% {result['server_rss_mb']:>5.0f}MB  {verdict}")
+            if not passed:
+                break
+
+        passing = [r for r in results if r['passed']]
+        best = max(passing, key=lambda r: r['clients']) if passing else None
+        summary = {'max_clients': best['clients'] if best else 0, 'limit_reached': not results or not results[-1]['passed']}
+        if best:
+            # The app serves everything from one event loop, so one core is all it can use
+            summary['clients_per_core'] = round(best['clients'] / max(best['server_cpu_percent'] / 100, 1e-3), 1) \
+                if summary['limit_reached'] else None
+        logger.info('')
+        if not best:
+            logger.info('Even the first step failed')
+        elif summary['limit_reached']:
+            logger.info(f"Supported: {best['clients']} displays at {best['server_cpu_percent']:.0f}% of a core, "
+                        f"about {summary['clients_per_core']:.0f} per core")
+        else:
+            logger.info(f"Every step passed; try more clients with --clients to find the limit")
+
+        output = args.output or os.path.join(RESULTS_DIR, f"load-{git_version()}-{datetime.now():%Y%m%d_%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump({
+                'version': git_version(),
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'settings': {key: getattr(args, key) for key in ('clients', 'step_seconds', 'ramp_seconds', 'tap_interval',
+                                                                 'gpio_rate', 'max_p99_ms', 'max_drop_rate', 'transport')},
+                'summary': summary,
+                'steps': results,
+            }, f, indent=2)
+        logger.info(f"Saved results to {output}")
+    finally:
+        gevent.killall(greenlets)
+        for client in clients:
+            client.close()
+        if process:
+            process.terminate()
+            try:
+                process.wait(10)
+            except Exception:
+                process.kill()
+        openai.stop()
+        luma.stop()
+        if args.keep:
+            logger.info(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import logging
+import argparse
+
+import requests
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.config_loader import load_config
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def _session(config):
+    token = config.get('ADMIN_TOKEN')
+    if not token:
+        raise SystemExit('ADMIN_TOKEN is not set in .env, so the profiling endpoints are turned off')
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {token}'
+    return session, f"http://localhost:{int(config.get('PORT', 5000))}/api/admin"
+
+def _check(response):
+    if response.status_code >= 400:
+        try:
+            message = response.json().get('message', response.text)
+        except ValueError:
+            message = response.text
+        raise SystemExit(f"{response.request.method} {response.url} failed ({response.status_code}): {message}")
+    return response
+
+def cpu(args, session, base_url):
+    params = {'seconds': args.seconds, 'interval_ms': args.interval}
+    if args.all_threads:
+        params['threads'] = 'all'
+    logger.info(f"Profiling for {args.seconds:g} s...")
+    response = _check(session.post(f'{base_url}/profile', params=params, timeout=args.seconds + 60))
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(response.text)
+        logger.info(f"Wrote {response.headers.get('X-Profile-Samples', '?')} samples to {args.output}; "
+                    f"render it with flamegraph.pl or speedscope")
+    else:
+        sys.stdout.write(response.text)
+
+def memory(args, session, base_url):
+    params = {'limit': args.limit, 'group_by': args.group_by}
+    if args.action in ('start', 'stop'):
+        if args.action == 'start':
+            params['frames'] = args.frames
+        response = session.post(f'{base_url}/memory/{args.action}', params=params, timeout=60)
+    else:
+        if args.reset:
+            params['reset'] = '1'
+        response = session.get(f'{base_url}/memory/{args.action}', params=params, timeout=120)
+    result = _check(response).json()
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"tracemalloc: {'on' if result['tracing'] else 'off'}, {result['traced_bytes'] / 1024:.1f} KiB traced "
+          f"(peak {result['peak_bytes'] / 1024:.1f} KiB)")
+    audio = result['audio']
+    print(f"Audio in memory: {audio['audio_chunks']} chunk(s), {audio['audio_chunks_bytes']} bytes; "
+          f"buffer {audio['audio_buffer_bytes']} bytes{' (recording)' if audio['is_recording'] else ''}")
+    for stat in result.get('top', []):
+        growth = f"{stat['size_diff'] / 1024:+.1f} KiB, " if 'size_diff' in stat else ''
+        print(f"\n{growth}{stat['size'] / 1024:.1f} KiB in {stat['count']} block(s)")
+        print('\n'.join(f"    {line}" for line in stat['traceback']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile the running Dream Recorder app')
+    commands = parser.add_subparsers(dest='command', required=True)
+    cpu_parser = commands.add_parser('cpu', help='Sample the CPU and write a collapsed-stack file for flamegraphs')
+    cpu_parser.add_argument('--seconds', type=float, default=10, help='How long to sample (default: 10, at most 120)')
+    cpu_parser.add_argument('--interval', type=float, default=5, help='Milliseconds between samples (default: 5)')
+    cpu_parser.add_argument('--all-threads', action='store_true', help='Also sample the threadpool threads')
+    cpu_parser.add_argument('--output', '-o', help='Write the stacks to this file instead of standard output')
+    memory_parser = commands.add_parser('memory', help='Find what is holding or leaking memory with tracemalloc')
+    memory_parser.add_argument('action', choices=('start', 'snapshot', 'diff', 'stop'),
+                               help='start tracing, list the largest allocations, show growth since start, or stop')
+    memory_parser.add_argument('--frames', type=int, default=10, help='Stack frames kept per allocation (default: 10)')
+    memory_parser.add_argument('--limit', type=int, default=25, help='Allocations to list (default: 25)')
+    memory_parser.add_argument('--group-by', choices=('lineno', 'filename', 'traceback'), default='lineno')
+    memory_parser.add_argument('--reset', action='store_true', help='With diff: compare the next diff against now')
+    memory_parser.add_argument('--json', action='store_true', help='Print the raw JSON')
+    args = parser.parse_args(argv)
+    session, base_url = _session(load_config())
+    {'cpu': cpu, 'memory': memory}[args.command](args, session, base_url)
+
+if __name__ == '__main__':
+    main()
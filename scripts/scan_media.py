@@ -0,0 +1,35 @@
+import os
+import sys
+import logging
+import argparse
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.dream_db import DreamDB
+from functions.media_scanner import scan_media
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find media files without a dream and dreams without their media')
+    parser.add_argument('--remove', action='store_true', help='Delete orphaned files instead of only listing them')
+    parser.add_argument('--min-age', type=int, default=None, metavar='MINUTES',
+                        help='Ignore files newer than this (default: MEDIA_SCAN_MIN_AGE_MINUTES)')
+    args = parser.parse_args(argv)
+    min_age_seconds = args.min_age * 60 if args.min_age is not None else None
+    report = scan_media(DreamDB(), remove_orphans=args.remove, min_age_seconds=min_age_seconds)
+    for path in report['orphans']:
+        print(f"{'Removed' if args.remove else 'Orphaned'}: {path}")
+    for row in report['missing']:
+        print(f"Missing: {row['kind']} file {row['filename']} of dream(s) {', '.join(map(str, row['ids']))}")
+    listed = len(report['orphans']) + len(report['missing'])
+    if listed < report['orphan_count'] + report['missing_count']:
+        print(f"(showing the first {listed} entries)")
+    print(f"Scanned {report['files_scanned']} file(s): {report['orphan_count']} orphaned "
+          f"({report['orphan_bytes'] / (1024 * 1024):.1f} MB, {report['removed']} removed), "
+          f"{report['missing_count']} missing")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import logging
+import argparse
+
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from functions.audio import AUDIO_ARCHIVE_FORMATS
+from functions.dream_db import DreamDB
+from functions.audio_transcode import transcode_archive
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert WAV dream recordings to the archive codec')
+    parser.add_argument('--codec', choices=sorted(AUDIO_ARCHIVE_FORMATS), default=None,
+                        help='Target codec (default: AUDIO_ARCHIVE_CODEC)')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel ffmpeg processes (default: one per core)')
+    args = parser.parse_args(argv)
+    report = transcode_archive(DreamDB(), codec=args.codec, workers=args.workers)
+    mb = 1024 * 1024
+    print(f"Converted {report['converted']} recording(s) to {report['codec']}, {report['failed']} failed: "
+          f"{report['bytes_before'] / mb:.1f} MB -> {report['bytes_after'] / mb:.1f} MB, "
+          f"{report['bytes_reclaimed'] / mb:.1f} MB reclaimed")
+
+if __name__ == '__main__':
+    main()
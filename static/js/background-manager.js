@@ -6,13 +6,114 @@ class BackgroundManager {
         this.updateInterval = 60000; // 1 minute in milliseconds
         this.isLoading = false;
         this.totalImages = parseInt(document.body.dataset.totalBackgroundImages);
-        
-        // Preload the first image
-        this.preloadNextImage().then(() => {
-            this.start();
+        this.images = null;
+        // Upcoming changes from /api/background/schedule, and the images already decoded for them
+        this.schedule = [];
+        this.scheduleSize = 5;
+        this.decoded = new Map();
+        this.changeTimer = null;
+        // Counters for checking that each image is downloaded and decoded once, ahead of its turn
+        this.stats = { prefetched: 0, transitions: 0, transitionsFromPrefetch: 0 };
+
+        this.refreshSchedule().then((scheduled) => {
+            if (scheduled) {
+                this.changeBackground(this.currentScheduled);
+                return;
+            }
+            // Without the schedule endpoint, work out the image on the client every minute
+            this.loadManifest()
+                .then(() => this.preloadNextImage())
+                .then(() => {
+                    this.start();
+                });
         });
     }
 
+    async refreshSchedule() {
+        try {
+            const tzOffset = new Date().getTimezoneOffset();
+            // Lets the server preload the right background with the page on the next load
+            document.cookie = `tz_offset=${tzOffset}; path=/; max-age=31536000; SameSite=Lax`;
+            const params = new URLSearchParams({
+                count: this.scheduleSize,
+                tz_offset: tzOffset
+            });
+            const response = await fetch(`/api/background/schedule?${params}`, { cache: 'no-store' });
+            if (!response.ok) return false;
+            const data = await response.json();
+            if (!data.current) return false;
+            this.currentScheduled = data.current.url;
+            this.schedule = data.next;
+            // Clocks drift; time changes against the server's idea of now
+            this.clockSkew = data.now - Date.now();
+            this.prefetchScheduled();
+            this.scheduleNextChange();
+            return true;
+        } catch (error) {
+            console.warn('Background schedule unavailable, falling back to the client clock:', error);
+            return false;
+        }
+    }
+
+    prefetchScheduled() {
+        const wanted = new Set([this.currentScheduled, ...this.schedule.map(entry => entry.url)]);
+        // Let go of images that have been shown or dropped out of the schedule
+        for (const url of this.decoded.keys()) {
+            if (!wanted.has(url) && url !== this.currentImage) this.decoded.delete(url);
+        }
+        const idle = window.requestIdleCallback || ((callback) => setTimeout(callback, 1));
+        this.schedule.forEach(entry => {
+            if (this.decoded.has(entry.url)) return;
+            const img = new Image();
+            this.decoded.set(entry.url, img.decode ? null : img);
+            idle(() => {
+                img.src = entry.url;
+                this.stats.prefetched += 1;
+                // Decode off the transition so the fade does not stall on it
+                if (img.decode) {
+                    img.decode()
+                        .then(() => this.decoded.set(entry.url, img))
+                        .catch(() => this.decoded.delete(entry.url));
+                }
+            });
+        });
+    }
+
+    scheduleNextChange() {
+        clearTimeout(this.changeTimer);
+        const entry = this.schedule[0];
+        if (!entry) return;
+        const delay = Math.max(entry.at - (Date.now() + this.clockSkew), 0);
+        this.changeTimer = setTimeout(async () => {
+            this.schedule.shift();
+            await this.changeBackground(entry.url);
+            // Top the schedule up before it runs out
+            if (this.schedule.length < 2) {
+                if (!(await this.refreshSchedule())) {
+                    await this.loadManifest();
+                    this.start();
+                }
+            } else {
+                this.scheduleNextChange();
+            }
+        }, delay);
+    }
+
+    async loadManifest() {
+        // Display-resolution images with hashed names, when the set has been built
+        try {
+            const response = await fetch('/backgrounds/manifest.json');
+            if (!response.ok) return;
+            const manifest = await response.json();
+            if (manifest.images && manifest.images.length) {
+                this.images = manifest.images.map(image => `/backgrounds/${image.file}`);
+                this.totalImages = this.images.length;
+            }
+        } catch (error) {
+            console.warn('Background manifest unavailable, using the original images:', error);
+        }
+    }
+
     async preloadNextImage() {
         const newImagePath = this.getImagePath();
         if (newImagePath === this.currentImage) return;
@@ -31,14 +132,15 @@ class BackgroundManager {
         const now = new Date();
         const minutesInDay = now.getHours() * 60 + now.getMinutes();
         const totalMinutes = 24 * 60;
-        
-        // Calculate which image to show based on time of day
-        const imageNumber = Math.floor((minutesInDay / totalMinutes) * this.totalImages);
+
+        // Calculate which image to show based on time of day (integer maths, as the server does)
+        const imageNumber = Math.floor((minutesInDay * this.totalImages) / totalMinutes);
         return Math.min(Math.max(imageNumber, 0), this.totalImages - 1);
     }
 
     getImagePath() {
         const imageNumber = this.getImageNumberForTime();
+        if (this.images) return this.images[imageNumber];
         return `/static/images/background/${imageNumber}.jpg`;
     }
 
@@ -71,30 +173,36 @@ class BackgroundManager {
         });
     }
 
-    async changeBackground() {
+    async changeBackground(newImagePath = this.getImagePath()) {
         if (this.isLoading) return;
-        
-        const newImagePath = this.getImagePath();
+
         if (newImagePath === this.currentImage) return;
 
         this.isLoading = true;
 
         try {
-            // If we have a preloaded image, use it
-            if (this.nextImage && this.nextImage.src === newImagePath) {
+            this.stats.transitions += 1;
+            // img.src is always absolute
+            const absolutePath = new URL(newImagePath, window.location.href).href;
+            if (this.decoded.get(newImagePath)) {
+                this.stats.transitionsFromPrefetch += 1;
+                await this.fadeToNewBackground(newImagePath);
+            } else if (this.nextImage && this.nextImage.src === absolutePath) {
+                // If we have a preloaded image, use it
                 await this.fadeToNewBackground(newImagePath);
             } else {
                 // Otherwise, load the new image
                 const img = new Image();
                 await new Promise((resolve) => {
                     img.onload = resolve;
+                    img.onerror = resolve;
                     img.src = newImagePath;
                 });
                 await this.fadeToNewBackground(newImagePath);
             }
 
-            // Preload the next image
-            await this.preloadNextImage();
+            // The schedule prefetches ahead; the minute-by-minute fallback preloads here
+            if (!this.schedule.length) await this.preloadNextImage();
         } finally {
             this.isLoading = false;
         }
@@ -103,7 +211,7 @@ class BackgroundManager {
     start() {
         // Initial background set
         this.changeBackground();
-        
+
         // Set up interval for background changes
         setInterval(() => {
             this.changeBackground();
@@ -114,4 +222,4 @@ class BackgroundManager {
 // Initialize the background manager when the DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
     window.backgroundManager = new BackgroundManager();
-}); 
\ No newline at end of file
+});
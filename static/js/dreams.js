@@ -0,0 +1,241 @@
+// Above this many loaded dreams, only the rows near the viewport are kept in the DOM
+const VIRTUALIZE_AFTER = 200;
+// Rows rendered above and below the viewport, so fast scrolling does not show gaps
+const BUFFER_ROWS = 3;
+
+class DreamLibrary {
+    constructor(grid) {
+        this.grid = grid;
+        this.template = document.getElementById('dreamCardTemplate');
+        this.sentinel = document.getElementById('dreamsSentinel');
+        this.pageLimit = parseInt(grid.dataset.pageLimit) || 40;
+        this.nextCursor = grid.dataset.nextCursor || null;
+        this.loading = false;
+        this.sentinelVisible = false;
+        this.renderQueued = false;
+        // Every loaded dream, in grid order; the cards in the DOM show a window onto it
+        this.items = Array.from(grid.querySelectorAll('.dream-card'), card => this.readCard(card));
+
+        // Start fetching a screen before the end is reached
+        this.observer = new IntersectionObserver((entries) => {
+            this.sentinelVisible = entries.some(entry => entry.isIntersecting);
+            if (this.sentinelVisible) this.loadMore();
+        }, { rootMargin: '100% 0px' });
+        this.observer.observe(this.sentinel);
+
+        window.addEventListener('scroll', () => this.requestRender(), { passive: true });
+        window.addEventListener('resize', () => this.requestRender());
+    }
+
+    readCard(card) {
+        // The server-rendered first screen, as the same objects /api/dreams returns
+        const img = card.querySelector('.dream-thumbnail');
+        return {
+            id: parseInt(card.dataset.id),
+            created_at: card.querySelector('.dream-date').textContent,
+            preview: card.querySelector('.dream-preview').textContent,
+            thumb_url: img.getAttribute('src'),
+            thumb_srcset: img.getAttribute('srcset')
+        };
+    }
+
+    fillCard(card, item) {
+        if (card.dataset.id === String(item.id)) return;
+        card.dataset.id = item.id;
+        const img = card.querySelector('.dream-thumbnail');
+        // srcset first, so the browser does not start on src and then switch
+        img.srcset = item.thumb_srcset || '';
+        img.src = item.thumb_url || '';
+        card.querySelector('.dream-date').textContent = item.created_at || '';
+        card.querySelector('.dream-preview').textContent = item.preview || '';
+    }
+
+    async loadMore() {
+        if (this.loading || !this.nextCursor) return;
+        this.loading = true;
+        try {
+            const params = new URLSearchParams({ cursor: this.nextCursor, limit: this.pageLimit });
+            const response = await fetch(`/api/dreams?${params}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const page = await response.json();
+            this.items.push(...page.dreams);
+            this.nextCursor = page.next_cursor;
+            this.render();
+        } catch (error) {
+            console.error('Error loading dreams:', error);
+            return;
+        } finally {
+            this.loading = false;
+        }
+        // The observer only reports changes; keep going while the end is still in view
+        if (this.sentinelVisible) this.loadMore();
+    }
+
+    requestRender() {
+        if (this.renderQueued || this.items.length <= VIRTUALIZE_AFTER) return;
+        this.renderQueued = true;
+        requestAnimationFrame(() => {
+            this.renderQueued = false;
+            this.render();
+        });
+    }
+
+    visibleRange() {
+        const total = this.items.length;
+        if (total <= VIRTUALIZE_AFTER) return { start: 0, end: total, before: 0, after: 0 };
+        const columns = getComputedStyle(this.grid).gridTemplateColumns.split(' ').length || 5;
+        // Cards are square, so a row is as tall as a column is wide
+        const rowHeight = this.grid.clientWidth / columns;
+        const rows = Math.ceil(total / columns);
+        const top = this.grid.getBoundingClientRect().top + window.scrollY;
+        const firstRow = Math.max(Math.floor((window.scrollY - top) / rowHeight) - BUFFER_ROWS, 0);
+        const lastRow = Math.min(Math.ceil((window.scrollY + window.innerHeight - top) / rowHeight) + BUFFER_ROWS, rows);
+        return {
+            start: Math.min(firstRow * columns, total),
+            end: Math.min(Math.max(lastRow, firstRow) * columns, total),
+            before: firstRow * rowHeight,
+            after: Math.max(rows - lastRow, 0) * rowHeight
+        };
+    }
+
+    render() {
+        const { start, end, before, after } = this.visibleRange();
+        // Padding stands in for the rows that are not in the DOM, so the scrollbar stays true
+        this.grid.style.paddingTop = `${before}px`;
+        this.grid.style.paddingBottom = `${after}px`;
+        const cards = this.grid.children;
+        // Reuse the cards already in the grid, only adding or dropping the difference
+        while (cards.length > end - start) this.grid.lastElementChild.remove();
+        while (cards.length < end - start) {
+            this.grid.appendChild(this.template.content.firstElementChild.cloneNode(true));
+        }
+        for (let i = start; i < end; i++) {
+            this.fillCard(cards[i - start], this.items[i]);
+        }
+    }
+
+    remove(dreamId) {
+        this.items = this.items.filter(item => String(item.id) !== String(dreamId));
+        const card = this.grid.querySelector(`.dream-card[data-id="${dreamId}"]`);
+        if (card) card.remove();
+        this.render();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const grid = document.getElementById('dreamsGrid');
+    const library = new DreamLibrary(grid);
+    window.dreamLibrary = library;
+    const modal = document.getElementById('dreamModal');
+    const modalClose = document.querySelector('.modal-close');
+
+    function stopPlayback() {
+        // Stop audio and video playback when closing modal
+        const audioPlayer = document.getElementById('modalAudioPlayer');
+        if (audioPlayer) {
+            audioPlayer.pause();
+            audioPlayer.currentTime = 0;
+        }
+        const videoPlayer = document.getElementById('modalVideoPlayer');
+        if (videoPlayer) {
+            videoPlayer.pause();
+            videoPlayer.currentTime = 0;
+        }
+    }
+
+    async function openDream(dreamId) {
+        let data;
+        try {
+            const response = await fetch(`/api/dreams/${dreamId}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            data = await response.json();
+        } catch (error) {
+            console.error('Error loading dream:', error);
+            return;
+        }
+
+        document.getElementById('modalUserPrompt').textContent = data.user_prompt;
+        document.getElementById('modalGeneratedPrompt').textContent = data.generated_prompt;
+        document.getElementById('modalCreatedAt').textContent = data.created_at;
+
+        // Audio player logic
+        const audioSection = document.getElementById('modalAudioSection');
+        const audioPlayer = document.getElementById('modalAudioPlayer');
+        const audioSource = document.getElementById('modalAudioSource');
+        if (data.audio_url) {
+            audioSource.src = data.audio_url;
+            audioSource.type = data.audio_type;
+            audioPlayer.load();
+            audioSection.style.display = '';
+        } else {
+            audioSource.src = '';
+            audioSection.style.display = 'none';
+        }
+
+        // Video player logic
+        const videoSection = document.getElementById('modalVideoSection');
+        const videoPlayer = document.getElementById('modalVideoPlayer');
+        const videoSource = document.getElementById('modalVideoSource');
+        if (data.video_url) {
+            // Reserve the player's space up front when the dimensions are known
+            videoPlayer.style.aspectRatio = (data.video_width && data.video_height)
+                ? `${data.video_width} / ${data.video_height}` : '';
+            videoSource.src = data.video_url;
+            videoPlayer.load();
+            videoSection.style.display = '';
+        } else {
+            videoSource.src = '';
+            videoSection.style.display = 'none';
+        }
+
+        // Store the dream ID for deletion
+        document.getElementById('modalDeleteButton').dataset.dreamId = data.id;
+
+        modal.classList.add('show');
+    }
+
+    // One listener for every card, including the ones added or recycled later
+    grid.addEventListener('click', function(e) {
+        const card = e.target.closest('.dream-card');
+        if (card) openDream(card.dataset.id);
+    });
+
+    modalClose.addEventListener('click', function() {
+        modal.classList.remove('show');
+        stopPlayback();
+    });
+
+    modal.addEventListener('click', function(e) {
+        if (e.target === modal) {
+            modal.classList.remove('show');
+            stopPlayback();
+        }
+    });
+
+    // Add delete button click handler
+    document.getElementById('modalDeleteButton').addEventListener('click', async function() {
+        const dreamId = this.dataset.dreamId;
+        if (!dreamId) return;
+
+        if (confirm('Are you sure you want to delete this dream? This action cannot be undone.')) {
+            try {
+                const response = await fetch(`/api/dreams/${dreamId}`, {
+                    method: 'DELETE'
+                });
+
+                if (response.ok) {
+                    // Remove the card from the grid
+                    library.remove(dreamId);
+                    // Close the modal
+                    modal.classList.remove('show');
+                    stopPlayback();
+                } else {
+                    alert('Failed to delete dream. Please try again.');
+                }
+            } catch (error) {
+                console.error('Error deleting dream:', error);
+                alert('An error occurred while deleting the dream.');
+            }
+        }
+    });
+});
@@ -190,8 +190,9 @@ window.socket.on('play_video', (data) => {
     }
 });
 
-window.socket.on('reload_config', () => {
-    console.log('Received reload_config event, reloading page...');
+window.socket.on('reload_config', (data) => {
+    const changed = (data && data.changed) || [];
+    console.log(`Received reload_config event (${changed.join(', ')}), reloading page...`);
     window.location.reload();
 });
 
@@ -1,3 +1,4 @@
+import os
 import pytest
 
 def test_index_page(test_client):
@@ -47,11 +48,35 @@ def test_clock_config_path(test_client, mocker):
     assert resp.status_code == 500
 
 def test_notify_config_reload(test_client, mocker):
+    mocker.patch('dream_recorder.reload_config', return_value={'PLAYBACK_DURATION', 'GPT_MODEL'})
     mock_emit = mocker.patch('dream_recorder.socketio.emit')
     resp = test_client.post('/api/notify_config_reload')
     assert resp.status_code == 200
-    assert resp.get_json()['status'] == 'reload event emitted'
-    mock_emit.assert_called_with('reload_config')
+    assert resp.get_json() == {'status': 'reload event emitted', 'changed': ['GPT_MODEL', 'PLAYBACK_DURATION']}
+    mock_emit.assert_called_with('reload_config', {'changed': ['GPT_MODEL', 'PLAYBACK_DURATION']})
+
+def test_notify_config_reload_unchanged(test_client, mocker):
+    mocker.patch('dream_recorder.reload_config', return_value=set())
+    mock_emit = mocker.patch('dream_recorder.socketio.emit')
+    resp = test_client.post('/api/notify_config_reload')
+    assert resp.get_json() == {'status': 'config unchanged', 'changed': []}
+    mock_emit.assert_not_called()
+
+def test_config_change_warns_about_restart_only_options(mocker):
+    import dream_recorder
+    mock_emit = mocker.patch('dream_recorder.socketio.emit')
+    mock_logger = mocker.patch('dream_recorder.logger')
+    dream_recorder.apply_config_change({'PORT', 'VIDEO_HISTORY_LIMIT'})
+    mock_logger.warning.assert_called_once_with("Restart the app to apply PORT")
+    mock_emit.assert_called_once_with('reload_config', {'changed': ['PORT', 'VIDEO_HISTORY_LIMIT']})
+
+def test_options_read_at_startup_need_a_restart(mocker):
+    import dream_recorder
+    mocker.patch('dream_recorder.socketio.emit')
+    mock_logger = mocker.patch('dream_recorder.logger')
+    dream_recorder.apply_config_change({'MEDIA_STORAGE_BACKEND', 'S3_BUCKET', 'HUB_BLOCK_THRESHOLD_MS'})
+    mock_logger.warning.assert_called_once_with(
+        "Restart the app to apply HUB_BLOCK_THRESHOLD_MS, MEDIA_STORAGE_BACKEND, S3_BUCKET")
 
 def test_delete_dream_success(test_client, mocker, mock_dream_db):
     mock_dream_db.get_dream.return_value = {
@@ -65,6 +90,25 @@ def test_delete_dream_success(test_client, mocker, mock_dream_db):
     assert resp.get_json()['success'] is True
     assert mock_remove.call_count == 3  # video, thumb, audio
 
+def test_delete_archived_dream_removes_its_other_files(test_client, mocker, mock_dream_db, tmp_path):
+    config = {}
+    for key in ('VIDEOS_DIR', 'THUMBS_DIR', 'RECORDINGS_DIR'):
+        config[key] = str(tmp_path / key.lower())
+        os.makedirs(config[key])
+    (tmp_path / 'thumbs_dir' / 'thumb1.jpg').write_text('data')
+    (tmp_path / 'recordings_dir' / 'audio1.opus').write_text('data')
+    mocker.patch('dream_recorder.get_config', return_value=config)
+    # Archived by the storage manager: the video is gone and its name cleared
+    mock_dream_db.get_dream.return_value = {
+        'id': 1, 'video_filename': '', 'thumb_filename': 'thumb1.jpg', 'audio_filename': 'audio1.opus'
+    }
+    mock_dream_db.delete_dream.return_value = True
+    resp = test_client.delete('/api/dreams/1')
+    assert resp.status_code == 200
+    assert os.path.isdir(config['VIDEOS_DIR'])
+    assert os.listdir(config['THUMBS_DIR']) == []
+    assert os.listdir(config['RECORDINGS_DIR']) == []
+
 def test_delete_dream_not_found(test_client, mock_dream_db):
     mock_dream_db.get_dream.return_value = None
     resp = test_client.delete('/api/dreams/999')
@@ -123,7 +167,367 @@ def test_404_page(test_client):
     assert resp.status_code == 404
 
 def test_notify_config_reload_multiple_clients(test_client, mocker):
+    mocker.patch('dream_recorder.reload_config', return_value={'LUMA_MODEL'})
     mock_emit = mocker.patch('dream_recorder.socketio.emit')
     resp = test_client.post('/api/notify_config_reload')
     assert resp.status_code == 200
-    mock_emit.assert_any_call('reload_config') 
\ No newline at end of file
+    mock_emit.assert_any_call('reload_config', {'changed': ['LUMA_MODEL']})
+
+def test_get_dream_json(test_client, mock_dream_db):
+    mock_dream_db.get_dream.return_value = {
+        'id': 1, 'video_filename': 'dream1.mp4', 'video_width': 1280, 'video_height': 544, 'video_duration': 5.0
+    }
+    resp = test_client.get('/api/dreams/1')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['video_width'] == 1280
+    assert data['video_duration'] == 5.0
+
+def test_get_dream_json_not_found(test_client, mock_dream_db):
+    mock_dream_db.get_dream.return_value = None
+    resp = test_client.get('/api/dreams/999')
+    assert resp.status_code == 404
+
+def test_library_manifest(test_client, mock_dream_db):
+    mock_dream_db.get_media_hashes.return_value = {'b', 'a'}
+    resp = test_client.get('/api/library/manifest')
+    assert resp.get_json() == {'hashes': ['a', 'b']}
+
+def test_library_export_streams_tar(test_client, mocker):
+    export = mocker.patch('dream_recorder.iter_export', return_value=iter([b'chunk1', b'chunk2']))
+    resp = test_client.post('/api/library/export', json={'hashes': ['abc']})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-tar'
+    assert resp.data == b'chunk1chunk2'
+    assert export.call_args.kwargs['have_hashes'] == ['abc']
+
+def test_library_import(test_client, mocker):
+    mocker.patch('dream_recorder.import_archive', return_value={'dreams': 2})
+    resp = test_client.post('/api/library/import', data=b'tar-bytes')
+    assert resp.status_code == 200
+    assert resp.get_json()['dreams'] == 2
+
+def test_library_import_error(test_client, mocker):
+    mocker.patch('dream_recorder.import_archive', side_effect=ValueError('Checksum mismatch'))
+    resp = test_client.post('/api/library/import', data=b'tar-bytes')
+    assert resp.status_code == 400
+    assert 'Checksum mismatch' in resp.get_json()['message']
+
+def test_metrics_reports_backup_status(test_client, mocker):
+    mocker.patch.dict('dream_recorder.backup_status', {'ok': True, 'path': 'db/backups/dreams-1.db'})
+    resp = test_client.get('/api/metrics')
+    assert resp.status_code == 200
+    assert resp.get_json()['db_backup']['ok'] is True
+
+def test_serve_blob_is_immutable(test_client, mocker, tmp_path):
+    sha256 = 'ab' * 32
+    blob = tmp_path / sha256
+    blob.write_bytes(b'video-bytes')
+    mocker.patch('dream_recorder.blob_store.path_for', return_value=str(blob))
+    resp = test_client.get(f'/media/blobs/{sha256}.mp4')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'video/mp4'
+    assert resp.data == b'video-bytes'
+    assert 'immutable' in resp.headers['Cache-Control']
+    resp = test_client.get(f'/media/blobs/{sha256}.mp4', headers={'If-None-Match': f'"{sha256}"'})
+    assert resp.status_code == 304
+
+def test_serve_blob_rejects_bad_hash(test_client):
+    assert test_client.get('/media/blobs/not-a-hash.mp4').status_code == 404
+
+def test_dream_media_redirects_to_blob(test_client, mock_dream_db, mocker):
+    mock_dream_db.get_dream.return_value = {'id': 1, 'video_filename': 'v.mp4', 'video_sha256': 'ab' * 32}
+    mocker.patch('dream_recorder.blob_store.has', return_value=True)
+    resp = test_client.get('/media/dreams/1/video')
+    assert resp.status_code == 302
+    assert resp.headers['Location'].endswith(f"/media/blobs/{'ab' * 32}.mp4")
+    assert resp.headers['Cache-Control'] == 'no-cache'
+    assert test_client.get('/media/dreams/1/poster').status_code == 404
+    mock_dream_db.get_dream.return_value = None
+    assert test_client.get('/media/dreams/2/video').status_code == 404
+
+def test_serve_blob_redirects_to_remote_backend(test_client, mocker):
+    sha256 = 'ab' * 32
+    presign = mocker.patch('dream_recorder.blob_store.presigned_url', return_value='https://s3.example/ab?X-Amz-Signature=x')
+    resp = test_client.get(f'/media/blobs/{sha256}.mp4')
+    assert resp.status_code == 302
+    assert resp.headers['Location'] == 'https://s3.example/ab?X-Amz-Signature=x'
+    assert resp.headers['Cache-Control'].startswith('private')
+    presign.assert_called_once_with(sha256, content_type='video/mp4')
+
+def test_serve_blob_thumbnail_variant(test_client, mocker, tmp_path):
+    sha256 = 'cd' * 32
+    blob = tmp_path / sha256
+    blob.write_bytes(b'png-bytes')
+    variant = tmp_path / f'{sha256}-160.webp'
+    variant.write_bytes(b'webp-bytes')
+    mocker.patch('dream_recorder.blob_store.path_for', return_value=str(blob))
+    make_variant = mocker.patch('dream_recorder.thumbnail_cache.variant', return_value=str(variant))
+    resp = test_client.get(f'/media/blobs/{sha256}.png?w=150&fmt=webp')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/webp'
+    assert resp.data == b'webp-bytes'
+    assert 'immutable' in resp.headers['Cache-Control']
+    make_variant.assert_called_once_with(sha256, str(blob), 150, 'webp')
+    resp = test_client.get(f'/media/blobs/{sha256}.png?w=150&fmt=webp', headers={'If-None-Match': f'"{variant.name}"'})
+    assert resp.status_code == 304
+    assert test_client.get(f'/media/blobs/{sha256}.png?w=150&fmt=gif').status_code == 400
+    assert test_client.get(f'/media/blobs/{sha256}.png?w=big').status_code == 400
+
+def test_thumbnail_variant_falls_back_to_original(test_client, mocker, tmp_path):
+    (tmp_path / 'thumb.png').write_bytes(b'png-bytes')
+    mocker.patch('dream_recorder.get_config', return_value={'THUMBS_DIR': str(tmp_path), 'THUMB_FORMAT': 'webp'})
+    mocker.patch('dream_recorder.thumbnail_cache.variant', side_effect=RuntimeError('no ffmpeg'))
+    resp = test_client.get('/media/thumbs/thumb.png?w=320')
+    assert resp.status_code == 200
+    assert resp.data == b'png-bytes'
+    assert test_client.get('/media/thumbs/missing.png?w=320').status_code == 404
+    assert test_client.get('/media/thumbs/../secret.png').status_code == 404
+
+def test_dreams_page_uses_responsive_thumbnails(test_client, mock_dream_db):
+    mock_dream_db.get_dreams_page.return_value = [
+        {'id': i, 'user_prompt': 'u', 'generated_prompt': 'g', 'created_at': 'now',
+         'video_filename': 'v.mp4', 'thumb_filename': f'thumb{i}.png', 'audio_filename': ''}
+        for i in range(12)
+    ]
+    html = test_client.get('/dreams').get_data(as_text=True)
+    assert 'src="/media/thumbs/thumb0.png?w=320&amp;fmt=webp"' in html
+    assert '/media/thumbs/thumb0.png?w=480&amp;fmt=webp 480w' in html
+    assert html.count('loading="eager"') == 10
+    # Two cards, and the template cards loaded later are cloned from
+    assert html.count('loading="lazy"') == 3
+
+def test_serve_background_is_immutable(test_client, mocker, tmp_path):
+    name = '7.0123456789ab.webp'
+    (tmp_path / name).write_bytes(b'webp-bytes')
+    (tmp_path / 'manifest.json').write_text('{"images": []}')
+    mocker.patch('dream_recorder.BACKGROUND_DIST_DIR', str(tmp_path))
+    resp = test_client.get(f'/backgrounds/{name}')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/webp'
+    assert 'immutable' in resp.headers['Cache-Control']
+    assert test_client.get(f'/backgrounds/{name}', headers={'If-None-Match': '"0123456789ab"'}).status_code == 304
+    assert test_client.get('/backgrounds/7.jpg').status_code == 404
+    assert test_client.get('/backgrounds/8.0123456789ab.webp').status_code == 404
+    resp = test_client.get('/backgrounds/manifest.json')
+    assert resp.get_json() == {'images': []}
+    assert resp.headers['Cache-Control'] == 'no-cache'
+
+def test_index_counts_backgrounds(test_client, mocker):
+    mocker.patch('dream_recorder.total_background_images', return_value=42)
+    assert b'data-total-background-images="42"' in test_client.get('/').data
+
+def test_background_schedule(test_client, mocker):
+    mocker.patch('dream_recorder.background_urls', return_value=[f'/backgrounds/{i}.webp' for i in range(1440)])
+    resp = test_client.get('/api/background/schedule?count=2&tz_offset=0')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['total'] == 1440
+    assert [entry['index'] for entry in data['next']] == [(data['current']['index'] + i) % 1440 for i in (1, 2)]
+    assert resp.headers['Link'] == f"<{data['next'][0]['url']}>; rel=preload; as=image"
+    assert resp.headers['Cache-Control'] == 'no-store'
+    assert len(test_client.get('/api/background/schedule?count=500').get_json()['next']) == 30
+    assert 'Link' not in test_client.get('/api/background/schedule?count=2').headers
+
+def test_index_preloads_current_background(test_client, mocker):
+    import dream_recorder
+    mocker.patch('dream_recorder.background_urls', return_value=[f'/backgrounds/{i}.webp' for i in range(1440)])
+    schedule = mocker.spy(dream_recorder, 'background_schedule')
+    # Without the display's timezone the server's clock would pick the wrong image
+    test_client.delete_cookie('tz_offset')
+    assert 'Link' not in test_client.get('/').headers
+    schedule.assert_not_called()
+    test_client.set_cookie('tz_offset', '-120')
+    try:
+        resp = test_client.get('/')
+    finally:
+        test_client.delete_cookie('tz_offset')
+    assert schedule.call_args.kwargs['tz_offset'] == -120
+    assert resp.headers['Link'] == f"<{schedule.spy_return['current']['url']}>; rel=preload; as=image"
+
+def test_serve_asset_precompressed(test_client, mocker, tmp_path):
+    name = 'index.0123456789ab.js'
+    (tmp_path / name).write_bytes(b'plain')
+    (tmp_path / (name + '.gz')).write_bytes(b'gzipped')
+    (tmp_path / (name + '.br')).write_bytes(b'brotli')
+    mocker.patch('dream_recorder.ASSET_DIST_DIR', str(tmp_path))
+    resp = test_client.get(f'/static/dist/{name}', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert resp.status_code == 200
+    assert resp.data == b'brotli'
+    assert resp.headers['Content-Encoding'] == 'br'
+    assert resp.mimetype == 'text/javascript'
+    assert resp.headers['Vary'] == 'Accept-Encoding'
+    assert 'immutable' in resp.headers['Cache-Control']
+    resp = test_client.get(f'/static/dist/{name}', headers={'Accept-Encoding': 'gzip'})
+    assert (resp.data, resp.headers['Content-Encoding']) == (b'gzipped', 'gzip')
+    resp = test_client.get(f'/static/dist/{name}')
+    assert resp.data == b'plain'
+    assert 'Content-Encoding' not in resp.headers
+    assert test_client.get(f'/static/dist/{name}', headers={
+        'Accept-Encoding': 'br', 'If-None-Match': '"0123456789ab-br"'}).status_code == 304
+    assert test_client.get('/static/dist/manifest.json').status_code == 404
+    assert test_client.get('/static/dist/index.ba9876543210.js').status_code == 404
+
+def test_index_uses_built_bundles(test_client, mocker):
+    mocker.patch('functions.assets.load_manifest', return_value={'version': 1, 'assets': {
+        'index.js': {'file': 'index.0123456789ab.js'}, 'index.css': {'file': 'index.ba9876543210.css'}}})
+    html = test_client.get('/').data.decode()
+    assert '<script src="/static/dist/index.0123456789ab.js"></script>' in html
+    assert '<link rel="stylesheet" href="/static/dist/index.ba9876543210.css">' in html
+    assert '/static/js/' not in html
+    mocker.patch('functions.assets.load_manifest', return_value=None)
+    html = test_client.get('/').data.decode()
+    assert '<script src="/static/js/sockets.js"></script>' in html
+    assert 'cdn.jsdelivr.net' not in test_client.get('/dreams').data.decode()
+
+def test_dreams_page_revalidates_with_library_version(test_client, mock_dream_db):
+    mock_dream_db.get_dreams_page.return_value = []
+    mock_dream_db.get_library_version.return_value = 7
+    resp = test_client.get('/dreams')
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+    assert etag.startswith('W/')
+    assert resp.headers['Cache-Control'] == 'no-cache'
+    mock_dream_db.get_dreams_page.reset_mock()
+    resp = test_client.get('/dreams', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+    # Answered without loading the library
+    mock_dream_db.get_dreams_page.assert_not_called()
+    mock_dream_db.get_library_version.return_value = 8
+    resp = test_client.get('/dreams', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+
+def test_dreams_page_revalidates_with_asset_build(test_client, mock_dream_db, mocker):
+    mock_dream_db.get_dreams_page.return_value = []
+    mock_dream_db.get_library_version.return_value = 7
+    mocker.patch('dream_recorder.assets_version', return_value='dreams.0123456789ab.js')
+    etag = test_client.get('/dreams').headers['ETag']
+    assert test_client.get('/dreams', headers={'If-None-Match': etag}).status_code == 304
+    mocker.patch('dream_recorder.assets_version', return_value='dreams.ba9876543210.js')
+    assert test_client.get('/dreams', headers={'If-None-Match': etag}).status_code == 200
+
+def test_config_etag_follows_config_file(test_client, mocker):
+    mocker.patch('dream_recorder.config_version', return_value=1)
+    etag = test_client.get('/api/clock-config-path').headers['ETag']
+    assert test_client.get('/api/clock-config-path', headers={'If-None-Match': etag}).status_code == 304
+    mocker.patch('dream_recorder.config_version', return_value=2)
+    assert test_client.get('/api/clock-config-path', headers={'If-None-Match': etag}).status_code == 200
+
+def test_get_dream_is_conditional(test_client, mock_dream_db):
+    mock_dream_db.get_dream.return_value = {'id': 1, 'user_prompt': 'a dream'}
+    resp = test_client.get('/api/dreams/1')
+    etag = resp.headers['ETag']
+    assert test_client.get('/api/dreams/1', headers={'If-None-Match': etag}).status_code == 304
+    mock_dream_db.get_dream.return_value = {'id': 1, 'user_prompt': 'a dream', 'last_played_at': 'now'}
+    assert test_client.get('/api/dreams/1', headers={'If-None-Match': etag}).status_code == 200
+
+def test_responses_compressed_above_threshold(test_client, mock_dream_db, mocker):
+    import gzip
+    import brotli
+    from functions.config_loader import get_config
+    mocker.patch('functions.config_loader._config', get_config().replace(RESPONSE_COMPRESS_MIN_BYTES=1024))
+    mock_dream_db.get_dreams_page.return_value = [{
+        'id': i, 'user_prompt': f'Dream number {i}', 'generated_prompt': 'g', 'created_at': '2025-01-01',
+        'audio_filename': 'a.wav', 'video_filename': 'v.mp4', 'thumb_filename': 't.png',
+    } for i in range(20)]
+    mock_dream_db.get_library_version.return_value = 1
+    plain = test_client.get('/dreams')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    resp = test_client.get('/dreams', headers={'Accept-Encoding': 'gzip, br'})
+    assert resp.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(resp.data) == plain.data
+    assert int(resp.headers['Content-Length']) == len(resp.data) < len(plain.data)
+    assert resp.headers['ETag'] == plain.headers['ETag']
+    resp = test_client.get('/dreams', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(resp.data) == plain.data
+    # Small bodies are not worth it
+    resp = test_client.get('/api/clock-config-path', headers={'Accept-Encoding': 'gzip, br'})
+    assert 'Content-Encoding' not in resp.headers
+
+def _dreams(count):
+    return [{'id': i, 'user_prompt': f'prompt {i} ' + 'x' * 60, 'generated_prompt': 'g', 'created_at': f'2025-01-{i:02d}',
+             'video_filename': 'v.mp4', 'thumb_filename': f'thumb{i}.png', 'audio_filename': 'a.opus'}
+            for i in range(count, 0, -1)]
+
+def test_dreams_page_renders_first_screen_only(test_client, mock_dream_db):
+    mock_dream_db.get_dreams_page.return_value = _dreams(21)
+    html = test_client.get('/dreams').get_data(as_text=True)
+    mock_dream_db.get_dreams_page.assert_called_with(None, 21)
+    assert html.count('<div class="dream-card" data-id="') == 21  # 20 cards and the template
+    assert 'data-user-prompt' not in html
+    assert 'data-next-cursor=""' not in html
+
+def test_list_dreams_pages_with_cursor(test_client, mock_dream_db):
+    from functions.dream_db import decode_cursor
+    mock_dream_db.get_dreams_page.return_value = _dreams(3)
+    resp = test_client.get('/api/dreams?limit=2')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [card['id'] for card in data['dreams']] == [3, 2]
+    assert data['dreams'][0]['preview'] == ('prompt 3 ' + 'x' * 60)[:50] + '...'
+    assert data['dreams'][0]['thumb_url'] == '/media/thumbs/thumb3.png?w=320&fmt=webp'
+    # The next page starts after the last dream on this one
+    assert decode_cursor(data['next_cursor']) == ('2025-01-02', 2)
+    mock_dream_db.get_dreams_page.return_value = _dreams(1)
+    data = test_client.get(f"/api/dreams?cursor={data['next_cursor']}&limit=2").get_json()
+    mock_dream_db.get_dreams_page.assert_called_with(('2025-01-02', 2), 3)
+    assert data['next_cursor'] is None
+    assert test_client.get('/api/dreams?cursor=not-a-cursor').status_code == 400
+    test_client.get('/api/dreams?limit=100000')
+    mock_dream_db.get_dreams_page.assert_called_with(None, 201)
+
+def test_get_dream_includes_media_urls(test_client, mock_dream_db):
+    mock_dream_db.get_dream.return_value = _dreams(1)[0]
+    data = test_client.get('/api/dreams/1').get_json()
+    assert data['video_url'] == '/media/video/v.mp4'
+    assert data['audio_url'] == '/media/audio/a.opus'
+    assert data['audio_type'] == 'audio/ogg'
+
+def test_health(test_client, mock_dream_db, mocker):
+    mocker.patch('dream_recorder.hub_monitor.health', return_value={'enabled': True, 'status': 'degraded'})
+    resp = test_client.get('/api/health')
+    assert resp.status_code == 200
+    assert resp.get_json()['status'] == 'degraded'
+    assert resp.headers['Cache-Control'] == 'no-store'
+    mock_dream_db.get_schema_version.side_effect = Exception('disk I/O error')
+    resp = test_client.get('/api/health')
+    assert resp.status_code == 503
+    assert resp.get_json()['database'] == 'error'
+
+def test_metrics_include_hub(test_client, mocker):
+    mocker.patch('dream_recorder.hub_monitor.stats', return_value={'enabled': False})
+    assert test_client.get('/api/metrics').get_json()['hub'] == {'enabled': False}
+
+def test_admin_routes_hidden_without_token(test_client, mocker):
+    from functions.config_loader import get_config
+    mocker.patch('functions.config_loader._config', get_config().replace(ADMIN_TOKEN=None))
+    assert test_client.post('/api/admin/profile').status_code == 404
+    assert test_client.get('/api/admin/memory/snapshot').status_code == 404
+
+def test_admin_routes_need_the_token(test_client, mocker):
+    from collections import Counter
+    from functions.config_loader import get_config
+    mocker.patch('functions.config_loader._config', get_config().replace(ADMIN_TOKEN='secret'))
+    profile = mocker.patch('dream_recorder.profiler.profile', return_value=(Counter({'hub;main': 7}), 7))
+    assert test_client.post('/api/admin/profile', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    resp = test_client.post('/api/admin/profile?seconds=2&threads=all', headers={'Authorization': 'Bearer secret'})
+    assert resp.status_code == 200
+    assert resp.data == b'hub;main 7\n'
+    assert resp.headers['X-Profile-Samples'] == '7'
+    assert '.folded' in resp.headers['Content-Disposition']
+    profile.assert_called_once_with(2.0, interval_ms=5, all_threads=True)
+
+def test_admin_memory(test_client, mocker):
+    from functions.config_loader import get_config
+    mocker.patch('functions.config_loader._config', get_config().replace(ADMIN_TOKEN='secret'))
+    auth = {'Authorization': 'Bearer secret'}
+    mocker.patch('dream_recorder.memory_tracer.diff', side_effect=RuntimeError('tracemalloc is not running'))
+    assert test_client.get('/api/admin/memory/diff', headers=auth).status_code == 409
+    assert test_client.get('/api/admin/memory/snapshot?group_by=nope', headers=auth).status_code == 400
+    assert test_client.get('/api/admin/memory/start', headers=auth).status_code == 404
+    mocker.patch('dream_recorder.memory_tracer.top', return_value={'tracing': True, 'top': []})
+    data = test_client.get('/api/admin/memory/snapshot', headers=auth).get_json()
+    assert data['tracing'] and data['audio']['audio_chunks'] == 0
@@ -0,0 +1,143 @@
+import os
+import gzip
+import json
+import base64
+import hashlib
+import brotli
+import pytest
+from functions import assets
+from functions.assets import build_assets, load_manifest, asset_tags, assets_version, negotiate_encoding, fetch_vendor_assets
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'js').mkdir(parents=True)
+    (static / 'css').mkdir()
+    (static / 'vendor').mkdir()
+    (static / 'vendor' / 'lib.min.js').write_text('var lib={};\n')
+    (static / 'js' / 'a.js').write_text('// first file\nfunction first() {\n    return 1\n}\n')
+    (static / 'js' / 'b.js').write_text('const second = first() + 1;\n')
+    (static / 'css' / 'site.css').write_text('/* site */\nbody {\n    background: url("/static/images/Mask.png");\n}\n')
+    return str(static)
+
+BUNDLES = {'app.js': ['vendor/lib.min.js', 'js/a.js', 'js/b.js'], 'site.css': ['css/site.css']}
+
+def test_build_minifies_hashes_and_precompresses(static_dir):
+    dist_dir = os.path.join(static_dir, 'dist')
+    manifest = build_assets(static_dir, dist_dir, bundles=BUNDLES, fetch=False)
+    entry = manifest['assets']['app.js']
+    assert assets.HASHED_NAME_RE.match(entry['file'])
+    with open(os.path.join(dist_dir, entry['file']), 'rb') as f:
+        data = f.read()
+    assert entry['file'] == f"app.{hashlib.sha256(data).hexdigest()[:12]}.js"
+    # Concatenated in order, comments and whitespace gone
+    assert data.index(b'var lib') < data.index(b'function first') < data.index(b'const second')
+    assert b'first file' not in data
+    assert entry['bytes'] == len(data) < entry['source_bytes']
+    with open(os.path.join(dist_dir, entry['file'] + '.gz'), 'rb') as f:
+        assert gzip.decompress(f.read()) == data
+    with open(os.path.join(dist_dir, entry['file'] + '.br'), 'rb') as f:
+        assert brotli.decompress(f.read()) == data
+    with open(os.path.join(dist_dir, manifest['assets']['site.css']['file'])) as f:
+        assert f.read() == 'body{background:url("/static/images/Mask.png")}\n'
+    with open(os.path.join(dist_dir, 'manifest.json')) as f:
+        assert json.load(f) == manifest
+
+def test_rebuild_removes_stale_bundles(static_dir):
+    dist_dir = os.path.join(static_dir, 'dist')
+    old = build_assets(static_dir, dist_dir, bundles=BUNDLES, fetch=False)['assets']['app.js']['file']
+    with open(os.path.join(static_dir, 'js', 'b.js'), 'a') as f:
+        f.write('const third = 3;\n')
+    new = build_assets(static_dir, dist_dir, bundles=BUNDLES, fetch=False)['assets']['app.js']['file']
+    assert new != old
+    names = os.listdir(dist_dir)
+    assert not [name for name in names if name.startswith(old)]
+    assert {new, new + '.gz', new + '.br'} <= set(names)
+
+def test_relative_css_url_is_refused(static_dir):
+    with open(os.path.join(static_dir, 'css', 'site.css'), 'w') as f:
+        f.write('body { background: url(../images/Mask.png); }')
+    with pytest.raises(ValueError, match='relative'):
+        build_assets(static_dir, os.path.join(static_dir, 'dist'), bundles=BUNDLES, fetch=False)
+
+def test_asset_tags_use_manifest_then_sources(static_dir, monkeypatch):
+    monkeypatch.setattr(assets, 'BUNDLES', BUNDLES)
+    monkeypatch.setattr(assets, 'VENDOR_ASSETS', {
+        'vendor/lib.min.js': {'url': 'https://cdn.example/lib.min.js', 'integrity': 'sha384-abc'},
+    })
+    dist_dir = os.path.join(static_dir, 'dist')
+    os.remove(os.path.join(static_dir, 'vendor', 'lib.min.js'))
+    # Not built: every source file, with the CDN standing in for the missing vendored file
+    html = asset_tags('app.js', static_dir=static_dir, dist_dir=dist_dir)
+    assert html.splitlines()[0].strip() == (
+        '<script src="https://cdn.example/lib.min.js" integrity="sha384-abc" crossorigin="anonymous"></script>')
+    assert '<script src="/static/js/b.js"></script>' in html
+    os.makedirs(dist_dir)
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump({'version': 1, 'assets': {'site.css': {'file': 'site.0123456789ab.css'}}}, f)
+    assert asset_tags('site.css', static_dir=static_dir, dist_dir=dist_dir) == (
+        '<link rel="stylesheet" href="/static/dist/site.0123456789ab.css">')
+    assert asset_tags('site.css', debug=True, static_dir=static_dir, dist_dir=dist_dir) == (
+        '<link rel="stylesheet" href="/static/css/site.css">')
+    assert load_manifest(dist_dir)['assets']['site.css']['file'] == 'site.0123456789ab.css'
+    with pytest.raises(KeyError):
+        asset_tags('missing.js', static_dir=static_dir, dist_dir=dist_dir)
+
+def test_assets_version_changes_with_any_bundle(static_dir, monkeypatch):
+    monkeypatch.setattr(assets, 'BUNDLES', BUNDLES)
+    dist_dir = os.path.join(static_dir, 'dist')
+    assert assets_version(dist_dir=dist_dir) is None
+    build_assets(static_dir=static_dir, dist_dir=dist_dir, fetch=False)
+    before = assets_version(dist_dir=dist_dir)
+    assert assets_version(debug=True, dist_dir=dist_dir) is None
+    # Only the script bundle changes, which the CSS-only version used to miss
+    with open(os.path.join(static_dir, 'js', 'b.js'), 'a') as f:
+        f.write('const third = 3;\n')
+    build_assets(static_dir=static_dir, dist_dir=dist_dir, fetch=False)
+    assert assets_version(dist_dir=dist_dir) != before
+
+def test_negotiate_encoding(tmp_path):
+    name = 'app.0123456789ab.js'
+    for suffix in ('', '.gz', '.br'):
+        (tmp_path / (name + suffix)).write_bytes(b'x')
+    dist_dir = str(tmp_path)
+    assert negotiate_encoding(name, 'gzip, deflate, br', dist_dir) == (str(tmp_path / (name + '.br')), 'br')
+    assert negotiate_encoding(name, 'br;q=0, gzip', dist_dir) == (str(tmp_path / (name + '.gz')), 'gzip')
+    assert negotiate_encoding(name, 'identity', dist_dir) == (str(tmp_path / name), None)
+    assert negotiate_encoding(name, None, dist_dir) == (str(tmp_path / name), None)
+    os.remove(tmp_path / (name + '.br'))
+    assert negotiate_encoding(name, '*', dist_dir) == (str(tmp_path / (name + '.gz')), 'gzip')
+
+def test_fetch_vendor_assets_checks_integrity(tmp_path, mocker):
+    body = b'/* socket.io */'
+    integrity = 'sha384-' + base64.b64encode(hashlib.sha384(body).digest()).decode()
+    mocker.patch.object(assets, 'VENDOR_ASSETS', {'vendor/io.min.js': {'url': 'https://cdn.example/io.min.js',
+                                                                       'integrity': integrity}})
+    urlopen = mocker.patch('functions.assets.urllib.request.urlopen')
+    urlopen.return_value.__enter__.return_value.read.return_value = body
+    assert fetch_vendor_assets(str(tmp_path)) == ['vendor/io.min.js']
+    assert (tmp_path / 'vendor' / 'io.min.js').read_bytes() == body
+    # Already vendored: nothing to download
+    assert fetch_vendor_assets(str(tmp_path)) == []
+    assert urlopen.call_count == 1
+    os.remove(tmp_path / 'vendor' / 'io.min.js')
+    urlopen.return_value.__enter__.return_value.read.return_value = b'tampered'
+    with pytest.raises(ValueError, match='integrity'):
+        fetch_vendor_assets(str(tmp_path))
+    assert not (tmp_path / 'vendor' / 'io.min.js').exists()
+
+def test_build_assets_falls_back_to_cdn_when_download_fails(tmp_path, mocker):
+    static_dir = tmp_path / 'static'
+    (static_dir / 'js').mkdir(parents=True)
+    (static_dir / 'js' / 'app.js').write_text('var app = 1;')
+    dist_dir = str(tmp_path / 'dist')
+    mocker.patch.object(assets, 'VENDOR_ASSETS', {'vendor/io.min.js': {'url': 'https://cdn.example/io.min.js',
+                                                                       'integrity': 'sha384-abc'}})
+    mocker.patch('functions.assets.urllib.request.urlopen', side_effect=OSError('unreachable'))
+    mocker.patch.object(assets, 'BUNDLES', {'index.js': ['vendor/io.min.js', 'js/app.js']})
+    entry = build_assets(str(static_dir), dist_dir)['assets']['index.js']
+    assert entry['cdn'] == [{'url': 'https://cdn.example/io.min.js', 'integrity': 'sha384-abc'}]
+    with open(os.path.join(dist_dir, entry['file'])) as f:
+        assert 'app' in f.read()
+    tags = str(asset_tags('index.js', dist_dir=dist_dir))
+    assert tags.index('src="https://cdn.example/io.min.js" integrity="sha384-abc"') < tags.index(entry['file'])
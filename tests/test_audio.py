@@ -12,6 +12,8 @@ def mock_config(monkeypatch):
         'AUDIO_SAMPLE_WIDTH': 2,
         'AUDIO_FRAME_RATE': 44100,
         'RECORDINGS_DIR': tempfile.gettempdir(),
+        'AUDIO_ARCHIVE_CODEC': 'wav',
+        'AUDIO_ARCHIVE_BITRATE': '32k',
         'OPENAI_API_KEY': 'sk-test',
         'GPT_SYSTEM_PROMPT': 'Prompt',
         'GPT_SYSTEM_PROMPT_EXTEND': 'PromptExt',
@@ -74,6 +76,33 @@ def test_save_wav_file_timestamp(monkeypatch, mock_config, mock_logger):
     assert filename.startswith('recording_') and filename.endswith('.wav')
     mock_logger.info.assert_called()
 
+def test_save_wav_file_uses_archive_codec(monkeypatch, mock_config, mock_logger):
+    outputs = []
+    monkeypatch.setattr(audio, 'get_config', lambda: {
+        'RECORDINGS_DIR': tempfile.gettempdir(),
+        'AUDIO_ARCHIVE_CODEC': 'opus',
+        'AUDIO_ARCHIVE_BITRATE': '24k',
+    })
+    monkeypatch.setattr(audio.ffmpeg, 'input', lambda x: x)
+    monkeypatch.setattr(audio.ffmpeg, 'output', lambda x, y, **kwargs: outputs.append((y, kwargs)))
+    monkeypatch.setattr(audio.ffmpeg, 'run', lambda *a, **k: None)
+    filename = audio.save_wav_file(b'webm', filename='recording_1.wav', logger=mock_logger)
+    assert filename == 'recording_1.opus'
+    path, options = outputs[0]
+    assert path.endswith('recording_1.opus')
+    assert options['acodec'] == 'libopus'
+    assert options['audio_bitrate'] == '24k'
+
+def test_audio_archive_format_rejects_unknown_codec(mock_config):
+    with pytest.raises(ValueError):
+        audio.audio_archive_format('mp3')
+
+def test_audio_mime_type():
+    assert audio.audio_mime_type('a.opus') == 'audio/ogg'
+    assert audio.audio_mime_type('a.FLAC') == 'audio/flac'
+    assert audio.audio_mime_type('a.wav') == 'audio/wav'
+    assert audio.audio_mime_type('') == 'audio/mpeg'
+
 def test_process_audio_no_sid(monkeypatch, mock_config, mock_logger):
     monkeypatch.setattr(audio, 'save_wav_file', lambda *a, **k: 'file.wav')
     fake_transcription = mock.Mock(text='hello world')
@@ -187,4 +216,19 @@ def test_process_audio_emit_sid_and_no_sid(monkeypatch, mock_config, mock_logger
     # Check that emit was called with and without room
     calls = [c for c in fake_socketio.emit.call_args_list]
     assert any('room' in c[1] for c in calls)  # with sid
-    assert any('room' not in c[1] for c in calls)  # without sid 
\ No newline at end of file
+    assert any('room' not in c[1] for c in calls)  # without sid
+
+def test_openai_client_built_on_first_use(monkeypatch, mock_config):
+    monkeypatch.setattr(audio, '_client', None)
+    client = audio.get_openai_client()
+    assert client.api_key == 'sk-test'
+    assert audio.client is client
+    audio.reset_openai_client()
+    assert audio.get_openai_client() is not client
+
+def test_importing_audio_leaves_openai_unloaded():
+    import sys
+    import subprocess
+    result = subprocess.run([sys.executable, '-c', "import sys, functions.audio; print('openai' in sys.modules)"],
+                            cwd=os.path.join(os.path.dirname(__file__), '..'), capture_output=True, text=True)
+    assert result.stdout.strip() == 'False'
@@ -9,6 +9,8 @@ def mock_config(monkeypatch):
         'AUDIO_SAMPLE_WIDTH': 2,
         'AUDIO_FRAME_RATE': 44100,
         'RECORDINGS_DIR': '/tmp',
+        'VIDEOS_DIR': '/tmp',
+        'THUMBS_DIR': '/tmp',
         'OPENAI_API_KEY': 'sk-test',
         'GPT_SYSTEM_PROMPT': 'Prompt',
         'GPT_SYSTEM_PROMPT_EXTEND': 'PromptExt',
@@ -65,6 +67,23 @@ def test_process_audio_success(monkeypatch, mock_config, mock_logger):
     fake_db.save_dream.assert_called()
     mock_logger.info.assert_called()
 
+def test_process_audio_persists_media_metadata(monkeypatch, mock_config, mock_logger):
+    monkeypatch.setattr(audio, 'save_wav_file', lambda *a, **k: 'file.wav')
+    monkeypatch.setattr(audio.client.audio.transcriptions, 'create', lambda **kwargs: mock.Mock(text='hello'))
+    monkeypatch.setattr(audio, 'generate_video_prompt', lambda *a, **k: 'video prompt')
+    def fake_generate_video(*a, timings=None, **k):
+        timings['luma'] = 1.0
+        return ('video.mp4', 'thumb.png')
+    monkeypatch.setattr(audio, 'generate_video', fake_generate_video)
+    monkeypatch.setattr(audio, 'collect_media_metadata', lambda **k: {'video_width': 1280, 'video_bytes': 42})
+    fake_db = mock.Mock()
+    audio.process_audio('sid', mock.Mock(), fake_db, {}, [b'audio'], logger=mock_logger)
+    saved = fake_db.save_dream.call_args[0][0]
+    assert saved['video_width'] == 1280
+    assert saved['video_bytes'] == 42
+    assert saved['stage_timings']['luma'] == 1.0
+    assert {'save_audio', 'transcribe', 'prompt', 'metadata'} <= set(saved['stage_timings'])
+
 def test_process_audio_error(monkeypatch, mock_config, mock_logger):
     # Patch save_wav_file to raise
     def raise_exc(*a, **k): raise Exception('fail')
@@ -115,4 +134,18 @@ def test_process_audio_finally_unlink_exception(monkeypatch, mock_config, mock_l
     audio_chunks = [b'audio']
     audio.process_audio('sid', fake_socketio, fake_db, recording_state, audio_chunks, logger=mock_logger)
     # Should complete without raising, even though os.unlink fails
-    assert recording_state['status'] == 'complete' 
\ No newline at end of file
+    assert recording_state['status'] == 'complete'
+
+def test_process_audio_ingests_media_into_blob_store(monkeypatch, mock_config, mock_logger):
+    monkeypatch.setattr(audio, 'save_wav_file', lambda *a, **k: 'file.opus')
+    monkeypatch.setattr(audio.client.audio.transcriptions, 'create', lambda **kwargs: mock.Mock(text='hello'))
+    monkeypatch.setattr(audio, 'generate_video_prompt', lambda *a, **k: 'video prompt')
+    monkeypatch.setattr(audio, 'generate_video', lambda *a, **k: ('video.mp4', 'thumb.png'))
+    monkeypatch.setattr(audio, 'collect_media_metadata', lambda **k: {'video_sha256': 'v' * 64, 'audio_sha256': 'a' * 64})
+    ingest = mock.Mock()
+    monkeypatch.setattr(audio.BlobStore, 'ingest', ingest)
+    audio.process_audio('sid', mock.Mock(), mock.Mock(), {}, [b'audio'], logger=mock_logger)
+    assert ingest.call_args_list == [
+        mock.call('/tmp/video.mp4', 'v' * 64),
+        mock.call('/tmp/file.opus', 'a' * 64),
+    ]
@@ -0,0 +1,78 @@
+import os
+import pytest
+from functions import audio, audio_transcode
+from functions.dream_db import DreamDB, DreamData
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    config = {
+        'RECORDINGS_DIR': str(tmp_path / 'audio'),
+        'MEDIA_BLOBS_DIR': str(tmp_path / 'blobs'),
+        'AUDIO_ARCHIVE_CODEC': 'opus',
+        'AUDIO_ARCHIVE_BITRATE': '32k',
+    }
+    os.makedirs(config['RECORDINGS_DIR'])
+    monkeypatch.setattr(audio, 'get_config', lambda: config)
+    return config
+
+@pytest.fixture
+def dream_db(tmp_path):
+    return DreamDB(db_path=str(tmp_path / 'dreams.db'))
+
+def add_dream(db, config, audio_filename, size=1000):
+    if size is not None:
+        with open(os.path.join(config['RECORDINGS_DIR'], audio_filename), 'wb') as f:
+            f.write(b'\0' * size)
+    return db.save_dream(DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename=audio_filename,
+        video_filename='v.mp4', thumb_filename=''
+    ).model_dump())
+
+def fake_ffmpeg(calls, fail_on=None):
+    def run(args, **kwargs):
+        calls.append((args, kwargs))
+        if fail_on and any(fail_on in arg for arg in args):
+            raise audio_transcode.subprocess.CalledProcessError(1, args, stderr=b'boom\nInvalid data found')
+        dest = [arg for arg in args if arg.endswith('.part')][0]
+        with open(dest, 'wb') as f:
+            f.write(b'\1' * 100)
+    return run
+
+def test_transcode_archive_converts_wav_recordings(dream_db, config, monkeypatch):
+    calls = []
+    monkeypatch.setattr(audio_transcode.subprocess, 'run', fake_ffmpeg(calls))
+    wav_id = add_dream(dream_db, config, 'recording_1.wav')
+    opus_id = add_dream(dream_db, config, 'recording_2.opus', size=100)
+    missing_id = add_dream(dream_db, config, 'recording_3.wav', size=None)
+    report = audio_transcode.transcode_archive(dream_db, config, workers=2)
+    assert report['converted'] == 1
+    assert report['failed'] == 0
+    assert report['bytes_reclaimed'] == 900
+    assert len(calls) == 1
+    args, kwargs = calls[0]
+    assert args[args.index('-acodec') + 1] == 'libopus'
+    assert args[args.index('-threads') + 1] == '1'
+    assert kwargs['preexec_fn'] is not None
+    dream = dream_db.get_dream(wav_id)
+    assert dream['audio_filename'] == 'recording_1.opus'
+    assert dream['audio_bytes'] == 100
+    assert sorted(os.listdir(config['RECORDINGS_DIR'])) == ['recording_1.opus', 'recording_2.opus']
+    assert dream_db.get_dream(opus_id)['audio_filename'] == 'recording_2.opus'
+    assert dream_db.get_dream(missing_id)['audio_filename'] == 'recording_3.wav'
+    assert audio_transcode.transcode_status['running'] is False
+    assert audio_transcode.transcode_status['bytes_reclaimed'] == 900
+
+def test_transcode_failure_keeps_wav(dream_db, config, monkeypatch):
+    monkeypatch.setattr(audio_transcode.subprocess, 'run', fake_ffmpeg([], fail_on='recording_1'))
+    dream_id = add_dream(dream_db, config, 'recording_1.wav')
+    report = audio_transcode.transcode_archive(dream_db, config)
+    assert report['failed'] == 1
+    assert report['converted'] == 0
+    assert dream_db.get_dream(dream_id)['audio_filename'] == 'recording_1.wav'
+    assert os.listdir(config['RECORDINGS_DIR']) == ['recording_1.wav']
+
+def test_transcode_to_wav_is_a_no_op(dream_db, config, monkeypatch):
+    monkeypatch.setattr(audio_transcode.subprocess, 'run', lambda *a, **k: pytest.fail('ffmpeg should not run'))
+    add_dream(dream_db, config, 'recording_1.wav')
+    config['AUDIO_ARCHIVE_CODEC'] = 'wav'
+    assert audio_transcode.transcode_archive(dream_db, config)['converted'] == 0
@@ -0,0 +1,122 @@
+import os
+import json
+import pytest
+import ffmpeg
+from functions import backgrounds
+from functions.backgrounds import (
+    build_backgrounds, load_manifest, background_urls, total_background_images, background_schedule, background_index
+)
+
+@pytest.fixture
+def dirs(tmp_path):
+    source_dir = tmp_path / 'background'
+    source_dir.mkdir()
+    for i in (0, 1, 2, 10):
+        (source_dir / f'{i}.jpg').write_bytes(f'jpeg-{i}'.encode())
+    (source_dir / 'notes.txt').write_text('not an image')
+    return str(source_dir), str(tmp_path / 'dist')
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """Record ffmpeg invocations and 'encode' by tagging the source bytes with the output options."""
+    calls = []
+    def run(stream, **kwargs):
+        args = ffmpeg.compile(stream)
+        calls.append(args)
+        with open(args[args.index('-i') + 1], 'rb') as f:
+            data = f.read()
+        with open(stream.node.kwargs['filename'], 'wb') as f:
+            f.write(data + ' '.join(args[3:-1]).encode())
+    monkeypatch.setattr(backgrounds.ffmpeg, 'run', run)
+    return calls
+
+def test_build_writes_hashed_images_and_manifest(dirs, fake_ffmpeg):
+    source_dir, dist_dir = dirs
+    manifest = build_backgrounds(source_dir, dist_dir, width=1280, height=400, workers=2)
+    assert [image['source'] for image in manifest['images']] == ['0.jpg', '1.jpg', '2.jpg', '10.jpg']
+    assert manifest['count'] == 4
+    for image in manifest['images']:
+        path = os.path.join(dist_dir, image['file'])
+        assert backgrounds.HASHED_NAME_RE.match(image['file'])
+        assert image['file'].split('.')[1] == image['sha256'][:12]
+        assert os.path.getsize(path) == image['bytes']
+    assert manifest['total_bytes'] == sum(image['bytes'] for image in manifest['images'])
+    assert '[0]scale=1280:400:force_original_aspect_ratio=increase[s0];[s0]crop=1280:400[s1]' in fake_ffmpeg[0]
+    with open(os.path.join(dist_dir, 'manifest.json')) as f:
+        assert json.load(f) == manifest
+    # Only the images and the manifest are left behind
+    assert len(os.listdir(dist_dir)) == 5
+
+def test_rebuild_only_encodes_changes(dirs, fake_ffmpeg):
+    source_dir, dist_dir = dirs
+    first = build_backgrounds(source_dir, dist_dir)
+    assert build_backgrounds(source_dir, dist_dir)['images'] == first['images']
+    assert len(fake_ffmpeg) == 4
+    with open(os.path.join(source_dir, '1.jpg'), 'wb') as f:
+        f.write(b'a new sunrise')
+    second = build_backgrounds(source_dir, dist_dir)
+    assert len(fake_ffmpeg) == 5
+    assert second['images'][1]['file'] != first['images'][1]['file']
+    assert not os.path.exists(os.path.join(dist_dir, first['images'][1]['file']))
+    # New settings re-encode everything
+    third = build_backgrounds(source_dir, dist_dir, fmt='avif', quality=50)
+    assert len(fake_ffmpeg) == 9
+    assert all(image['file'].endswith('.avif') for image in third['images'])
+    assert '-crf' in fake_ffmpeg[-1] and fake_ffmpeg[-1][fake_ffmpeg[-1].index('-crf') + 1] == '32'
+    assert sorted(os.listdir(dist_dir)) == sorted([image['file'] for image in third['images']] + ['manifest.json'])
+
+def test_build_rejects_bad_input(dirs, tmp_path, fake_ffmpeg):
+    source_dir, dist_dir = dirs
+    with pytest.raises(ValueError):
+        build_backgrounds(source_dir, dist_dir, fmt='gif')
+    with pytest.raises(FileNotFoundError):
+        build_backgrounds(str(tmp_path / 'empty'), dist_dir)
+
+def test_count_and_urls_come_from_manifest(dirs, fake_ffmpeg):
+    source_dir, dist_dir = dirs
+    assert load_manifest(dist_dir) is None
+    assert total_background_images(dist_dir, source_dir) == 4
+    assert background_urls(dist_dir, source_dir)[3] == '/static/images/background/10.jpg'
+    manifest = build_backgrounds(source_dir, dist_dir)
+    assert total_background_images(dist_dir, source_dir) == 4
+    assert background_urls(dist_dir, source_dir) == ['/backgrounds/' + image['file'] for image in manifest['images']]
+    os.remove(os.path.join(source_dir, '10.jpg'))
+    build_backgrounds(source_dir, dist_dir)
+    assert total_background_images(dist_dir, source_dir) == 3
+
+def urls(total):
+    return [f'/backgrounds/{i}.webp' for i in range(total)]
+
+def test_background_index_spreads_the_day():
+    assert background_index(0, 1119) == 0
+    assert background_index(1, 1119) == 0
+    assert background_index(2, 1119) == 1
+    assert background_index(1439, 1119) == 1118
+    assert background_index(1439, 3000) == 2997
+
+def test_schedule_lists_upcoming_changes():
+    day = 86400 * 20000
+    # 30 seconds into minute 1: image 0 shows until minute 2
+    schedule = background_schedule(urls(1119), count=3, now=day + 90, tz_offset=0)
+    assert schedule['total'] == 1119
+    assert schedule['now'] == (day + 90) * 1000
+    assert schedule['current'] == {'index': 0, 'url': '/backgrounds/0.webp'}
+    assert schedule['next'] == [
+        {'index': 1, 'url': '/backgrounds/1.webp', 'at': (day + 120) * 1000},
+        {'index': 2, 'url': '/backgrounds/2.webp', 'at': (day + 180) * 1000},
+        {'index': 3, 'url': '/backgrounds/3.webp', 'at': (day + 240) * 1000},
+    ]
+    # Every entry is a different image from the one before it, and the list wraps past midnight
+    late = background_schedule(urls(1119), count=2, now=day + 86400 - 61, tz_offset=0)
+    assert late['current']['index'] == 1117
+    assert [entry['index'] for entry in late['next']] == [1118, 0]
+    assert late['next'][1]['at'] == (day + 86400) * 1000
+
+def test_schedule_follows_the_display_timezone():
+    # UTC+1 (getTimezoneOffset() == -60): at 00:00 UTC the display shows 01:00
+    schedule = background_schedule(urls(1440), count=1, now=0, tz_offset=-60)
+    assert schedule['current']['index'] == 60
+    assert schedule['next'][0] == {'index': 61, 'url': '/backgrounds/61.webp', 'at': 60 * 1000}
+
+def test_schedule_without_images():
+    assert background_schedule([], now=0) == {'total': 0, 'now': 0, 'current': None, 'next': []}
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import pytest
+from functions.blob_store import BlobStore
+from functions.dream_db import DreamDB, DreamData
+from functions.media_info import file_sha256
+
+@pytest.fixture
+def config(tmp_path):
+    config = {
+        'VIDEOS_DIR': str(tmp_path / 'video'),
+        'THUMBS_DIR': str(tmp_path / 'thumbs'),
+        'RECORDINGS_DIR': str(tmp_path / 'audio'),
+        'MEDIA_BLOBS_DIR': str(tmp_path / 'blobs'),
+    }
+    for key in ('VIDEOS_DIR', 'THUMBS_DIR', 'RECORDINGS_DIR'):
+        os.makedirs(config[key])
+    return config
+
+@pytest.fixture
+def dream_db(tmp_path):
+    return DreamDB(db_path=str(tmp_path / 'dreams.db'))
+
+def write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+def save(db, video_filename, video_sha256):
+    return db.save_dream(DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename='',
+        video_filename=video_filename, video_sha256=video_sha256
+    ).model_dump())
+
+def test_ingest_stores_sharded_blob(dream_db, config):
+    path = write(os.path.join(config['VIDEOS_DIR'], 'a.mp4'), b'video')
+    store = BlobStore(dream_db, config)
+    sha256 = store.ingest(path)
+    assert sha256 == file_sha256(path)
+    blob_path = store.path_for(sha256)
+    assert blob_path == os.path.join(config['MEDIA_BLOBS_DIR'], sha256[:2], sha256[2:4], sha256)
+    assert os.path.samefile(path, blob_path)
+    assert dream_db.get_blob_refcount(sha256) == 0
+
+def test_ingest_deduplicates_identical_files(dream_db, config):
+    first = write(os.path.join(config['VIDEOS_DIR'], 'a.mp4'), b'same')
+    second = write(os.path.join(config['VIDEOS_DIR'], 'b.mp4'), b'same')
+    store = BlobStore(dream_db, config)
+    assert store.ingest(first) == store.ingest(second)
+    assert os.path.samefile(first, second)
+    assert os.stat(first).st_nlink == 3
+
+def test_refcounts_follow_dream_rows(dream_db, config):
+    path = write(os.path.join(config['VIDEOS_DIR'], 'a.mp4'), b'video')
+    store = BlobStore(dream_db, config)
+    sha256 = store.ingest(path)
+    first = save(dream_db, 'a.mp4', sha256)
+    second = save(dream_db, 'a.mp4', sha256)
+    assert dream_db.get_blob_refcount(sha256) == 2
+    dream_db.delete_dream(first)
+    assert store.release(sha256) == 0
+    assert store.has(sha256)
+    dream_db.update_dream(second, {'video_sha256': None})
+    assert dream_db.get_blob_refcount(sha256) == 0
+    assert store.release(sha256) == 5
+    assert not store.has(sha256)
+    assert dream_db.get_blob_refcount(sha256) is None
+
+def test_collect_garbage_respects_grace_period(dream_db, config):
+    sha256 = BlobStore(dream_db, config).ingest(write(os.path.join(config['VIDEOS_DIR'], 'a.mp4'), b'orphan'))
+    store = BlobStore(dream_db, config)
+    assert store.collect_garbage() == 0
+    assert store.has(sha256)
+    assert store.collect_garbage(grace_seconds=0) == 6
+    assert not store.has(sha256)
+
+def test_url_for_prefers_blob(dream_db, config):
+    store = BlobStore(dream_db, config)
+    path = write(os.path.join(config['VIDEOS_DIR'], 'a.MP4'), b'video')
+    sha256 = file_sha256(path)
+    dream = {'video_filename': 'a.MP4', 'video_sha256': sha256, 'audio_filename': ''}
+    assert store.url_for(dream, 'video') == '/media/video/a.MP4'
+    store.ingest(path, sha256)
+    assert store.url_for(dream, 'video') == f'/media/blobs/{sha256}.mp4'
+    assert store.url_for(dream, 'audio') == ''
+    with pytest.raises(ValueError):
+        store.url_for(dream, 'poster')
+
+def test_path_for_rejects_non_hashes(dream_db, config):
+    with pytest.raises(ValueError):
+        BlobStore(dream_db, config).path_for('../../etc/passwd')
+
+def test_migration_counts_existing_references(tmp_path):
+    from functions.dream_db import MIGRATIONS
+    db_path = str(tmp_path / 'dreams.db')
+    sha256 = 'ab' * 32
+    # A library at schema version 4, before blobs were counted
+    with sqlite3.connect(db_path) as conn:
+        for migration in MIGRATIONS[:4]:
+            migration.apply(conn)
+        conn.execute('PRAGMA user_version = 4')
+        for _ in range(2):
+            conn.execute(
+                "INSERT INTO dreams (user_prompt, generated_prompt, audio_filename, video_filename, video_sha256, thumb_sha256) "
+                "VALUES ('u', 'g', '', 'v.mp4', ?, ?)", (sha256, sha256)
+            )
+    db = DreamDB(db_path=db_path)
+    assert db.get_blob_refcount(sha256) == 4
+
+def test_remote_backend_uploads_and_deletes(dream_db, config):
+    from unittest import mock
+    backend = mock.Mock(is_local=False)
+    backend.stat.return_value = None
+    store = BlobStore(dream_db, config, backend=backend)
+    path = write(os.path.join(config['VIDEOS_DIR'], 'a.mp4'), b'video')
+    sha256 = store.ingest(path)
+    key = f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+    backend.put_file.assert_called_once_with(key, path, 'video/mp4')
+    assert store.has(sha256)
+    assert not store.has('cd' * 32)
+    # Already uploaded: no second upload
+    backend.stat.return_value = {'size': 5, 'etag': None}
+    store.ingest(path, sha256)
+    assert backend.put_file.call_count == 1
+    backend.delete.return_value = True
+    assert store.release(sha256) == 5
+    backend.delete.assert_called_once_with(key)
+    backend.url.return_value = 'https://s3.example/blob?sig'
+    assert store.presigned_url(sha256, 'video/mp4') == 'https://s3.example/blob?sig'
@@ -0,0 +1,106 @@
+import os
+import json
+import pytest
+from functions import config_loader
+from functions.config_loader import ConfigSnapshot, build_config, coerce_option
+
+TEMPLATE = [
+    {'name': 'PORT', 'default': 5000, 'type': 'integer', 'min': 1, 'max': 65535},
+    {'name': 'GPT_TEMPERATURE', 'default': 0.7, 'type': 'float', 'min': 0, 'max': 2},
+    {'name': 'LUMA_EXTEND', 'default': False, 'type': 'boolean'},
+    {'name': 'LOG_LEVEL', 'default': 'INFO', 'type': 'string', 'options': ['DEBUG', 'INFO']},
+    {'name': 'LUMA_API_URL', 'default': 'https://api.example.com', 'type': 'url'},
+]
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """config.json and .env in a scratch directory, with the loader's state restored afterwards."""
+    config_path = tmp_path / 'config.json'
+    env_path = tmp_path / '.env'
+    config_path.write_text(json.dumps({'PORT': 5000, 'LOG_LEVEL': 'INFO'}))
+    env_path.write_text('OPENAI_API_KEY=first\n')
+    monkeypatch.setattr(config_loader, 'CONFIG_PATH', str(config_path))
+    monkeypatch.setattr(config_loader, 'find_dotenv', lambda: str(env_path))
+    monkeypatch.setattr(config_loader, 'load_template', lambda: TEMPLATE)
+    monkeypatch.setattr(config_loader, '_config', None)
+    monkeypatch.setattr(config_loader, '_dotenv_seen', {})
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    return config_path, env_path
+
+def touch_later(path):
+    """Move the file's mtime forward, so a rewrite within the same clock tick still counts as an edit."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_coerce_option_types():
+    assert coerce_option(TEMPLATE[0], '8080') == 8080
+    assert coerce_option(TEMPLATE[0], 8080.0) == 8080
+    assert coerce_option(TEMPLATE[1], '1.5') == 1.5
+    assert coerce_option(TEMPLATE[2], 'yes') is True
+    assert coerce_option(TEMPLATE[2], 'false') is False
+    assert coerce_option(TEMPLATE[4], '') == ''
+
+@pytest.mark.parametrize('spec, value', [
+    (TEMPLATE[0], 0),
+    (TEMPLATE[0], 70000),
+    (TEMPLATE[0], 1.5),
+    (TEMPLATE[0], 'eighty'),
+    (TEMPLATE[0], True),
+    (TEMPLATE[1], 2.5),
+    (TEMPLATE[2], 'maybe'),
+    (TEMPLATE[3], 'TRACE'),
+    (TEMPLATE[4], 'ftp://example.com'),
+])
+def test_coerce_option_rejects(spec, value):
+    with pytest.raises(ValueError):
+        coerce_option(spec, value)
+
+def test_build_config_falls_back_to_defaults():
+    config = build_config({'PORT': '80', 'GPT_TEMPERATURE': 9, 'LOG_LEVEL': 'DEBUG', 'EXTRA': [1]}, TEMPLATE)
+    assert config['PORT'] == 80
+    assert config['GPT_TEMPERATURE'] == 0.7
+    assert config['LOG_LEVEL'] == 'DEBUG'
+    assert config['LUMA_EXTEND'] is False
+    # Options the template does not know are kept as they are
+    assert config['EXTRA'] == [1]
+    assert [name for name, _ in config.errors] == ['GPT_TEMPERATURE']
+
+def test_snapshot_is_read_only():
+    config = ConfigSnapshot({'PORT': 5000}, version=(1, 2))
+    for change in (lambda: config.__setitem__('PORT', 1), lambda: config.update(PORT=1),
+                   lambda: config.pop('PORT'), lambda: config.clear()):
+        with pytest.raises(TypeError):
+            change()
+    changed = config.replace(PORT=80)
+    assert changed['PORT'] == 80 and changed.version == (1, 2)
+    assert config['PORT'] == 5000
+
+def test_reload_reports_only_changed_options(sources):
+    config_path, _ = sources
+    first = config_loader.get_config()
+    assert config_loader.reload_config() == set()
+    config_path.write_text(json.dumps({'PORT': '5001', 'LOG_LEVEL': 'INFO'}))
+    touch_later(config_path)
+    assert config_loader.reload_config() == {'PORT'}
+    assert config_loader.get_config()['PORT'] == 5001
+    assert config_loader.config_version() != first.version
+    # The snapshot handed out earlier is unchanged
+    assert first['PORT'] == 5000
+
+def test_reload_keeps_snapshot_on_unreadable_file(sources):
+    config_path, _ = sources
+    first = config_loader.get_config()
+    config_path.write_text('{"PORT": 50')
+    assert config_loader.reload_config() == set()
+    assert config_loader.get_config() is first
+
+def test_reload_picks_up_dotenv_edits(sources):
+    _, env_path = sources
+    assert config_loader.get_config()['OPENAI_API_KEY'] == 'first'
+    env_path.write_text('OPENAI_API_KEY=second\n')
+    assert config_loader.reload_config() == {'OPENAI_API_KEY'}
+    assert config_loader.get_config()['OPENAI_API_KEY'] == 'second'
+
+def test_environment_wins_over_dotenv_at_first_load(sources, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'from-environment')
+    assert config_loader.get_config()['OPENAI_API_KEY'] == 'from-environment'
@@ -1,7 +1,8 @@
 import pytest
 import tempfile
 import os
-from functions.dream_db import DreamDB, DreamData
+import sqlite3
+from functions.dream_db import DreamDB, DreamData, encode_cursor, decode_cursor
 
 def test_get_all_dreams(mock_dream_db):
     mock_dream_db.get_all_dreams.return_value = [
@@ -119,4 +120,180 @@ def test_update_dream_outer_exception(dream_db, caplog):
     with caplog.at_level('ERROR'):
         with pytest.raises(RuntimeError):
             dream_db.update_dream(dream_id, BadUpdates())
-    assert "Error updating dream" in caplog.text 
\ No newline at end of file
+    assert "Error updating dream" in caplog.text
+
+def test_migrations_set_user_version(dream_db):
+    from functions.dream_db import MIGRATIONS
+    assert dream_db.get_schema_version() == MIGRATIONS[-1].version
+    with sqlite3.connect(dream_db.db_path) as conn:
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(dreams)")}
+    assert 'idx_dreams_created_at' in indexes
+
+def test_migrations_upgrade_legacy_database(temp_db_path):
+    # A database created before migrations existed: table present, user_version 0
+    with sqlite3.connect(temp_db_path) as conn:
+        conn.execute('''
+            CREATE TABLE dreams (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_prompt TEXT NOT NULL,
+                generated_prompt TEXT NOT NULL,
+                audio_filename TEXT NOT NULL,
+                video_filename TEXT NOT NULL,
+                thumb_filename TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT
+            )
+        ''')
+        conn.execute("INSERT INTO dreams (user_prompt, generated_prompt, audio_filename, video_filename) VALUES ('u', 'g', 'a', 'v')")
+    db = DreamDB(db_path=temp_db_path)
+    assert db.get_schema_version() > 0
+    assert [d['video_filename'] for d in db.get_all_dreams()] == ['v']
+    # Re-opening is a no-op
+    assert db._migrate() == db.get_schema_version()
+
+def test_failed_migration_rolls_back(dream_db, monkeypatch):
+    from functions import dream_db as dream_db_module
+    version = dream_db.get_schema_version()
+    def create_then_fail(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError('boom')
+    monkeypatch.setattr(dream_db_module, 'MIGRATIONS', dream_db_module.MIGRATIONS + [
+        dream_db_module.Migration(version + 1, 'broken', create_then_fail),
+    ])
+    with pytest.raises(RuntimeError):
+        dream_db._migrate()
+    assert dream_db.get_schema_version() == version
+    with sqlite3.connect(dream_db.db_path) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name='half_done'").fetchone() is None
+
+def test_destructive_migration_backs_up_first(dream_db, monkeypatch):
+    from functions import dream_db as dream_db_module
+    version = dream_db.get_schema_version()
+    monkeypatch.setattr(dream_db_module, 'MIGRATIONS', dream_db_module.MIGRATIONS + [
+        dream_db_module.Migration(version + 1, 'drop created_at index', lambda conn: conn.execute("DROP INDEX IF EXISTS idx_dreams_created_at"), destructive=True),
+    ])
+    backups = []
+    original = dream_db._backup_before_migration
+    monkeypatch.setattr(dream_db, '_backup_before_migration', lambda v: backups.append(original(v)))
+    dream_db._migrate()
+    assert len(backups) == 1
+    try:
+        with sqlite3.connect(backups[0]) as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == version
+    finally:
+        os.remove(backups[0])
+    assert dream_db.get_schema_version() == version + 1
+
+def test_save_dream_with_media_metadata(dream_db):
+    data = DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename='a', video_filename='v',
+        video_width=1280, video_height=544, video_duration=5.0, video_bytes=1024,
+        video_sha256='ab' * 32, stage_timings={'transcribe': 1.5}
+    ).model_dump()
+    dream_id = dream_db.save_dream(data)
+    dream = dream_db.get_dream(dream_id)
+    assert dream['video_width'] == 1280
+    assert dream['video_duration'] == 5.0
+    assert dream['stage_timings'] == {'transcribe': 1.5}
+    assert dream['audio_bytes'] is None
+    assert dream_id not in [d['id'] for d in dream_db.get_dreams_missing_metadata()]
+
+def test_library_version_follows_changes_but_not_playback(dream_db):
+    version = dream_db.get_library_version()
+    dream_id = dream_db.save_dream(DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename='a', video_filename='v'
+    ).model_dump())
+    assert dream_db.get_library_version() > version
+    version = dream_db.get_library_version()
+    dream_db.mark_played(dream_id)
+    assert dream_db.get_library_version() == version
+    dream_db.update_dream(dream_id, {'status': 'failed'})
+    assert dream_db.get_library_version() > version
+    version = dream_db.get_library_version()
+    dream_db.delete_dream(dream_id)
+    assert dream_db.get_library_version() > version
+
+def test_get_dreams_page_walks_newest_first(dream_db):
+    for i in range(7):
+        dream_id = dream_db.save_dream(DreamData(
+            user_prompt=f'u{i}', generated_prompt='g', audio_filename='a', video_filename=f'page{i}.mp4'
+        ).model_dump())
+        # Several dreams share a timestamp; the id breaks the tie
+        dream_db.update_dream(dream_id, {'created_at': f'2025-01-0{1 + i // 3} 00:00:00'})
+    expected = [d['id'] for d in sorted(dream_db.get_all_dreams(), key=lambda d: (d['created_at'], d['id']), reverse=True)]
+    seen = []
+    before = None
+    while True:
+        page = dream_db.get_dreams_page(before, 3)
+        seen.extend(d['id'] for d in page)
+        if len(page) < 3:
+            break
+        before = decode_cursor(encode_cursor(page[-1]))
+    assert seen == expected
+
+def test_decode_cursor_rejects_garbage():
+    assert decode_cursor('') is None
+    assert decode_cursor(encode_cursor({'created_at': '2025-01-01 00:00:00', 'id': 4})) == ('2025-01-01 00:00:00', 4)
+    for bad in ('not-a-cursor', 'W10', encode_cursor({'created_at': 1, 'id': 'x'})):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+def test_get_dreams_missing_metadata(dream_db):
+    data = DreamData(user_prompt='u', generated_prompt='g', audio_filename='a', video_filename='v').model_dump()
+    first = dream_db.save_dream(data)
+    second = dream_db.save_dream(data)
+    before_first = first - 1
+    assert [d['id'] for d in dream_db.get_dreams_missing_metadata(after_id=before_first)] == [first, second]
+    assert [d['id'] for d in dream_db.get_dreams_missing_metadata(after_id=first)] == [second]
+    assert len(dream_db.get_dreams_missing_metadata(after_id=before_first, limit=1)) == 1
+    dream_db.update_dream(first, {'video_bytes': 10, 'stage_timings': {'luma': 2.0}})
+    assert dream_db.get_dream(first)['stage_timings'] == {'luma': 2.0}
+    assert [d['id'] for d in dream_db.get_dreams_missing_metadata(after_id=before_first)] == [second]
+
+def test_audio_ingest_during_write_burst(temp_db_path, monkeypatch):
+    import gevent
+    from gevent import monkey
+    import dream_recorder
+    db = DreamDB(db_path=temp_db_path)
+    get_ident = monkey.get_original('threading', 'get_ident')
+    hub_thread = get_ident()
+    # Simulate a slow SD-card fsync: the commit blocks its OS thread for real
+    blocking_sleep = monkey.get_original('time', 'sleep')
+    lock = monkey.get_original('threading', 'Lock')()
+    commits = {'threads': [], 'in_flight': 0}
+    real_connect = sqlite3.connect
+    class SlowCommitConnection(sqlite3.Connection):
+        def commit(self):
+            with lock:
+                commits['threads'].append(get_ident())
+                commits['in_flight'] += 1
+            try:
+                blocking_sleep(0.1)
+                super().commit()
+            finally:
+                with lock:
+                    commits['in_flight'] -= 1
+    monkeypatch.setattr(sqlite3, 'connect', lambda *a, **k: real_connect(*a, factory=SlowCommitConnection, **k))
+    data = DreamData(user_prompt='u', generated_prompt='g', audio_filename='a', video_filename='v').model_dump()
+    client = dream_recorder.socketio.test_client(dream_recorder.app)
+    try:
+        client.emit('start_recording')
+        chunks_before = len(dream_recorder.audio_chunks)
+        writers = [gevent.spawn(db.save_dream, data) for _ in range(20)]
+        sent = during_commit = 0
+        while not all(w.ready() for w in writers):
+            client.emit('stream_recording', {'data': [0] * 1024})
+            sent += 1
+            with lock:
+                during_commit += commits['in_flight'] > 0
+            gevent.sleep(0.005)
+        gevent.joinall(writers, raise_error=True)
+    finally:
+        dream_recorder.recording_state['is_recording'] = False
+        client.disconnect()
+    assert len({w.value for w in writers}) == 20
+    assert len(dream_recorder.audio_chunks) - chunks_before == sent
+    # No commit held the hub's thread, so audio kept arriving while they were blocked
+    assert len(commits['threads']) == 20
+    assert hub_thread not in commits['threads']
+    assert during_commit > 0
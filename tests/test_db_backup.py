@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import pytest
+from functions import db_backup
+from functions.dream_db import DreamDB, DreamData
+
+@pytest.fixture
+def backup_config(tmp_path):
+    return {
+        'DB_BACKUP_DIR': str(tmp_path / 'backups'),
+        'DB_BACKUP_RETENTION': 2,
+        'DB_BACKUP_PAGES_PER_STEP': 1,
+        'DB_BACKUP_STEP_SLEEP': 0,
+    }
+
+@pytest.fixture
+def dream_db(tmp_path):
+    db = DreamDB(db_path=str(tmp_path / 'dreams.db'))
+    data = DreamData(user_prompt='u' * 5000, generated_prompt='g', audio_filename='a', video_filename='v').model_dump()
+    for _ in range(20):
+        db.save_dream(data)
+    return db
+
+def test_backup_to_copies_in_steps(dream_db, tmp_path, monkeypatch):
+    from functions import dream_db as dream_db_module
+    sleeps = []
+    monkeypatch.setattr(dream_db_module, '_blocking_sleep', lambda s: sleeps.append(s))
+    dest = str(tmp_path / 'copy.db')
+    pages = dream_db.backup_to(dest, pages_per_step=2, step_sleep=0.01)
+    assert pages > 2
+    assert len(sleeps) == (pages + 1) // 2 - 1
+    with sqlite3.connect(dest) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM dreams').fetchone()[0] == len(dream_db.get_all_dreams())
+
+def test_run_backup_records_status_and_rotates(dream_db, backup_config, monkeypatch):
+    from datetime import datetime
+    calls = []
+    class FakeDatetime:
+        @staticmethod
+        def now():
+            calls.append(1)
+            return datetime(2025, 1, len(calls))
+    monkeypatch.setattr(db_backup, 'datetime', FakeDatetime)
+    for _ in range(3):
+        assert db_backup.run_backup(dream_db, backup_config)
+    backups = db_backup.list_backups(backup_config['DB_BACKUP_DIR'])
+    assert [os.path.basename(p) for p in backups] == ['dreams-20250102_000000.db', 'dreams-20250103_000000.db']
+    assert db_backup.backup_status['ok'] is True
+    assert db_backup.backup_status['path'] == backups[-1]
+    assert db_backup.backup_status['backups_kept'] == 2
+    assert not any(name.endswith('.part') for name in os.listdir(backup_config['DB_BACKUP_DIR']))
+
+def test_run_backup_failure_is_reported(dream_db, backup_config, monkeypatch):
+    def fail(*a, **k):
+        raise sqlite3.DatabaseError('Backup failed integrity check: corrupt')
+    monkeypatch.setattr(dream_db, 'backup_to', fail)
+    assert db_backup.run_backup(dream_db, backup_config) is None
+    assert db_backup.backup_status['ok'] is False
+    assert 'integrity check' in db_backup.backup_status['error']
+
+def test_seconds_until_next_backup(tmp_path):
+    backup_dir = str(tmp_path)
+    assert db_backup.seconds_until_next_backup(backup_dir, 3600) == 0
+    path = tmp_path / 'dreams-20250101_000000.db'
+    path.write_bytes(b'')
+    os.utime(path, (1000, 1000))
+    assert db_backup.seconds_until_next_backup(backup_dir, 3600, now=1600) == 3000
+    assert db_backup.seconds_until_next_backup(backup_dir, 3600, now=5000) == 0
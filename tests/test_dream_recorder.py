@@ -4,50 +4,31 @@ import types
 import os
 import subprocess
 
-def test_sample_dreams_initialization_success_and_failure(monkeypatch):
-    # Patch os.path.exists to always return False (simulate missing DB)
-    monkeypatch.setattr('os.path.exists', lambda path: False)
-    # Patch subprocess.run to simulate success and failure
-    class Result:
-        def __init__(self, returncode, stderr=''):
-            self.returncode = returncode
-            self.stderr = stderr
-    calls = []
-    def fake_run(cmd, capture_output, text):
-        calls.append(cmd)
-        if len(calls) == 1:
-            return Result(0)
-        else:
-            return Result(1, 'fail')
-    monkeypatch.setattr('subprocess.run', fake_run)
-    # Patch print to capture output
-    printed = []
-    monkeypatch.setattr('builtins.print', lambda *a, **kw: printed.append(a))
-    # Patch os.path.dirname to return current dir
-    monkeypatch.setattr('os.path.dirname', lambda path: '.')
-    # Patch __file__
-    monkeypatch.setattr(sys.modules['dream_recorder'], '__file__', 'dream_recorder.py')
-    # Import and run the block
-    import importlib
+def test_sample_dreams_initialization_success(monkeypatch, mocker, mock_dream_db):
     import dream_recorder
-    importlib.reload(dream_recorder)
-    # Call the function twice: first for success, second for failure
+    mock_dream_db.get_state.return_value = None
+    init = mocker.patch('dream_recorder.init_sample_dreams', return_value=4)
+    mock_logger = mocker.patch('dream_recorder.logger')
     dream_recorder.init_sample_dreams_if_missing()
+    init.assert_called_once_with(dream_recorder.dream_db, dream_recorder.blob_store)
+    mock_logger.info.assert_called_with('Sample dreams initialized (4 added).')
+
+def test_sample_dreams_are_installed_once(mocker, mock_dream_db):
+    import dream_recorder
+    mock_dream_db.get_state.return_value = '1'
+    init = mocker.patch('dream_recorder.init_sample_dreams')
     dream_recorder.init_sample_dreams_if_missing()
-    # The first call should print success, the second should print warning
-    assert any('Sample dreams initialized.' in str(x) for x in printed)
-    assert any('Failed to initialize sample dreams.' in str(x) for x in printed)
+    mock_dream_db.get_state.assert_called_once_with('sample_dreams_installed')
+    init.assert_not_called()
 
-def test_sample_dreams_initialization_exception(monkeypatch):
+def test_sample_dreams_initialization_exception(monkeypatch, mocker, mock_dream_db):
     import dream_recorder
-    # Patch subprocess.run to raise an exception
-    monkeypatch.setattr('subprocess.run', lambda *a, **kw: (_ for _ in ()).throw(Exception('fail')))
-    # Patch print to capture output
-    printed = []
-    monkeypatch.setattr('builtins.print', lambda *a, **kw: printed.append(a))
-    # Call the function to trigger the exception branch
+    mock_dream_db.get_state.return_value = None
+    mocker.patch('dream_recorder.init_sample_dreams', side_effect=OSError('fail'))
+    mock_logger = mocker.patch('dream_recorder.logger')
+    # Logged, not raised: the app keeps serving without samples
     dream_recorder.init_sample_dreams_if_missing()
-    assert any('Exception while initializing sample dreams' in str(x) for x in printed)
+    mock_logger.error.assert_called_once_with('Exception while initializing sample dreams: fail')
 
 def test_handle_audio_data_error(monkeypatch, mocker):
     import dream_recorder
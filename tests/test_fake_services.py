@@ -0,0 +1,41 @@
+import requests
+from openai import OpenAI
+from scripts.fake_services import FakeOpenAI, FakeLuma
+from scripts.benchmark_pipeline import split_chunks, summarize
+
+def test_openai_client_talks_to_fake():
+    fake = FakeOpenAI(transcribe_delay=0, chat_delay=0, transcript='a dream', prompt='a video').start()
+    try:
+        client = OpenAI(api_key='bench', base_url=f"{fake.url}/v1")
+        assert client.audio.transcriptions.create(model='whisper-1', file=('a.webm', b'audio')).text == 'a dream'
+        response = client.chat.completions.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'a dream'}])
+        assert response.choices[0].message.content == 'a video'
+        assert fake.requests == {'POST /v1/audio/transcriptions': 1, 'POST /v1/chat/completions': 1}
+    finally:
+        fake.stop()
+
+def test_luma_generation_completes_after_delay(tmp_path):
+    video = tmp_path / 'fixture.mp4'
+    video.write_bytes(b'mp4 data')
+    fake = FakeLuma(str(video), generation_delay=10).start()
+    try:
+        created = requests.post(f"{fake.url}/generations", json={'prompt': 'a video'}).json()
+        status = requests.get(f"{fake.url}/generations/{created['id']}").json()
+        assert status['state'] == 'dreaming'
+        fake.generation_delay = 0
+        status = requests.get(f"{fake.url}/generations/{created['id']}").json()
+        assert status['state'] == 'completed'
+        assert requests.get(status['assets']['video']).content == b'mp4 data'
+        assert requests.get(f"{fake.url}/generations/missing").status_code == 404
+    finally:
+        fake.stop()
+
+def test_split_chunks_like_media_recorder():
+    chunks = split_chunks(b'x' * 1001, 1.0)
+    assert len(chunks) == 10
+    assert b''.join(chunks) == b'x' * 1001
+
+def test_summarize_percentiles():
+    stats = summarize([float(i) for i in range(1, 101)])
+    assert stats['p50'] == 51.0 and stats['p99'] == 100.0 and stats['max'] == 100.0
+    assert stats['mean'] == 50.5
@@ -15,6 +15,7 @@ def mock_config(monkeypatch):
         'GPIO_SINGLE_TAP_ENDPOINT': '/single',
         'GPIO_DOUBLE_TAP_ENDPOINT': '/double',
         'GPIO_STARTUP_DELAY': 0,
+        'GPIO_MODE': 'polling',
     })
 
 @pytest.fixture
@@ -445,6 +446,7 @@ def test_main_keyboardinterrupt_and_exception(monkeypatch, mock_config, mock_gpi
         double_tap_max_interval = 0.3
         debounce_time = 0.01
         sampling_rate = 0.01
+        mode = 'polling'
         startup_delay = 0
         test = False
     fake_parser = mock.Mock()
@@ -502,4 +504,119 @@ def test_start_monitoring_single_tap_timeout(monkeypatch, mock_config, mock_gpio
     ctrl.start_monitoring(single_tap_max=0.2, double_tap_max_interval=0.3)
 
     # After running, single tap callback should be called
-    assert 'x' in single_called 
\ No newline at end of file
+    assert 'x' in single_called 
+
+@pytest.fixture
+def fake_gpio(monkeypatch):
+    from scripts.fake_gpio import FakeGPIO
+    gpio = FakeGPIO()
+    monkeypatch.setitem(sys.modules, 'RPi', mock.Mock(GPIO=gpio))
+    monkeypatch.setitem(sys.modules, 'RPi.GPIO', gpio)
+    yield gpio
+    gpio.cleanup()
+    assert gpio._dispatcher is None
+
+def start_monitor(ctrl, taps):
+    import threading
+    import gpio_service
+    ctrl.register_callback(gpio_service.TouchPattern.SINGLE_TAP, lambda: taps.append('single'))
+    ctrl.register_callback(gpio_service.TouchPattern.DOUBLE_TAP, lambda: taps.append('double'))
+    thread = threading.Thread(target=ctrl.start_monitoring, daemon=True,
+                              kwargs={'single_tap_max': 0.2, 'double_tap_max_interval': 0.15})
+    thread.start()
+    return thread
+
+def wait_for(condition, timeout=2):
+    import time
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+def test_interrupt_mode_detects_taps_without_reading_the_pin_when_idle(mock_config, fake_gpio):
+    import time
+    import gpio_service
+    ctrl = gpio_service.GPIOController(mode='interrupt', debounce_time=0.005)
+    taps = []
+    thread = start_monitor(ctrl, taps)
+    try:
+        # Read once for the starting level, then not again until something happens
+        assert wait_for(lambda: ctrl.last_state is False)
+        reads = fake_gpio.reads
+        time.sleep(0.1)
+        assert fake_gpio.reads == reads
+        fake_gpio.tap(17, 0.02)
+        assert wait_for(lambda: taps == ['single'])
+        fake_gpio.tap(17, 0.02)
+        time.sleep(0.02)
+        fake_gpio.tap(17, 0.02)
+        assert wait_for(lambda: taps == ['single', 'double'])
+    finally:
+        ctrl.stop_monitoring()
+        thread.join(1)
+    assert not thread.is_alive()
+    assert fake_gpio.callbacks == {}
+
+def test_interrupt_mode_rereads_the_pin_after_a_bounce(mock_config, fake_gpio):
+    import time
+    import gpio_service
+    ctrl = gpio_service.GPIOController(mode='interrupt', debounce_time=0.03)
+    taps = []
+    thread = start_monitor(ctrl, taps)
+    try:
+        assert wait_for(lambda: 17 in fake_gpio.callbacks)
+        # Released before the debounce time is up: that edge is dropped, and no other comes
+        fake_gpio.set_level(17, fake_gpio.HIGH)
+        time.sleep(0.01)
+        fake_gpio.set_level(17, fake_gpio.LOW)
+        time.sleep(0.05)
+        assert ctrl.last_state is False
+        assert not ctrl.recheck_pending
+    finally:
+        ctrl.stop_monitoring()
+        thread.join(1)
+
+def test_interrupt_mode_keeps_taps_the_callback_thread_fell_behind_on(mock_config, fake_gpio):
+    import gpio_service
+    # Each callback runs after the tap has ended, when the pin reads low again
+    fake_gpio.callback_delay = 0.05
+    ctrl = gpio_service.GPIOController(mode='interrupt', debounce_time=0.005)
+    taps = []
+    thread = start_monitor(ctrl, taps)
+    try:
+        assert wait_for(lambda: ctrl.last_state is False)
+        fake_gpio.tap(17, 0.01)
+        assert wait_for(lambda: taps == ['single'])
+    finally:
+        ctrl.stop_monitoring()
+        thread.join(1)
+
+def test_interrupt_mode_falls_back_to_polling(mock_config, fake_gpio):
+    import gpio_service
+    fake_gpio.edge_detection = False
+    ctrl = gpio_service.GPIOController(mode='interrupt', debounce_time=0.005, sampling_rate=0.005)
+    taps = []
+    thread = start_monitor(ctrl, taps)
+    try:
+        assert wait_for(lambda: fake_gpio.reads > 3)
+        fake_gpio.tap(17, 0.03)
+        assert wait_for(lambda: taps == ['single'])
+    finally:
+        ctrl.stop_monitoring()
+        thread.join(1)
+
+def test_unknown_mode_is_rejected(mock_config, fake_gpio):
+    import gpio_service
+    with pytest.raises(ValueError, match='Unknown GPIO mode'):
+        gpio_service.GPIOController(mode='sometimes')
+
+def test_benchmark_compares_both_modes(mock_config, fake_gpio, monkeypatch):
+    from scripts import benchmark_gpio
+    monkeypatch.setattr(benchmark_gpio.FakeGPIO, 'install', lambda self: fake_gpio)
+    # No contact bounce: on a busy runner a 1 ms bounce can oversleep past the debounce time and count as a tap
+    results = [benchmark_gpio.run_mode(mode, taps=1, idle_seconds=0.1, double_tap_max_interval=0.2, bounces=0)
+               for mode in ('polling', 'interrupt')]
+    assert [r['missed'] for r in results] == [0, 0]
+    assert results[0]['idle']['reads_per_second'] > 0
+    assert results[1]['idle']['reads_per_second'] == 0
+    assert set(results[1]['latency']) == {'single', 'double'}
@@ -0,0 +1,71 @@
+import gevent
+from gevent import monkey
+from functions.hub_monitor import HubMonitor, LAG_BUCKETS_MS
+
+CONFIG = {'HUB_MONITOR_ENABLED': True, 'HUB_MONITOR_INTERVAL_MS': 10, 'HUB_BLOCK_THRESHOLD_MS': 50}
+
+def test_disabled_monitor_reports_nothing():
+    monitor = HubMonitor({'HUB_MONITOR_ENABLED': False})
+    assert monitor.stats() == {'enabled': False}
+    assert monitor.health() == {'enabled': False, 'status': 'ok'}
+
+def test_lag_histogram():
+    monitor = HubMonitor(CONFIG)
+    for lag in (0.0005, 0.003, 0.003, 0.2, 5.0):
+        monitor.record_lag(lag)
+    lag = monitor.stats()['lag_ms']
+    assert lag['samples'] == 5
+    assert lag['max'] == 5000.0
+    counts = dict(zip(LAG_BUCKETS_MS + ('slower',), lag['histogram']['counts']))
+    assert counts[1] == 1 and counts[5] == 2 and counts[250] == 1 and counts['slower'] == 1
+    assert sum(lag['histogram']['counts']) == 5
+    # The recent window saw a 5 s stall, so the hub is not keeping up
+    assert monitor.health()['status'] == 'degraded'
+
+def blocking_handler(monitor):
+    # Stands in for a synchronous call in a request handler
+    # threading.get_ident is patched to return greenlet ids; the monitor needs the thread's
+    monitor.record_blocked(monkey.get_original('threading', 'get_ident')(), greenlet='handler')
+
+def test_blocked_stack_is_grouped_by_our_code():
+    monitor = HubMonitor(CONFIG)
+    for _ in range(3):
+        blocking_handler(monitor)
+    offenders = monitor.stats()['top_offenders']
+    assert len(offenders) == 1
+    assert offenders[0]['reports'] == 3
+    assert offenders[0]['location'].startswith('tests/test_hub_monitor.py:')
+    assert offenders[0]['location'].endswith('in blocking_handler')
+    assert 'blocking_handler' in offenders[0]['stack']
+    assert monitor.stats()['blocked_reports'] == 3
+
+def test_monitor_catches_a_blocking_greenlet():
+    monitor = HubMonitor(CONFIG)
+    monitor.start()
+    try:
+        def stall():
+            # Hold the hub without yielding, as a synchronous sqlite or ffmpeg call would
+            monkey.get_original('time', 'sleep')(0.4)
+        gevent.sleep(0.05)
+        gevent.spawn(stall).join()
+        gevent.sleep(0.1)
+        stats = monitor.stats()
+    finally:
+        monitor.stop()
+    assert stats['lag_ms']['max'] >= 300
+    assert not gevent.config.monitor_thread
+    assert any(o['location'].endswith('in stall') for o in stats['top_offenders'])
+
+def test_only_the_main_hub_gets_a_monitor_thread():
+    monitor = HubMonitor(CONFIG)
+    monitor.start()
+    try:
+        assert gevent.get_hub().periodic_monitoring_thread is not None
+        assert not gevent.config.monitor_thread
+        # A threadpool worker's hub, started while the monitor runs
+        pool = gevent.get_hub().threadpool
+        worker_monitor = pool.spawn(lambda: gevent.get_hub().periodic_monitoring_thread).get()
+    finally:
+        monitor.stop()
+    assert worker_monitor is None
+    assert gevent.get_hub().periodic_monitoring_thread is None
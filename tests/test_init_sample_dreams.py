@@ -1,47 +1,108 @@
+import os
+import sqlite3
 import pytest
-import sys
-import types
-import builtins
-from unittest import mock
+from functions.blob_store import BlobStore
+from functions.dream_db import DreamDB, DreamData, SAMPLE_DREAMS_INSTALLED
+from functions import sample_dreams
 
 @pytest.fixture
-def patch_sample_dreams(monkeypatch):
-    # Patch DreamDB and DreamData
-    fake_db = mock.Mock()
-    monkeypatch.setattr('scripts.init_sample_dreams.DreamDB', lambda: fake_db)
-    monkeypatch.setattr('scripts.init_sample_dreams.DreamData', mock.Mock(return_value=mock.Mock(model_dump=lambda: {'x': 1})))
-    return fake_db
-
-def test_copies_and_inserts(monkeypatch, patch_sample_dreams):
-    # Patch os.path.exists to always return False (force copy)
-    monkeypatch.setattr('os.path.exists', lambda path: False)
-    # Patch shutil.copy2 to record calls
-    copy_calls = []
-    monkeypatch.setattr('shutil.copy2', lambda src, dst: copy_calls.append((src, dst)))
-    # Patch print to capture output
-    printed = []
-    monkeypatch.setattr(builtins, 'print', lambda *a, **kw: printed.append(a))
-    # Patch get_all_dreams to return empty (force insert)
-    import scripts.init_sample_dreams as mod
-    patch_sample_dreams.get_all_dreams.return_value = []
-    mod.main()
-    # Should copy and insert for all samples
-    assert len(copy_calls) == 8  # 4 videos + 4 thumbs
-    assert any('Inserted sample dream' in str(x) for x in printed)
-
-def test_already_exists(monkeypatch, patch_sample_dreams):
-    # Patch os.path.exists to always return True (no copy)
-    monkeypatch.setattr('os.path.exists', lambda path: True)
-    # Patch shutil.copy2 to record calls
-    monkeypatch.setattr('shutil.copy2', lambda src, dst: None)
-    # Patch print to capture output
-    printed = []
-    monkeypatch.setattr(builtins, 'print', lambda *a, **kw: printed.append(a))
-    # Patch get_all_dreams to return all samples as existing
-    import scripts.init_sample_dreams as mod
-    patch_sample_dreams.get_all_dreams.return_value = [
-        {'video_filename': f'dream_{i}.mp4'} for i in range(1, 5)
-    ]
-    mod.main()
-    # Should print already exists for all samples
-    assert all('already exists' in str(x) for x in printed) 
\ No newline at end of file
+def library(tmp_path, monkeypatch):
+    samples = tmp_path / 'samples'
+    samples.mkdir()
+    for i in range(1, 5):
+        (samples / f'video_{i}.mp4').write_bytes(f'video {i}'.encode())
+        (samples / f'thumb_{i}.png').write_bytes(f'thumb {i}'.encode())
+    monkeypatch.setattr(sample_dreams, 'SAMPLES_DIR', str(samples))
+    config = {
+        'VIDEOS_DIR': str(tmp_path / 'video'),
+        'THUMBS_DIR': str(tmp_path / 'thumbs'),
+        'MEDIA_BLOBS_DIR': str(tmp_path / 'blobs'),
+        'MEDIA_STORAGE_BACKEND': 'local',
+    }
+    db = DreamDB(db_path=str(tmp_path / 'dreams.db'))
+    return db, BlobStore(db, config), config
+
+def test_new_database_is_left_empty_until_installed(library):
+    db, store, config = library
+    assert db.get_all_dreams() == []
+    assert db.get_state(SAMPLE_DREAMS_INSTALLED) is None
+    sample_dreams.init_sample_dreams(db, store, config)
+    assert db.get_state(SAMPLE_DREAMS_INSTALLED) == '1'
+
+def test_existing_library_counts_as_installed(tmp_path):
+    path = str(tmp_path / 'dreams.db')
+    db = DreamDB(db_path=path)
+    db.save_dream(DreamData(user_prompt='u', generated_prompt='g', audio_filename='a', video_filename='v').model_dump())
+    # As it was before library_state existed
+    with sqlite3.connect(path) as conn:
+        conn.execute('DROP TABLE library_state')
+        conn.execute('PRAGMA user_version = 6')
+    assert DreamDB(db_path=path).get_state(SAMPLE_DREAMS_INSTALLED) == '1'
+
+def test_files_are_linked_off_the_hub(library, mocker):
+    from gevent import monkey
+    db, store, config = library
+    get_ident = monkey.get_original('threading', 'get_ident')
+    threads = []
+    link_into = store.link_into
+    def spy(*args, **kwargs):
+        threads.append(get_ident())
+        return link_into(*args, **kwargs)
+    mocker.patch.object(store, 'link_into', side_effect=spy)
+    assert sample_dreams.init_sample_dreams(db, store, config) == 4
+    assert len(threads) == 8
+    assert get_ident() not in threads
+
+def test_links_samples_and_inserts_in_one_batch(library, mocker):
+    db, store, config = library
+    save_dreams = mocker.spy(db, 'save_dreams')
+    save_dream = mocker.spy(db, 'save_dream')
+    assert sample_dreams.init_sample_dreams(db, store, config) == 4
+    save_dreams.assert_called_once()
+    save_dream.assert_not_called()
+    dreams = db.get_all_dreams()
+    assert sorted(d['video_filename'] for d in dreams) == [f'dream_{i}.mp4' for i in range(1, 5)]
+    dream = next(d for d in dreams if d['video_filename'] == 'dream_1.mp4')
+    video = os.path.join(config['VIDEOS_DIR'], 'dream_1.mp4')
+    # Hardlinked to the blob, not copied
+    assert os.path.samefile(video, store.path_for(dream['video_sha256']))
+    assert db.get_blob_refcount(dream['thumb_sha256']) == 1
+
+def test_running_again_adds_nothing(library):
+    db, store, config = library
+    sample_dreams.init_sample_dreams(db, store, config)
+    os.remove(os.path.join(config['THUMBS_DIR'], 'dream_2.png'))
+    assert sample_dreams.init_sample_dreams(db, store, config) == 0
+    assert len(db.get_all_dreams()) == 4
+    # Missing files are put back
+    assert os.path.exists(os.path.join(config['THUMBS_DIR'], 'dream_2.png'))
+
+def test_sample_without_its_video_is_retried(library):
+    db, store, config = library
+    video = os.path.join(sample_dreams.SAMPLES_DIR, 'video_2.mp4')
+    os.rename(video, video + '.bak')
+    assert sample_dreams.init_sample_dreams(db, store, config) == 3
+    assert 'dream_2.mp4' not in {d['video_filename'] for d in db.get_all_dreams()}
+    assert db.get_state(SAMPLE_DREAMS_INSTALLED) is None
+    os.rename(video + '.bak', video)
+    assert sample_dreams.init_sample_dreams(db, store, config) == 1
+    assert db.get_state(SAMPLE_DREAMS_INSTALLED) == '1'
+
+def test_falls_back_to_copying_across_filesystems(library, mocker):
+    db, store, config = library
+    mocker.patch('functions.media_backend.os.link', side_effect=OSError(18, 'Invalid cross-device link'))
+    assert sample_dreams.init_sample_dreams(db, store, config) == 4
+    video = os.path.join(config['VIDEOS_DIR'], 'dream_3.mp4')
+    with open(video, 'rb') as f:
+        assert f.read() == b'video 3'
+    assert os.stat(video).st_nlink == 1
+
+def test_script_uses_the_shared_initializer(mocker, capsys):
+    import scripts.init_sample_dreams as script
+    mocker.patch.object(script, 'DreamDB')
+    mocker.patch.object(script, 'BlobStore')
+    init = mocker.patch.object(script, 'init_sample_dreams', side_effect=[4, 0])
+    script.main()
+    script.main()
+    assert init.call_count == 2
+    assert capsys.readouterr().out.splitlines() == ['Inserted 4 sample dream(s)', 'Sample dreams already exist in DB']
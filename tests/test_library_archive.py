@@ -0,0 +1,135 @@
+import io
+import os
+import tarfile
+import pytest
+from functions.dream_db import DreamDB, DreamData
+from functions.library_archive import iter_export, import_archive
+from functions.media_info import file_sha256
+
+def make_library(tmp_path, name):
+    root = tmp_path / name
+    config = {
+        'VIDEOS_DIR': str(root / 'video'),
+        'THUMBS_DIR': str(root / 'thumbs'),
+        'RECORDINGS_DIR': str(root / 'audio'),
+        'MEDIA_BLOBS_DIR': str(root / 'blobs'),
+    }
+    for directory in config.values():
+        os.makedirs(directory)
+    db = DreamDB(db_path=str(root / 'dreams.db'))
+    return db, config
+
+def add_dream(db, config, n, with_hash=True):
+    files = {'VIDEOS_DIR': f'v{n}.mp4', 'THUMBS_DIR': f't{n}.png', 'RECORDINGS_DIR': f'a{n}.wav'}
+    for key, filename in files.items():
+        with open(os.path.join(config[key], filename), 'wb') as f:
+            f.write(f'{key}-{n}'.encode() * 5000)
+    data = DreamData(
+        user_prompt=f'u{n}', generated_prompt=f'g{n}', audio_filename=files['RECORDINGS_DIR'],
+        video_filename=files['VIDEOS_DIR'], thumb_filename=files['THUMBS_DIR'],
+        stage_timings={'luma': float(n)},
+    ).model_dump()
+    if with_hash:
+        data['video_sha256'] = file_sha256(os.path.join(config['VIDEOS_DIR'], files['VIDEOS_DIR']))
+    return db.save_dream(data)
+
+def export_bytes(db, config, **kwargs):
+    return b''.join(iter_export(db, config, chunk_size=1024, **kwargs))
+
+def test_export_is_a_valid_tar_stream(tmp_path):
+    db, config = make_library(tmp_path, 'src')
+    add_dream(db, config, 1)
+    add_dream(db, config, 2, with_hash=False)
+    data = export_bytes(db, config)
+    assert len(data) % tarfile.RECORDSIZE == 0
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        names = tar.getnames()
+    assert names[0].startswith('dreams/')
+    assert 'video/v1.mp4' in names and 'audio/a2.wav' in names
+    assert names[-1] == 'manifest.json'
+
+def test_export_import_roundtrip(tmp_path):
+    src_db, src_config = make_library(tmp_path, 'src')
+    add_dream(src_db, src_config, 1)
+    add_dream(src_db, src_config, 2)
+    dst_db, dst_config = make_library(tmp_path, 'dst')
+    summary = import_archive(io.BytesIO(export_bytes(src_db, src_config)), dst_db, dst_config, chunk_size=1024)
+    assert summary['dreams'] == 2
+    assert summary['files_written'] == 6
+    assert summary['manifest']['dreams'] == 2
+    dreams = {d['video_filename']: d for d in dst_db.get_all_dreams()}
+    assert dreams['v1.mp4']['user_prompt'] == 'u1'
+    assert dreams['v2.mp4']['stage_timings'] == {'luma': 2.0}
+    for key in ('VIDEOS_DIR', 'THUMBS_DIR', 'RECORDINGS_DIR'):
+        assert sorted(os.listdir(dst_config[key])) == sorted(os.listdir(src_config[key]))
+    # Importing the same archive again writes nothing new
+    summary = import_archive(io.BytesIO(export_bytes(src_db, src_config)), dst_db, dst_config)
+    assert summary['dreams'] == 0
+    assert summary['files_written'] == 0
+    assert summary['files_skipped'] == 6
+
+def test_roundtrip_keeps_every_archived_dream(tmp_path):
+    src_db, src_config = make_library(tmp_path, 'src')
+    for n in range(3):
+        dream_id = add_dream(src_db, src_config, n)
+        # As the storage manager leaves a dream it archived
+        os.remove(os.path.join(src_config['VIDEOS_DIR'], f'v{n}.mp4'))
+        src_db.update_dream(dream_id, {'video_filename': '', 'video_sha256': None})
+    dst_db, dst_config = make_library(tmp_path, 'dst')
+    add_dream(dst_db, dst_config, 9)
+    dst_db.update_dream(1, {'video_filename': '', 'video_sha256': None})
+    summary = import_archive(io.BytesIO(export_bytes(src_db, src_config)), dst_db, dst_config)
+    assert summary['dreams'] == 3
+    assert sorted(d['audio_filename'] for d in dst_db.get_all_dreams()) == ['a0.wav', 'a1.wav', 'a2.wav', 'a9.wav']
+    summary = import_archive(io.BytesIO(export_bytes(src_db, src_config)), dst_db, dst_config)
+    assert summary['dreams'] == 0
+
+def test_export_resumes_by_manifest(tmp_path):
+    src_db, src_config = make_library(tmp_path, 'src')
+    add_dream(src_db, src_config, 1)
+    have = src_db.get_media_hashes()
+    data = export_bytes(src_db, src_config, have_hashes=have)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        names = tar.getnames()
+    assert 'video/v1.mp4' not in names
+    assert 'thumbs/t1.png' in names
+
+def test_import_rejects_corrupt_member(tmp_path):
+    src_db, src_config = make_library(tmp_path, 'src')
+    add_dream(src_db, src_config, 1)
+    data = bytearray(export_bytes(src_db, src_config))
+    marker = b'VIDEOS_DIR-1'
+    data[data.index(marker)] = ord('X')
+    dst_db, dst_config = make_library(tmp_path, 'dst')
+    with pytest.raises(ValueError):
+        import_archive(io.BytesIO(bytes(data)), dst_db, dst_config)
+    assert os.listdir(dst_config['VIDEOS_DIR']) == []
+    assert dst_db.get_all_dreams() == []
+
+def test_import_skips_conflicting_files(tmp_path):
+    src_db, src_config = make_library(tmp_path, 'src')
+    add_dream(src_db, src_config, 1)
+    dst_db, dst_config = make_library(tmp_path, 'dst')
+    with open(os.path.join(dst_config['VIDEOS_DIR'], 'v1.mp4'), 'wb') as f:
+        f.write(b'something else')
+    summary = import_archive(io.BytesIO(export_bytes(src_db, src_config)), dst_db, dst_config)
+    assert summary['conflicts'] == 1
+    assert summary['dreams'] == 0
+    with open(os.path.join(dst_config['VIDEOS_DIR'], 'v1.mp4'), 'rb') as f:
+        assert f.read() == b'something else'
+
+def test_existing_file_is_hashed_even_if_its_hash_is_known(tmp_path):
+    from functions.blob_store import BlobStore
+    src_db, src_config = make_library(tmp_path, 'src')
+    add_dream(src_db, src_config, 1)
+    sha256 = src_db.get_all_dreams()[0]['video_sha256']
+    dst_db, dst_config = make_library(tmp_path, 'dst')
+    # The library knows the hash under another name, and v1.mp4 holds something else
+    dst_db.save_dream(DreamData(user_prompt='', generated_prompt='', audio_filename='',
+                                video_filename='other.mp4', thumb_filename='').model_dump() | {'video_sha256': sha256})
+    with open(os.path.join(dst_config['VIDEOS_DIR'], 'v1.mp4'), 'wb') as f:
+        f.write(b'local video')
+    summary = import_archive(io.BytesIO(export_bytes(src_db, src_config)), dst_db, dst_config)
+    assert summary['conflicts'] == 1
+    assert summary['dreams'] == 0
+    assert not BlobStore(dst_db, dst_config).has(sha256)
@@ -0,0 +1,14 @@
+from scripts.load_test import FRAME_BYTES, StepStats, load_frames
+
+def test_frames_from_a_recording(tmp_path):
+    recording = tmp_path / 'dream.webm'
+    recording.write_bytes(b'x' * (FRAME_BYTES * 2 + 1))
+    frames = load_frames(str(recording))
+    assert [len(frame) for frame in frames] == [FRAME_BYTES, FRAME_BYTES, 1]
+    assert all(len(frame) == FRAME_BYTES for frame in load_frames(None))
+
+def test_late_acks_count_as_dropped():
+    stats = StepStats()
+    stats.frames_sent = 4
+    stats.frame_latency = [0.01, 0.02, 2.5]
+    assert stats.frames_acked(timeout=1.0) == 2
@@ -0,0 +1,215 @@
+import hashlib
+import hmac
+import os
+import re
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, urlsplit
+from functions.media_backend import MediaBackend, LocalBackend, S3Backend, MediaBackendError, get_media_backend
+
+ACCESS_KEY = 'minio'
+SECRET_KEY = 'minio-secret'
+REGION = 'us-east-1'
+
+def _signature(canonical_request, amz_date, scope):
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+    ])
+    key = ('AWS4' + SECRET_KEY).encode()
+    for part in scope.split('/'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+def _canonical_query(pairs):
+    return '&'.join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(pairs))
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """Just enough of the S3 API, with SigV4 checks, to exercise S3Backend."""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _authorized(self, path, query):
+        server = self.server
+        params = dict(query)
+        if 'X-Amz-Signature' in params:
+            signature = params.pop('X-Amz-Signature')
+            scope = params['X-Amz-Credential'].split('/', 1)[1]
+            canonical = '\n'.join([self.command, path, _canonical_query(params.items()),
+                                   f"host:{self.headers['Host']}\n", 'host', 'UNSIGNED-PAYLOAD'])
+            return signature == _signature(canonical, params['X-Amz-Date'], scope)
+        auth = self.headers.get('Authorization', '')
+        match = re.match(r'AWS4-HMAC-SHA256 Credential=([^/]+)/(\S+), SignedHeaders=(\S+), Signature=(\w+)', auth)
+        if not match or match.group(1) != ACCESS_KEY:
+            return False
+        scope, signed_headers, signature = match.group(2), match.group(3), match.group(4)
+        headers = ''.join(f"{h}:{self.headers[h].strip()}\n" for h in signed_headers.split(';'))
+        canonical = '\n'.join([self.command, path, _canonical_query(query), headers, signed_headers,
+                               self.headers['x-amz-content-sha256']])
+        server.requests.append((self.command, path, dict(query)))
+        return signature == _signature(canonical, self.headers['x-amz-date'], scope)
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        query = parse_qsl(url.query, keep_blank_values=True)
+        if not self._authorized(url.path, query):
+            return self._reply(403, b'<Error><Code>SignatureDoesNotMatch</Code></Error>')
+        params = dict(query)
+        key = url.path.split('/', 2)[2]
+        objects, uploads = self.server.objects, self.server.uploads
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.command == 'POST' and 'uploads' in params:
+            upload_id = f"upload-{len(uploads) + 1}"
+            uploads[upload_id] = {}
+            return self._reply(200, f'<InitiateMultipartUploadResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                                    f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>'.encode())
+        if self.command == 'PUT' and 'uploadId' in params:
+            part = int(params['partNumber'])
+            if part in self.server.fail_parts:
+                return self._reply(500, b'<Error><Code>InternalError</Code></Error>')
+            uploads[params['uploadId']][part] = body
+            return self._reply(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+        if self.command == 'POST' and 'uploadId' in params:
+            parts = uploads.pop(params['uploadId'])
+            numbers = [int(n) for n in re.findall(rb'<PartNumber>(\d+)</PartNumber>', body)]
+            objects[key] = b''.join(parts[n] for n in numbers)
+            return self._reply(200, b'<CompleteMultipartUploadResult/>')
+        if self.command == 'DELETE' and 'uploadId' in params:
+            uploads.pop(params['uploadId'], None)
+            self.server.aborted += 1
+            return self._reply(204)
+        if self.command == 'PUT':
+            objects[key] = body
+            return self._reply(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+        if self.command == 'DELETE':
+            objects.pop(key, None)
+            return self._reply(204)
+        if key not in objects:
+            return self._reply(404, b'<Error><Code>NoSuchKey</Code></Error>')
+        data = objects[key]
+        headers = {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+        if 'response-content-type' in params:
+            headers['Content-Type'] = params['response-content-type']
+        if self.command == 'HEAD':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('ETag', headers['ETag'])
+            self.end_headers()
+            return
+        return self._reply(200, data, headers)
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _handle
+
+@pytest.fixture
+def fake_s3():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeS3Handler)
+    server.objects, server.uploads, server.requests = {}, {}, []
+    server.fail_parts, server.aborted = set(), 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def s3(fake_s3):
+    host, port = fake_s3.server_address
+    return S3Backend(f"http://{host}:{port}", 'dreams', ACCESS_KEY, SECRET_KEY, region=REGION, prefix='recorder-1')
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def test_s3_put_stat_open_delete(s3, fake_s3, tmp_path):
+    path = write(tmp_path / 'thumb.png', b'png-bytes')
+    s3.put_file('ab/cd/abcd', path)
+    assert fake_s3.objects == {'recorder-1/ab/cd/abcd': b'png-bytes'}
+    assert s3.stat('ab/cd/abcd')['size'] == 9
+    assert b''.join(s3.open('ab/cd/abcd', chunk_size=4)) == b'png-bytes'
+    assert s3.delete('ab/cd/abcd') is True
+    assert s3.stat('ab/cd/abcd') is None
+    assert s3.delete('ab/cd/abcd') is False
+    with pytest.raises(FileNotFoundError):
+        list(s3.open('ab/cd/abcd'))
+
+def test_s3_large_files_use_multipart(s3, fake_s3, tmp_path):
+    data = os.urandom(s3.part_size * 2 + 123)
+    path = write(tmp_path / 'video.mp4', data)
+    s3.put_file('video', path)
+    assert fake_s3.objects['recorder-1/video'] == data
+    part_uploads = [r for r in fake_s3.requests if r[0] == 'PUT' and 'partNumber' in r[2]]
+    assert [int(r[2]['partNumber']) for r in part_uploads] == [1, 2, 3]
+
+def test_s3_failed_multipart_is_aborted(s3, fake_s3, tmp_path):
+    fake_s3.fail_parts.add(2)
+    path = write(tmp_path / 'video.mp4', os.urandom(s3.part_size * 2))
+    with pytest.raises(MediaBackendError):
+        s3.put_file('video', path)
+    assert fake_s3.aborted == 1
+    assert fake_s3.uploads == {}
+    assert 'recorder-1/video' not in fake_s3.objects
+
+def test_s3_rejects_bad_credentials(fake_s3, tmp_path):
+    host, port = fake_s3.server_address
+    backend = S3Backend(f"http://{host}:{port}", 'dreams', ACCESS_KEY, 'wrong', region=REGION)
+    with pytest.raises(MediaBackendError):
+        backend.put_file('x', write(tmp_path / 'x', b'x'))
+
+def test_s3_presigned_url_is_fetchable(s3, tmp_path):
+    s3.put_file('ab/cd/abcd', write(tmp_path / 'v.mp4', b'movie'))
+    url = s3.url('ab/cd/abcd', expires=600, content_type='video/mp4')
+    assert 'X-Amz-Expires=600' in url
+    response = requests.get(url)
+    assert response.status_code == 200
+    assert response.content == b'movie'
+    assert response.headers['Content-Type'] == 'video/mp4'
+    # Tampering with the URL invalidates it
+    assert requests.get(url.replace('X-Amz-Expires=600', 'X-Amz-Expires=9999')).status_code == 403
+
+def test_local_backend(tmp_path):
+    backend = LocalBackend(str(tmp_path / 'blobs'))
+    src = write(tmp_path / 'a.mp4', b'abc')
+    backend.put_file('ab/cd/abcd', src)
+    assert os.path.samefile(src, backend.path('ab/cd/abcd'))
+    assert backend.stat('ab/cd/abcd')['size'] == 3
+    assert b''.join(backend.open('ab/cd/abcd')) == b'abc'
+    assert backend.url('ab/cd/abcd') is None
+    assert backend.delete('ab/cd/abcd') is True
+    assert backend.delete('ab/cd/abcd') is False
+
+def test_backends_must_implement_every_operation():
+    class Incomplete(MediaBackend):
+        def put_file(self, key, path, content_type=None):
+            pass
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_get_media_backend_selects_backend(tmp_path):
+    config = {
+        'MEDIA_STORAGE_BACKEND': 's3', 'MEDIA_BLOBS_DIR': str(tmp_path),
+        'S3_ENDPOINT_URL': 'http://minio:9000/', 'S3_BUCKET': 'b', 'S3_ACCESS_KEY_ID': 'k',
+        'S3_SECRET_ACCESS_KEY': 's', 'S3_REGION': 'eu-west-1', 'S3_PREFIX': '', 'S3_MULTIPART_CHUNK_MB': 1,
+    }
+    backend = get_media_backend(config)
+    assert isinstance(backend, S3Backend)
+    assert backend.endpoint_url == 'http://minio:9000'
+    assert backend.part_size == 5 * 1024 * 1024
+    config['S3_MULTIPART_CHUNK_MB'] = 1024
+    assert get_media_backend(config).part_size == 64 * 1024 * 1024
+    config['MEDIA_STORAGE_BACKEND'] = 'local'
+    assert isinstance(get_media_backend(config), LocalBackend)
+    config['MEDIA_STORAGE_BACKEND'] = 'ftp'
+    with pytest.raises(ValueError):
+        get_media_backend(config)
@@ -0,0 +1,50 @@
+import hashlib
+import pytest
+from unittest import mock
+from functions import media_info
+
+def test_file_sha256(tmp_path):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(b'dream' * 1000)
+    assert media_info.file_sha256(str(path), chunk_size=7) == hashlib.sha256(b'dream' * 1000).hexdigest()
+
+def test_probe_media_video(monkeypatch):
+    monkeypatch.setattr(media_info.ffmpeg, 'probe', lambda p: {
+        'format': {'duration': '5.04'},
+        'streams': [{'codec_type': 'audio'}, {'codec_type': 'video', 'width': 1280, 'height': 544}]
+    })
+    assert media_info.probe_media('v.mp4') == {'duration': 5.04, 'width': 1280, 'height': 544}
+
+def test_collect_media_metadata(monkeypatch, tmp_path):
+    video = tmp_path / 'v.mp4'
+    thumb = tmp_path / 't.png'
+    audio = tmp_path / 'a.wav'
+    for f in (video, thumb, audio):
+        f.write_bytes(b'x' * 10)
+    def fake_probe(path):
+        if path.endswith('.mp4'):
+            return {'duration': 5.0, 'width': 1280, 'height': 544}
+        return {'duration': 3.2, 'width': None, 'height': None}
+    monkeypatch.setattr(media_info, 'probe_media', fake_probe)
+    metadata = media_info.collect_media_metadata(str(video), str(thumb), str(audio))
+    assert metadata['video_width'] == 1280
+    assert metadata['video_duration'] == 5.0
+    assert metadata['audio_duration'] == 3.2
+    assert metadata['thumb_bytes'] == 10
+    assert 'thumb_duration' not in metadata
+    assert len(metadata['audio_sha256']) == 64
+
+def test_collect_media_metadata_missing_and_probe_errors(monkeypatch, tmp_path):
+    video = tmp_path / 'v.mp4'
+    video.write_bytes(b'x')
+    def fail(path): raise Exception('ffprobe fail')
+    monkeypatch.setattr(media_info, 'probe_media', fail)
+    logger = mock.Mock()
+    metadata = media_info.collect_media_metadata(str(video), str(tmp_path / 'missing.png'), None, logger=logger)
+    assert metadata == {'video_bytes': 1, 'video_sha256': media_info.file_sha256(str(video))}
+    logger.warning.assert_called()
+
+def test_dream_media_paths():
+    config = {'VIDEOS_DIR': 'media/video', 'THUMBS_DIR': 'media/thumbs', 'RECORDINGS_DIR': 'media/audio'}
+    dream = {'video_filename': 'v.mp4', 'thumb_filename': None, 'audio_filename': ''}
+    assert media_info.dream_media_paths(dream, config) == ('media/video/v.mp4', None, None)
@@ -0,0 +1,83 @@
+import os
+import time
+import pytest
+from functions import media_scanner
+from functions.dream_db import DreamDB, DreamData
+
+@pytest.fixture
+def config(tmp_path):
+    config = {
+        'VIDEOS_DIR': str(tmp_path / 'video'),
+        'THUMBS_DIR': str(tmp_path / 'thumbs'),
+        'RECORDINGS_DIR': str(tmp_path / 'audio'),
+        'MEDIA_SCAN_MIN_AGE_MINUTES': 60,
+    }
+    for key in ('VIDEOS_DIR', 'THUMBS_DIR', 'RECORDINGS_DIR'):
+        os.makedirs(config[key])
+    return config
+
+@pytest.fixture
+def dream_db(tmp_path):
+    return DreamDB(db_path=str(tmp_path / 'dreams.db'))
+
+def write(path, size=10, age=7200):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+def test_scan_reports_orphans_and_missing(dream_db, config):
+    write(os.path.join(config['VIDEOS_DIR'], 'kept.mp4'))
+    write(os.path.join(config['THUMBS_DIR'], 'kept.png'))
+    write(os.path.join(config['VIDEOS_DIR'], 'generated_old.mp4'), size=100)
+    write(os.path.join(config['RECORDINGS_DIR'], 'recording_old.wav'), size=50)
+    write(os.path.join(config['VIDEOS_DIR'], 'generated_new.mp4'), age=0)
+    write(os.path.join(config['VIDEOS_DIR'], '.gitkeep'))
+    dream_id = dream_db.save_dream(DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename='gone.wav',
+        video_filename='kept.mp4', thumb_filename='kept.png'
+    ).model_dump())
+    report = media_scanner.scan_media(dream_db, config)
+    assert sorted(os.path.basename(p) for p in report['orphans']) == ['generated_old.mp4', 'recording_old.wav']
+    assert report['orphan_bytes'] == 150
+    assert report['removed'] == 0
+    assert report['missing'] == [{'ids': [dream_id], 'kind': 'audio', 'filename': 'gone.wav'}]
+    assert os.path.exists(os.path.join(config['VIDEOS_DIR'], 'generated_old.mp4'))
+    assert media_scanner.scan_status['orphans'] == 2
+    assert media_scanner.scan_status['missing'] == 1
+    assert media_scanner.scan_status['running'] is False
+
+def test_scan_reports_every_dream_sharing_a_missing_file(dream_db, config):
+    dream_ids = [dream_db.save_dream(DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename='', video_filename='shared.mp4', thumb_filename=''
+    ).model_dump()) for _ in range(2)]
+    report = media_scanner.scan_media(dream_db, config)
+    assert report['missing'] == [{'ids': dream_ids, 'kind': 'video', 'filename': 'shared.mp4'}]
+    assert report['missing_count'] == 1
+
+def test_scan_removes_orphans(dream_db, config):
+    write(os.path.join(config['VIDEOS_DIR'], 'generated_old.mp4'))
+    write(os.path.join(config['VIDEOS_DIR'], 'generated_new.mp4'), age=0)
+    write(os.path.join(config['RECORDINGS_DIR'], 'recording.wav.part'))
+    report = media_scanner.scan_media(dream_db, config, remove_orphans=True)
+    assert report['removed'] == 2
+    assert os.listdir(config['VIDEOS_DIR']) == ['generated_new.mp4']
+    assert os.listdir(config['RECORDINGS_DIR']) == []
+
+def test_scan_walks_database_in_batches(dream_db, config, monkeypatch):
+    for i in range(5):
+        write(os.path.join(config['VIDEOS_DIR'], f'v{i}.mp4'))
+        dream_db.save_dream(DreamData(
+            user_prompt='u', generated_prompt='g', audio_filename='', video_filename=f'v{i}.mp4', thumb_filename=''
+        ).model_dump())
+    calls = []
+    original = dream_db.get_media_references
+    def spy(after_id=0, limit=1000):
+        calls.append(after_id)
+        return original(after_id=after_id, limit=limit)
+    monkeypatch.setattr(dream_db, 'get_media_references', spy)
+    report = media_scanner.scan_media(dream_db, config, batch_size=2)
+    assert len(calls) == 4
+    assert report['orphan_count'] == 0
+    assert report['missing_count'] == 0
+    assert report['files_scanned'] == 5
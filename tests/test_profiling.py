@@ -0,0 +1,87 @@
+import sys
+import gevent
+import tracemalloc
+from functions.profiling import (
+    SamplingProfiler, MemoryTracer, collapse_stack, format_collapsed, format_import_times, parse_import_times
+)
+
+def test_collapse_stack_runs_from_the_root():
+    def inner():
+        return collapse_stack(sys._getframe(), 'hub')
+    stack = inner()
+    frames = stack.split(';')
+    assert frames[0] == 'hub'
+    assert frames[-1].startswith('inner (tests/test_profiling.py:')
+    assert frames[-2].startswith('test_collapse_stack_runs_from_the_root (tests/test_profiling.py:')
+
+def test_format_collapsed_most_frequent_first():
+    from collections import Counter
+    assert format_collapsed(Counter({'hub;a': 1, 'hub;a;b': 3})) == 'hub;a;b 3\nhub;a 1\n'
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       300 |        300 |   _io
+import time:       120 |        120 |     json.decoder
+import time:       200 |        320 |   json
+import time:      2000 |       2000 |     openai._models
+import time:     50000 |      52000 |   openai
+import time:      1000 |      53620 | dream_recorder
+import time:        50 |         50 | site
+"""
+
+def test_parse_import_times_builds_the_tree():
+    tree = parse_import_times(IMPORTTIME_OUTPUT)
+    assert [node[0] for node in tree] == ['dream_recorder', 'site']
+    name, self_seconds, cumulative, children = tree[0]
+    assert (self_seconds, cumulative) == (0.001, 0.05362)
+    # Heaviest first, each with its own imports underneath
+    assert [child[0] for child in children] == ['openai', 'json', '_io']
+    assert children[0][3][0][0] == 'openai._models'
+
+def test_format_import_times_hides_cheap_imports():
+    text = format_import_times(parse_import_times(IMPORTTIME_OUTPUT), max_depth=2, min_seconds=0.001)
+    assert text.splitlines()[1:] == ['     53.6      1.0  dream_recorder', '     52.0     50.0    openai']
+
+def busy(seconds):
+    end = gevent.get_hub().loop.now() + seconds
+    while gevent.get_hub().loop.now() < end:
+        gevent.get_hub().loop.update_now()
+
+def test_profile_samples_the_busy_greenlet():
+    profiler = SamplingProfiler()
+    worker = gevent.spawn(busy, 0.3)
+    counts, samples = profiler.profile(0.3, interval_ms=2)
+    worker.join()
+    assert samples > 10
+    assert not profiler.running
+    assert any('busy (tests/test_profiling.py:' in stack for stack in counts)
+
+def test_memory_diff_needs_a_baseline():
+    # As when PYTHONTRACEMALLOC started tracing without the tracer
+    tracemalloc.start()
+    try:
+        MemoryTracer().diff()
+    except RuntimeError as e:
+        assert 'baseline' in str(e)
+    else:
+        raise AssertionError('diff() should need a baseline')
+    finally:
+        tracemalloc.stop()
+
+def test_memory_diff_finds_growth():
+    tracer = MemoryTracer()
+    try:
+        tracer.start()
+        retained = [bytearray(1024) for _ in range(200)]
+        diff = tracer.diff(limit=5)
+        assert diff['tracing']
+        assert any('test_profiling.py' in ''.join(stat['traceback']) and stat['size_diff'] >= 200 * 1024
+                   for stat in diff['top'])
+        assert len(retained) == 200
+    finally:
+        tracer.stop()
+    try:
+        tracer.top()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('top() should need tracemalloc to be running')
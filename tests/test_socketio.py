@@ -49,6 +49,8 @@ def test_playback_flow(mocker):
 
 def test_no_dreams_playback(socketio_client, mock_dream_db):
     mock_dream_db.get_all_dreams.return_value = []
+    # Drop the play_video broadcasts from the playback tests before this one
+    socketio_client.get_received()
     socketio_client.emit('show_previous_dream')
     time.sleep(0.1)
     received = socketio_client.get_received()
@@ -96,4 +98,21 @@ def test_state_reset_after_recording(socketio_client, mocker):
     # Start again, should reset state
     socketio_client.emit('start_recording')
     received = socketio_client.get_received()
-    assert any(x['name'] == 'state_update' and x['args'][0]['status'] == 'recording' for x in received) 
\ No newline at end of file
+    assert any(x['name'] == 'state_update' and x['args'][0]['status'] == 'recording' for x in received)
+
+def test_playback_skips_evicted_and_marks_played(mocker):
+    from dream_recorder import socketio, app, video_playback_state
+    video_playback_state['current_index'] = 0
+    video_playback_state['is_playing'] = False
+    mock_db = mocker.MagicMock()
+    mock_db.get_all_dreams.return_value = [
+        {'id': 3, 'video_filename': ''},
+        {'id': 2, 'video_filename': 'dream2.mp4'},
+    ]
+    mocker.patch('dream_recorder.dream_db', mock_db)
+    client = socketio.test_client(app)
+    client.emit('show_previous_dream')
+    received = client.get_received()
+    assert any(x['name'] == 'play_video' and 'dream2.mp4' in x['args'][0]['video_url'] for x in received)
+    mock_db.mark_played.assert_called_with(2)
+    client.disconnect()
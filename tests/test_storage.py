@@ -0,0 +1,114 @@
+import os
+import pytest
+from unittest import mock
+from functions import storage
+from functions.dream_db import DreamDB, DreamData
+from functions.blob_store import BlobStore
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def config(tmp_path):
+    config = {
+        'VIDEOS_DIR': str(tmp_path / 'video'),
+        'THUMBS_DIR': str(tmp_path / 'thumbs'),
+        'RECORDINGS_DIR': str(tmp_path / 'audio'),
+        'MEDIA_BLOBS_DIR': str(tmp_path / 'blobs'),
+        'MEDIA_STORAGE_BUDGET_MB': 0,
+        'MEDIA_EVICTION_POLICY': 'downgrade',
+        'GENERATION_MIN_FREE_MB': 0,
+    }
+    for key in ('VIDEOS_DIR', 'THUMBS_DIR', 'RECORDINGS_DIR'):
+        os.makedirs(config[key])
+    return config
+
+@pytest.fixture
+def dream_db(tmp_path):
+    return DreamDB(db_path=str(tmp_path / 'dreams.db'))
+
+def add_dream(db, config, n, video_mb=1):
+    names = {'VIDEOS_DIR': f'v{n}.mp4', 'THUMBS_DIR': f't{n}.png', 'RECORDINGS_DIR': f'a{n}.wav'}
+    sizes = {'VIDEOS_DIR': video_mb * MB, 'THUMBS_DIR': 1000, 'RECORDINGS_DIR': 2000}
+    for key, name in names.items():
+        with open(os.path.join(config[key], name), 'wb') as f:
+            f.write(b'\0' * sizes[key])
+    return db.save_dream(DreamData(
+        user_prompt='u', generated_prompt='g', audio_filename=names['RECORDINGS_DIR'],
+        video_filename=names['VIDEOS_DIR'], thumb_filename=names['THUMBS_DIR']
+    ).model_dump())
+
+def test_usage_counts_hardlinks_once(dream_db, config):
+    add_dream(dream_db, config, 1)
+    os.link(os.path.join(config['VIDEOS_DIR'], 'v1.mp4'), os.path.join(config['VIDEOS_DIR'], 'copy.mp4'))
+    BlobStore(dream_db, config).ingest(os.path.join(config['VIDEOS_DIR'], 'v1.mp4'))
+    usage = storage.StorageManager(dream_db, config).usage()
+    assert usage == {'total': MB + 3000, 'video': MB, 'thumbs': 1000, 'audio': 2000, 'blobs': 0}
+
+def test_usage_walks_the_disk_off_the_hub(dream_db, config, monkeypatch):
+    from gevent import monkey
+    import dream_recorder  # applies the monkey patches
+    get_ident = monkey.get_original('threading', 'get_ident')
+    threads = []
+    iter_files = storage._iter_files
+    def spy(directory):
+        threads.append(get_ident())
+        return iter_files(directory)
+    monkeypatch.setattr(storage, '_iter_files', spy)
+    storage.StorageManager(dream_db, config).usage()
+    assert threads and get_ident() not in threads
+
+def test_budget_disabled_evicts_nothing(dream_db, config):
+    add_dream(dream_db, config, 1)
+    assert storage.StorageManager(dream_db, config).enforce_budget() == []
+
+def test_downgrade_evicts_least_recently_played(dream_db, config):
+    first = add_dream(dream_db, config, 1)
+    second = add_dream(dream_db, config, 2)
+    third = add_dream(dream_db, config, 3)
+    for dream_id, created_at in ((first, '2024-01-01 00:00:00'), (second, '2024-01-02 00:00:00'), (third, '2024-01-03 00:00:00')):
+        dream_db.update_dream(dream_id, {'created_at': created_at})
+    # The oldest dream was played recently, so the second one goes first
+    dream_db.mark_played(first)
+    config['MEDIA_STORAGE_BUDGET_MB'] = 3
+    evicted = storage.StorageManager(dream_db, config).enforce_budget()
+    assert evicted == [second]
+    dream = dream_db.get_dream(second)
+    assert dream['video_filename'] == ''
+    assert dream['status'] == 'archived'
+    assert dream['audio_filename'] == 'a2.wav'
+    assert not os.path.exists(os.path.join(config['VIDEOS_DIR'], 'v2.mp4'))
+    assert os.path.exists(os.path.join(config['RECORDINGS_DIR'], 'a2.wav'))
+    assert dream_db.get_dream(third)['video_filename'] == 'v3.mp4'
+
+def test_delete_policy_removes_dreams(dream_db, config):
+    first = add_dream(dream_db, config, 1)
+    add_dream(dream_db, config, 2)
+    config['MEDIA_STORAGE_BUDGET_MB'] = 2
+    config['MEDIA_EVICTION_POLICY'] = 'delete'
+    assert storage.StorageManager(dream_db, config).enforce_budget() == [first]
+    assert dream_db.get_dream(first) is None
+    assert os.listdir(config['THUMBS_DIR']) == ['t2.png']
+
+def test_refuses_generation_when_disk_is_full(dream_db, config, monkeypatch):
+    manager = storage.StorageManager(dream_db, config)
+    config['GENERATION_MIN_FREE_MB'] = 300
+    monkeypatch.setattr(manager, 'free_bytes', lambda: 100 * MB)
+    assert manager.has_room_for_generation() is False
+    with pytest.raises(storage.InsufficientStorageError):
+        manager.ensure_room_for_generation()
+    monkeypatch.setattr(manager, 'free_bytes', lambda: 500 * MB)
+    manager.ensure_room_for_generation()
+
+def test_process_audio_refuses_without_space(monkeypatch):
+    from functions import audio
+    def refuse(self):
+        raise storage.InsufficientStorageError('Not enough free disk space')
+    monkeypatch.setattr(storage.StorageManager, 'ensure_room_for_generation', refuse)
+    save_wav = mock.Mock()
+    monkeypatch.setattr(audio, 'save_wav_file', save_wav)
+    socketio = mock.Mock()
+    recording_state = {}
+    audio.process_audio('sid', socketio, mock.Mock(), recording_state, [b'audio'])
+    assert recording_state['status'] == 'error'
+    save_wav.assert_not_called()
+    socketio.emit.assert_any_call('error', {'message': 'Not enough free disk space'})
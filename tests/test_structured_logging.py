@@ -0,0 +1,95 @@
+import json
+import logging
+import gevent
+from functions.dream_db import _off_hub
+from functions.structured_logging import (
+    AsyncQueueHandler, JsonFormatter, LogWriter, TextFormatter, current_trace_id, pop_trace_cost, trace, traced,
+    _SimpleQueue
+)
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+def make_logger(name, max_chars=2000):
+    """A logger writing JSON through its own queue and writer thread, as configure_logging sets up the root."""
+    queue = _SimpleQueue()
+    target = ListHandler()
+    target.setFormatter(JsonFormatter())
+    writer = LogWriter(queue, target)
+    writer.start()
+    log = logging.getLogger(name)
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    log.handlers = [AsyncQueueHandler(queue, max_chars)]
+    return log, writer, target
+
+def test_json_lines_carry_the_trace_id():
+    log, writer, target = make_logger('test.json')
+    with trace('abc123'):
+        log.info('transcribed %d words', 12, extra={'stage': 'transcribe'})
+    log.warning('no trace')
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        log.exception('failed')
+    writer.stop()
+    first, second, third = (json.loads(line) for line in target.lines)
+    assert first['message'] == 'transcribed 12 words'
+    assert first['trace_id'] == 'abc123' and first['stage'] == 'transcribe'
+    assert first['level'] == 'INFO' and first['logger'] == 'test.json'
+    assert 'trace_id' not in second
+    assert 'ValueError: boom' in third['exc']
+
+def test_long_messages_are_truncated():
+    log, writer, target = make_logger('test.truncate', max_chars=10)
+    log.info('x' * 50)
+    writer.stop()
+    assert json.loads(target.lines[0])['message'] == 'x' * 10 + '... [40 more characters]'
+
+def test_trace_follows_spawned_greenlets_and_threadpool():
+    @_off_hub
+    def in_thread():
+        return current_trace_id()
+    def pipeline():
+        return current_trace_id(), in_thread()
+    assert gevent.spawn(traced('t1', pipeline)).get() == ('t1', 't1')
+    # A greenlet spawned without traced() starts without one
+    assert gevent.spawn(pipeline).get() == (None, None)
+
+def test_logging_cost_is_counted_per_trace():
+    log, writer, target = make_logger('test.cost')
+    with trace('dream-1'):
+        for _ in range(3):
+            log.info('poll')
+    writer.stop()
+    records, seconds = pop_trace_cost('dream-1')
+    assert records == 3 and seconds > 0
+    assert pop_trace_cost('dream-1') == (0, 0.0)
+
+def test_text_format_shows_trace():
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, 'hello', None, None)
+    record.trace_id = 'abc'
+    assert TextFormatter().format(record) == 'INFO:app:[abc] hello'
+
+def test_logging_does_not_take_the_handler_lock():
+    log, writer, target = make_logger('test.lock')
+    handler = log.handlers[0]
+    @_off_hub
+    def log_from_thread():
+        with trace('dream-2'):
+            log.info('from the threadpool')
+    # Python 3.13's Handler.handle always takes self.lock; holding it here would deadlock the thread
+    handler.acquire()
+    try:
+        with gevent.Timeout(5):
+            log_from_thread()
+    finally:
+        handler.release()
+    writer.stop()
+    assert json.loads(target.lines[0])['message'] == 'from the threadpool'
+    assert pop_trace_cost('dream-2')[0] == 1
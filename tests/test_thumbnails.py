@@ -0,0 +1,98 @@
+import os
+import pytest
+import ffmpeg
+from functions import thumbnails
+from functions.thumbnails import ThumbnailCache, snap_width, thumbnail_srcset, thumbnail_url, source_key
+
+@pytest.fixture
+def config(tmp_path):
+    return {'THUMB_CACHE_DIR': str(tmp_path / 'cache'), 'THUMB_CACHE_MAX_MB': 1, 'THUMB_FORMAT': 'webp'}
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """Record ffmpeg invocations and write a variant whose size is 1 KiB per 10px of width."""
+    calls = []
+    def run(stream, **kwargs):
+        args = ffmpeg.compile(stream)
+        calls.append(args)
+        width = int(args[args.index('-filter_complex') + 1].split('scale=')[1].split(':')[0])
+        with open(stream.node.kwargs['filename'], 'wb') as f:
+            f.write(b'v' * (width * 1024 // 10))
+    monkeypatch.setattr(thumbnails.ffmpeg, 'run', run)
+    return calls
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'thumb.png'
+    path.write_bytes(b'png')
+    return str(path)
+
+def test_snap_width():
+    assert snap_width(1) == 160
+    assert snap_width(160) == 160
+    assert snap_width(161) == 320
+    assert snap_width(5000) == 480
+
+def test_srcset_lists_every_width(monkeypatch):
+    monkeypatch.setattr(thumbnails, 'get_config', lambda: {'THUMB_FORMAT': 'webp'})
+    assert thumbnail_url('/media/blobs/ab.png', 300) == '/media/blobs/ab.png?w=320&fmt=webp'
+    assert thumbnail_srcset('/t.png', fmt='jpeg') == '/t.png?w=160&fmt=jpeg 160w, /t.png?w=320&fmt=jpeg 320w, /t.png?w=480&fmt=jpeg 480w'
+    assert thumbnail_srcset('') == ''
+
+def test_variant_is_generated_once(config, fake_ffmpeg, source):
+    cache = ThumbnailCache(config)
+    path = cache.variant('ab' * 32, source, 150, 'webp')
+    assert path == os.path.join(config['THUMB_CACHE_DIR'], 'ab', f"{'ab' * 32}-160.webp")
+    assert os.path.getsize(path) == 16 * 1024
+    assert cache.variant('ab' * 32, source, 160, 'webp') == path
+    assert len(fake_ffmpeg) == 1
+    assert fake_ffmpeg[0][fake_ffmpeg[0].index('-c:v') + 1] == 'libwebp'
+    # No temporary files are left behind
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+    assert cache.size() == 16 * 1024
+
+def test_variant_from_streamed_source(config, fake_ffmpeg):
+    cache = ThumbnailCache(config)
+    path = cache.variant('cd' * 32, iter([b'pn', b'g']), 320, 'jpeg')
+    assert path.endswith('-320.jpg')
+    source_arg = fake_ffmpeg[0][fake_ffmpeg[0].index('-i') + 1]
+    assert source_arg.endswith('.src')
+    assert not os.path.exists(source_arg)
+
+def test_failed_resize_leaves_nothing(config, monkeypatch, source):
+    def run(stream, **kwargs):
+        open(stream.node.kwargs['filename'], 'wb').close()
+        raise ffmpeg.Error('ffmpeg', b'', b'boom')
+    monkeypatch.setattr(thumbnails.ffmpeg, 'run', run)
+    cache = ThumbnailCache(config)
+    with pytest.raises(ffmpeg.Error):
+        cache.variant('ab' * 32, source, 160, 'webp')
+    assert os.listdir(os.path.join(config['THUMB_CACHE_DIR'], 'ab')) == []
+
+def test_unknown_format_rejected(config, source):
+    with pytest.raises(ValueError):
+        ThumbnailCache(config).variant('ab' * 32, source, 160, 'gif')
+
+def test_cache_evicts_least_recently_used(config, fake_ffmpeg, source):
+    cache = ThumbnailCache(config)
+    # 480px variants are 48 KiB each; a 1 MiB budget holds 21 of them
+    paths = []
+    for i in range(21):
+        key = f"{i:02d}" + 'a' * 62
+        paths.append(cache.variant(key, source, 480, 'webp'))
+        os.utime(paths[-1], (i, i))
+    # Requesting the oldest one again makes it the most recently used
+    cache.variant('00' + 'a' * 62, source, 480, 'webp')
+    assert len(fake_ffmpeg) == 21
+    cache.variant('99' + 'a' * 62, source, 480, 'webp')
+    assert cache.size() <= 1024 * 1024 * thumbnails.EVICT_TARGET
+    assert os.path.exists(paths[0])
+    assert not os.path.exists(paths[1])
+    assert cache.size() == sum(os.path.getsize(p) for p in paths + [cache.path_for('99' + 'a' * 62, 480, 'webp')] if os.path.exists(p))
+
+def test_source_key_changes_with_content(source):
+    key = source_key(source)
+    assert key == source_key(source)
+    with open(source, 'ab') as f:
+        f.write(b'more')
+    assert source_key(source) != key